@@ -0,0 +1,6 @@
+"""Benchmarks for the Materials Commons CLI
+
+These run `mc` commands in-process against :class:`benchmarks.fake_server.FakeServer`, an
+in-memory stand-in for the Materials Commons REST API, so they do not need a live remote.
+See :mod:`benchmarks.bench` for usage.
+"""
@@ -0,0 +1,243 @@
+"""End-to-end benchmarks for `mc` commands against an in-process fake server
+
+Each scenario builds a synthetic project (see :func:`benchmarks.fake_server.synthetic_tree`),
+served by a :class:`benchmarks.fake_server.FakeServer` with simulated latency and bandwidth,
+clones it to a temporary directory, and then times one operation:
+
+- 'up': `mc up -r .` of a local tree to an empty remote project
+- 'down': `mc down -r .` of a remote tree to an empty local project
+- 'ls': `mc ls` of every directory, with matching local and remote trees
+- 'ls-auto-lock': 'ls', repeated with `mc fetch --auto-lock` set and no remote changes
+- 'fetch': `mc fetch -r .` to fill the remote tree cache
+- 'treecompare': `treecompare` of every directory, with checksums
+- 'localtree': recursive LocalTree refresh of an empty cache
+- 'localtree-warm': recursive LocalTree refresh of an up-to-date cache
+
+For each scenario the wall time, number of API calls (total and by endpoint), file bytes sent and
+received, and peak RSS are reported. By default each scenario runs in a fresh process, so that
+peak RSS is per scenario.
+
+Usage: ::
+
+    python -m benchmarks.bench
+    python -m benchmarks.bench --files 100000 --shape deep --latency 0.02 --bandwidth 50e6
+    python -m benchmarks.bench --scenario up --scenario down --jobs 8 --json results.json
+
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_server import FakeServer, synthetic_tree, write_local_tree
+
+SCENARIOS = ('up', 'down', 'ls', 'ls-auto-lock', 'fetch', 'treecompare', 'localtree', 'localtree-warm')
+
+APIKEY = "benchmark-apikey"
+EMAIL = "benchmark@materialscommons.org"
+
+
+def peak_rss():
+    """Returns the peak resident set size of this process, in bytes"""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if platform.system() == 'Darwin':
+        return maxrss
+    return maxrss * 1024
+
+
+@contextlib.contextmanager
+def _environment(server, working_dir):
+    """Use `server` as the default remote, from `working_dir`, with stdout discarded"""
+    saved_env = {k: os.environ.get(k) for k in ('MC_API_URL', 'MC_API_KEY', 'MC_API_EMAIL')}
+    saved_cwd = os.getcwd()
+    os.environ['MC_API_URL'] = server.base_url
+    os.environ['MC_API_KEY'] = APIKEY
+    os.environ['MC_API_EMAIL'] = EMAIL
+    os.chdir(working_dir)
+    try:
+        with open(os.devnull, 'w') as devnull:
+            with contextlib.redirect_stdout(devnull), server.installed():
+                yield
+    finally:
+        os.chdir(saved_cwd)
+        for k, v in saved_env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+def _refresh_localtree(proj_path):
+    from materials_commons.cli.treedb import LocalTree
+    localtree = LocalTree(proj_path)
+    localtree.connect()
+    try:
+        localtree.update("/", recurs=True)
+    finally:
+        localtree.close()
+
+
+def _setup(scenario, server, tree, tmpdir, jobs):
+    """Create the remote and local projects for a scenario and return a function to time"""
+    import materials_commons.cli.functions as clifuncs
+    import materials_commons.cli.tree_functions as treefuncs
+    from materials_commons.cli.subcommands.down import down_subcommand
+    from materials_commons.cli.subcommands.fetch import fetch_subcommand
+    from materials_commons.cli.subcommands.ls import ls_subcommand
+    from materials_commons.cli.subcommands.up import up_subcommand
+    from materials_commons.cli.user_config import RemoteConfig
+
+    proj_id = server.create_project("bench")
+    if scenario != 'up':
+        server.populate(proj_id, tree)
+
+    clifuncs.invalidate_project_context()
+    remote_config = RemoteConfig(mcurl=server.base_url, email=EMAIL, mcapikey=APIKEY)
+    proj = clifuncs.clone_project(remote_config, proj_id, tmpdir)
+    proj_path = proj.local_path
+    if scenario != 'down':
+        write_local_tree(proj_path, tree)
+    dirs = ["/"] + tree[0]
+    jobs = str(jobs)
+
+    if scenario == 'up':
+        return proj_path, lambda: up_subcommand(['-r', '.', '--jobs', jobs, '--no-progress'], proj_path)
+    elif scenario == 'down':
+        return proj_path, lambda: down_subcommand(['-r', '.', '--jobs', jobs, '--no-progress'], proj_path)
+    elif scenario == 'ls':
+        paths = [os.path.join(proj_path, d.lstrip('/')) for d in dirs]
+        return proj_path, lambda: ls_subcommand(paths, proj_path)
+    elif scenario == 'ls-auto-lock':
+        # files changed just now would be reported as changes since the marker was recorded
+        server.age(3600)
+        fetch_subcommand(['--auto-lock'], proj_path)
+        paths = [os.path.join(proj_path, d.lstrip('/')) for d in dirs]
+        ls_subcommand(paths, proj_path)
+        clifuncs.invalidate_project_context()
+        return proj_path, lambda: ls_subcommand(paths, proj_path)
+    elif scenario == 'fetch':
+        return proj_path, lambda: fetch_subcommand(['-r', '.'], proj_path)
+    elif scenario == 'treecompare':
+        return proj_path, lambda: treefuncs.treecompare(proj, dirs, checksum=True)
+    elif scenario == 'localtree':
+        return proj_path, lambda: _refresh_localtree(proj_path)
+    elif scenario == 'localtree-warm':
+        _refresh_localtree(proj_path)
+        return proj_path, lambda: _refresh_localtree(proj_path)
+    raise ValueError("Unknown scenario: " + str(scenario))
+
+
+def run_scenario(scenario, options):
+    """Run one scenario in this process and return its results
+
+    Arguments:
+        scenario (str): One of SCENARIOS.
+        options (dict): Keys 'files', 'shape', 'file_size', 'latency', 'bandwidth', and 'jobs'.
+
+    Returns:
+        dict: Results, with keys 'scenario', 'wall_time', 'api_calls', 'api_calls_by_endpoint',
+        'bytes_sent', 'bytes_received', and 'peak_rss'.
+    """
+    server = FakeServer(latency=options['latency'], bandwidth=options['bandwidth'])
+    tree = synthetic_tree(options['files'], shape=options['shape'], file_size=options['file_size'])
+    tmpdir = tempfile.mkdtemp(prefix="mc-bench-")
+    try:
+        with _environment(server, tmpdir):
+            proj_path, fn = _setup(scenario, server, tree, tmpdir, options['jobs'])
+            server.calls.clear()
+            server.bytes_in = server.bytes_out = 0
+            os.chdir(proj_path)
+            start = time.perf_counter()
+            fn()
+            wall_time = time.perf_counter() - start
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    return {
+        'scenario': scenario,
+        'wall_time': wall_time,
+        'api_calls': sum(server.calls.values()),
+        'api_calls_by_endpoint': dict(server.calls.most_common()),
+        'bytes_sent': server.bytes_in,
+        'bytes_received': server.bytes_out,
+        'peak_rss': peak_rss()
+    }
+
+
+def run_isolated(scenario, options):
+    """Run one scenario in a fresh process and return its results"""
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(run_scenario, scenario, options).result()
+
+
+def print_results(results, out=None):
+    from tabulate import tabulate
+    from materials_commons.cli.functions import humanize
+    table = [[r['scenario'], "{0:.3f}".format(r['wall_time']), r['api_calls'],
+              humanize(r['bytes_sent'] + r['bytes_received']), humanize(r['peak_rss'])]
+             for r in results]
+    (out or sys.stdout).write(tabulate(table, headers=['scenario', 'wall (s)', 'API calls',
+                                                       'bytes', 'peak RSS']) + "\n")
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(
+        description='Time mc commands against an in-process fake Materials Commons server',
+        prog='python -m benchmarks.bench')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, default=None,
+                        help='Scenario to run. May be repeated. Default runs all scenarios.')
+    parser.add_argument('--files', type=int, default=1000, help='Number of files. Default=1000.')
+    parser.add_argument('--shape', choices=('wide', 'deep'), default='wide',
+                        help='Shape of the synthetic tree. Default=wide.')
+    parser.add_argument('--file-size', type=int, default=256, help='Bytes per file. Default=256.')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds of simulated latency per request. Default=0.')
+    parser.add_argument('--bandwidth', type=float, default=None,
+                        help='Simulated bytes per second for file contents. Default is no limit.')
+    parser.add_argument('--jobs', type=str, default='1',
+                        help='Value for the `--jobs` option of `mc up` and `mc down`. Default=1.')
+    parser.add_argument('--in-process', action="store_true", default=False,
+                        help='Run scenarios in this process (peak RSS is then cumulative).')
+    parser.add_argument('--json', type=str, default=None, metavar='PATH',
+                        help='Write results as JSON to PATH. Use "-" to print them.')
+    return parser
+
+
+def main(argv=None):
+    args = make_parser().parse_args(argv)
+    options = {
+        'files': args.files,
+        'shape': args.shape,
+        'file_size': args.file_size,
+        'latency': args.latency,
+        'bandwidth': args.bandwidth,
+        'jobs': args.jobs
+    }
+    results = []
+    for scenario in (args.scenario or SCENARIOS):
+        if args.in_process:
+            results.append(run_scenario(scenario, options))
+        else:
+            results.append(run_isolated(scenario, options))
+
+    output = {'options': options, 'python': platform.python_version(), 'results': results}
+    if args.json == '-':
+        print(json.dumps(output, indent=2))
+        return
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(output, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,580 @@
+"""An in-process stand-in for the Materials Commons REST API
+
+:class:`FakeServer` keeps projects, directories, and files in memory and answers the requests
+made by :class:`materials_commons.api.Client` for the routes used by `mc up`, `mc down`, `mc ls`,
+`mc fetch`, `mc mkdir`, and `mc rm`, and for getting datasets and their file selections. While :func:`FakeServer.installed` is active, the `requests`
+module used by `materials_commons.api.client` is replaced so that every Client request is
+answered by the FakeServer. Everything above the HTTP layer (the Client, rate limiting, retries,
+tracing, lookup caches, and the tree caches) runs unchanged.
+
+Each request sleeps for `latency` seconds, plus the time to send or receive file contents at
+`bandwidth` bytes per second, outside of the server lock, so concurrent requests overlap like
+they would against a real server.
+
+Example: ::
+
+    server = FakeServer(latency=0.01, bandwidth=10e6)
+    proj_id = server.create_project("bench")
+    server.populate(proj_id, synthetic_tree(1000, shape='wide'))
+    with server.installed():
+        client = mcapi.Client("apikey", base_url=server.base_url)
+        print(client.list_directory(proj_id, server.root_id(proj_id)))
+    print(server.calls.most_common())
+
+"""
+import collections
+import contextlib
+import datetime
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import threading
+import time
+import uuid
+import zipfile
+
+import requests
+
+import materials_commons.api.client as mcapi_client
+from materials_commons.cli.file_functions import FileSelection
+from materials_commons.cli.trace import endpoint_name
+
+DEFAULT_BASE_URL = "http://fake.materialscommons.org/api"
+
+_ROUTES = []
+
+
+def _route(method, pattern):
+    def decorator(fn):
+        _ROUTES.append((method, re.compile("^" + pattern + "$"), fn))
+        return fn
+    return decorator
+
+
+OWNER = {'id': 1, 'name': "Benchmark User", 'email': "benchmark@materialscommons.org"}
+
+
+def _now_str():
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _parse_time(value):
+    return datetime.datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%fZ").replace(
+        tzinfo=datetime.timezone.utc)
+
+
+def synthetic_content(path, size):
+    """Returns `size` bytes of deterministic content for the file at `path`"""
+    seed = (path + "\n").encode('utf-8')
+    return (seed * (size // len(seed) + 1))[:size]
+
+
+def synthetic_tree(n_files, shape='wide', fanout=None, depth=None, file_size=256):
+    """Generate the paths of a synthetic project tree
+
+    Arguments:
+        n_files (int): Number of files.
+        shape (str): 'wide' places files in `fanout` top level directories ("/dir_0/file_0.dat",
+            ...). 'deep' places files along a single chain of `depth` nested directories
+            ("/level_0/level_1/.../file_0.dat").
+        fanout (int): For 'wide', number of top level directories. Default is ceil(sqrt(n_files)).
+        depth (int): For 'deep', number of nested directories. Default is min(n_files, 20).
+        file_size (int): Size of each file, in bytes.
+
+    Returns:
+        (dirs, files): `dirs` is a list of Materials Commons directory paths, parents before
+        children, and `files` is a list of (path, size).
+    """
+    dirs = []
+    files = []
+    if shape == 'wide':
+        if fanout is None:
+            fanout = max(1, int(math.ceil(math.sqrt(n_files))))
+        dirs = ["/dir_" + str(i) for i in range(fanout)]
+        for i in range(n_files):
+            files.append((dirs[i % fanout] + "/file_" + str(i) + ".dat", file_size))
+    elif shape == 'deep':
+        if depth is None:
+            depth = max(1, min(n_files, 20))
+        curr = ""
+        for i in range(depth):
+            curr += "/level_" + str(i)
+            dirs.append(curr)
+        for i in range(n_files):
+            files.append((dirs[i % depth] + "/file_" + str(i) + ".dat", file_size))
+    else:
+        raise ValueError("Unknown tree shape: " + str(shape))
+    return (dirs, files)
+
+
+def write_local_tree(local_path, tree):
+    """Write the directories and files of a :func:`synthetic_tree` under `local_path`"""
+    dirs, files = tree
+    for path in dirs:
+        os.makedirs(os.path.join(local_path, path.lstrip('/')), exist_ok=True)
+    for path, size in files:
+        with open(os.path.join(local_path, path.lstrip('/')), 'wb') as f:
+            f.write(synthetic_content(path, size))
+
+
+def _response(url, status_code=200, data=None, content=None):
+    r = requests.models.Response()
+    r.status_code = status_code
+    r.url = url
+    r.reason = requests.status_codes._codes.get(status_code, [''])[0].upper().replace('_', ' ')
+    r.headers['x-ratelimit-limit'] = '10000'
+    r.headers['x-ratelimit-remaining'] = '10000'
+    if content is not None:
+        r._content = content
+        r.headers['content-type'] = 'application/octet-stream'
+    else:
+        r._content = json.dumps({"data": data} if status_code < 400 else data).encode('utf-8')
+        r.headers['content-type'] = 'application/json'
+    r.headers['content-length'] = str(len(r._content))
+    r._content_consumed = True
+    return r
+
+
+class _NotFound(Exception):
+    pass
+
+
+class FakeServer(object):
+    """In-memory Materials Commons projects, served to :class:`materials_commons.api.Client`
+
+    Project data includes 'updated_at', 'file_count', 'directory_count', and 'size', which are
+    kept current as files and directories are added or removed, so it can supply the change
+    marker used by :func:`materials_commons.cli.treedb.RemoteTree.validate`. Files changed since a
+    time are listed by their 'updated_at'.
+
+    Arguments:
+        latency (float): Seconds added to every request.
+        bandwidth (float or None): Bytes per second for file contents sent or received, or None
+            for no limit.
+        base_url (str): The Materials Commons API URL that is served.
+
+    Attributes:
+        calls (collections.Counter): Number of requests, by endpoint name (see
+            :func:`materials_commons.cli.trace.endpoint_name`).
+        bytes_in (int): File bytes received by uploads.
+        bytes_out (int): File bytes sent by downloads.
+    """
+
+    def __init__(self, latency=0.0, bandwidth=None, base_url=DEFAULT_BASE_URL):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.base_url = base_url
+        self.calls = collections.Counter()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._projects = {}
+        self._objects = {}
+        self._children = {}
+        self._by_path = {}
+        self._contents = {}
+        self._datasets = {}
+        self._zipfiles = {}
+        self._next_id = 1
+        self._lock = threading.RLock()
+
+    # data
+
+    def _new_id(self):
+        id = self._next_id
+        self._next_id += 1
+        return id
+
+    def create_project(self, name):
+        """Create a project with an empty root directory, and return its id"""
+        with self._lock:
+            proj_id = self._new_id()
+            root = self._add_object(proj_id, "/", None, 'directory', 0, None)
+            now = _now_str()
+            self._projects[proj_id] = {
+                'id': proj_id,
+                'uuid': str(uuid.uuid4()),
+                'name': name,
+                'description': "",
+                'owner_id': 1,
+                'owner': dict(OWNER),
+                'root_dir_id': root['id'],
+                'created_at': now,
+                'updated_at': now,
+                'file_count': 0,
+                'directory_count': 1,
+                'size': 0
+            }
+            return proj_id
+
+    def create_dataset(self, project_id, name, file_selection=None):
+        """Create an unpublished dataset, and return its id
+
+        Arguments:
+            file_selection (dict or None): Dict with "include_files", "exclude_files",
+                "include_dirs", and "exclude_dirs" lists of paths. Missing lists are empty.
+        """
+        with self._lock:
+            dataset_id = self._new_id()
+            now = _now_str()
+            selection = {key: [] for key in ('include_files', 'exclude_files', 'include_dirs',
+                                             'exclude_dirs')}
+            selection.update(file_selection or {})
+            self._datasets[dataset_id] = {
+                'id': dataset_id,
+                'uuid': str(uuid.uuid4()),
+                'name': name,
+                'description': "",
+                'owner_id': 1,
+                'owner': dict(OWNER),
+                'project_id': project_id,
+                'file_selection': selection,
+                'created_at': now,
+                'updated_at': now,
+                'published_at': None
+            }
+            return dataset_id
+
+    def publish_dataset(self, dataset_id):
+        """Publish a dataset, building its zipfile from the currently selected project files"""
+        with self._lock:
+            dataset = self._datasets[dataset_id]
+            selection = FileSelection.from_dict(dataset['file_selection'])
+            buf = io.BytesIO()
+            with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+                for record in sorted(self._objects.values(), key=lambda r: r['path']):
+                    if record['project_id'] != dataset['project_id'] or \
+                            record['mime_type'] == 'directory':
+                        continue
+                    if selection.check(record['path'])[0]:
+                        zf.writestr(record['path'].lstrip('/'), self._content(record))
+            self._zipfiles[dataset_id] = buf.getvalue()
+            dataset['published_at'] = _now_str()
+            dataset['zipfile_size'] = len(self._zipfiles[dataset_id])
+
+    def _changed(self, project_id, files=0, directories=0, size=0):
+        """Update the project fields used as a change marker"""
+        proj = self._projects.get(project_id)
+        if proj is not None:
+            proj['updated_at'] = _now_str()
+            proj['file_count'] += files
+            proj['directory_count'] += directories
+            proj['size'] += size
+
+    def age(self, seconds):
+        """Make all files and directories look as if they were last changed `seconds` ago"""
+        with self._lock:
+            then = datetime.datetime.now(datetime.timezone.utc) - \
+                datetime.timedelta(seconds=seconds)
+            for record in self._objects.values():
+                record['updated_at'] = then.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+    def root_id(self, project_id):
+        return self._projects[project_id]['root_dir_id']
+
+    def _add_object(self, project_id, path, directory_id, mime_type, size, checksum):
+        now = _now_str()
+        record = {
+            'id': self._new_id(),
+            'uuid': str(uuid.uuid4()),
+            'name': os.path.basename(path) or "/",
+            'path': path,
+            'mime_type': mime_type,
+            'directory_id': directory_id,
+            'project_id': project_id,
+            'size': size,
+            'checksum': checksum,
+            'owner_id': 1,
+            'created_at': now,
+            'updated_at': now,
+            'deleted_at': None
+        }
+        self._objects[record['id']] = record
+        self._by_path[(project_id, path)] = record['id']
+        if mime_type == 'directory':
+            self._children[record['id']] = {}
+        if directory_id is not None:
+            self._children[directory_id][record['name']] = record['id']
+        if mime_type == 'directory':
+            self._changed(project_id, directories=1)
+        else:
+            self._changed(project_id, files=1, size=size)
+        return record
+
+    def _get_object(self, project_id, id):
+        record = self._objects.get(id)
+        if record is None or record['project_id'] != project_id:
+            raise _NotFound()
+        return record
+
+    def _get_by_path(self, project_id, path):
+        id = self._by_path.get((project_id, os.path.normpath(path)))
+        if id is None:
+            raise _NotFound()
+        return self._objects[id]
+
+    def _mkdirs(self, project_id, path):
+        """Returns the directory record at `path`, creating it and its parents as needed"""
+        path = os.path.normpath(path)
+        id = self._by_path.get((project_id, path))
+        if id is not None:
+            return self._objects[id]
+        parent = self._mkdirs(project_id, os.path.dirname(path))
+        return self._add_object(project_id, path, parent['id'], 'directory', 0, None)
+
+    def _add_file(self, project_id, directory, name, size, checksum, content=None):
+        """Add a file, replacing any existing file with the same name (as a new version)"""
+        path = os.path.join(directory['path'], name)
+        existing = self._children[directory['id']].get(name)
+        if existing is not None:
+            if self._objects[existing]['mime_type'] == 'directory':
+                raise _NotFound()
+            self._changed(project_id, files=-1, size=-self._objects[existing]['size'])
+            del self._objects[existing]
+            self._contents.pop(existing, None)
+        record = self._add_object(project_id, path, directory['id'], 'application/octet-stream',
+                                  size, checksum)
+        if content is not None:
+            self._contents[record['id']] = content
+        return record
+
+    def populate(self, project_id, tree):
+        """Add the directories and files of a :func:`synthetic_tree` to a project
+
+        File contents are generated by :func:`synthetic_content` when downloaded, not stored.
+        """
+        dirs, files = tree
+        with self._lock:
+            for path in dirs:
+                self._mkdirs(project_id, path)
+            for path, size in files:
+                directory = self._mkdirs(project_id, os.path.dirname(path))
+                checksum = hashlib.md5(synthetic_content(path, size)).hexdigest()
+                self._add_file(project_id, directory, os.path.basename(path), size, checksum)
+
+    def paths(self, project_id):
+        """Returns the sorted paths of all files and directories in a project"""
+        with self._lock:
+            return sorted(path for (proj_id, path) in self._by_path if proj_id == project_id)
+
+    def _content(self, record):
+        content = self._contents.get(record['id'])
+        if content is None:
+            content = synthetic_content(record['path'], record['size'])
+        return content
+
+    def _remove(self, record):
+        for child_id in list(self._children.get(record['id'], {}).values()):
+            self._remove(self._objects[child_id])
+        self._children.pop(record['id'], None)
+        self._contents.pop(record['id'], None)
+        if record['mime_type'] == 'directory':
+            self._changed(record['project_id'], directories=-1)
+        else:
+            self._changed(record['project_id'], files=-1, size=-record['size'])
+        del self._objects[record['id']]
+        del self._by_path[(record['project_id'], record['path'])]
+        if record['directory_id'] is not None:
+            self._children[record['directory_id']].pop(record['name'], None)
+
+    # routes
+
+    @_route('GET', r"/projects")
+    def _get_all_projects(self, match, params, body):
+        return [dict(p) for p in self._projects.values()]
+
+    @_route('GET', r"/projects/(\d+)")
+    def _get_project(self, match, params, body):
+        proj = self._projects.get(int(match.group(1)))
+        if proj is None:
+            raise _NotFound()
+        return dict(proj)
+
+    @_route('GET', r"/projects/(\d+)/directories/(\d+)")
+    def _get_directory(self, match, params, body):
+        return dict(self._get_object(int(match.group(1)), int(match.group(2))))
+
+    @_route('GET', r"/projects/(\d+)/directories/(\d+)/list")
+    def _list_directory(self, match, params, body):
+        directory = self._get_object(int(match.group(1)), int(match.group(2)))
+        return [dict(self._objects[id]) for id in self._children[directory['id']].values()]
+
+    @_route('GET', r"/projects/(\d+)/directories_by_path")
+    def _list_directory_by_path(self, match, params, body):
+        directory = self._get_by_path(int(match.group(1)), params.get('path', '/'))
+        return [dict(self._objects[id]) for id in self._children[directory['id']].values()]
+
+    @_route('GET', r"/projects/(\d+)/files/(\d+)")
+    def _get_file(self, match, params, body):
+        return dict(self._get_object(int(match.group(1)), int(match.group(2))))
+
+    @_route('GET', r"/projects/(\d+)/file-changes-since")
+    def _list_files_changed_since(self, match, params, body):
+        since = datetime.datetime.strptime(params['since'], "%Y-%m-%d %H:%M:%S").replace(
+            tzinfo=datetime.timezone.utc)
+        project_id = int(match.group(1))
+        return [dict(record) for record in self._objects.values()
+                if record['project_id'] == project_id and record['mime_type'] != 'directory'
+                and _parse_time(record['updated_at']) >= since]
+
+    @_route('GET', r"/projects/(\d+)/datasets")
+    def _get_all_datasets(self, match, params, body):
+        project_id = int(match.group(1))
+        return [dict(d) for d in self._datasets.values() if d['project_id'] == project_id]
+
+    @_route('GET', r"/projects/(\d+)/datasets/(\d+)")
+    def _get_dataset(self, match, params, body):
+        dataset = self._datasets.get(int(match.group(2)))
+        if dataset is None or dataset['project_id'] != int(match.group(1)):
+            raise _NotFound()
+        return json.loads(json.dumps(dataset))
+
+    @_route('GET', r"/published/datasets")
+    def _get_all_published_datasets(self, match, params, body):
+        return [json.loads(json.dumps(d)) for d in self._datasets.values()
+                if d['published_at'] is not None]
+
+    @_route('GET', r"/published/datasets/(\d+)")
+    def _get_published_dataset(self, match, params, body):
+        dataset = self._datasets.get(int(match.group(1)))
+        if dataset is None or dataset['published_at'] is None:
+            raise _NotFound()
+        return json.loads(json.dumps(dataset))
+
+    @_route('POST', r"/files/by_path")
+    def _get_file_by_path(self, match, params, body):
+        return dict(self._get_by_path(int(body['project_id']), body['path']))
+
+    @_route('POST', r"/directories")
+    def _create_directory(self, match, params, body):
+        project_id = int(body['project_id'])
+        parent = self._get_object(project_id, int(body['directory_id']))
+        path = os.path.join(parent['path'], body['name'])
+        if (project_id, path) in self._by_path:
+            return dict(self._objects[self._by_path[(project_id, path)]])
+        return dict(self._add_object(project_id, path, parent['id'], 'directory', 0, None))
+
+    @_route('POST', r"/projects/(\d+)/files/(\d+)/upload(?:/(.+))?")
+    def _upload_file(self, match, params, body):
+        project_id = int(match.group(1))
+        directory = self._get_object(project_id, int(match.group(2)))
+        results = []
+        for name, content in body:
+            name = match.group(3) or name
+            record = self._add_file(project_id, directory, name, len(content),
+                                    hashlib.md5(content).hexdigest(), content)
+            results.append(dict(record))
+        return results
+
+    @_route('DELETE', r"/projects/(\d+)/files/(\d+)")
+    def _delete_file(self, match, params, body):
+        self._remove(self._get_object(int(match.group(1)), int(match.group(2))))
+
+    @_route('DELETE', r"/projects/(\d+)/directories/(\d+)")
+    def _delete_directory(self, match, params, body):
+        self._remove(self._get_object(int(match.group(1)), int(match.group(2))))
+
+    # transport
+
+    def _delay(self, nbytes=0):
+        seconds = self.latency
+        if self.bandwidth and nbytes:
+            seconds += nbytes / float(self.bandwidth)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def request(self, method, url, params=None, json=None, files=None, **kwargs):
+        """Answer one HTTP request, returning a `requests.models.Response`"""
+        urlpart = url[len(self.base_url):] if url.startswith(self.base_url) else url
+        urlpart = urlpart.split('?')[0]
+        params = params or {}
+
+        body = json
+        nbytes_in = 0
+        if files is not None:
+            items = files.items() if isinstance(files, dict) else files
+            body = []
+            for name, f in items:
+                content = f.read()
+                nbytes_in += len(content)
+                body.append((os.path.basename(getattr(f, 'name', name)), content))
+
+        download = method == 'GET' and urlpart.endswith(("/download", "/download_zipfile"))
+        with self._lock:
+            self.calls[endpoint_name(method, urlpart)] += 1
+            self.bytes_in += nbytes_in
+            try:
+                if download:
+                    r = self._download(url, urlpart, (kwargs.get('headers') or {}).get('Range'))
+                    self.bytes_out += len(r._content)
+                else:
+                    for route_method, pattern, fn in _ROUTES:
+                        match = pattern.match(urlpart)
+                        if route_method == method and match:
+                            r = _response(url, data=fn(self, match, params, body))
+                            break
+                    else:
+                        raise _NotFound()
+            except _NotFound:
+                r = _response(url, status_code=404, data={"error": "Not found"})
+
+        self._delay(nbytes_in + (len(r._content) if download else 0))
+        return r
+
+    def _download(self, url, urlpart, range_header=None):
+        """Answer a file or dataset zipfile download, honoring a "bytes=<start>-<end>" Range"""
+        match = re.match(r"^/projects/(\d+)/files/(\d+)/download$", urlpart)
+        if match:
+            content = self._content(self._get_object(int(match.group(1)), int(match.group(2))))
+        else:
+            match = re.match(r"^/published/datasets/(\d+)/download_zipfile$", urlpart)
+            if not match or int(match.group(1)) not in self._zipfiles:
+                raise _NotFound()
+            content = self._zipfiles[int(match.group(1))]
+        match = re.match(r"^bytes=(\d+)-(\d*)$", range_header or "")
+        if not match:
+            return _response(url, content=content)
+        start = int(match.group(1))
+        end = min(int(match.group(2)) if match.group(2) else len(content) - 1, len(content) - 1)
+        if start >= len(content):
+            r = _response(url, status_code=416, data={"error": "Range not satisfiable"})
+            r.headers['Content-Range'] = "bytes */" + str(len(content))
+            return r
+        r = _response(url, status_code=206, content=content[start:end + 1])
+        r.headers['Content-Range'] = "bytes {0}-{1}/{2}".format(start, end, len(content))
+        return r
+
+    @contextlib.contextmanager
+    def installed(self):
+        """Context manager that serves all :class:`materials_commons.api.Client` requests"""
+        original = mcapi_client.requests
+        mcapi_client.requests = _FakeRequests(self, original)
+        try:
+            yield self
+        finally:
+            mcapi_client.requests = original
+
+
+class _FakeRequests(object):
+    """Stands in for the `requests` module in `materials_commons.api.client`"""
+
+    def __init__(self, server, module):
+        self._server = server
+        self._module = module
+
+    def get(self, url, **kwargs):
+        return self._server.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self._server.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self._server.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self._server.request('DELETE', url, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._module, name)
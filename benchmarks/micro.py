@@ -0,0 +1,348 @@
+"""Micro-benchmarks for inner loops of the Materials Commons CLI
+
+Each benchmark times a fixed number of operations, `n` (multiplied by `--scale`), repeated
+`--repeat` times, and reports the minimum and median time. Setup, such as writing files or
+filling tables, is not timed.
+
+Results are written as JSON in a stable format, so runs on different commits can be compared: ::
+
+    {
+        "schema_version": 1,
+        "git_commit": <sha or null>,
+        "python": <version>,
+        "platform": <platform>,
+        "scale": <float>,
+        "repeat": <int>,
+        "results": [
+            {
+                "name": <str>,
+                "n": <int>,
+                "min": <seconds>,
+                "median": <seconds>,
+                "per_op_ns": <min / n, in nanoseconds>,
+                "bytes_per_second": <float, only for benchmarks that process data>
+            },
+            ...
+        ]
+    }
+
+Results are sorted by name. Usage: ::
+
+    python -m benchmarks.micro --json before.json
+    git checkout <other commit>
+    python -m benchmarks.micro --json after.json --compare before.json
+    python -m benchmarks.micro --scale 0.1 --filter epoch_time
+
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+SCHEMA_VERSION = 1
+
+_BENCHMARKS = []
+
+
+def benchmark(name, n, nbytes=None):
+    """Register a benchmark
+
+    The decorated function is called as `fn(n, tmpdir)`, does any setup, and returns a function
+    with no arguments that performs `n` operations. If `nbytes` is given, it is the number of
+    bytes processed per operation, used to report a rate.
+    """
+    def decorator(fn):
+        _BENCHMARKS.append((name, n, nbytes, fn))
+        return fn
+    return decorator
+
+
+def _project_dir(tmpdir):
+    proj_path = os.path.join(tmpdir, "proj")
+    os.makedirs(os.path.join(proj_path, ".mc"), exist_ok=True)
+    return proj_path
+
+
+def _tree_records(n):
+    now = time.time()
+    return [{
+        "path": "/dir/file_" + str(i) + ".dat",
+        "name": "file_" + str(i) + ".dat",
+        "parent_path": "/dir",
+        "otype": "file",
+        "mtime": now - i,
+        "checktime": now,
+        "children_checktime": None,
+        "size": 1000 + i,
+        "checksum": "%032x" % i,
+        "id": str(i + 10),
+        "parent_id": "2"
+    } for i in range(n)]
+
+
+def _api_timestamps(n):
+    return ["2023-%02d-%02dT%02d:%02d:%02d.%06dZ" % (1 + i % 12, 1 + i % 28, i % 24, i % 60,
+                                                     (i // 60) % 60, i % 1000000)
+            for i in range(n)]
+
+
+@benchmark("sqltable.insert_or_replace", 10000)
+def _insert_or_replace(n, tmpdir):
+    from materials_commons.cli.treedb import RemoteTree
+    proj = types.SimpleNamespace(local_path=_project_dir(tmpdir), name="proj")
+    table = RemoteTree(proj, None)
+    records = _tree_records(n)
+
+    def run():
+        table.connect()
+        try:
+            for record in records:
+                table.insert_or_replace(record)
+            table.conn.commit()
+        finally:
+            table.close()
+    return run
+
+
+@benchmark("treedb.localtree_update_children", 10000)
+def _localtree_update(n, tmpdir):
+    from materials_commons.cli.treedb import LocalTree
+    proj_path = _project_dir(tmpdir)
+    os.mkdir(os.path.join(proj_path, "dir"))
+    for i in range(n):
+        with open(os.path.join(proj_path, "dir", "file_" + str(i) + ".dat"), 'wb') as f:
+            f.write(b"x" * 100)
+    localtree = LocalTree(proj_path)
+
+    def run():
+        localtree.connect()
+        try:
+            localtree.update("/dir", get_children=True, force=True)
+        finally:
+            localtree.close()
+    return run
+
+
+@benchmark("treedb.remotetree_update_children", 10000)
+def _remotetree_update(n, tmpdir):
+    import materials_commons.api as mcapi
+    from benchmarks.fake_server import FakeServer, synthetic_tree
+    from materials_commons.cli.treedb import RemoteTree
+    server = FakeServer()
+    proj_id = server.create_project("proj")
+    server.populate(proj_id, synthetic_tree(n, shape='wide', fanout=1, file_size=100))
+    proj = types.SimpleNamespace(id=proj_id, name="proj", local_path=_project_dir(tmpdir),
+                                 remote=mcapi.Client("apikey", base_url=server.base_url))
+    remotetree = RemoteTree(proj, None)
+
+    def run():
+        with server.installed():
+            remotetree.connect()
+            try:
+                remotetree.update("/dir_0", get_children=True, force=True)
+            finally:
+                remotetree.close()
+    return run
+
+
+def _checksum_benchmark(size):
+    def setup(n, tmpdir):
+        import materials_commons.cli.functions as clifuncs
+        path = os.path.join(tmpdir, "data.bin")
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size))
+
+        def run():
+            for i in range(n):
+                clifuncs.checksum(path)
+        return run
+    return setup
+
+
+benchmark("functions.checksum_1KiB", 2000, nbytes=1024)(_checksum_benchmark(1024))
+benchmark("functions.checksum_1MiB", 100, nbytes=1024**2)(_checksum_benchmark(1024**2))
+benchmark("functions.checksum_64MiB", 2, nbytes=64 * 1024**2)(_checksum_benchmark(64 * 1024**2))
+
+
+@benchmark("functions.epoch_time_str", 1000000)
+def _epoch_time_str(n, tmpdir):
+    import materials_commons.cli.functions as clifuncs
+    values = _api_timestamps(min(n, 10000))
+    values = (values * (n // len(values) + 1))[:n]
+
+    def run():
+        for value in values:
+            clifuncs.epoch_time(value)
+    return run
+
+
+@benchmark("functions.format_time_float", 1000000)
+def _format_time_float(n, tmpdir):
+    import materials_commons.cli.functions as clifuncs
+    now = time.time()
+    values = [now - i for i in range(n)]
+
+    def run():
+        for value in values:
+            clifuncs.format_time(value)
+    return run
+
+
+@benchmark("ls._format_path_data", 10000)
+def _format_path_data(n, tmpdir):
+    from materials_commons.cli.subcommands.ls import _format_path_data
+    proj_path = _project_dir(tmpdir)
+    proj = types.SimpleNamespace(local_path=proj_path)
+    now = time.time()
+    data = {}
+    for i in range(n):
+        path = "/dir/file_" + str(i) + ".dat"
+        data[path] = {
+            'l_mtime': now - i, 'l_size': 1000 + i, 'l_type': 'file', 'l_checksum': None,
+            'r_mtime': now - i, 'r_size': 1000 + i, 'r_type': 'file', 'r_checksum': None,
+            'r_obj': None, 'path': path, 'id': i + 10, 'parent_id': 2, 'eq': True
+        }
+    columns = ['l_mtime', 'l_size', 'l_type', 'r_mtime', 'r_size', 'r_type', 'eq', 'name', 'id']
+    refpath = os.path.join(proj_path, "dir")
+
+    def run():
+        _format_path_data(proj, data, columns, refpath=refpath, checksum=True)
+    return run
+
+
+@benchmark("print_formatter.print", 10000)
+def _print_formatter(n, tmpdir):
+    from materials_commons.cli.print_formatter import PrintFormatter
+    from materials_commons.cli.treedb import RemoteTree
+    pformatter = PrintFormatter(RemoteTree.default_print_fmt())
+    records = _tree_records(n)
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            pformatter.print_header()
+            for record in records:
+                pformatter.print(record)
+    return run
+
+
+def git_commit():
+    """Returns the current git commit sha of this repository, or None"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(name, n, nbytes, fn, repeat=3):
+    """Run one benchmark and return its result dict"""
+    tmpdir = tempfile.mkdtemp(prefix="mc-micro-")
+    try:
+        run = fn(n, tmpdir)
+        times = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    result = {
+        "name": name,
+        "n": n,
+        "min": min(times),
+        "median": statistics.median(times),
+        "per_op_ns": 1e9 * min(times) / n
+    }
+    if nbytes is not None:
+        result["bytes_per_second"] = n * nbytes / min(times) if min(times) > 0 else 0.0
+    return result
+
+
+def run_all(scale=1.0, repeat=3, name_filter=None):
+    """Run the registered benchmarks and return results in the JSON output format"""
+    results = []
+    for name, n, nbytes, fn in _BENCHMARKS:
+        if name_filter and name_filter not in name:
+            continue
+        results.append(run_benchmark(name, max(1, int(n * scale)), nbytes, fn, repeat=repeat))
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "repeat": repeat,
+        "results": sorted(results, key=lambda r: r["name"])
+    }
+
+
+def print_results(output, baseline=None, out=None):
+    """Print a table of results, with the ratio to `baseline` results if given"""
+    from tabulate import tabulate
+    base = {r["name"]: r for r in baseline["results"]} if baseline else {}
+    headers = ['name', 'n', 'min (s)', 'median (s)', 'per op (ns)']
+    if baseline:
+        headers.append('vs baseline')
+    table = []
+    for r in output["results"]:
+        row = [r["name"], r["n"], "{0:.4f}".format(r["min"]), "{0:.4f}".format(r["median"]),
+               "{0:.1f}".format(r["per_op_ns"])]
+        if baseline:
+            b = base.get(r["name"])
+            row.append("{0:.2f}x".format(r["per_op_ns"] / b["per_op_ns"]) if b and b["per_op_ns"] else "-")
+        table.append(row)
+    (out or sys.stdout).write(tabulate(table, headers=headers, disable_numparse=True) + "\n")
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(
+        description='Micro-benchmarks for Materials Commons CLI inner loops',
+        prog='python -m benchmarks.micro')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Multiply the number of operations per benchmark. Default=1.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of times to repeat each benchmark. Default=3.')
+    parser.add_argument('--filter', type=str, default=None, metavar='TEXT',
+                        help='Only run benchmarks whose name contains TEXT.')
+    parser.add_argument('--json', type=str, default=None, metavar='PATH',
+                        help='Write results as JSON to PATH. Use "-" to print them.')
+    parser.add_argument('--compare', type=str, default=None, metavar='PATH',
+                        help='Compare to results previously written with --json.')
+    parser.add_argument('--list', action="store_true", default=False,
+                        help='List benchmark names and exit.')
+    return parser
+
+
+def main(argv=None):
+    args = make_parser().parse_args(argv)
+    if args.list:
+        for name, n, nbytes, fn in sorted(_BENCHMARKS):
+            print(name)
+        return
+
+    output = run_all(scale=args.scale, repeat=args.repeat, name_filter=args.filter)
+    if args.json == '-':
+        print(json.dumps(output, indent=2, sort_keys=True))
+        return
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(output, baseline=baseline)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(output, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
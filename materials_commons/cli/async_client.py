@@ -0,0 +1,207 @@
+"""Concurrent access to Materials Commons API calls from asyncio
+
+:class:`materials_commons.api.Client` is synchronous (it is built on `requests`), so
+:class:`AsyncClient` runs each call on a bounded thread pool and exposes it as a coroutine. This
+lets metadata-heavy operations such as tree comparison, directory crawling, and dataset listing
+keep many small REST calls in flight at once, while:
+
+- the total number of requests in flight is bounded (``max_concurrency``),
+- the number of requests in flight to any one host is bounded (``per_host_limit``), and
+- a failure in one request cancels the rest of its group (:func:`AsyncClient.gather`).
+
+Example: ::
+
+    aclient = AsyncClient(proj.remote)
+    objs = aclient.run(aclient.gather(
+        *[aclient.get_by_path_if_exists(proj.id, path) for path in paths]))
+
+"""
+import asyncio
+import concurrent.futures
+import sys
+import threading
+from urllib.parse import urlparse
+
+import materials_commons.cli.file_functions as filefuncs
+
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_PER_HOST_LIMIT = 8
+
+
+def _host(client):
+    """Returns the network location of a client's base_url, used to key per-host limits"""
+    return urlparse(getattr(client, 'base_url', '') or '').netloc
+
+
+class AsyncClient(object):
+    """Run blocking :class:`materials_commons.api.Client` calls as bounded, cancellable coroutines
+
+    Arguments:
+        client (:class:`materials_commons.api.Client`): The client used to make requests.
+        max_concurrency (int): Maximum number of requests in flight, in total.
+        per_host_limit (int): Maximum number of requests in flight to one host.
+
+    Notes:
+        Semaphores are created for the event loop that is running when the first request is
+        made, so one AsyncClient should be used with one event loop at a time. Use :func:`run`
+        to run a coroutine to completion from synchronous code.
+    """
+
+    def __init__(self, client, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 per_host_limit=DEFAULT_PER_HOST_LIMIT):
+        self.client = client
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.per_host_limit = max(1, min(int(per_host_limit), self.max_concurrency))
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._loop = None
+        self._total_sem = None
+        self._host_sems = {}
+
+    @property
+    def executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_concurrency, thread_name_prefix="mc-async")
+            return self._executor
+
+    def close(self):
+        """Shut down the thread pool. Requests that have not started are cancelled."""
+        with self._executor_lock:
+            if self._executor is not None:
+                if sys.version_info >= (3, 9):
+                    self._executor.shutdown(wait=True, cancel_futures=True)
+                else:
+                    self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _semaphores(self, host):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._total_sem = asyncio.Semaphore(self.max_concurrency)
+            self._host_sems = {}
+        if host not in self._host_sems:
+            self._host_sems[host] = asyncio.Semaphore(self.per_host_limit)
+        return (self._total_sem, self._host_sems[host])
+
+    async def call(self, fn, *args, **kwargs):
+        """Run the blocking function `fn(*args, **kwargs)` within the concurrency limits
+
+        Arguments:
+            fn: A callable which makes a request using `self.client`.
+
+        Returns:
+            The result of `fn(*args, **kwargs)`.
+        """
+        total_sem, host_sem = self._semaphores(_host(self.client))
+        async with total_sem:
+            async with host_sem:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self.executor, lambda: fn(*args, **kwargs))
+
+    async def gather(self, *aws):
+        """Run awaitables concurrently, cancelling the rest if any one fails
+
+        Returns:
+            List of results, in the same order as `aws`.
+
+        Raises:
+            The first exception raised by any of `aws`, after the others have been cancelled.
+        """
+        tasks = [asyncio.ensure_future(aw) for aw in aws]
+        if not tasks:
+            return []
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+            return [task.result() for task in tasks]
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def run(self, coro):
+        """Run a coroutine to completion from synchronous code, using a new event loop
+
+        If called from a thread which is already running an event loop (for example, in a Jupyter
+        notebook) the coroutine is run on a new event loop in a separate thread.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as ex:
+            return ex.submit(asyncio.run, coro).result()
+
+    def map(self, fn, iterable):
+        """Synchronously call `fn(item)` for each item concurrently, returning results in order
+
+        Arguments:
+            fn: A blocking callable which makes a request using `self.client`.
+            iterable: Arguments for `fn`.
+
+        Returns:
+            List of results, in the same order as `iterable`.
+        """
+        items = list(iterable)
+        if not items:
+            return []
+        return self.run(self.gather(*[self.call(fn, item) for item in items]))
+
+    # Wrapped API calls
+
+    async def get_file_by_path(self, project_id, file_path):
+        """Coroutine for :func:`materials_commons.api.Client.get_file_by_path`"""
+        return await self.call(self.client.get_file_by_path, project_id, file_path)
+
+    async def get_by_path_if_exists(self, project_id, file_path):
+        """Coroutine for :func:`file_functions.get_by_path_if_exists`"""
+        return await self.call(filefuncs.get_by_path_if_exists, self.client, project_id, file_path)
+
+    async def list_directory(self, project_id, directory_id):
+        """Coroutine for :func:`file_functions.list_directory`"""
+        return await self.call(filefuncs.list_directory, self.client, project_id, directory_id)
+
+    async def create_directory(self, project_id, name, parent_id):
+        """Coroutine for :func:`materials_commons.api.Client.create_directory`"""
+        return await self.call(self.client.create_directory, project_id, name, parent_id)
+
+    async def get_all_datasets(self, project_id):
+        """Coroutine for :func:`materials_commons.api.Client.get_all_datasets`"""
+        return await self.call(self.client.get_all_datasets, project_id)
+
+    async def get_by_paths(self, project_id, file_paths, get_children=False):
+        """Get many files or directories by path concurrently
+
+        Arguments:
+            project_id (int): Project ID
+            file_paths (list of str): Materials Commons style paths
+            get_children (bool): If True, also list the children of each directory found.
+
+        Returns:
+            dict of path: (obj, children), where obj is the file or directory or None if it does
+            not exist, and children is a list of the directory children or None if not a directory
+            or `get_children` is False.
+        """
+        async def _get(path):
+            obj = await self.get_by_path_if_exists(project_id, path)
+            children = None
+            if get_children and obj is not None and filefuncs.isdir(obj) \
+                    and obj._data.get('deleted_at', False) is None:
+                children = await self.list_directory(project_id, obj.id)
+            return (obj, children)
+
+        paths = list(dict.fromkeys(file_paths))
+        results = await self.gather(*[_get(path) for path in paths])
+        return dict(zip(paths, results))
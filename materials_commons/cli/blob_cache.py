@@ -0,0 +1,228 @@
+"""Cache file version contents locally
+
+The contents of a file version never change, so once downloaded they can be reused by every later
+`mc versions --print`, `--down`, or `--diff`. Contents are stored once per checksum, in
+"~/.materialscommons/cache/blobs/<ab>/<checksum>", and indexed in the "blobcache" table of
+"~/.materialscommons/cache/index.db", along with their size and the time they were last used.
+
+- Blobs are only added after their MD5 checksum is verified against the checksum reported by the
+  remote, and are never modified afterwards.
+- When the total size of cached blobs exceeds the size limit, the least recently used blobs are
+  removed.
+
+The size limit, in bytes, can be set in the user configuration file: ::
+
+    "blob_cache_size": 2147483648
+
+A size limit of 0 disables the cache.
+"""
+import contextlib
+import hashlib
+import os
+import tempfile
+import time
+
+import materials_commons.cli.offline as clioffline
+from materials_commons.cli.sqltable import PathSqlTable
+from materials_commons.cli.user_config import Config
+
+BLOB_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.materialscommons', 'cache')
+
+# Default maximum total size (bytes) of cached blobs
+DEFAULT_MAX_SIZE = 2 * 1024 * 1024 * 1024
+
+CHUNK_SIZE = 1024 * 1024
+
+class BlobCacheTable(PathSqlTable):
+    """The BlobCacheTable indexes cached blobs
+
+    Values:
+        checksum: str, MD5 checksum of the blob contents
+        version_id: integer, id of the file version the blob was last used for
+        size: integer, size of the blob (bytes)
+        atime: real, time the blob was last used (s since epoch)
+    """
+
+    @staticmethod
+    def default_print_fmt():
+        from materials_commons.cli.functions import as_is, format_time, humanize
+        return [
+            ("checksum", "checksum", "<", 32, as_is),
+            ("version_id", "version_id", "<", 12, as_is),
+            ("size", "size", "<", 10, humanize),
+            ("atime", "atime", "<", 24, format_time)
+        ]
+
+    @staticmethod
+    def tablecolumns():
+        return {
+            "checksum": ["text", "UNIQUE"],
+            "version_id": ["integer"],
+            "size": ["integer"],
+            "atime": ["real"]
+        }
+
+    @staticmethod
+    def tablename():
+        return "blobcache"
+
+    def select_by_checksum(self, checksum):
+        """Select record by checksum
+
+        Returns:
+            sqlite3.Row or None
+        """
+        self.curs.execute("SELECT * FROM " + self.tablename() + " WHERE checksum=?", (checksum,))
+        return self.curs.fetchone()
+
+    def touch(self, checksum, version_id, atime):
+        """Update the version id and last use time of a record"""
+        self.curs.execute(
+            "UPDATE " + self.tablename() + " SET version_id=?, atime=? WHERE checksum=?",
+            (version_id, atime, checksum))
+        self.conn.commit()
+
+    def delete_by_checksum(self, checksum):
+        self.curs.execute("DELETE FROM " + self.tablename() + " WHERE checksum=?", (checksum,))
+        self.conn.commit()
+
+    def total_size(self):
+        self.curs.execute("SELECT COALESCE(SUM(size), 0) FROM " + self.tablename())
+        return self.curs.fetchone()[0]
+
+    def select_lru(self):
+        """Select all records, least recently used first
+
+        Returns:
+            list of sqlite3.Row
+        """
+        self.curs.execute("SELECT * FROM " + self.tablename() + " ORDER BY atime")
+        return self.curs.fetchall()
+
+def file_md5(path):
+    """Returns the MD5 hex digest of a file, read in chunks"""
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+class BlobCache(object):
+    """Content-addressed, size-bounded, least-recently-used cache of file version contents
+
+    Arguments:
+        path (str): Cache directory. Default is BLOB_CACHE_DIR.
+        max_size (int or None): Maximum total size of cached blobs (bytes). Default uses the
+            "blob_cache_size" user configuration value, or DEFAULT_MAX_SIZE.
+    """
+    def __init__(self, path=None, max_size=None):
+        if max_size is None:
+            max_size = Config().blob_cache_size
+            if max_size is None:
+                max_size = DEFAULT_MAX_SIZE
+        self.path = path or BLOB_CACHE_DIR
+        self.max_size = max_size
+
+    def blob_path(self, checksum):
+        return os.path.join(self.path, 'blobs', checksum[:2], checksum)
+
+    def _table(self):
+        table = BlobCacheTable(os.path.join(self.path, 'index.db'))
+        table.connect()
+        return table
+
+    def get(self, version_id, checksum):
+        """Returns the path to the cached contents of a file version, or None if not cached"""
+        if not checksum or self.max_size <= 0:
+            return None
+        table = self._table()
+        try:
+            record = table.select_by_checksum(checksum)
+            if record is None:
+                return None
+            path = self.blob_path(checksum)
+            if not os.path.isfile(path):
+                table.delete_by_checksum(checksum)
+                return None
+            table.touch(checksum, version_id, time.time())
+            return path
+        finally:
+            table.close()
+
+    def put(self, version_id, checksum, src):
+        """Move the downloaded contents of a file version at `src` into the cache
+
+        The file at `src` is only moved if its MD5 checksum matches `checksum` and its size is
+        within the size limit.
+
+        Returns:
+            str or None: Path to the cached blob, or None if `src` was not added.
+        """
+        if not checksum or self.max_size <= 0:
+            return None
+        size = os.path.getsize(src)
+        if size > self.max_size or file_md5(src) != checksum:
+            return None
+        path = self.blob_path(checksum)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.chmod(src, 0o444)
+        os.replace(src, path)
+        table = self._table()
+        try:
+            table.insert_or_replace({
+                'checksum': checksum,
+                'version_id': version_id,
+                'size': size,
+                'atime': time.time()
+            })
+            self._evict(table, keep=checksum)
+        finally:
+            table.close()
+        return path
+
+    def _evict(self, table, keep=None):
+        total = table.total_size()
+        for record in table.select_lru():
+            if total <= self.max_size:
+                break
+            if record['checksum'] == keep:
+                continue
+            try:
+                os.remove(self.blob_path(record['checksum']))
+            except FileNotFoundError:
+                pass
+            table.delete_by_checksum(record['checksum'])
+            total -= record['size']
+
+    @contextlib.contextmanager
+    def version_file(self, client, project_id, version_id, checksum):
+        """Context manager giving a local path with the contents of a file version
+
+        Cached contents are used if available. Otherwise the version is downloaded and added to the
+        cache. If it cannot be added, the download is removed on exit.
+
+        Arguments:
+            client (materials_commons.api.Client): Client for the remote.
+            project_id (int): Project id.
+            version_id (int): File version id.
+            checksum (str or None): MD5 checksum of the version, as reported by the remote.
+        """
+        path = self.get(version_id, checksum)
+        if path is not None:
+            yield path
+            return
+        clioffline.require_online("Downloading file version " + str(version_id))
+        os.makedirs(self.path, exist_ok=True)
+        fd, tmppath = tempfile.mkstemp(prefix=".download-", dir=self.path)
+        os.close(fd)
+        try:
+            client.download_file(project_id, version_id, tmppath)
+            path = self.put(version_id, checksum, tmppath)
+            yield path if path is not None else tmppath
+        finally:
+            if os.path.exists(tmppath):
+                os.remove(tmppath)
+
+def blob_cache():
+    """Returns a BlobCache for the default cache directory"""
+    return BlobCache()
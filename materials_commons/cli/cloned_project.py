@@ -5,6 +5,7 @@ from contextlib import contextmanager
 
 import materials_commons.cli.exceptions as cliexcept
 import materials_commons.cli.functions as clifuncs
+import materials_commons.cli.progress as cliprogress
 from materials_commons.cli.user_config import Config, \
     get_remote_config_and_login_if_necessary
 from materials_commons.cli.subcommands.down import down_subcommand
@@ -131,7 +132,8 @@ class ClonedProject(object):
         return [str(file.relative_to(self.local_path)) for file in self.local_path.glob(pattern)]
 
     def download(self, *paths, recursive=False, only_print=False, force=False,
-                 output=None, globus=False, label=None, no_compare=False):
+                 output=None, globus=False, label=None, no_compare=False, jobs=None,
+                 max_rps=None, stats_json=None, progress_callback=None):
         """Download requested files from the Materials Commons project
 
         Args:
@@ -143,6 +145,11 @@ class ClonedProject(object):
             label (str): Globus transfer label to make finding tasks simpler
             no_compare (bool): Download remote without checking if local is
                 equivalent
+            jobs (int or str): Number of files to download in parallel, or "auto"
+            max_rps (float): Maximum number of API requests per second
+            stats_json (str): Write a JSON summary of the transfer to this path
+            progress_callback (callable): Called as `progress_callback(event, stats, path=path,
+                size=size)` for each file event. See :mod:`materials_commons.cli.progress`.
             *paths (str): Files or directories to download, specified either
                 using absolute paths or paths relative to the project root
                 directory (`self.local_path`).
@@ -168,17 +175,28 @@ class ClonedProject(object):
             argv.append(str(label))
         if no_compare is True:
             argv.append("--no-compare")
+        if jobs is not None:
+            argv.append("--jobs")
+            argv.append(str(jobs))
+        if max_rps is not None:
+            argv.append("--max-rps")
+            argv.append(str(max_rps))
+        if stats_json is not None:
+            argv.append("--stats-json")
+            argv.append(str(stats_json))
         if len(paths):
             # using relpaths is more robust within the working_dir context
             # argv += [str(os.path.relpath(os.path.abspath(path), self.local_path)) for path in paths]
             argv += [os.path.normpath(os.path.join(working_dir, path)) for path in paths]
         try:
-            down_subcommand(argv, working_dir)
+            with cliprogress.subscribe(progress_callback):
+                down_subcommand(argv, working_dir)
         except SystemExit as e:
             print("Invalid download request")
 
     def upload(self, *paths, recursive=False, limit=None, globus=False,
-               label=None, no_compare=False, upload_as=None):
+               label=None, no_compare=False, upload_as=None, jobs=None, max_rps=None,
+               stats_json=None, progress_callback=None):
         """Upload requested files to Materials Commons
 
         Args:
@@ -190,6 +208,11 @@ class ClonedProject(object):
             no_compare (bool): Download remote without checking if local is
                 equivalent
             upload_as (str): Upload a file or directory to a particular location in the project. Raises if `len(paths) != 1`.
+            jobs (int or str): Number of files to upload in parallel, or "auto"
+            max_rps (float): Maximum number of API requests per second
+            stats_json (str): Write a JSON summary of the transfer to this path
+            progress_callback (callable): Called as `progress_callback(event, stats, path=path,
+                size=size)` for each file event. See :mod:`materials_commons.cli.progress`.
             *paths (str): Files or directories to upload, specified either
                 using absolute paths or paths relative to the project root
                 directory (`self.local_path`).
@@ -214,11 +237,21 @@ class ClonedProject(object):
         if upload_as is not None:
             argv.append("--upload-as")
             argv.append(str(upload_as))
+        if jobs is not None:
+            argv.append("--jobs")
+            argv.append(str(jobs))
+        if max_rps is not None:
+            argv.append("--max-rps")
+            argv.append(str(max_rps))
+        if stats_json is not None:
+            argv.append("--stats-json")
+            argv.append(str(stats_json))
         if len(paths):
             # using relpaths is more robust within the working_dir context
             # argv += [str(os.path.relpath(os.path.abspath(path), self.local_path)) for path in paths]
             argv += [os.path.normpath(os.path.join(working_dir, path)) for path in paths]
         try:
-            up_subcommand(argv, working_dir)
+            with cliprogress.subscribe(progress_callback):
+                up_subcommand(argv, working_dir)
         except SystemExit as e:
             print("Invalid upload request")
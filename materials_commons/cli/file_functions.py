@@ -1,8 +1,12 @@
+import concurrent.futures
+import contextlib
 import io
 import json
 import os.path
 import requests
+import threading
 import materials_commons.api as mcapi
+import materials_commons.cli.trace as clitrace
 from materials_commons.cli.exceptions import MCCLIException
 
 def isfile(file_or_dir):
@@ -60,14 +64,116 @@ def make_mcpath(proj_local_path, local_abspath):
         mcpath = os.path.join("/", relpath)
     return mcpath
 
-def get_by_path_if_exists(client, project_id, file_path):
+class LookupMemo(object):
+    """Memoize remote lookups by path and directory listings for the life of one command
+
+    - Identical requests made concurrently are issued once, other callers wait for the result.
+    - Successful results are cached until invalidated. Exceptions are not cached.
+    - :func:`invalidate` drops the entries for a path, its descendants, and the listings of the
+      path and its parent directory. It is called after the remote is changed.
     """
-    Get file (or directory) by path in project, if it exists.
-    :param int project_id: The id of the project containing the file or directory
-    :param file_path: The Materials Commons path to the file or directory
-    :return: The file or None
-    :rtype File or None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_path = {}      # (project_id, path): file or None
+        self._listings = {}     # (project_id, directory_id): list of file
+        self._in_flight = {}    # key: concurrent.futures.Future
+
+    def _get(self, cache, key, fn, name):
+        with self._lock:
+            if key in cache:
+                clitrace.record_cache(name, True)
+                return cache[key]
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = concurrent.futures.Future()
+                self._in_flight[key] = future
+        clitrace.record_cache(name, not owner)
+        if not owner:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._in_flight[key]
+            cache[key] = result
+        future.set_result(result)
+        return result
+
+    def get_by_path(self, project_id, path, fn):
+        return self._get(self._by_path, (project_id, os.path.normpath(path)), fn, 'get_by_path')
+
+    def list_directory(self, project_id, directory_id, fn):
+        return self._get(self._listings, (project_id, directory_id), fn, 'list_directory')
+
+    def invalidate(self, project_id, path, obj=None):
+        """Drop cached entries that may be changed by a change to the remote at "path"
+
+        If "obj" is given, it is the new remote file or directory at "path" and is cached.
+        """
+        path = os.path.normpath(path)
+        parent_path = os.path.dirname(path)
+        prefix = path.rstrip('/') + '/'
+        with self._lock:
+            directory_ids = set()
+            all_listings = False
+            for key in [(project_id, path), (project_id, parent_path)]:
+                if key not in self._by_path:
+                    all_listings = True
+                elif self._by_path[key] is not None:
+                    directory_ids.add(self._by_path[key].id)
+            for key in list(self._by_path.keys()):
+                if key[0] == project_id and (key[1] == path or key[1].startswith(prefix)):
+                    del self._by_path[key]
+            for key in list(self._listings.keys()):
+                if key[0] == project_id and (all_listings or key[1] in directory_ids):
+                    del self._listings[key]
+            if obj is not None:
+                self._by_path[(project_id, path)] = obj
+
+_lookup_memos = None
+
+@contextlib.contextmanager
+def lookup_memo_scope():
+    """Memoize :func:`get_by_path_if_exists` and :func:`list_directory` within this scope
+
+    Used to make lookups request-scoped: `mc` subcommands run inside a scope, so repeated lookups
+    of the same path during one command result in one API call.
     """
+    global _lookup_memos
+    prev = _lookup_memos
+    _lookup_memos = {}
+    try:
+        yield
+    finally:
+        _lookup_memos = prev
+
+def get_lookup_memo(client):
+    """Returns the :class:`LookupMemo` for client in the current scope, or None if not in a scope"""
+    memos = _lookup_memos
+    if memos is None:
+        return None
+    entry = memos.get(id(client))
+    if entry is None:
+        # keep a reference to client so that its id is not reused while the scope exists
+        entry = memos.setdefault(id(client), (client, LookupMemo()))
+    return entry[1]
+
+def invalidate_lookup(client, project_id, path, obj=None):
+    """Drop memoized lookups affected by a change to the remote at "path", if in a scope
+
+    If "obj" is given, it is the new remote file or directory at "path" and is memoized.
+    """
+    memo = get_lookup_memo(client)
+    if memo is not None:
+        memo.invalidate(project_id, path, obj=obj)
+
+def _get_by_path_if_exists(client, project_id, file_path):
     try:
         return client.get_file_by_path(project_id, file_path)
     except mcapi.MCAPIError as e:
@@ -75,6 +181,40 @@ def get_by_path_if_exists(client, project_id, file_path):
             return None
         raise e
 
+def get_by_path_if_exists(client, project_id, file_path):
+    """
+    Get file (or directory) by path in project, if it exists.
+
+    Memoized within a :func:`lookup_memo_scope`.
+
+    :param int project_id: The id of the project containing the file or directory
+    :param file_path: The Materials Commons path to the file or directory
+    :return: The file or None
+    :rtype File or None
+    """
+    memo = get_lookup_memo(client)
+    if memo is None:
+        return _get_by_path_if_exists(client, project_id, file_path)
+    return memo.get_by_path(project_id, file_path,
+                            lambda: _get_by_path_if_exists(client, project_id, file_path))
+
+def list_directory(client, project_id, directory_id):
+    """
+    List the files and directories in a directory.
+
+    Memoized within a :func:`lookup_memo_scope`.
+
+    :param int project_id: The id of the project containing the directory
+    :param directory_id: The id of the directory
+    :return: The directory children
+    :rtype list of File
+    """
+    memo = get_lookup_memo(client)
+    if memo is None:
+        return client.list_directory(project_id, directory_id)
+    return memo.list_directory(project_id, directory_id,
+                               lambda: client.list_directory(project_id, directory_id))
+
 def _check_file_selection_dirs(path, file_selection, orig_path=None):
     """Recursively checks if a path is included in a dataset file selection, and why"""
     if path == orig_path:
@@ -115,7 +255,11 @@ def check_file_selection(path, file_selection):
         selected (bool): True if selected, False if not selected
 
         selected_by (str or None): One of "(self)" if included/excluded explicitly; Else, "<path>", the path of the first parent directory that is included or excluded; Otherwise, None, to indicate that it is not selected, but neither included nor excluded.
+
+    To check many paths, use a :class:`FileSelection`, which may also be passed as `file_selection`.
     """
+    if isinstance(file_selection, FileSelection):
+        return file_selection.check(path)
     result = None
     if path in file_selection['include_files']:
         result = (True, "(self)")
@@ -125,6 +269,146 @@ def check_file_selection(path, file_selection):
         result = _check_file_selection_dirs(path, file_selection, orig_path=path)
     return result
 
+class FileSelection(object):
+    """A dataset file selection, indexed for fast checks and edits
+
+    Files are kept in sets, and included and excluded directories in a trie of path components,
+    so checking a path costs one set lookup per file list plus one step per path component, and
+    edits cost one set operation per path. Results match :func:`check_file_selection`.
+
+    Example: ::
+
+        selection = FileSelection.from_dict(dataset.file_selection)
+        selection.include(files=["/data/a.txt"], dirs=["/data/results"])
+        selection.exclude(dirs=["/data/results/tmp"])
+        results = selection.check_all(paths)    # {path: (selected, selected_by)}
+        client.change_dataset_file_selection(project_id, dataset_id, selection.to_dict())
+
+    Arguments:
+        include_files, exclude_files, include_dirs, exclude_dirs: Iterables of Materials Commons
+            paths.
+    """
+
+    KEYS = ('include_files', 'exclude_files', 'include_dirs', 'exclude_dirs')
+
+    # trie node key for the selection of the directory a node represents
+    _SELECTED = None
+
+    def __init__(self, include_files=(), exclude_files=(), include_dirs=(), exclude_dirs=()):
+        self.include_files = set(include_files)
+        self.exclude_files = set(exclude_files)
+        self.include_dirs = set(include_dirs)
+        self.exclude_dirs = set(exclude_dirs)
+        self._trie = None
+        self._include_parents = None
+
+    @classmethod
+    def from_dict(cls, file_selection):
+        """Construct from a file selection dict, as returned by the Materials Commons API"""
+        return cls(**{key: file_selection.get(key) or () for key in cls.KEYS})
+
+    def to_dict(self):
+        """Returns a file selection dict, as expected by the Materials Commons API"""
+        return {key: sorted(getattr(self, key)) for key in self.KEYS}
+
+    def _get_trie(self):
+        if self._trie is None:
+            trie = {}
+            # if a directory is both included and excluded, it is included
+            for dirs, selected in ((self.exclude_dirs, False), (self.include_dirs, True)):
+                for path in dirs:
+                    node = trie
+                    for part in path.strip("/").split("/"):
+                        node = node.setdefault(part, {})
+                    node[self._SELECTED] = selected
+            self._trie = trie
+        return self._trie
+
+    def check(self, path):
+        """Check if a file or directory is selected, and why
+
+        Returns:
+            (selected, selected_by): See :func:`check_file_selection`.
+        """
+        if path in self.include_files:
+            return (True, "(self)")
+        if path in self.exclude_files:
+            return (False, "(self)")
+        if path == "/":
+            if path in self.include_dirs:
+                return (True, "(self)")
+            return (False, "(self)") if path in self.exclude_dirs else (False, None)
+
+        # the deepest included or excluded directory, not including "/", decides
+        result = (False, None)
+        node = self._get_trie()
+        end = 0
+        for part in path[1:].split("/"):
+            node = node.get(part)
+            if node is None:
+                break
+            end += len(part) + 1
+            if self._SELECTED in node:
+                result = (node[self._SELECTED], end)
+        selected, end = result
+        if end is None:
+            return result
+        return (selected, "(self)" if end == len(path) else path[:end])
+
+    def check_all(self, paths):
+        """Check many paths, returning {path: (selected, selected_by)}"""
+        return {path: self.check(path) for path in paths}
+
+    @staticmethod
+    def _parents(path):
+        parent = os.path.dirname(path)
+        while parent != path:
+            yield parent
+            path, parent = parent, os.path.dirname(parent)
+
+    def roots(self):
+        """Returns the sorted included files and directories that are not inside an included
+        directory. Every selected file is one of these, or is inside one of them."""
+        return sorted(path for path in self.include_files | self.include_dirs
+                      if not any(parent in self.include_dirs for parent in self._parents(path)))
+
+    def may_select_under(self, dirpath):
+        """True if files inside a directory may be selected, so it must be searched"""
+        if self._include_parents is None:
+            self._include_parents = set(parent for path in self.include_files | self.include_dirs
+                                        for parent in self._parents(path))
+        return dirpath in self._include_parents or self.check(dirpath)[0]
+
+    def include(self, files=(), dirs=()):
+        """Include files and directories, removing them from the excluded lists"""
+        for path in files:
+            self.include_files.add(path)
+            self.exclude_files.discard(path)
+        for path in dirs:
+            self.include_dirs.add(path)
+            self.exclude_dirs.discard(path)
+        self._trie = None
+        self._include_parents = None
+
+    def exclude(self, files=(), dirs=()):
+        """Exclude files and directories, removing them from the included lists"""
+        for path in files:
+            self.exclude_files.add(path)
+            self.include_files.discard(path)
+        for path in dirs:
+            self.exclude_dirs.add(path)
+            self.include_dirs.discard(path)
+        self._trie = None
+        self._include_parents = None
+
+    def clear(self, paths):
+        """Remove paths from all of the include and exclude lists"""
+        for path in paths:
+            for key in self.KEYS:
+                getattr(self, key).discard(path)
+        self._trie = None
+        self._include_parents = None
+
 def download_file_as_string(client, project_id, file_id):
     f = io.BytesIO()
     client._throttle()
@@ -1,19 +1,22 @@
+import calendar
 import datetime
 import dateutil
 import hashlib
 import json
 import os
+import re
 import requests
 import sys
 import time
 
 import materials_commons.api as mcapi
 import materials_commons.api.models as models
-from tabulate import tabulate
 
+import materials_commons.cli.offline as clioffline
+import materials_commons.cli.progress as cliprogress
 from materials_commons.cli.exceptions import MCCLIException, MissingRemoteException, \
     MultipleRemoteException, NoDefaultRemoteException
-from materials_commons.cli.print_formatter import PrintFormatter, trunc
+from materials_commons.cli.print_formatter import PrintFormatter, StreamingTable, trunc
 from materials_commons.cli.sqltable import SqlTable
 from materials_commons.cli.user_config import Config, RemoteConfig
 
@@ -44,6 +47,7 @@ def remove_hidden_project_files(project_path):
     remove_if(os.path.join(project_path, ".mc", "config.json"))
     remove_if(os.path.join(project_path, ".mc", "project.db"))
     rmdir_if(os.path.join(project_path, ".mc"))
+    invalidate_project_context()
 
 def getit(obj, name, default=None):
     """Returns the "name" attribute (or default value) whether "obj" is a dict or an object."""
@@ -56,6 +60,40 @@ def as_is(value):
     """Returns value without any changes. A placeholder for when a function is needed."""
     return value
 
+_ISO8601_UTC_RE = re.compile(
+    r"^(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?(?:Z|[+-]00:?00)$")
+
+def _parse_iso8601_utc(time_value):
+    """Returns (seconds since the epoch, microseconds) for a UTC ISO 8601 str, else None
+
+    Handles the fixed format used by Materials Commons, "%Y-%m-%dT%H:%M:%S.%fZ", without
+    constructing a datetime.
+    """
+    m = _ISO8601_UTC_RE.match(time_value)
+    if m is None:
+        return None
+    (year, month, day, hour, minute, second, fraction) = m.groups()
+    seconds = calendar.timegm((int(year), int(month), int(day), int(hour), int(minute),
+                               int(second), 0, 0, 0))
+    microseconds = int(fraction.ljust(6, '0')) if fraction else 0
+    return (seconds, microseconds)
+
+def parse_time(time_value):
+    """Parse an ISO 8601 str into a datetime.datetime
+
+    Tries, in order, the fixed Materials Commons timestamp format, datetime.datetime.fromisoformat,
+    and dateutil.parser.parse. As with dateutil.parser.parse, the result is naive if time_value
+    does not specify a timezone.
+    """
+    parsed = _parse_iso8601_utc(time_value)
+    if parsed is not None:
+        return datetime.datetime.fromtimestamp(parsed[0], tz=datetime.timezone.utc).replace(
+            microsecond=parsed[1])
+    try:
+        return datetime.datetime.fromisoformat(time_value)
+    except ValueError:
+        return dateutil.parser.parse(time_value)
+
 def epoch_time(time_value):
     """Attempts to convert various time representations into s since the epoch
 
@@ -68,7 +106,7 @@ def epoch_time(time_value):
             +-------------------+------------------------------------------------------------+
             | If this type      | Then do this conversion                                    |
             +-------------------+------------------------------------------------------------+
-            | str               | dateutil.parser.parse(time_value).timestamp()              |
+            | str               | parse_time(time_value).timestamp()                         |
             +-------------------+------------------------------------------------------------+
             | float, int        | time_value                                                 |
             +-------------------+------------------------------------------------------------+
@@ -82,7 +120,10 @@ def epoch_time(time_value):
             +-------------------+------------------------------------------------------------+
     """
     if isinstance(time_value, str): # expect ISO 8601 str
-        return dateutil.parser.parse(time_value).timestamp()
+        parsed = _parse_iso8601_utc(time_value)
+        if parsed is not None:
+            return (parsed[0] * 10**6 + parsed[1]) / 10**6
+        return parse_time(time_value).timestamp()
     elif isinstance(time_value, (float, int)):
         return float(time_value)
     elif isinstance(time_value, datetime.datetime):
@@ -94,6 +135,29 @@ def epoch_time(time_value):
     else:
         return str(type(time_value))
 
+def epoch_times(time_values):
+    """Convert a list of time representations into s since the epoch, as by :func:`epoch_time`
+
+    Intended for whole directory listings, where many records share the same timestamp: each
+    distinct value is converted once.
+
+    Args:
+        time_values (iterable): Representations of time, expects UTC time.
+
+    Returns:
+        list: The result of :func:`epoch_time` for each value.
+    """
+    converted = {}
+    result = []
+    for time_value in time_values:
+        if isinstance(time_value, str):
+            if time_value not in converted:
+                converted[time_value] = epoch_time(time_value)
+            result.append(converted[time_value])
+        else:
+            result.append(epoch_time(time_value))
+    return result
+
 def format_time(time_value, fmt="%Y %b %d %H:%M:%S"):
     """Attempts to put various time representations into specified format for printing
 
@@ -108,7 +172,7 @@ def format_time(time_value, fmt="%Y %b %d %H:%M:%S"):
             +-------------------+-------------------------------------------------+
             | If this type      | Then do this conversion                         |
             +-------------------+-------------------------------------------------+
-            | str               | dateutil.parser.parse(time_value).strftime(fmt) |
+            | str               | parse_time(time_value).strftime(fmt)            |
             +-------------------+-------------------------------------------------+
             | float, int        | time.strftime(fmt, time.localtime(time_value))  |
             +-------------------+-------------------------------------------------+
@@ -122,7 +186,7 @@ def format_time(time_value, fmt="%Y %b %d %H:%M:%S"):
             +-------------------+-------------------------------------------------+
     """
     if isinstance(time_value, str): # expect ISO 8601 str
-        return dateutil.parser.parse(time_value).astimezone().strftime(fmt)
+        return parse_time(time_value).astimezone().strftime(fmt)
     elif isinstance(time_value, (float, int)):
         return time.strftime(fmt, time.localtime(time_value))
     elif isinstance(time_value, datetime.datetime):
@@ -137,12 +201,13 @@ def format_time(time_value, fmt="%Y %b %d %H:%M:%S"):
 def checksum(path, chunk_size=131072):
     """Generate MD5 checksum for the file at "path" """
     md5 = hashlib.md5()
-    with open(path, 'rb') as f:
-        while True:
-            data = f.read(chunk_size)
-            if not data:
-                break
-            md5.update(data)
+    with cliprogress.current().phase('hash'):
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(chunk_size)
+                if not data:
+                    break
+                md5.update(data)
     return md5.hexdigest()
 
 def random_name(n=3, max_letters=6, sep='-'):
@@ -169,22 +234,37 @@ def random_name(n=3, max_letters=6, sep='-'):
     return sep.join(results)
 
 
-def print_table(data, columns=[], headers=[], out=None):
+def print_table(data, columns=[], headers=[], out=None, widths=None):
     """Print table from list of dict
 
+    Records are written as they are read, with column widths found from the first records (see
+    :class:`materials_commons.cli.print_formatter.StreamingTable`).
+
     Args:
-        data: list of dict, Data to print
+        data: iterable of dict, Data to print
         columns: list of str, Keys of data to print, in order
         headers: list of str, Header strings
         out: stream, Output stream
+        widths: list of int, Fixed column widths, or None to size columns from the data
     """
-    tabulate_in = []
     if out is None:
         out = sys.stdout
-    for record in data:
-        tabulate_in.append([record[col] for col in columns])
-    out.write(tabulate(tabulate_in, headers=headers))
-    out.write('\n')
+    with StreamingTable(columns, headers, out=out, widths=widths) as table:
+        for record in data:
+            table.write(record)
+
+def sort_records(records, keys):
+    """Sort a list of records in place by several keys at once
+
+    Equivalent to a stable sort by each key, starting from the last, but with one pass.
+
+    Args:
+        records: list of dict, Records to sort
+        keys: list of str, Keys to sort by, most significant first
+    """
+    if keys:
+        records.sort(key=lambda record: tuple(record[k] for k in keys))
+    return records
 
 def print_projects(projects, current=None):
     """Prints a list of projects, including a '*' indicating the project containing the current working directory
@@ -335,6 +415,16 @@ def print_remotes(config_remotes, show_apikey=False):
     for record in data:
         pformatter.print(record)
 
+def _make_project_client(project_config, config):
+    """Construct a client for the remote specified in a local project configuration"""
+    remote_config = project_config.remote
+    if remote_config == config.default_remote:
+        return config.default_remote.make_client()
+    elif remote_config not in config.remotes:
+        raise MissingRemoteException("Could not make project Client, failed to find remote config: {0} {1}".format(remote_config.email, remote_config.mcurl))
+    remote_config_with_apikey = config.remotes[config.remotes.index(remote_config)]
+    return remote_config_with_apikey.make_client()
+
 def make_local_project_client(path):
     """Construct a client to access project data from the local project configuration
 
@@ -344,18 +434,9 @@ def make_local_project_client(path):
     Returns:
         :class:`materials_commons.api.Client`: A client for the instance of Materials Commons that is storing the project
     """
-    project_config = read_project_config(path)
-    if not project_config:
+    if not read_project_config(path):
         return None
-
-    config = Config()
-    remote_config = project_config.remote
-    if remote_config == config.default_remote:
-        return config.default_remote.make_client()
-    elif remote_config not in config.remotes:
-        raise MissingRemoteException("Could not make project Client, failed to find remote config: {0} {1}".format(remote_config.email, remote_config.mcurl))
-    remote_config_with_apikey = config.remotes[config.remotes.index(remote_config)]
-    return remote_config_with_apikey.make_client()
+    return project_context(path).client
 
 class ProjectTable(SqlTable):
     """The ProjectTable creates a sqlite "project" table to cache some basic project data"""
@@ -416,6 +497,9 @@ def make_local_project(path, data=None):
     - Add attributes to the project:
         - "local_path" (str) providing the absolute path to the local project directory
         - "remote" (:class:`materials_commons.api.Client`) project specific client instance
+        - "remote_checktime" (float or None) time the project data was fetched from the remote by this process, or None if it was read from the cache
+    - The result is memoized in the :class:`ProjectContext` for the project, so repeated calls
+      in one process do not re-read configuration or the project cache.
 
     Args:
         path (str): Path inside a local project directory
@@ -424,12 +508,15 @@ def make_local_project(path, data=None):
     Notes:
         Caching behavior is currently disabled while updating `materials_commons.cli` for MC2.0. It allows setting a "fetch lock" so that data that is not cached or older than the time the lock was set will be queried from the remote, otherwise the local cache data is used.
     """
+    ctx = project_context(path, required=True)
+    if data is not None or ctx._proj is None:
+        ctx._proj = _load_local_project(ctx, data)
+    return ctx._proj
 
-    proj_path = project_path(path)
-    if not proj_path:
-        raise MCCLIException("No Materials Commons project found at " + str(path))
-
-    project_config = read_project_config(path)
+def _load_local_project(ctx, data=None):
+    """Construct the project for a :class:`ProjectContext`, using the ".mc/project.db" cache if possible"""
+    proj_path = ctx.project_path
+    project_config = ctx.project_config
 
     # check for project data cached in sqlite ".mc/project.db"
     project_table = ProjectTable(proj_path)
@@ -440,8 +527,18 @@ def make_local_project(path, data=None):
     if len(results) > 1:
         raise MCCLIException("Project db error: Found >1 project")
 
-    client = make_local_project_client(path)
-    if not results or not project_config.remote_updatetime or results[0]['checktime'] < project_config.remote_updatetime:
+    client = ctx.client
+    if clioffline.enabled() and data is None:
+        # offline, use the cached project data regardless of age
+        if not results:
+            raise clioffline.OfflineError(
+                "Offline: no cached project data in " + os.path.join(proj_path, ".mc", "project.db")
+                + ". Run any `mc` command in the project while online to create it.")
+        use_cache = True
+    else:
+        use_cache = results and project_config.remote_updatetime and results[0]['checktime'] >= project_config.remote_updatetime
+
+    if not use_cache:
         checktime = time.time()
         try:
             if data is None:
@@ -449,7 +546,7 @@ def make_local_project(path, data=None):
             else:
                 proj = models.Project(data=data)
         except requests.exceptions.ConnectionError as e:
-            raise MCCLIException("Could not connect to " + remote.config.mcurl)
+            raise MCCLIException("Could not connect to " + str(project_config.remote.mcurl))
         except requests.exceptions.HTTPError as e:
             raise MCCLIException("HTTPError: " + str(e))
 
@@ -464,10 +561,12 @@ def make_local_project(path, data=None):
         project_table.insert_or_replace(record)
         project_table.close()
     else:
+        checktime = None
         record = results[0]
         proj = models.Project(data=json.loads(record['data']))
 
     proj.local_path = proj_path
+    proj.remote_checktime = checktime
     proj.remote = client
     return proj
 
@@ -506,6 +605,21 @@ def humanize(file_size_bytes):
         if _size < 1000 or key == "T":
             return str(_size) + key
 
+def parse_size(s):
+    """Parse a file size, as bytes or with a suffix as used by :func:`humanize`
+
+    Args:
+        s (str): File size string (ex: "1048576", "10B", "8K", "5M", "2G", etc.)
+
+    Returns:
+        int: File size in bytes
+    """
+    abbrev = {"B": 0, "K": 10, "M": 20, "G": 30, "T": 40}
+    match = re.match(r"^\s*(\d+(?:\.\d+)?)\s*([BKMGT]?)B?\s*$", str(s).upper())
+    if not match:
+        raise MCCLIException("Invalid size: " + str(s))
+    return int(float(match.group(1)) * (1 << abbrev.get(match.group(2) or "B")))
+
 def request_confirmation(msg, force=False):
     """Request user confirmation
 
@@ -531,15 +645,25 @@ def request_confirmation(msg, force=False):
     else:
         return True
 
+_proj_path_cache = {}
+
 def _proj_path(path):
-    """Returns the path to a local project directory if it contains "path", else None"""
+    """Returns the path to a local project directory if it contains "path", else None
+
+    Found project directories are memoized for the life of the process, and re-validated with a
+    single check that the ".mc" directory still exists.
+    """
     # if not os.path.isdir(path):
     #   raise Exception("Error, no directory named: " + path)
+    cached = _proj_path_cache.get(path)
+    if cached is not None and os.path.isdir(os.path.join(cached, '.mc')):
+        return cached
     curr = path
     cont = True
     while cont is True:
         test_path = os.path.join(curr, '.mc')
         if os.path.isdir(test_path):
+            _proj_path_cache[path] = curr
             return curr
         elif curr == os.path.dirname(curr):
             return None
@@ -587,6 +711,7 @@ class ProjectConfig(object):
             "experiment_id": <id>,
             "experiment_uuid": <uuid>,
             "remote_updatetime": <number>,
+            "remote_auto_lock": <bool>,
             "globus_upload_id": <id>,
             "globus_download_id": <id>
         }
@@ -601,6 +726,7 @@ class ProjectConfig(object):
         experiment_uuid (str or None): Current experiment UUID
         remote (user_config.RemoteConfig): Holds configuration variables (email, url, apikey) for the remote instance of Materials Commons where the project is stored.
         remote_updatetime (number or None): For use with optional caching, holds the last time local cache data was updated from the remote.
+        remote_auto_lock (bool): For use with optional caching, if True the remote tree cache is validated as a whole by checking the project change marker (see :func:`treedb.RemoteTree.validate`).
         globus_upload_id (int or None): ID specifying which Globus upload directory should be used for Globus uploads.
         globus_download_id (int or None): ID specifying which Globus download directory should be used for Globus downloads.
 
@@ -639,6 +765,7 @@ class ProjectConfig(object):
         self.experiment_id = data.get('experiment_id', None)
         self.experiment_uuid = data.get('experiment_uuid', None)
         self.remote_updatetime = data.get('remote_updatetime', None)
+        self.remote_auto_lock = data.get('remote_auto_lock', False)
         self.globus_upload_id = data.get('globus_upload_id', None)
         self.globus_download_id = data.get('globus_download_id', None)
 
@@ -654,6 +781,7 @@ class ProjectConfig(object):
             'experiment_id': self.experiment_id,
             'experiment_uuid': self.experiment_uuid,
             'remote_updatetime': self.remote_updatetime,
+            'remote_auto_lock': self.remote_auto_lock,
             'globus_upload_id': self.globus_upload_id,
             'globus_download_id': self.globus_download_id,
         }
@@ -664,6 +792,7 @@ class ProjectConfig(object):
             os.mkdir(self.config_dir)
         with open(self.config_path, 'w') as f:
             json.dump(self.to_dict(), f)
+        invalidate_project_context()
         return
 
 def read_project_config(path):
@@ -672,13 +801,120 @@ def read_project_config(path):
     Returns:
          If the project configuration file ("<project>/.mc/config.json") exists, returns a :class:`ProjectConfig` instance. Else, returns None.
     """
-    # get config
-    proj_config_path = _proj_config(path)
-    if proj_config_path and os.path.exists(proj_config_path):
-        return ProjectConfig(project_path(path))
+    ctx = project_context(path)
+    if ctx is not None and os.path.exists(ctx.project_config.config_path):
+        return ctx.project_config
     else:
         return None
 
+class ProjectContext(object):
+    """Memoized local project state, built at most once per process for each project
+
+    A single command may need the project path, project configuration, user configuration,
+    client, project, and tree caches from several places. A ProjectContext reads or constructs
+    each of these once, on first use, and is shared by every caller in the process via
+    :func:`project_context`. Contexts are dropped by :func:`invalidate_project_context`, which is
+    called whenever :func:`ProjectConfig.save` or :func:`user_config.Config.save` write
+    configuration files.
+
+    Attributes:
+        project_path (str): Absolute path to local project directory.
+        project_config (:class:`ProjectConfig`): Local project configuration.
+        config (:class:`user_config.Config`): User configuration.
+        client (:class:`materials_commons.api.Client`): A client for the remote storing the project.
+        proj (:class:`materials_commons.api.models.Project`): The project, as constructed by
+            :func:`make_local_project`.
+        localtree (:class:`treedb.LocalTree`): Local tree cache.
+        remotetree (:class:`treedb.RemoteTree` or None): Remote tree cache, or None if not enabled
+            (if the project configuration "remote_updatetime" and "remote_auto_lock" are not set and
+            offline mode is off).
+    """
+    def __init__(self, project_path):
+        self.project_path = project_path
+        self._project_config = None
+        self._config = None
+        self._client = None
+        self._proj = None
+        self._localtree = None
+        self._remotetree = None
+
+    @property
+    def project_config(self):
+        if self._project_config is None:
+            self._project_config = ProjectConfig(self.project_path)
+        return self._project_config
+
+    @property
+    def config(self):
+        if self._config is None:
+            self._config = Config()
+        return self._config
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = _make_project_client(self.project_config, self.config)
+        return self._client
+
+    @property
+    def proj(self):
+        if self._proj is None:
+            self._proj = _load_local_project(self)
+        return self._proj
+
+    @property
+    def localtree(self):
+        if self._localtree is None:
+            from materials_commons.cli.treedb import LocalTree
+            self._localtree = LocalTree(self.project_path)
+        return self._localtree
+
+    @property
+    def remotetree(self):
+        pconfig = self.project_config
+        if self._remotetree is None and (pconfig.remote_updatetime or pconfig.remote_auto_lock
+                                         or clioffline.enabled()):
+            from materials_commons.cli.treedb import RemoteTree
+            self._remotetree = RemoteTree(self.proj, pconfig.remote_updatetime,
+                                          auto_lock=pconfig.remote_auto_lock)
+        return self._remotetree
+
+_project_contexts = {}
+
+def project_context(path, required=False):
+    """Returns the memoized :class:`ProjectContext` for the local project containing "path"
+
+    Args:
+        path (str): Path inside a local project directory
+        required (bool): If True, raise if "path" is not inside a local project directory.
+
+    Returns:
+        :class:`ProjectContext`, or None if "path" is not inside a local project directory and
+        "required" is False.
+
+    Raises:
+        MCCLIException: If "required" is True and "path" is not inside a local project directory.
+    """
+    proj_path = _proj_path(path)
+    if not proj_path:
+        if required:
+            raise MCCLIException("No Materials Commons project found at " + str(path))
+        return None
+    ctx = _project_contexts.get(proj_path)
+    if ctx is None:
+        ctx = ProjectContext(proj_path)
+        _project_contexts[proj_path] = ctx
+    return ctx
+
+def invalidate_project_context():
+    """Drop all memoized project contexts and project paths
+
+    Called whenever project or user configuration files are written or removed, so that the next
+    call to :func:`project_context` re-reads them.
+    """
+    _project_contexts.clear()
+    _proj_path_cache.clear()
+
 def clone_project(remote_config, project_id, parent_dest, name=None):
     """Clone a remote project to a local directory
 
@@ -1,13 +1,20 @@
 import os
 import sys
 import argparse
+import concurrent.futures
 import contextlib
 import json
 import re
 
+import materials_commons.api as mcapi
 import materials_commons.cli.functions as clifuncs
+import materials_commons.cli.ndjson as clindjson
+import materials_commons.cli.object_cache as objcache
 from materials_commons.cli.exceptions import MCCLIException
 
+# Default maximum number of projects queried at once by ListObjects.fan_out_projects
+DEFAULT_FAN_OUT_JOBS = 8
+
 @contextlib.contextmanager
 def output_method(file=None, force=False):
     if file is None:
@@ -68,6 +75,14 @@ class ListObjects(object):
     |<name>(self, objects, args, out=sys.stdout) |
     +--------------------------------------------+
 
+    Derived classes may cache the lists they get from the remote with :func:`cached_list` and
+    :func:`cached_project_list`. Cached lists of the types in `cache_types` are invalidated after
+    create, delete, and the custom actions listed in `modifying_actions`.
+
+    Derived classes that list objects from all projects in `get_all_from_remote` should use
+    :func:`fan_out_projects`, which queries projects concurrently (``--jobs``) and reports
+    projects that could not be queried instead of failing.
+
     See :class:`materials_commons.cli.subcommands.proj.ProjSubcommand` for an example.
 
     """
@@ -77,7 +92,8 @@ class ListObjects(object):
                  remote_help='Select remote',
                  list_columns=None, headers=None,
                  deletable=False, dry_runable=False, has_owner=True, creatable=False,
-                 custom_actions=[], custom_selection_actions=[], request_confirmation_actions={}):
+                 custom_actions=[], custom_selection_actions=[], request_confirmation_actions={},
+                 cache_types=(), modifying_actions=()):
         """
 
         Args:
@@ -124,6 +140,14 @@ class ListObjects(object):
                 Dictionary of names of custom_selection_actions which require prompting the user
                 for confirmation before executing. The value is the message shown at the prompt.
                 Delete is always confirmed and is not included here.
+            cache_types: Tuple of str
+                Object types (see :mod:`materials_commons.cli.object_cache`) whose cached lists are
+                invalidated after create, delete, or `modifying_actions`. If not empty, enables
+                --refresh.
+            modifying_actions: Tuple of str
+                Names of custom_actions and custom_selection_actions that modify remote data, after
+                which cached lists of `cache_types` are invalidated. Other custom actions, such as
+                opening a web browser or setting local configuration, keep the cache.
         """
         if list_columns is None:
             list_columns = []
@@ -147,6 +171,11 @@ class ListObjects(object):
         self.custom_actions = custom_actions
         self.custom_selection_actions = custom_selection_actions
         self.request_confirmation_actions = request_confirmation_actions
+        self.cache_types = cache_types
+        self.modifying_actions = modifying_actions
+        self.refresh = False
+        self.jobs = DEFAULT_FAN_OUT_JOBS
+        self.fan_out_failures = []
 
         self.desc = desc
         if self.desc is None:
@@ -164,6 +193,7 @@ class ListObjects(object):
         regxsearch_help = 'use regular expression search instead of match'
         sort_by_help = 'columns to sort by'
         json_help = 'print JSON data'
+        ndjson_help = 'print JSON data, one compact record per line'
         all_help = 'list ' + self.typename_plural + ' from all projects'
         expt_help = 'restrict to ' + self.typename_plural + ' in the current experiment'
         dataset_help = 'restrict to ' + self.typename_plural + ' in the specified (by id) dataset'
@@ -172,6 +202,9 @@ class ListObjects(object):
         create_help = 'create a ' + self.typename
         delete_help = 'delete a ' + self.typename + ', specified by id'
         dry_run_help = 'dry run deletion'
+        refresh_help = 'fetch from the remote instead of using cached ' + self.typename_plural
+        jobs_help = 'maximum number of projects to query at once with --all (default ' \
+            + str(DEFAULT_FAN_OUT_JOBS) + ')'
 
         cmd = "mc "
         for n in self.cmdname:
@@ -188,12 +221,15 @@ class ListObjects(object):
         parser.add_argument('--regxsearch', action="store_true", default=False, help=regxsearch_help)
         parser.add_argument('--sort-by', nargs='*', default=['name'], help=sort_by_help)
         parser.add_argument('--json', action="store_true", default=False, help=json_help)
+        parser.add_argument('--ndjson', action="store_true", default=False, help=ndjson_help)
         parser.add_argument('-o', '--output', nargs=1, default=None, help=output_help)
         parser.add_argument('-f', '--force', action="store_true", default=False, help=force_help)
         if self.non_proj_member:
             clifuncs.add_remote_option(parser, self.remote_help)
         if self.non_proj_member and self.proj_member:
             parser.add_argument('--all', action="store_true", default=False, help=all_help)
+            parser.add_argument('--jobs', type=int, default=DEFAULT_FAN_OUT_JOBS, metavar='N',
+                                help=jobs_help)
         if self.expt_member:
             parser.add_argument('--expt', action="store_true", default=False, help=expt_help)
         if self.dataset_member:
@@ -204,6 +240,8 @@ class ListObjects(object):
             parser.add_argument('--delete', action="store_true", default=False, help=delete_help)
         if self.dry_runable:
             parser.add_argument('-n', '--dry-run', action="store_true", default=False, help=dry_run_help)
+        if self.cache_types:
+            parser.add_argument('--refresh', action="store_true", default=False, help=refresh_help)
 
         if hasattr(self, 'add_create_options'):
             self.add_create_options(parser)
@@ -232,6 +270,10 @@ class ListObjects(object):
         """
         args = self.parse_args(argv)
         self.working_dir = working_dir
+        self.refresh = getattr(args, 'refresh', False)
+        self.jobs = getattr(args, 'jobs', DEFAULT_FAN_OUT_JOBS)
+        if self.jobs < 1:
+            raise MCCLIException("--jobs must be a positive integer, got: " + str(self.jobs))
 
         output = None
         if args.output:
@@ -240,7 +282,7 @@ class ListObjects(object):
         # check for --create and other custom actions
         for name in ['create'] + self.custom_actions:
             if hasattr(args, name) and getattr(args, name):
-                with output_method(output, args.force) as out:
+                with output_method(output, args.force) as out, self._invalidating_cache(name):
                     # interfaces 'mc casm monte --create ...'
                     getattr(self, name)(args, out=out)
                 return
@@ -264,13 +306,15 @@ class ListObjects(object):
                         out.write("Exiting\n")
                         return
                     else:
-                        self.delete(objects, args, dry_run=args.dry_run, out=out)
+                        with self._invalidating_cache('delete'):
+                            self.delete(objects, args, dry_run=args.dry_run, out=out)
                 else:
                     if args.dry_run:
                         out.write("** Dry run **\n")
                     self.output(objects, args, out)
                     out.write("Permanently deleting with --force...\n")
-                    self.delete(objects, args, dry_run=args.dry_run, out=out)
+                    with self._invalidating_cache('delete'):
+                        self.delete(objects, args, dry_run=args.dry_run, out=out)
                 return
 
             else:
@@ -288,15 +332,83 @@ class ListObjects(object):
                 if name in self.request_confirmation_actions and not args.force:
                     self.output(objects, args, out)
                     if clifuncs.request_confirmation(self.request_confirmation_actions[name]):
-                        getattr(self, name)(objects, args, out)
+                        with self._invalidating_cache(name):
+                            getattr(self, name)(objects, args, out)
                     else:
                         out.write("Exiting\n")
                         return
+                elif name == 'output':
+                    self.output(objects, args, out)
                 else:
-                    getattr(self, name)(objects, args, out)
+                    with self._invalidating_cache(name):
+                        getattr(self, name)(objects, args, out)
 
                 return
 
+    @contextlib.contextmanager
+    def _invalidating_cache(self, name):
+        """Invalidate cached lists of self.cache_types after the body runs, even if it fails, if
+        action `name` modifies remote data"""
+        try:
+            yield
+        finally:
+            if self.cache_types and \
+                    (name in ('create', 'delete') or name in self.modifying_actions):
+                objcache.invalidate(self.cache_types,
+                                    proj_local_path=clifuncs.project_path(self.working_dir))
+
+    def cached_list(self, remote, otype, fetch, cls):
+        """Get a remote-wide list of objects, using the per-user cache unless --refresh
+
+        See :func:`materials_commons.cli.object_cache.get_remote_list`.
+        """
+        return objcache.get_remote_list(remote, otype, fetch, cls, refresh=self.refresh)
+
+    def cached_project_list(self, proj, otype, fetch, cls):
+        """Get a list of objects belonging to a project, using the cache unless --refresh
+
+        See :func:`materials_commons.cli.object_cache.get_project_list`.
+        """
+        return objcache.get_project_list(proj, otype, fetch, cls, refresh=self.refresh)
+
+    def fan_out_projects(self, remote, get_from_project):
+        """Call `get_from_project(project)` for all of a user's projects, concurrently
+
+        At most `self.jobs` projects are queried at once. Projects that fail are recorded in
+        `self.fan_out_failures`, as (project, exception), and reported by
+        :func:`get_all_objects`; if every project fails, the first exception is raised.
+
+        Arguments:
+            remote (materials_commons.api.Client): The remote.
+            get_from_project (callable): Returns a list of objects for one project, for instance
+                `self.get_all_from_project`.
+
+        Returns:
+            list: The concatenated results, in project order.
+        """
+        projects = self.cached_list(remote, 'project', remote.get_all_projects, mcapi.Project)
+        for project in projects:
+            project.remote = remote
+
+        self.fan_out_failures = []
+        results = [None] * len(projects)
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(1, min(self.jobs, len(projects))),
+                thread_name_prefix="mc-fan-out") as executor:
+            futures = {executor.submit(get_from_project, project): i
+                       for i, project in enumerate(projects)}
+            for future in concurrent.futures.as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    self.fan_out_failures.append((projects[i], e))
+
+        if projects and len(self.fan_out_failures) == len(projects):
+            raise self.fan_out_failures[0][1]
+        self.fan_out_failures.sort(key=lambda failure: projects.index(failure[0]))
+        return [obj for result in results if result is not None for obj in result]
+
     def get_remote(self, args):
         default_client = None
         if clifuncs.project_exists(self.working_dir):
@@ -305,8 +417,11 @@ class ListObjects(object):
 
     def get_all_objects(self, args, out=sys.stdout):
 
+        # with --ndjson, out only gets records
+        msg_out = sys.stderr if getattr(args, 'ndjson', False) else out
+
         if self.requires_project and not clifuncs.project_exists(self.working_dir):
-            out.write("Not in a Materials Commons project directory.\n")
+            msg_out.write("Not in a Materials Commons project directory.\n")
             raise MCCLIException("Invalid Materials Commons request")
 
         if hasattr(args, 'expt') and args.expt:
@@ -314,21 +429,27 @@ class ListObjects(object):
             expt = clifuncs.make_local_expt(proj)
             data = self.get_all_from_experiment(expt)
             if not len(data):
-                out.write("No " + self.typename_plural + " found in experiment\n")
+                msg_out.write("No " + self.typename_plural + " found in experiment\n")
                 return []
         elif (self.non_proj_member and not self.proj_member) \
             or (self.non_proj_member and self.proj_member and hasattr(args, 'all') and args.all) \
             or (self.non_proj_member and self.proj_member and not clifuncs.project_exists(self.working_dir)):
             remote = self.get_remote(args)
+            self.fan_out_failures = []
             data = self.get_all_from_remote(remote=remote)
+            if self.fan_out_failures:
+                msg_out.write("Warning: could not get " + self.typename_plural + " from "
+                          + str(len(self.fan_out_failures)) + " project(s):\n")
+                for project, e in self.fan_out_failures:
+                    msg_out.write("  " + project.name + " (id=" + str(project.id) + "): " + str(e) + "\n")
             if not len(data):
-                out.write("No " + self.typename_plural + " found at " + remote.base_url + "\n")
+                msg_out.write("No " + self.typename_plural + " found at " + remote.base_url + "\n")
                 return []
         else:
             proj = clifuncs.make_local_project(self.working_dir)
             data = self.get_all_from_project(proj)
             if not len(data):
-                out.write("No " + self.typename_plural + " found in project\n")
+                msg_out.write("No " + self.typename_plural + " found in project\n")
                 return []
 
         def _any_match(obj, attrname, remethod):
@@ -360,16 +481,17 @@ class ListObjects(object):
             objects = data
 
         if not len(objects):
-            out.write("No " + self.typename_plural + " found matching specified criteria:\n")
-            out.write("  Method: re." + remethod.__name__)
-            out.write("  Expression(s): " + str(args.expr))
-            out.write("  Checking attribute: '" + attrname + "'\n")
+            msg_out.write("No " + self.typename_plural + " found matching specified criteria:\n")
+            msg_out.write("  Method: re." + remethod.__name__)
+            msg_out.write("  Expression(s): " + str(args.expr))
+            msg_out.write("  Checking attribute: '" + attrname + "'\n")
 
         return objects
 
     def output(self, objects, args, out=sys.stdout):
         if not len(objects):
-            out.write("No " + self.typename_plural + " found matching specified criteria\n")
+            msg_out = sys.stderr if getattr(args, 'ndjson', False) else out
+            msg_out.write("No " + self.typename_plural + " found matching specified criteria\n")
             return
         if args.details:
             if not hasattr(self, 'print_details'):
@@ -389,13 +511,19 @@ class ListObjects(object):
                 else:
                     out.write("--json not currently possible for this type of object\n")
                     break
-        else:
-            data = []
+        elif args.ndjson:
+            writer = clindjson.NDJSONWriter(out)
             for obj in objects:
-                data.append(self.list_data(obj, args))
-
-            for col in reversed(args.sort_by):
-                data = sorted(data, key=lambda k: k[col])
+                if hasattr(obj, '_data'):
+                    writer.write(obj._data)
+                elif isinstance(obj, dict):
+                    writer.write(obj)
+                else:
+                    sys.stderr.write("--ndjson not currently possible for this type of object\n")
+                    break
+        else:
+            data = [self.list_data(obj, args) for obj in objects]
+            clifuncs.sort_records(data, args.sort_by)
 
             columns = self.list_columns
             headers = self.headers
@@ -0,0 +1,65 @@
+"""Newline-delimited JSON (NDJSON) output for scripting
+
+With ``--ndjson``, commands write one compact JSON record per line, as soon as each record is
+available, so that output can be processed as a stream: ::
+
+    mc proj --ndjson | jq -r .name
+    mc ls -r data --ndjson | jq 'select(.l_type != .r_type)'
+    mc up -r data --ndjson events.ndjson
+
+Other messages, such as warnings and, for `mc up` and `mc down`, per-file messages and prompts,
+are written to stderr so that stdout only contains records.
+
+- `mc proj`, `mc dataset`, `mc expt`, `mc globus upload`, ... (see
+  :class:`materials_commons.cli.list_objects.ListObjects`): one record per object, with the
+  object data as returned by the Materials Commons API.
+- `mc ls`: one record per file or directory, with the local and remote comparison data.
+- `mc up` and `mc down`: one record per file as it finishes, is skipped, or fails, and a final
+  summary record (see :func:`materials_commons.cli.progress.reporting`).
+"""
+import contextlib
+import json
+import sys
+import threading
+
+
+def dumps(record):
+    """Returns a record as compact, single line JSON. Values JSON cannot encode use str()."""
+    return json.dumps(record, separators=(',', ':'), default=str)
+
+
+class NDJSONWriter(object):
+    """Write records to a stream, one per line, flushing after each record
+
+    Writing is thread-safe, so records can be written by transfer worker threads.
+
+    Arguments:
+        out: stream, output stream, default sys.stdout
+    """
+
+    def __init__(self, out=None):
+        self.out = out
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = dumps(record) + "\n"
+        out = self.out if self.out is not None else sys.stdout
+        with self._lock:
+            out.write(line)
+            out.flush()
+
+
+@contextlib.contextmanager
+def open_writer(path):
+    """Context manager giving a NDJSONWriter for a path, or for stdout if path is '-'
+
+    If path is '-', everything else printed to stdout while the context is active is sent to
+    stderr instead, so that stdout only contains records.
+    """
+    if path == '-':
+        writer = NDJSONWriter(sys.stdout)
+        with contextlib.redirect_stdout(sys.stderr):
+            yield writer
+        return
+    with open(path, 'w') as f:
+        yield NDJSONWriter(f)
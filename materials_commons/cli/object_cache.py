@@ -0,0 +1,349 @@
+"""Cache lists of projects, datasets, experiments, and Globus requests
+
+Commands like `mc proj`, `mc dataset`, `mc expt`, and `mc globus upload` list objects fetched from
+the remote. The lists are cached, with a time-to-live (TTL) for each object type, so repeated
+listings do not need to fetch the same data again:
+
+- Lists belonging to a local project are cached in the "objectcache" table of the project
+  database, ".mc/project.db".
+- Lists that span the remote, such as all of a user's projects or all published datasets, and lists
+  belonging to projects that are not cloned locally, are cached in the same table of a per-user
+  database, "~/.materialscommons/cache.db".
+
+Cached lists are invalidated whenever the CLI creates, deletes, publishes, or otherwise modifies an
+object of the same type, and `--refresh` always fetches from the remote. In offline mode (see
+:mod:`materials_commons.cli.offline`) cached lists are used regardless of age.
+
+TTLs, in seconds, can be set per object type in the user configuration file: ::
+
+    "cache_ttl": {
+        "project": 300,
+        "dataset": 60
+    }
+
+A TTL of 0 disables caching for that type.
+
+Users, needed to show object owners, are cached individually in the "usercache" table of the
+per-user database by :class:`UserCache`, with the "user" TTL.
+"""
+import hashlib
+import json
+import os
+import time
+
+import materials_commons.api.models as models
+import materials_commons.cli.offline as clioffline
+from materials_commons.cli.sqltable import PathSqlTable, dbpath
+from materials_commons.cli.user_config import Config
+
+USER_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.materialscommons', 'cache.db')
+
+# Default time-to-live (s) for cached lists, by object type
+DEFAULT_TTLS = {
+    'project': 300.0,
+    'dataset': 300.0,
+    'published_dataset': 3600.0,
+    'experiment': 300.0,
+    'globus_upload': 60.0,
+    'globus_download': 60.0,
+    'user': 86400.0
+}
+
+class ObjectCacheTable(PathSqlTable):
+    """The ObjectCacheTable stores lists of objects, as JSON, with the time they were fetched
+
+    Values:
+        key: str, identifies the list, including the remote and object type
+        otype: str, object type, one of the DEFAULT_TTLS keys
+        data: str, JSON list of object data, as returned by the Materials Commons API
+        checktime: real, time the list was fetched (s since epoch)
+    """
+
+    @staticmethod
+    def default_print_fmt():
+        from materials_commons.cli.functions import as_is, format_time
+        return [
+            ("key", "key", "<", 80, as_is),
+            ("otype", "otype", "<", 24, as_is),
+            ("checktime", "checktime", "<", 24, format_time)
+        ]
+
+    @staticmethod
+    def tablecolumns():
+        return {
+            "key": ["text", "UNIQUE"],
+            "otype": ["text"],
+            "data": ["text"],
+            "checktime": ["real"]
+        }
+
+    @staticmethod
+    def tablename():
+        return "objectcache"
+
+    def select_by_key(self, key):
+        """Select record by key
+
+        Returns:
+            sqlite3.Row or None
+        """
+        self.curs.execute("SELECT * FROM " + self.tablename() + " WHERE key=?", (key,))
+        return self.curs.fetchone()
+
+    def delete_by_otype(self, otype):
+        """Delete all records of an object type"""
+        self.curs.execute("DELETE FROM " + self.tablename() + " WHERE otype=?", (otype,))
+        self.conn.commit()
+
+class ObjectCache(object):
+    """Get lists of objects from a cache database, fetching them if missing or expired
+
+    Arguments:
+        path (str): Path to the sqlite database file.
+        ttls (dict or None): Time-to-live (s) by object type. Default uses DEFAULT_TTLS, updated
+            with the user configuration "cache_ttl" values.
+    """
+    def __init__(self, path, ttls=None):
+        if ttls is None:
+            ttls = dict(DEFAULT_TTLS)
+            ttls.update(Config().cache_ttl)
+        self.path = path
+        self.ttls = ttls
+        self.table = ObjectCacheTable(path)
+
+    def get_list(self, otype, key, fetch, cls, refresh=False):
+        """Returns a cached list of objects, or the result of `fetch()` which is then cached
+
+        Arguments:
+            otype (str): Object type, used to look up the TTL and to invalidate.
+            key (str): Identifies the list, for example "<remote url> dataset project=<id>".
+            fetch (callable): Function with no arguments that gets the list of objects from the
+                remote. The objects must have a `_data` attribute.
+            cls (type): A `materials_commons.api.models` class with a `from_list` function, used to
+                construct objects from cached data.
+            refresh (bool): If True, always fetch.
+
+        Returns:
+            list of `cls`: The objects.
+        """
+        ttl = self.ttls.get(otype, 0)
+        if not refresh and (ttl > 0 or clioffline.enabled()):
+            self.table.connect()
+            try:
+                record = self.table.select_by_key(key)
+            finally:
+                self.table.close()
+            if record is not None and (clioffline.enabled() or time.time() - record['checktime'] < ttl):
+                return cls.from_list(json.loads(record['data']))
+
+        checktime = time.time()
+        objects = fetch()
+        if ttl > 0:
+            self.table.connect()
+            try:
+                self.table.insert_or_replace({
+                    'key': key,
+                    'otype': otype,
+                    'data': json.dumps([obj._data for obj in objects]),
+                    'checktime': checktime
+                })
+            finally:
+                self.table.close()
+        return objects
+
+    def invalidate(self, otypes):
+        """Delete all cached lists of the given object types"""
+        self.table.connect()
+        try:
+            for otype in otypes:
+                self.table.delete_by_otype(otype)
+        finally:
+            self.table.close()
+
+class UserCacheTable(PathSqlTable):
+    """The UserCacheTable stores individual users, as JSON, with the time they were fetched
+
+    Values:
+        key: str, "<remote key> <user id>" (see :func:`remote_key`)
+        remote: str, identifies the remote and account
+        id: integer, user id
+        data: str, JSON user data, as returned by the Materials Commons API
+        checktime: real, time the user was fetched (s since epoch)
+    """
+
+    @staticmethod
+    def default_print_fmt():
+        from materials_commons.cli.functions import as_is, format_time
+        return [
+            ("remote", "remote", "<", 60, as_is),
+            ("id", "id", "<", 12, as_is),
+            ("checktime", "checktime", "<", 24, format_time)
+        ]
+
+    @staticmethod
+    def tablecolumns():
+        return {
+            "key": ["text", "UNIQUE"],
+            "remote": ["text"],
+            "id": ["integer"],
+            "data": ["text"],
+            "checktime": ["real"]
+        }
+
+    @staticmethod
+    def tablename():
+        return "usercache"
+
+    def select_by_ids(self, remote, ids):
+        """Select records for a remote and list of user ids
+
+        Returns:
+            list of sqlite3.Row
+        """
+        ids = list(ids)
+        results = []
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i+500]
+            self.curs.execute(
+                "SELECT * FROM " + self.tablename() + " WHERE remote=? AND id IN ("
+                + ", ".join("?" * len(chunk)) + ")", [remote] + chunk)
+            results += self.curs.fetchall()
+        return results
+
+    def insert_or_replace_many(self, records):
+        """Insert or replace many records, with one commit"""
+        records = list(records)
+        if not records:
+            return
+        (colstr, questionstr, valtuple) = self._sql_insert_or_replace_str(records[0])
+        self.curs.executemany(
+            "INSERT OR REPLACE INTO {0} {1} VALUES {2}".format(self.tablename(), colstr, questionstr),
+            [tuple(record.values()) for record in records])
+        self.conn.commit()
+
+class UserCache(object):
+    """Look up users by id for one remote, using the per-user cache
+
+    Users are found, in order:
+
+    1. in memory, for users already found by this process,
+    2. in the "usercache" table, for users fetched within the "user" TTL (any age if offline),
+    3. from the remote, with `client.get_current_user()` (often the owner), and then, at most once
+       per process, with `client.list_users()`. All users fetched are saved in the cache.
+
+    Arguments:
+        client (materials_commons.api.Client): Client for the remote.
+        path (str): Path to the sqlite database file. Default is USER_CACHE_PATH.
+        ttl (float or None): Time-to-live (s). Default uses the "user" TTL.
+    """
+    def __init__(self, client, path=None, ttl=None):
+        if ttl is None:
+            ttl = dict(DEFAULT_TTLS, **Config().cache_ttl)['user']
+        self.client = client
+        self.remote = remote_key(client)
+        self.path = path or USER_CACHE_PATH
+        self.ttl = ttl
+        self.users_by_id = {}
+        self._checked_current_user = False
+        self._listed_users = False
+
+    def add(self, users):
+        """Save users (materials_commons.api.User) fetched from the remote"""
+        checktime = time.time()
+        new_users = [u for u in users if u.id is not None]
+        for u in new_users:
+            self.users_by_id[u.id] = u
+        if self.ttl <= 0 or not new_users:
+            return
+        table = UserCacheTable(self.path)
+        table.connect()
+        try:
+            table.insert_or_replace_many({
+                'key': self.remote + " " + str(u.id),
+                'remote': self.remote,
+                'id': u.id,
+                'data': json.dumps(u._data),
+                'checktime': checktime
+            } for u in new_users)
+        finally:
+            table.close()
+
+    def _select(self, ids):
+        if self.ttl <= 0 and not clioffline.enabled():
+            return
+        table = UserCacheTable(self.path)
+        table.connect()
+        try:
+            records = table.select_by_ids(self.remote, ids)
+        finally:
+            table.close()
+        now = time.time()
+        for record in records:
+            if clioffline.enabled() or now - record['checktime'] < self.ttl:
+                self.users_by_id[record['id']] = models.User(json.loads(record['data']))
+
+    def get_users(self, ids):
+        """Returns dict of id: materials_commons.api.User for the ids that could be found"""
+        missing = set(ids) - set(self.users_by_id)
+        if missing:
+            self._select(missing)
+            missing -= set(self.users_by_id)
+        if missing and not self._checked_current_user:
+            self._checked_current_user = True
+            self.add([self.client.get_current_user()])
+            missing -= set(self.users_by_id)
+        if missing and not self._listed_users:
+            self._listed_users = True
+            self.add(self.client.list_users())
+        return {id: self.users_by_id[id] for id in ids if id in self.users_by_id}
+
+def get_user_cache(client):
+    """Returns the UserCache for a client, constructing it on first use"""
+    cache = getattr(client, '_user_cache', None)
+    if cache is None:
+        cache = UserCache(client)
+        client._user_cache = cache
+    return cache
+
+def user_cache():
+    """Returns the per-user ObjectCache"""
+    return ObjectCache(USER_CACHE_PATH)
+
+def project_cache(proj_local_path):
+    """Returns the ObjectCache for a local project"""
+    return ObjectCache(dbpath(proj_local_path))
+
+def remote_key(remote):
+    """Returns a key prefix identifying a remote and user account, without exposing the apikey"""
+    account = hashlib.sha256(str(remote.apikey).encode('utf-8')).hexdigest()[:16]
+    return remote.base_url + " " + account
+
+def get_remote_list(remote, otype, fetch, cls, refresh=False):
+    """Get a remote-wide list of objects, using the per-user cache
+
+    Arguments:
+        remote (materials_commons.api.Client): The client, used to identify the cached list.
+        otype, fetch, cls, refresh: See :func:`ObjectCache.get_list`.
+    """
+    key = remote_key(remote) + " " + otype
+    return user_cache().get_list(otype, key, fetch, cls, refresh=refresh)
+
+def get_project_list(proj, otype, fetch, cls, refresh=False):
+    """Get a list of objects belonging to a project, using the project cache if it is local
+
+    Arguments:
+        proj (materials_commons.api.models.Project): The project. If it has a "local_path"
+            attribute the project cache is used, otherwise the per-user cache is used.
+        otype, fetch, cls, refresh: See :func:`ObjectCache.get_list`.
+    """
+    key = remote_key(proj.remote) + " " + otype + " project=" + str(proj.id)
+    local_path = getattr(proj, 'local_path', None)
+    cache = project_cache(local_path) if local_path else user_cache()
+    return cache.get_list(otype, key, fetch, cls, refresh=refresh)
+
+def invalidate(otypes, proj_local_path=None):
+    """Delete cached lists of the given object types from the per-user cache, and from the
+    project cache if `proj_local_path` is given"""
+    user_cache().invalidate(otypes)
+    if proj_local_path:
+        project_cache(proj_local_path).invalidate(otypes)
@@ -0,0 +1,119 @@
+"""Offline mode: answer read-only commands from the local caches without network access
+
+Offline mode is enabled for one `mc` command with the global ``--offline`` option, or with the
+environment variable ``MC_OFFLINE=1``: ::
+
+    mc --offline ls somedir
+    MC_OFFLINE=1 mc ls -r data
+
+When offline:
+
+- The project is constructed from the data cached in ".mc/project.db", regardless of when it was
+  last checked (see :func:`materials_commons.cli.functions.make_local_project`).
+- Remote file and directory data is read only from the remote tree cache,
+  :class:`materials_commons.cli.treedb.RemoteTree`, which is used even if no fetch lock is set.
+  Cached records are used regardless of age. Use `mc fetch` while online to fill the cache.
+- Any request that would be made by a :class:`materials_commons.api.Client` fails immediately
+  with :class:`OfflineError`, instead of waiting on the network.
+- The background check for newer CLI versions is skipped.
+"""
+import contextlib
+import os
+
+import materials_commons.api as mcapi
+from materials_commons.cli.exceptions import MCCLIException
+
+# Client methods that make one HTTP request
+_REQUEST_METHODS = ('_get', '_get_no_value', '_post', '_put', '_delete', '_delete_with_value',
+                    '_download', '_upload', '_upload_raw', '_upload_to_path')
+
+_enabled = False
+_originals = {}
+
+
+class OfflineError(MCCLIException):
+    """Raised in offline mode when data is not cached locally and would require the network"""
+    pass
+
+
+def enabled():
+    """True if offline mode is active"""
+    return _enabled
+
+
+def require_online(what):
+    """Raise OfflineError if offline mode is active
+
+    Arguments:
+        what (str): Description of the operation that needs the network, used in the message.
+    """
+    if _enabled:
+        raise OfflineError(what + " requires network access (offline mode is on)")
+
+
+def _blocked_request(name):
+    def wrapper(self, urlpart, *args, **kwargs):
+        raise OfflineError("Offline: '" + urlpart.split('?')[0] + "' is not cached locally. "
+                           "Run `mc fetch` while online to fill the cache, or run without "
+                           "--offline / MC_OFFLINE.")
+    wrapper.__wrapped__ = _originals[name]
+    return wrapper
+
+
+def start():
+    """Enable offline mode: make mcapi.Client requests fail immediately"""
+    global _enabled
+    if not _originals:
+        for name in _REQUEST_METHODS:
+            fn = getattr(mcapi.Client, name, None)
+            if fn is not None:
+                _originals[name] = fn
+                setattr(mcapi.Client, name, _blocked_request(name))
+    _enabled = True
+
+
+def stop():
+    """Disable offline mode and restore mcapi.Client"""
+    global _enabled
+    _enabled = False
+    for name, fn in _originals.items():
+        setattr(mcapi.Client, name, fn)
+    _originals.clear()
+
+
+def parse_offline_options(argv, environ=None):
+    """Remove the global "--offline" option from the options before the command in argv
+
+    Arguments:
+        argv (list of str): Command line, including program name.
+        environ (dict): Environment, default os.environ. MC_OFFLINE=1 enables offline mode.
+
+    Returns:
+        (argv, enabled): argv without the offline option, and whether offline mode is enabled.
+    """
+    if environ is None:
+        environ = os.environ
+    enabled = environ.get('MC_OFFLINE', '') not in ('', '0')
+    result = list(argv[:1])
+    i = 1
+    while i < len(argv) and argv[i].startswith('--'):
+        if argv[i] == '--offline':
+            enabled = True
+        else:
+            result.append(argv[i])
+        i += 1
+    result.extend(argv[i:])
+    return (result, enabled)
+
+
+@contextlib.contextmanager
+def offline(enabled=True):
+    """Context manager that runs its body in offline mode, if enabled"""
+    if not enabled:
+        yield
+        return
+    start()
+    try:
+        yield
+    finally:
+        stop()
@@ -2,14 +2,15 @@ import argparse
 import json
 import os
 import sys
-from datetime import datetime, timedelta
 from io import StringIO
 
 import materials_commons.api as mcapi
 import pkg_resources
-import requests
 
+import materials_commons.cli.file_functions as filefuncs
 import materials_commons.cli.functions as clifuncs
+import materials_commons.cli.offline as clioffline
+import materials_commons.cli.trace as clitrace
 from materials_commons.cli.exceptions import MCCLIException, MissingRemoteException, \
     MultipleRemoteException, NoDefaultRemoteException
 from materials_commons.cli.subcommands.clone import clone_subcommand
@@ -31,6 +32,7 @@ from materials_commons.cli.subcommands.rm import rm_subcommand
 from materials_commons.cli.subcommands.up import up_subcommand
 from materials_commons.cli.subcommands.versions import versions_subcommand
 from materials_commons.cli.user_config import Config
+from materials_commons.cli.version_check import check_package_version
 
 standard_usage = [
     {'name': 'remote', 'desc': 'List servers', 'subcommand': remote_subcommand},
@@ -57,7 +59,7 @@ standard_interfaces = {d['name']: d for d in standard_usage}
 
 def make_parser():
     usage_help = StringIO()
-    usage_help.write("mc <command> [<args>]\n\n")
+    usage_help.write("mc [--offline] [--trace[=FILE]] <command> [<args>]\n\n")
     usage_help.write("The standard mc commands are:\n")
 
     for name, interface in standard_interfaces.items():
@@ -69,66 +71,30 @@ def make_parser():
     parser.add_argument('command', help='Subcommand to run')
     parser.add_argument('--version', '-v', action='version',
                         version=pkg_resources.get_distribution('materials-commons-cli').version)
+    parser.add_argument('--trace', nargs='?', const=True, metavar='FILE',
+                        help='Print a summary of API requests, database queries, and cache use '
+                             'when finished, and optionally write a Chrome trace JSON timeline '
+                             'to FILE (use --trace=FILE). Also enabled by MC_TRACE=1.')
+    parser.add_argument('--offline', action="store_true", default=False,
+                        help='Use only locally cached project and remote tree data, and fail '
+                             'instead of making network requests. Also enabled by MC_OFFLINE=1.')
 
     return parser
 
 
-CLI_VERSION_CACHE_FILE = os.path.expanduser('~/.materialscommons/.cli-version-cache.json')
-
-
-def should_check_version():
-    try:
-        if os.path.exists(CLI_VERSION_CACHE_FILE):
-            with open(CLI_VERSION_CACHE_FILE) as f:
-                cache = json.load(f)
-            last_check = datetime.fromisoformat(cache['last_check'])
-            # Only check once per day
-            if datetime.now() - last_check < timedelta(days=1):
-                return False
-    except Exception:
-        pass
-    return True
-
-
-def update_version_cache():
-    try:
-        with open(CLI_VERSION_CACHE_FILE, 'w') as f:
-            json.dump({
-                'last_check': datetime.now().isoformat()
-            }, f)
-    except Exception:
-        pass
-
-
-def check_package_version():
-    if not should_check_version():
-        return
-
-    package_name = 'materials-commons-cli'
-    try:
-        current_version = pkg_resources.get_distribution(package_name).version
-        response = requests.get(f"https://pypi.org/pypi/{package_name}/json")
-        latest_version = response.json()["info"]["version"]
-
-        if current_version != latest_version:
-            print(
-                f"\nWarning: You are using an older version of the Materials Commons CLI ({current_version}).\n"
-                f"A newer version is available ({latest_version}).\n"
-                f"It is recommended you upgrade to the newest version: pip install --upgrade {package_name}\n",
-                file=sys.stderr,
-            )
-
-        update_version_cache()
-
-    except Exception as e:
-        pass
-
-
 def main(argv=None, working_dir=None):
     if argv is None:
         argv = sys.argv
     if working_dir is None:
         working_dir = os.getcwd()
+    argv, offline_enabled = clioffline.parse_offline_options(argv)
+    argv, trace_enabled, trace_file = clitrace.parse_trace_options(argv)
+    with clioffline.offline(offline_enabled):
+        with clitrace.tracing(trace_enabled, trace_file=trace_file):
+            return _main(argv, working_dir)
+
+
+def _main(argv, working_dir):
     try:
 
         config = Config()
@@ -147,8 +113,10 @@ def main(argv=None, working_dir=None):
         args = parser.parse_args(argv[1:2])
 
         if args.command in standard_interfaces:
-            result = standard_interfaces[args.command]['subcommand'](argv[2:], working_dir)
-            check_package_version()
+            with filefuncs.lookup_memo_scope():
+                result = standard_interfaces[args.command]['subcommand'](argv[2:], working_dir)
+            if not clioffline.enabled():
+                check_package_version()
             return result
 
         else:
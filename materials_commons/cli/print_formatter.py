@@ -1,4 +1,6 @@
 
+import sys
+
 def _trunc(s, size=40):
     _s = str(s)
     if len(_s) > size:
@@ -33,12 +35,19 @@ class PrintFormatter(object):
                 alignment: str, string.format alignment option
                 size: int, column size
                 function: function, function that acts on record[key], or None if key is not in record, to determine what is printed.
+        sep: str, column separator
+        end: str, line end
+        truncate: bool, if True, pad values to the column size and truncate longer values
+        clip: bool, if False, values longer than the column size are printed in full, even if truncate is True
+        out: stream, output stream, default sys.stdout
     """
-    def __init__(self, fmt, sep=" ", end="\n", truncate=True):
+    def __init__(self, fmt, sep=" ", end="\n", truncate=True, clip=True, out=None):
         self.fmt = fmt
         self.sep = sep
         self.end = end
         self.truncate = truncate
+        self.clip = clip
+        self.out = out
 
         self.fmtstr = ""
         for fmt_tuple in fmt:
@@ -69,9 +78,9 @@ class PrintFormatter(object):
         self.value_if_key_not_in_record = "-"
 
     def print_header(self):
-        print(self.header_line, end=self.end)
+        print(self.header_line, end=self.end, file=self.out)
         if self.truncate:
-            print(self.header_sep, end=self.end)
+            print(self.header_sep, end=self.end, file=self.out)
 
     def _record_to_data(self, record):
         data = {}
@@ -85,21 +94,113 @@ class PrintFormatter(object):
             if value is None and self.truncate:
                 value = self.value_if_key_not_in_record
             else:
-                if self.truncate:
+                if self.truncate and self.clip:
                     value = trunc(f(value), size)
                 else:
                     value = f(value)
             data[key] = value
         return data
 
+    def format(self, record):
+        """Returns the line for a record, without the line end"""
+        return self.fmtstr.format(**self._record_to_data(record))
+
     def print(self, record):
-        print(self.fmtstr.format(**self._record_to_data(record)), end=self.end)
+        print(self.format(record), end=self.end, file=self.out)
 
     def print_detail(self, title_key, record):
         data = self._record_to_data(record)
 
-        print(str(data[title_key]) + ":")
+        print(str(data[title_key]) + ":", file=self.out)
         for fmt_tuple in self.fmt:
             key = fmt_tuple[0]
-            print(key + ": '" + str(data[key]) + "'")
-        print()
+            print(key + ": '" + str(data[key]) + "'", file=self.out)
+        print(file=self.out)
+
+class StreamingTable(object):
+    """Print a table of dict-like records as they are produced, without keeping them all
+
+    The layout matches the "simple" format of tabulate: a header line, a line of dashes, and one
+    line per record, with columns separated by two spaces and numbers right-aligned. Column widths
+    are fixed, if `widths` is given, or else found from the headers and the first `sample_size`
+    records, which are held until the widths are known. Later values that are wider than their
+    column are printed in full. Lines are written to `out` in blocks of `buffer_lines`.
+
+    Example: ::
+
+        with StreamingTable(['name', 'size'], ['name', 'size']) as table:
+            for record in records:
+                table.write(record)
+
+    Arguments:
+        columns: List of str, keys of the records to print, in order
+        headers: List of str, header strings. If empty or None, no header is printed.
+        out: stream, output stream, default sys.stdout
+        widths: List of int, fixed column widths, or None to size columns from a sample
+        sample_size: int, number of records used to size columns
+        buffer_lines: int, number of lines written to `out` at once
+    """
+    def __init__(self, columns, headers=None, out=None, widths=None, sample_size=1000,
+                 buffer_lines=256):
+        self.columns = columns
+        self.headers = headers or []
+        self.out = out
+        self.widths = widths
+        self.sample_size = sample_size
+        self.buffer_lines = buffer_lines
+        self.formatter = None
+        self._sample = []
+        self._lines = []
+
+    def _make_formatter(self):
+        headers = self.headers or [''] * len(self.columns)
+        fmt = []
+        for i, col in enumerate(self.columns):
+            values = [record[col] for record in self._sample if record[col] is not None]
+            is_number = len(values) and all(isinstance(v, (int, float)) and not isinstance(v, bool)
+                                            for v in values)
+            if self.widths is not None:
+                width = self.widths[i]
+            else:
+                # like tabulate, leave 2 extra spaces for headers
+                header_width = len(str(headers[i])) + 2 if self.headers else 0
+                width = max([header_width] + [len(str(v)) for v in values])
+            fmt.append((col, headers[i], '>' if is_number else '<', max(width, 1), str))
+        self.formatter = PrintFormatter(fmt, sep="  ", clip=False)
+        self.formatter.value_if_key_not_in_record = ""
+        if self.headers:
+            self._lines.append(self.formatter.header_line.rstrip())
+            self._lines.append(self.formatter.header_sep.rstrip())
+        for record in self._sample:
+            self._lines.append(self.formatter.format(record).rstrip())
+        self._sample = []
+
+    def write(self, record):
+        """Add one record to the table"""
+        if self.formatter is None:
+            self._sample.append(record)
+            if self.widths is None and len(self._sample) < self.sample_size:
+                return
+            self._make_formatter()
+        else:
+            self._lines.append(self.formatter.format(record).rstrip())
+        if len(self._lines) >= self.buffer_lines:
+            self.flush()
+
+    def flush(self):
+        if self._lines:
+            out = self.out if self.out is not None else sys.stdout
+            out.write("\n".join(self._lines) + "\n")
+            self._lines = []
+
+    def close(self):
+        """Print any held records and flush"""
+        if self.formatter is None:
+            self._make_formatter()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,454 @@
+"""Progress, throughput, and timing metrics for uploads and downloads
+
+:class:`TransferStats` counts files and bytes as they are planned, transferred, skipped, or fail,
+and times the phases of a transfer:
+
+- 'compare': comparing local and remote files and directories
+- 'hash': computing local file checksums
+- 'mkdir': creating remote directories
+- 'transfer': uploading or downloading file contents
+- 'cache_update': updating the local and remote tree caches in `.mc/project.db`
+
+Phase times are exclusive (time hashing during a comparison counts as 'hash', not 'compare') and
+are summed over worker threads, so with `--jobs N` they may add up to more than the elapsed time.
+
+While a transfer runs, its TransferStats is "active" (see :func:`reporting`), and the functions
+doing the work report to it via :func:`current`. When no transfer is active, :func:`current`
+returns a stand-in that ignores everything, so instrumented code works unchanged outside of
+`mc up` and `mc down`.
+
+Callbacks, registered with :func:`subscribe` or passed to TransferStats, are called as: ::
+
+    callback(event, stats, path=path, size=size)
+
+where `event` is one of 'planned', 'start', 'finish', 'skip', or 'fail', and `stats` is the
+TransferStats. For example: ::
+
+    def on_progress(event, stats, path=None, size=0):
+        if event == 'finish':
+            print(path, stats.bytes_done, "/", stats.bytes_total)
+
+    proj.upload("data", recursive=True, progress_callback=on_progress)
+
+"""
+import contextlib
+import json
+import sys
+import threading
+import time
+
+import materials_commons.cli.ndjson as clindjson
+
+PHASES = ('compare', 'hash', 'mkdir', 'transfer', 'cache_update')
+
+_callbacks = []
+_active = []
+_lock = threading.Lock()
+
+
+def _format_seconds(seconds):
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return str(seconds) + "s"
+    if seconds < 3600:
+        return "{0}m{1:02d}s".format(seconds // 60, seconds % 60)
+    return "{0}h{1:02d}m".format(seconds // 3600, (seconds % 3600) // 60)
+
+
+class TransferStats(object):
+    """Thread-safe counters and phase timers for one upload or download command
+
+    Arguments:
+        operation (str): Label, for example 'upload' or 'download'.
+        callbacks (list of callable): Called for each file event, in addition to callbacks
+            registered with :func:`subscribe` when the TransferStats is constructed.
+    """
+
+    def __init__(self, operation='transfer', callbacks=None):
+        self.operation = operation
+        self.callbacks = list(_callbacks) + list(callbacks or [])
+        self.start_time = time.monotonic()
+        self.end_time = None
+        self.files_total = 0
+        self.bytes_total = 0
+        self.files_done = 0
+        self.bytes_done = 0
+        self.files_skipped = 0
+        self.bytes_skipped = 0
+        self.files_failed = 0
+        self.bytes_failed = 0
+        self.in_flight = 0
+        self.phase_time = {name: 0.0 for name in PHASES}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _emit(self, event, path, size):
+        for callback in self.callbacks:
+            callback(event, self, path=path, size=size)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Context manager that adds the time spent in its body to phase `name`
+
+        Nested phases are exclusive: while an inner phase runs, the outer phase is paused.
+        """
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        now = time.monotonic()
+        if stack:
+            self._add_phase_time(stack[-1][0], now - stack[-1][1])
+        stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.monotonic()
+            name, start = stack.pop()
+            self._add_phase_time(name, now - start)
+            if stack:
+                stack[-1][1] = now
+
+    def _add_phase_time(self, name, seconds):
+        with self._lock:
+            self.phase_time[name] = self.phase_time.get(name, 0.0) + seconds
+
+    def add_planned(self, path=None, size=0):
+        """Count a file that is going to be transferred, skipped, or fail"""
+        with self._lock:
+            self.files_total += 1
+            self.bytes_total += size or 0
+        self._emit('planned', path, size)
+
+    def start_file(self, path=None, size=0):
+        """A file transfer started"""
+        with self._lock:
+            self.in_flight += 1
+        self._emit('start', path, size)
+
+    def finish_file(self, path=None, size=0, ok=True):
+        """A file transfer started with `start_file` finished, successfully if `ok`"""
+        with self._lock:
+            self.in_flight -= 1
+            if ok:
+                self.files_done += 1
+                self.bytes_done += size or 0
+            else:
+                self.files_failed += 1
+                self.bytes_failed += size or 0
+        self._emit('finish' if ok else 'fail', path, size)
+
+    def skip_file(self, path=None, size=0):
+        """A planned file did not need to be transferred"""
+        with self._lock:
+            self.files_skipped += 1
+            self.bytes_skipped += size or 0
+        self._emit('skip', path, size)
+
+    def fail_file(self, path=None, size=0):
+        """A planned file could not be transferred, without a transfer having started"""
+        with self._lock:
+            self.files_failed += 1
+            self.bytes_failed += size or 0
+        self._emit('fail', path, size)
+
+    def close(self):
+        """Stop the elapsed time clock"""
+        if self.end_time is None:
+            self.end_time = time.monotonic()
+
+    @property
+    def elapsed(self):
+        end = self.end_time if self.end_time is not None else time.monotonic()
+        return end - self.start_time
+
+    @property
+    def bytes_per_second(self):
+        elapsed = self.elapsed
+        return self.bytes_done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def files_per_second(self):
+        elapsed = self.elapsed
+        return self.files_done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        """Estimated seconds remaining for the files planned so far, or None if unknown"""
+        rate = self.bytes_per_second
+        with self._lock:
+            remaining = self.bytes_total - self.bytes_done - self.bytes_skipped - self.bytes_failed
+        if remaining <= 0:
+            return 0.0
+        if rate <= 0:
+            return None
+        return remaining / rate
+
+    def as_dict(self):
+        """Returns a summary dict, as written by `--stats-json`"""
+        with self._lock:
+            result = {
+                "operation": self.operation,
+                "elapsed": self.elapsed,
+                "files": {
+                    "total": self.files_total,
+                    "done": self.files_done,
+                    "skipped": self.files_skipped,
+                    "failed": self.files_failed
+                },
+                "bytes": {
+                    "total": self.bytes_total,
+                    "done": self.bytes_done,
+                    "skipped": self.bytes_skipped,
+                    "failed": self.bytes_failed
+                },
+                "phases": dict(self.phase_time)
+            }
+        result["bytes_per_second"] = self.bytes_per_second
+        result["files_per_second"] = self.files_per_second
+        return result
+
+    def format_line(self):
+        """Returns a one line progress summary"""
+        from materials_commons.cli.functions import humanize
+        eta = self.eta
+        with self._lock:
+            finished = self.files_done + self.files_skipped + self.files_failed
+            parts = [
+                self.operation + ": " + str(finished) + "/" + str(self.files_total) + " files",
+                humanize(self.bytes_done) + "/" +
+                humanize(self.bytes_total - self.bytes_skipped),
+                humanize(int(self.bytes_per_second)) + "/s",
+                "{0:.1f} files/s".format(self.files_per_second),
+                str(self.in_flight) + " in flight"
+            ]
+            if self.files_failed:
+                parts.append(str(self.files_failed) + " failed")
+        if eta is not None:
+            parts.append("ETA " + _format_seconds(eta))
+        return ", ".join(parts)
+
+
+class _NoStats(object):
+    """Stand-in for TransferStats when no transfer is active"""
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        yield
+
+    def add_planned(self, path=None, size=0):
+        pass
+
+    def start_file(self, path=None, size=0):
+        pass
+
+    def finish_file(self, path=None, size=0, ok=True):
+        pass
+
+    def skip_file(self, path=None, size=0):
+        pass
+
+    def fail_file(self, path=None, size=0):
+        pass
+
+
+_no_stats = _NoStats()
+
+
+def current():
+    """Returns the active TransferStats, or a stand-in which ignores everything"""
+    return _active[-1][0] if _active else _no_stats
+
+
+@contextlib.contextmanager
+def subscribe(callback):
+    """Context manager that registers `callback` for TransferStats constructed in its body"""
+    if callback is None:
+        yield
+        return
+    with _lock:
+        _callbacks.append(callback)
+    try:
+        yield
+    finally:
+        with _lock:
+            _callbacks.remove(callback)
+
+
+class _StatusLineStream(object):
+    """Wraps a TTY stream so that a status line stays below everything else written to it
+
+    The status is shown only while the cursor is at the start of a line, so output written in
+    several fragments, as by `print`, is not interrupted: the status is cleared before the first
+    fragment of a line and redrawn after the fragment that ends it.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.status = ""
+        self.at_line_start = True
+        self.lock = threading.RLock()
+
+    def _clear(self):
+        if self.status and self.at_line_start:
+            self.stream.write("\r\x1b[K")
+
+    def write(self, s):
+        with self.lock:
+            if not s:
+                return self.stream.write(s)
+            self._clear()
+            n = self.stream.write(s)
+            self.at_line_start = s.endswith("\n")
+            if self.at_line_start and self.status:
+                self.stream.write(self.status)
+            self.stream.flush()
+            return n
+
+    def set_status(self, status):
+        with self.lock:
+            if not self.at_line_start:
+                # shown once the current line is finished
+                self.status = status
+                return
+            self._clear()
+            self.status = status
+            self.stream.write(status)
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class ProgressRenderer(object):
+    """Show a live single-line progress summary below other output on a terminal
+
+    While running, sys.stdout is replaced by a wrapper that keeps the status line at the bottom.
+    Does nothing if sys.stdout is not a TTY.
+
+    Arguments:
+        stats (TransferStats): The stats to show.
+        interval (float): Seconds between updates.
+    """
+
+    def __init__(self, stats, interval=0.5):
+        self.stats = stats
+        self.interval = interval
+        self._stream = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._paused = threading.Event()
+
+    def start(self):
+        if self._thread is not None or not sys.stdout.isatty():
+            return
+        self._stream = _StatusLineStream(sys.stdout)
+        sys.stdout = self._stream
+        self._thread = threading.Thread(target=self._run, name="mc-progress", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self._paused.is_set():
+                self._stream.set_status(self.stats.format_line())
+
+    @contextlib.contextmanager
+    def paused(self):
+        """Context manager that hides the status line, for example while prompting the user"""
+        if self._thread is None:
+            yield
+            return
+        self._paused.set()
+        self._stream.set_status("")
+        try:
+            yield
+        finally:
+            self._paused.clear()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._stream.set_status("")
+        sys.stdout = self._stream.stream
+        self._thread = None
+
+
+@contextlib.contextmanager
+def paused():
+    """Context manager that hides the active progress line, if any, for example while prompting"""
+    renderer = _active[-1][1] if _active else None
+    if renderer is None:
+        yield
+        return
+    with renderer.paused():
+        yield
+
+
+def add_progress_options(parser):
+    """Add the "--stats-json PATH", "--no-progress", and "--ndjson PATH" cli options to an
+    ArgumentParser"""
+    parser.add_argument('--stats-json', type=str, default=None, metavar='PATH',
+                        help='Write a JSON summary of file counts, bytes, rates, and per-phase '
+                             'times to PATH when finished. Use "-" to print it.')
+    parser.add_argument('--no-progress', action="store_true", default=False,
+                        help='Do not show the live progress line.')
+    parser.add_argument('--ndjson', type=str, default=None, metavar='PATH',
+                        help='Write one JSON record per line to PATH as each file finishes, is '
+                             'skipped, or fails, and a summary record when finished. Use "-" to '
+                             'print them.')
+
+
+def write_stats_json(stats, path):
+    """Write `stats.as_dict()` as JSON to `path`, or to stdout if path is '-'"""
+    if path == '-':
+        print(json.dumps(stats.as_dict(), indent=2))
+    else:
+        with open(path, 'w') as f:
+            json.dump(stats.as_dict(), f, indent=2)
+
+
+def _ndjson_events(writer):
+    """Returns a callback writing one NDJSON record per finished, skipped, or failed file"""
+    def callback(event, stats, path=None, size=0):
+        if event in ('finish', 'skip', 'fail'):
+            writer.write({"event": event, "operation": stats.operation, "path": path,
+                          "size": size})
+    return callback
+
+
+@contextlib.contextmanager
+def reporting(stats, show=True, stats_json=None, ndjson=None):
+    """Context manager making `stats` active, showing progress, and writing the JSON summary
+
+    Arguments:
+        stats (TransferStats): The stats to make active.
+        show (bool): If True, show a live progress line if stdout is a TTY.
+        stats_json (str or None): If given, path to write the JSON summary to on exit.
+        ndjson (str or None): If given, path to write NDJSON records to, or '-' for stdout: one
+            record per file as it finishes, is skipped, or fails, and a final "summary" record.
+    """
+    with contextlib.ExitStack() as stack:
+        writer = None
+        if ndjson:
+            writer = stack.enter_context(clindjson.open_writer(ndjson))
+            stats.callbacks.append(_ndjson_events(writer))
+        renderer = ProgressRenderer(stats) if show else None
+        with _lock:
+            _active.append((stats, renderer))
+        if renderer is not None:
+            renderer.start()
+        try:
+            yield stats
+        finally:
+            if renderer is not None:
+                renderer.stop()
+            with _lock:
+                _active.remove((stats, renderer))
+            stats.close()
+            if stats_json:
+                write_stats_json(stats, stats_json)
+            if writer is not None:
+                summary = {"event": "summary"}
+                summary.update(stats.as_dict())
+                writer.write(summary)
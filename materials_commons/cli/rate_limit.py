@@ -0,0 +1,381 @@
+"""Rate limiting and adaptive concurrency for Materials Commons API requests
+
+When uploads and downloads run in parallel, a fixed number of workers can either underuse the
+server or trip its throttling. This module provides:
+
+- :class:`TokenBucket`: limits the request rate (``--max-rps``).
+- :class:`AdaptiveConcurrency`: limits the number of requests in flight, using additive-increase /
+  multiplicative-decrease (AIMD). The limit grows while metadata request latency is stable, or
+  while file transfers succeed, and is halved when the server signals overload (HTTP 429 or 503,
+  connection errors, or timeouts).
+- :class:`RateLimiter`: combines both and honors ``Retry-After``, pausing all new requests.
+- :func:`install_rate_limiter`: makes a :class:`materials_commons.api.Client` instance request
+  through a RateLimiter.
+- :class:`TransferPool`: runs uploads or downloads on a bounded pool of worker threads.
+  With ``jobs=1`` tasks run inline, in order, as before.
+
+Example: ::
+
+    limiter = RateLimiter(jobs='auto', max_rps=20)
+    install_rate_limiter(proj.remote, limiter)
+    with TransferPool(limiter.max_jobs) as pool:
+        futures = [pool.submit(proj.remote.download_file, proj.id, id, to) for id, to in files]
+        pool.wait(futures)
+
+"""
+import concurrent.futures
+import email.utils
+import threading
+import time
+
+import requests
+
+from materials_commons.cli.exceptions import MCCLIException
+
+DEFAULT_MAX_JOBS = 16
+OVERLOAD_STATUS_CODES = (429, 503)
+
+OK = 'ok'
+OVERLOADED = 'overloaded'
+ERROR = 'error'
+
+METADATA = 'metadata'
+TRANSFER = 'transfer'
+
+# Client methods that make one HTTP request
+_REQUEST_METHODS = ['_get', '_get_no_value', '_post', '_put', '_delete', '_delete_with_value',
+                    '_download', '_upload', '_upload_raw', '_upload_to_path']
+
+# Client methods that transfer file contents, whose latency depends on the file size
+_TRANSFER_METHODS = ['_download', '_upload', '_upload_raw', '_upload_to_path']
+
+
+def parse_jobs(value):
+    """Parse a `--jobs` option value: a positive int or "auto"
+
+    Returns:
+        int or 'auto'
+    """
+    if value == 'auto':
+        return value
+    try:
+        jobs = int(value)
+    except (TypeError, ValueError):
+        raise MCCLIException("--jobs must be a positive integer or 'auto', got: " + str(value))
+    if jobs < 1:
+        raise MCCLIException("--jobs must be a positive integer or 'auto', got: " + str(value))
+    return jobs
+
+
+def add_concurrency_options(parser):
+    """Add the "--jobs N|auto" and "--max-rps R" cli options to an ArgumentParser"""
+    parser.add_argument('--jobs', '-j', type=str, default='1', metavar='N|auto',
+                        help='Number of files to transfer in parallel, or "auto" to adapt to the '
+                             'server. Default=1.')
+    parser.add_argument('--max-rps', type=float, default=None, metavar='R',
+                        help='Maximum number of API requests per second. Default is no limit.')
+
+
+def parse_retry_after(value, now=None):
+    """Parse a Retry-After header value (seconds or HTTP date) into seconds to wait, or None"""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when is None:
+        return None
+    if now is None:
+        now = time.time()
+    return max(0.0, when.timestamp() - now)
+
+
+class TokenBucket(object):
+    """Limit the average rate of requests, allowing short bursts
+
+    Arguments:
+        rate (float): Tokens added per second, or None for no limit.
+        burst (float): Bucket capacity. Defaults to max(1, rate).
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate or 1.0)
+        self.tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self):
+        """Take a token if available. Returns 0 on success, else the seconds until one is available."""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return 0.0
+            return (1.0 - self.tokens) / self.rate
+
+    def acquire(self):
+        """Block until a token is available"""
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0.0:
+                return
+            time.sleep(wait)
+
+
+class AdaptiveConcurrency(object):
+    """Limit the number of requests in flight, adjusting the limit with AIMD
+
+    - On each successful METADATA request with latency no more than `latency_tolerance` times the
+      lowest recently observed METADATA latency, the limit increases by 1/limit (so about +1 per
+      round of `limit` requests).
+    - On each successful TRANSFER request the limit increases by 1/limit. Transfer latency
+      depends on the file size, so it is not compared with a baseline; only errors signal
+      overload.
+    - On an overload signal, the limit is halved. Requests started before the last decrease do
+      not decrease it again, so one burst of errors causes one decrease.
+
+    Arguments:
+        initial (int): Initial limit.
+        min_limit (int): Lowest limit.
+        max_limit (int): Highest limit.
+        adaptive (bool): If False, the limit is fixed at `initial`.
+        latency_tolerance (float): Latency ratio considered "stable".
+    """
+
+    def __init__(self, initial=2, min_limit=1, max_limit=DEFAULT_MAX_JOBS, adaptive=True,
+                 latency_tolerance=2.0):
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.adaptive = adaptive
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.min_latency = None
+        self._min_latency_time = 0.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Block until a request may start. Returns the start time, to pass to release."""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self, start, outcome=OK, kind=METADATA):
+        """Record the end of a request that started at `start` with `outcome` (OK, OVERLOADED, ERROR)
+
+        `kind` is METADATA or TRANSFER.
+        """
+        now = time.monotonic()
+        latency = now - start
+        with self._cond:
+            self.in_flight -= 1
+            if self.adaptive:
+                if outcome == OVERLOADED:
+                    if start >= self._last_decrease:
+                        self.limit = max(float(self.min_limit), self.limit / 2.0)
+                        self._last_decrease = now
+                elif outcome == OK and kind == TRANSFER:
+                    self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+                elif outcome == OK:
+                    # forget the minimum after a while, since the server load changes
+                    if self.min_latency is None or latency < self.min_latency \
+                            or now - self._min_latency_time > 60.0:
+                        self.min_latency = latency
+                        self._min_latency_time = now
+                    if latency <= self.latency_tolerance * self.min_latency:
+                        self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+
+class RateLimiter(object):
+    """Shared gate for API requests: rate limit, concurrency limit, and Retry-After pauses
+
+    Arguments:
+        jobs (int or 'auto'): If an int, a fixed number of requests in flight. If 'auto', the
+            number adapts between 1 and `max_jobs`.
+        max_rps (float or None): Maximum requests per second, or None for no limit.
+        max_jobs (int): Maximum number of requests in flight for `jobs='auto'`.
+    """
+
+    def __init__(self, jobs=1, max_rps=None, max_jobs=DEFAULT_MAX_JOBS):
+        jobs = parse_jobs(jobs)
+        if jobs == 'auto':
+            self.max_jobs = max_jobs
+            self.concurrency = AdaptiveConcurrency(initial=2, max_limit=max_jobs, adaptive=True)
+        else:
+            self.max_jobs = jobs
+            self.concurrency = AdaptiveConcurrency(initial=jobs, max_limit=jobs, adaptive=False)
+        self.bucket = TokenBucket(max_rps)
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds):
+        """Do not start new requests for `seconds`"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _wait_for_pause(self):
+        while True:
+            with self._lock:
+                wait = self._paused_until - time.monotonic()
+            if wait <= 0.0:
+                return
+            time.sleep(wait)
+
+    def acquire(self):
+        """Block until a request may start. Returns a token to pass to release."""
+        self._wait_for_pause()
+        self.bucket.acquire()
+        return self.concurrency.acquire()
+
+    def release(self, token, outcome=OK, retry_after=None, kind=METADATA):
+        """Record the end of a request
+
+        Arguments:
+            token: The value returned by acquire.
+            outcome (str): One of OK, OVERLOADED, or ERROR.
+            retry_after (float or None): Seconds the server asked clients to wait.
+            kind (str): METADATA, or TRANSFER for requests that transfer file contents.
+        """
+        if retry_after:
+            self.pause(retry_after)
+        self.concurrency.release(token, outcome, kind=kind)
+
+
+def classify_exception(e):
+    """Returns (outcome, retry_after) for an exception raised by a request"""
+    if isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return (OVERLOADED, None)
+    response = getattr(e, 'response', None)
+    status_code = getattr(response, 'status_code', None)
+    if status_code in OVERLOAD_STATUS_CODES:
+        return (OVERLOADED, parse_retry_after(response.headers.get('retry-after')))
+    return (ERROR, None)
+
+
+def install_rate_limiter(client, limiter):
+    """Make all requests by a client instance go through a RateLimiter
+
+    The client's own throttle (which sleeps based on the rate limit headers of the last
+    response) is replaced; instead, a low remaining rate limit is treated as an overload signal.
+
+    Arguments:
+        client (:class:`materials_commons.api.Client`): Client to modify in place.
+        limiter (:class:`RateLimiter`): The limiter to use.
+
+    Returns:
+        client
+    """
+    if getattr(client, '_rate_limiter', None) is not None:
+        client._rate_limiter = limiter
+        return client
+    client._rate_limiter = limiter
+    client._throttle = lambda: None
+
+    for name in _REQUEST_METHODS:
+        if hasattr(client, name):
+            kind = TRANSFER if name in _TRANSFER_METHODS else METADATA
+            setattr(client, name, rate_limited(client, getattr(client, name), kind=kind))
+    return client
+
+
+def rate_limited(client, fn, kind=METADATA):
+    """Returns `fn`, a function making one request for `client`, wrapped so that it goes through
+    the client's RateLimiter, if one is installed (see :func:`install_rate_limiter`)
+
+    `kind` is METADATA, or TRANSFER if `fn` transfers file contents.
+    """
+    def wrapper(*args, **kwargs):
+        _limiter = getattr(client, '_rate_limiter', None)
+        if _limiter is None:
+            return fn(*args, **kwargs)
+        token = _limiter.acquire()
+        outcome, retry_after = (OK, None)
+        try:
+            result = fn(*args, **kwargs)
+            if client.rate_limit and client.rate_limit_remaining < 10:
+                outcome = OVERLOADED
+            return result
+        except Exception as e:
+            outcome, retry_after = classify_exception(e)
+            raise
+        finally:
+            _limiter.release(token, outcome, retry_after=retry_after, kind=kind)
+    return wrapper
+
+
+def make_rate_limiter(client, jobs=1, max_rps=None):
+    """Create a RateLimiter for the `--jobs` and `--max-rps` options and install it on client
+
+    Returns:
+        :class:`RateLimiter` or None: None if jobs == 1 and max_rps is None, in which case the
+        client is not modified.
+    """
+    jobs = parse_jobs(jobs)
+    if jobs == 1 and max_rps is None:
+        return None
+    limiter = RateLimiter(jobs=jobs, max_rps=max_rps)
+    install_rate_limiter(client, limiter)
+    return limiter
+
+
+class TransferPool(object):
+    """Run transfer tasks on a bounded pool of threads, or inline if jobs == 1
+
+    Arguments:
+        jobs (int): Maximum number of tasks run at once.
+    """
+
+    def __init__(self, jobs=1):
+        self.jobs = max(1, int(jobs))
+        self._executor = None
+        if self.jobs > 1:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.jobs, thread_name_prefix="mc-transfer")
+
+    @property
+    def parallel(self):
+        return self._executor is not None
+
+    def submit(self, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)`, returning a concurrent.futures.Future
+
+        If running inline (jobs == 1), `fn` is called immediately and any exception is raised
+        immediately.
+        """
+        if self._executor is not None:
+            return self._executor.submit(fn, *args, **kwargs)
+        future = concurrent.futures.Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+    @staticmethod
+    def wait(futures):
+        """Wait for futures, returning results in order. Raises the first exception."""
+        return [f.result() for f in futures]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,156 @@
+"""Compact record types for tree cache entries and tree comparison results
+
+Listing or comparing large projects creates one record per file or directory. Records are
+instances of :class:`Record` subclasses, which store their fields in ``__slots__`` rather than in
+a per-instance dict, but support the dict-style access used throughout the cli: ::
+
+    record['r_type']
+    record['eq'] = True
+    if 'eq' in record and record['eq']:
+        ...
+    for key, value in record.items():
+        ...
+
+- :class:`TreeRecord`: one row of a :class:`materials_commons.cli.treedb.TreeTable`. Tree tables
+  return rows as TreeRecord directly from SQLite (see :func:`TreeRecord.row_factory`).
+- :class:`CompareRecord`: comparison data for one path, as returned by
+  :func:`materials_commons.cli.tree_functions.treecompare`.
+
+"""
+import sqlite3
+
+
+class Record(object):
+    """Base class for compact dict-like records with a fixed set of fields
+
+    Derived classes set ``__slots__`` and ``_fields`` to the same tuple of field names. Fields in
+    ``_optional`` start unset, and are not "in" the record until assigned; other fields start as
+    None. Assigning to a key that is not a field raises KeyError.
+    """
+    __slots__ = ()
+    _fields = ()
+    _optional = ()
+    _required = ()
+
+    def __init__(self, **kwargs):
+        for key in self._required:
+            object.__setattr__(self, key, None)
+        for key, value in kwargs.items():
+            self[key] = value
+
+    def __getitem__(self, key):
+        if key in self._fields:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in self._fields:
+            raise KeyError(key)
+        object.__setattr__(self, key, value)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        object.__delattr__(self, key)
+
+    def __contains__(self, key):
+        return key in self._fields and hasattr(self, key)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, (Record, dict)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return type(self).__name__ + "(" + ", ".join(
+            key + "=" + repr(value) for key, value in self.items()) + ")"
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self._fields else default
+
+    def keys(self):
+        return [key for key in self._fields if hasattr(self, key)]
+
+    def values(self):
+        return [getattr(self, key) for key in self.keys()]
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.keys()]
+
+    def copy(self):
+        result = type(self).__new__(type(self))
+        for key in self.keys():
+            object.__setattr__(result, key, getattr(self, key))
+        return result
+
+    def to_dict(self):
+        return dict(self.items())
+
+
+class TreeRecord(Record):
+    """One file or directory in a tree cache table
+
+    Fields match :func:`materials_commons.cli.treedb.TreeTable.tablecolumns`. All fields are
+    always present, with None for NULL values.
+    """
+    __slots__ = ('id', 'parent_id', 'name', 'path', 'parent_path', 'mtime', 'size', 'checksum',
+                 'otype', 'checktime', 'children_checktime')
+    _fields = __slots__
+    _required = __slots__
+
+    # (cursor.description, column names or None) for the most recent statement
+    _last_columns = (None, None)
+
+    @classmethod
+    def from_row(cls, names, row):
+        """Construct from a sequence of column names and a matching sequence of values"""
+        record = cls.__new__(cls)
+        for key in cls._required:
+            object.__setattr__(record, key, None)
+        for key, value in zip(names, row):
+            object.__setattr__(record, key, value)
+        return record
+
+    @classmethod
+    def row_factory(cls, cursor, row):
+        """sqlite3 row factory: returns TreeRecord for tree table rows, else sqlite3.Row
+
+        The column names are found once per statement, so converting each row only assigns its
+        values.
+        """
+        description = cursor.description
+        last_description, names = cls._last_columns
+        if description is not last_description:
+            names = tuple(d[0] for d in description)
+            if not all(name in cls._fields for name in names):
+                names = None
+            cls._last_columns = (description, names)
+        if names is None:
+            return sqlite3.Row(cursor, row)
+        return cls.from_row(names, row)
+
+
+class CompareRecord(Record):
+    """Local and remote comparison data for one file or directory
+
+    See :func:`materials_commons.cli.tree_functions.treecompare` for field descriptions. The
+    optional fields 'eq', 'selected', and 'selected_by' are only present once assigned.
+    """
+    __slots__ = ('l_mtime', 'l_size', 'l_type', 'l_checksum', 'r_mtime', 'r_size', 'r_type',
+                 'r_checksum', 'r_obj', 'path', 'id', 'parent_id', 'eq', 'selected',
+                 'selected_by')
+    _fields = __slots__
+    _optional = ('eq', 'selected', 'selected_by')
+    _required = ('l_mtime', 'l_size', 'l_type', 'l_checksum', 'r_mtime', 'r_size', 'r_type',
+                 'r_checksum', 'r_obj', 'path', 'id', 'parent_id')
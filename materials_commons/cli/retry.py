@@ -0,0 +1,247 @@
+"""Retry transient transfer failures, and journal the items that still fail
+
+A single failed request (for example, an HTTP 502 from a proxy) should not cost a full re-run of
+a large upload or download. This module provides:
+
+- :class:`RetryPolicy`: retries a call on transient failures with exponential backoff and full
+  jitter, honoring ``Retry-After``. Before each retry an optional `already_done` check is run, so
+  an operation whose response was lost but which took effect on the server (an upload, a new
+  directory, a move, or a delete) is not repeated.
+- :class:`RetryJournal`: records the files that still failed after retrying in the project
+  database, so that ``mc up --retry-failed`` and ``mc down --retry-failed`` can replay just those
+  files, without re-walking and re-comparing the whole tree.
+
+Transient failures are connection errors, timeouts, and responses with status 408, 425, 429, 500,
+502, 503 or 504.
+
+Example: ::
+
+    policy = RetryPolicy()
+    result = policy.call(proj.remote.upload_file, proj.id, parent_id, local_abspath,
+                         already_done=lambda: uploaded_file_if_equal(proj, mcpath, local_abspath))
+
+"""
+import random
+import threading
+import time
+
+import requests
+
+from materials_commons.cli.rate_limit import parse_retry_after
+from materials_commons.cli.sqltable import SqlTable, sql_iter
+
+TRANSIENT_STATUS_CODES = (408, 425, 429, 500, 502, 503, 504)
+
+UPLOAD = 'upload'
+DOWNLOAD = 'download'
+
+
+def is_transient(e):
+    """True if the exception `e`, raised by a request, is worth retrying"""
+    if isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                      requests.exceptions.ChunkedEncodingError)):
+        return True
+    response = getattr(e, 'response', None)
+    return getattr(response, 'status_code', None) in TRANSIENT_STATUS_CODES
+
+
+def _retry_after(e):
+    response = getattr(e, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    return parse_retry_after(headers.get('retry-after'))
+
+
+class RetryPolicy(object):
+    """Retry calls that fail transiently, with exponential backoff and full jitter
+
+    The wait before retry number `n` (starting at 1) is a random value between 0 and
+    ``min(max_delay, base_delay * 2**(n-1))``, or the server's ``Retry-After`` value if given
+    (up to `max_delay`).
+
+    Arguments:
+        max_attempts (int): Maximum number of attempts, including the first.
+        base_delay (float): Backoff scale, in seconds.
+        max_delay (float): Maximum wait between attempts, in seconds.
+        verbose (bool): If True, print a message before each retry.
+    """
+
+    def __init__(self, max_attempts=5, base_delay=1.0, max_delay=30.0, verbose=True):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.verbose = verbose
+        self._sleep = time.sleep
+        self._random = random.random
+
+    def delay(self, attempt, e=None):
+        """Seconds to wait after failed attempt number `attempt` (starting at 1)"""
+        retry_after = _retry_after(e) if e is not None else None
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        return self._random() * min(self.max_delay, self.base_delay * 2**(attempt - 1))
+
+    def call(self, fn, *args, already_done=None, description=None, **kwargs):
+        """Call `fn(*args, **kwargs)`, retrying on transient failures
+
+        Arguments:
+            fn: The function to call.
+            already_done (callable or None): Called with no arguments before each retry. If it
+                returns a value other than None, the operation is taken to have succeeded and that
+                value is returned instead of calling `fn` again.
+            description (str or None): Used as a prefix when printing retry messages.
+
+        Returns:
+            The result of `fn`, or of `already_done`.
+
+        Raises:
+            The last exception, if it is not transient or `max_attempts` is reached.
+        """
+        attempt = 1
+        while True:
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_attempts or not is_transient(e):
+                    raise
+                wait = self.delay(attempt, e)
+                if self.verbose:
+                    prefix = (description + ": ") if description else ""
+                    print(prefix + str(e) + " (retrying in {0:.1f}s)".format(wait))
+                self._sleep(wait)
+                attempt += 1
+            if already_done is not None:
+                result = already_done()
+                if result is not None:
+                    return result
+
+
+default_policy = RetryPolicy()
+
+
+class RetryJournalTable(SqlTable):
+    """Files that failed to upload or download, stored in the project database
+
+    Values:
+        key: str, "<operation>:<path>", unique
+        operation: str, 'upload' or 'download'
+        path: str, Materials Commons style path
+        local_abspath: str, local file uploaded from or downloaded to
+        force: int, 1 if a download should overwrite an existing local file
+        error: str, the last error message
+        failtime: real, time of last failure (s since epoch)
+    """
+
+    @staticmethod
+    def default_print_fmt():
+        from materials_commons.cli.functions import as_is, format_time
+        # (key, header, fmt, size, function)
+        return [
+            ("operation", "operation", "<", 10, as_is),
+            ("path", "path", "<", 60, as_is),
+            ("failtime", "failtime", "<", 24, format_time),
+            ("error", "error", "<", 60, as_is)
+        ]
+
+    @staticmethod
+    def tablecolumns():
+        return {
+            "key": ["text", "UNIQUE"],
+            "operation": ["text"],
+            "path": ["text"],
+            "local_abspath": ["text"],
+            "force": ["integer"],
+            "error": ["text"],
+            "failtime": ["real"]
+        }
+
+    @staticmethod
+    def tablename():
+        return "retryjournal"
+
+    def select_by_operation(self, operation):
+        """Returns list of records for `operation`, sorted by path"""
+        self.curs.execute("SELECT * FROM " + self.tablename() + " WHERE operation=? ORDER BY path",
+                          (operation,))
+        return [dict(record) for record in sql_iter(self.curs)]
+
+    def delete_by_key(self, key):
+        self.curs.execute("DELETE FROM " + self.tablename() + " WHERE key=?", (key,))
+        self.conn.commit()
+
+
+class RetryJournal(object):
+    """Record transfer failures in the retry journal, and clear them when they succeed
+
+    Failures and successes may be recorded from any thread. Each failure is written to the
+    project database as it is recorded, so failures are kept even if the process is killed
+    before the transfer finishes. A recorded success removes any journal entry for the same
+    operation and path.
+
+    Arguments:
+        proj_local_path (str): Local project path
+    """
+
+    def __init__(self, proj_local_path):
+        self.table = RetryJournalTable(proj_local_path)
+        self._lock = threading.Lock()
+        self.table.connect()
+        try:
+            self.table.curs.execute("SELECT key FROM " + self.table.tablename())
+            self._keys = set(record['key'] for record in sql_iter(self.table.curs))
+        finally:
+            self.table.close()
+
+    @staticmethod
+    def _key(operation, path):
+        return operation + ":" + path
+
+    def record_failure(self, operation, path, local_abspath, error, force=False):
+        """Record that `operation` on `path` failed with `error`"""
+        record = {
+            "key": self._key(operation, path),
+            "operation": operation,
+            "path": path,
+            "local_abspath": local_abspath,
+            "force": int(bool(force)),
+            "error": str(error),
+            "failtime": time.time()
+        }
+        with self._lock:
+            self.table.connect()
+            try:
+                self.table.insert_or_replace(record)
+            finally:
+                self.table.close()
+            self._keys.add(record['key'])
+
+    def record_success(self, operation, path):
+        """Record that `operation` on `path` succeeded"""
+        key = self._key(operation, path)
+        with self._lock:
+            if key not in self._keys:
+                return
+            self.table.connect()
+            try:
+                self.table.delete_by_key(key)
+            finally:
+                self.table.close()
+            self._keys.discard(key)
+
+    def pending(self, operation):
+        """Returns the recorded failures for `operation` ('upload' or 'download'), as a list of
+        dict"""
+        with self._lock:
+            self.table.connect()
+            try:
+                return self.table.select_by_operation(operation)
+            finally:
+                self.table.close()
+
+    def report(self, operation, command):
+        """Print how many `operation` failures remain and the `command` to retry them"""
+        n_failed = len(self.pending(operation))
+        if n_failed:
+            print(str(n_failed) + " failed " + operation + "(s) recorded. Use `" + command
+                  + "` to retry.")
@@ -4,6 +4,7 @@ import sqlite3
 import warnings
 
 from materials_commons.cli.print_formatter import PrintFormatter
+from materials_commons.cli.trace import trace_cursor
 
 def dbpath(proj_local_path):
     """Location of a sqlite database to cache project data locally"""
@@ -30,6 +31,9 @@ class SqlTable(object):
 
     """
 
+    # sqlite3 row factory used for query results
+    row_factory = sqlite3.Row
+
     # Example 'tablecolumns':
     #
     # @staticmethod
@@ -125,9 +129,9 @@ class SqlTable(object):
 
         # print("Connect to:", self.dbpath)
         self.conn = sqlite3.connect(self.dbpath)
-        self.conn.row_factory = sqlite3.Row
+        self.conn.row_factory = self.row_factory
         self.conn.create_function("REGEXP", 2, self._regexp)
-        self.curs = self.conn.cursor()
+        self.curs = trace_cursor(self.conn.cursor())
 
     def close(self):
         self.conn.close()
@@ -211,3 +215,24 @@ class SqlTable(object):
             if record is None:
                 break
             pformatter.print_detail("id", record)
+
+class PathSqlTable(SqlTable):
+    """A SqlTable in the sqlite database file at a given path, instead of a project database
+
+    The directory containing the database file is created if necessary. Derived classes must
+    implement the same methods as for SqlTable.
+    """
+
+    def __init__(self, path):
+        """
+
+        Arguments:
+            path: str, path to the sqlite database file
+        """
+        self.dbpath = path
+        db_dir = os.path.dirname(path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        self.connect()
+        self._create_table()
+        self.close()
@@ -0,0 +1,416 @@
+"""Compare large files line by line, in bounded memory
+
+:func:`difflib.unified_diff` needs both files in memory as lists of lines, and its matching can
+take time quadratic in the number of lines. :func:`diff_files` instead reads both files as
+streams and compares them one window of lines at a time:
+
+1. Lines common to the start of both streams are passed over as they are read.
+2. At the first difference, a window of lines is read from each stream, limited by the memory
+   budget, and matched using "anchors": lines that occur exactly once in each window. The longest
+   sequence of anchors in the same order in both windows (found in O(n log n)) splits the windows
+   into smaller regions, which are matched the same way a limited number of times. Small regions
+   without anchors are matched with :class:`difflib.SequenceMatcher`, and lines that are still
+   left unmatched are reported as deleted or inserted.
+3. Lines after the last matching line are carried over to the next window, unless it is in the
+   first half of both windows, so that each window consumes at least half a window of lines.
+
+Total time is therefore linear in the size of the files, up to a log factor, and memory is bounded
+by `max_memory`. The result is a valid diff, but it may be longer than the minimal diff found by
+:mod:`difflib`, particularly for files with many repeated lines.
+
+Output is in unified or context diff format, like :func:`difflib.unified_diff` and
+:func:`difflib.context_diff`. Hunks that grow past the memory budget are written as several
+consecutive hunks, with as many context lines before as after their changes, so that they can be
+applied by `patch`.
+"""
+import bisect
+import collections
+import difflib
+import filecmp
+import os
+
+# Default memory budget (bytes)
+DEFAULT_MAX_MEMORY = 256 * 1024 * 1024
+
+# Approximate memory used per line read, in addition to the line contents (bytes)
+LINE_OVERHEAD = 200
+
+# Number of times regions between anchors are matched again
+MAX_ANCHOR_DEPTH = 4
+
+# Regions without anchors, of at most this many lines in each file, are matched with difflib
+MAX_SMALL_REGION = 200
+
+def files_equal(path_a, path_b, checksum_a=None, checksum_b=None):
+    """Check if two files have the same contents, without reading them into memory
+
+    If both checksums are given they are compared, and the files are not read. Otherwise files of
+    different size are not equal, and files of equal size are compared in chunks.
+    """
+    if checksum_a and checksum_b:
+        return checksum_a == checksum_b
+    if os.path.getsize(path_a) != os.path.getsize(path_b):
+        return False
+    return filecmp.cmp(path_a, path_b, shallow=False)
+
+class _LineReader(object):
+    """Read lines from a text stream, with lookahead"""
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = collections.deque()
+        self.eof = False
+
+    def _read(self):
+        line = self.f.readline()
+        if not line:
+            self.eof = True
+            return None
+        self.buffer.append(line)
+        return line
+
+    def peek(self):
+        """Returns the next line without consuming it, or None at the end of the stream"""
+        if self.buffer:
+            return self.buffer[0]
+        if self.eof:
+            return None
+        return self._read()
+
+    def pop(self):
+        line = self.peek()
+        if line is not None:
+            self.buffer.popleft()
+        return line
+
+    def window(self, max_bytes):
+        """Returns a list of the next lines, up to max_bytes (at least one line), not consumed
+
+        Returns:
+            (lines, full): full is True if the window was limited by max_bytes, not by the end of
+            the stream.
+        """
+        lines = []
+        nbytes = 0
+        i = 0
+        while True:
+            if i < len(self.buffer):
+                line = self.buffer[i]
+            elif self.eof or self._read() is None:
+                return (lines, False)
+            else:
+                line = self.buffer[i]
+            lines.append(line)
+            nbytes += len(line) + LINE_OVERHEAD
+            i += 1
+            if nbytes >= max_bytes:
+                return (lines, True)
+
+    def consume(self, n):
+        for i in range(n):
+            self.buffer.popleft()
+
+def _unique_positions(lines, lo, hi):
+    """Returns dict of line: index for the lines that occur once in lines[lo:hi]"""
+    positions = {}
+    for i in range(lo, hi):
+        line = lines[i]
+        positions[line] = None if line in positions else i
+    return positions
+
+def _anchors(a, b, lo_a, hi_a, lo_b, hi_b):
+    """Returns the longest list of (i, j) with a[i] == b[j] unique in both regions, i and j increasing"""
+    unique_a = _unique_positions(a, lo_a, hi_a)
+    unique_b = _unique_positions(b, lo_b, hi_b)
+    pairs = [(i, unique_b[line]) for line, i in unique_a.items()
+             if i is not None and unique_b.get(line) is not None]
+    pairs.sort()
+
+    # longest increasing subsequence of j, by patience sorting
+    tails = []
+    tail_index = []
+    previous = [None] * len(pairs)
+    for k, (i, j) in enumerate(pairs):
+        pos = bisect.bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_index.append(k)
+        else:
+            tails[pos] = j
+            tail_index[pos] = k
+        previous[k] = tail_index[pos - 1] if pos > 0 else None
+    result = []
+    k = tail_index[-1] if tail_index else None
+    while k is not None:
+        result.append(pairs[k])
+        k = previous[k]
+    result.reverse()
+    return result
+
+def _match(a, b, lo_a, hi_a, lo_b, hi_b, depth=0, bounded=True):
+    """Yield ('equal', i, j), ('delete', i, None), and ('insert', None, j) for a region
+
+    If not `bounded`, the region ends at the end of a window rather than at a matching line or the
+    end of the files, so lines at its end are not assumed to match.
+    """
+    # common prefix and suffix
+    while lo_a < hi_a and lo_b < hi_b and a[lo_a] == b[lo_b]:
+        yield ('equal', lo_a, lo_b)
+        lo_a += 1
+        lo_b += 1
+    suffix = 0
+    while bounded and lo_a < hi_a - suffix and lo_b < hi_b - suffix and a[hi_a - suffix - 1] == b[hi_b - suffix - 1]:
+        suffix += 1
+    hi_a -= suffix
+    hi_b -= suffix
+
+    anchors = []
+    if depth < MAX_ANCHOR_DEPTH and lo_a < hi_a and lo_b < hi_b:
+        anchors = _anchors(a, b, lo_a, hi_a, lo_b, hi_b)
+    for i, j in anchors:
+        yield from _match(a, b, lo_a, i, lo_b, j, depth + 1)
+        yield ('equal', i, j)
+        lo_a, lo_b = i + 1, j + 1
+    if anchors:
+        yield from _match(a, b, lo_a, hi_a, lo_b, hi_b, depth + 1, bounded)
+    elif 0 < hi_a - lo_a <= MAX_SMALL_REGION and 0 < hi_b - lo_b <= MAX_SMALL_REGION:
+        matcher = difflib.SequenceMatcher(None, a[lo_a:hi_a], b[lo_b:hi_b], autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                for k in range(i2 - i1):
+                    yield ('equal', lo_a + i1 + k, lo_b + j1 + k)
+                continue
+            for i in range(lo_a + i1, lo_a + i2):
+                yield ('delete', i, None)
+            for j in range(lo_b + j1, lo_b + j2):
+                yield ('insert', None, j)
+    else:
+        for i in range(lo_a, hi_a):
+            yield ('delete', i, None)
+        for j in range(lo_b, hi_b):
+            yield ('insert', None, j)
+
+    for k in range(suffix):
+        yield ('equal', hi_a + k, hi_b + k)
+
+def diff_ops(f_a, f_b, max_memory=DEFAULT_MAX_MEMORY):
+    """Compare two text streams, yielding (tag, line) for each line
+
+    Tags are 'equal', 'delete' (line only in f_a), and 'insert' (line only in f_b).
+    """
+    reader_a = _LineReader(f_a)
+    reader_b = _LineReader(f_b)
+    window_bytes = max(1, max_memory // 8)
+    while True:
+        # pass over common lines
+        line_a = reader_a.peek()
+        while line_a is not None and line_a == reader_b.peek():
+            yield ('equal', line_a)
+            reader_a.pop()
+            reader_b.pop()
+            line_a = reader_a.peek()
+        if line_a is None and reader_b.peek() is None:
+            return
+
+        a, full_a = reader_a.window(window_bytes)
+        b, full_b = reader_b.window(window_bytes)
+        ops = list(_match(a, b, 0, len(a), 0, len(b), bounded=not (full_a or full_b)))
+        if full_a or full_b:
+            # lines after the last match may match lines after the windows: carry them over
+            last = len(ops)
+            while last > 0 and ops[last - 1][0] != 'equal':
+                last -= 1
+            end_a, end_b = (ops[last - 1][1] + 1, ops[last - 1][2] + 1) if last else (0, 0)
+            # consume at least half of a full window, to ensure progress
+            half_a, half_b = (len(a) + 1) // 2, (len(b) + 1) // 2
+            if (not full_a or end_a < half_a) and (not full_b or end_b < half_b):
+                if full_a:
+                    end_a = max(end_a, half_a)
+                if full_b:
+                    end_b = max(end_b, half_b)
+                ops = _match(a, b, 0, end_a, 0, end_b)
+            else:
+                ops = ops[:last]
+        else:
+            end_a, end_b = len(a), len(b)
+
+        for tag, i, j in ops:
+            yield (tag, b[j] if i is None else a[i])
+        reader_a.consume(end_a)
+        reader_b.consume(end_b)
+
+def _format_range_unified(start, stop):
+    """Convert a range to the "ed" format, as in difflib.unified_diff"""
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return '{}'.format(beginning)
+    if not length:
+        beginning -= 1
+    return '{},{}'.format(beginning, length)
+
+def _format_range_context(start, stop):
+    """Convert a range to the "ed" format, as in difflib.context_diff"""
+    beginning = start + 1
+    length = stop - start
+    if not length:
+        beginning -= 1
+    if length <= 1:
+        return '{}'.format(beginning)
+    return '{},{}'.format(beginning, beginning + length - 1)
+
+def _format_unified(hunk, start_a, start_b):
+    n_a = sum(1 for tag, line in hunk if tag != 'insert')
+    n_b = sum(1 for tag, line in hunk if tag != 'delete')
+    yield '@@ -{} +{} @@\n'.format(_format_range_unified(start_a, start_a + n_a),
+                                   _format_range_unified(start_b, start_b + n_b))
+    prefix = {'equal': ' ', 'delete': '-', 'insert': '+'}
+    for tag, line in hunk:
+        yield prefix[tag] + line
+
+def _format_context(hunk, start_a, start_b):
+    # a run of deletes and inserts between equal lines is a replacement, marked with '!'
+    marks = []
+    k = 0
+    while k < len(hunk):
+        if hunk[k][0] == 'equal':
+            marks.append('  ')
+            k += 1
+            continue
+        end = k
+        while end < len(hunk) and hunk[end][0] != 'equal':
+            end += 1
+        tags = set(tag for tag, line in hunk[k:end])
+        for tag, line in hunk[k:end]:
+            if len(tags) > 1:
+                marks.append('! ')
+            else:
+                marks.append('- ' if tag == 'delete' else '+ ')
+        k = end
+    n_a = sum(1 for tag, line in hunk if tag != 'insert')
+    n_b = sum(1 for tag, line in hunk if tag != 'delete')
+    yield '***************\n'
+    yield '*** {} ****\n'.format(_format_range_context(start_a, start_a + n_a))
+    if any(tag == 'delete' for tag, line in hunk):
+        for mark, (tag, line) in zip(marks, hunk):
+            if tag != 'insert':
+                yield mark + line
+    yield '--- {} ----\n'.format(_format_range_context(start_b, start_b + n_b))
+    if any(tag == 'insert' for tag, line in hunk):
+        for mark, (tag, line) in zip(marks, hunk):
+            if tag != 'delete':
+                yield mark + line
+
+def _balance_context(hunk, start_a, start_b):
+    """Trim the leading or trailing context of a hunk so that both have the same length
+
+    Tools like `patch` take a hunk with less leading than trailing context (or the reverse) to be
+    at the start (or end) of the file, so hunks split to bound memory must have equal context.
+
+    Returns:
+        (hunk, start_a, start_b): The trimmed hunk and its starting line numbers.
+    """
+    lead = 0
+    while hunk[lead][0] == 'equal':
+        lead += 1
+    trail = 0
+    while hunk[len(hunk) - 1 - trail][0] == 'equal':
+        trail += 1
+    c = min(lead, trail)
+    return (hunk[lead - c:len(hunk) - (trail - c)], start_a + lead - c, start_b + lead - c)
+
+def diff_streams(f_a, f_b, fromfile='', tofile='', n=3, context=False,
+                 max_memory=DEFAULT_MAX_MEMORY):
+    """Compare two text streams, yielding lines of a unified (or context) diff
+
+    A hunk that grows past the memory budget is continued in a new hunk at its next change after
+    at least two equal lines, or at its next change once it reaches twice the budget. The equal
+    lines before that change are shared out as context of the two hunks, and each split hunk is
+    given the same number of context lines before and after its changes.
+
+    Arguments:
+        f_a, f_b: Text streams to compare.
+        fromfile, tofile (str): File names used in the diff header.
+        n (int): Number of context lines.
+        context (bool): If True, use the context diff format, otherwise unified diff format.
+        max_memory (int): Memory budget (bytes).
+    """
+    fmt = _format_context if context else _format_unified
+    max_hunk_bytes = max(1, max_memory // 8)
+    header = ['*** {}\n'.format(fromfile), '--- {}\n'.format(tofile)] if context else \
+        ['--- {}\n'.format(fromfile), '+++ {}\n'.format(tofile)]
+    hunk = None                             # (tag, line) of the current hunk
+    hunk_bytes = 0
+    split = False                           # True if the current hunk continues a split hunk
+    start_a = start_b = 0                   # line numbers of the start of the current hunk
+    pos_a = pos_b = 0                       # line numbers of the next line
+    before = collections.deque(maxlen=n)    # equal lines before the next hunk
+    gap = []                                # equal lines since the last change in the hunk
+
+    for tag, line in diff_ops(f_a, f_b, max_memory=max_memory):
+        if tag == 'equal':
+            pos_a += 1
+            pos_b += 1
+            if hunk is None:
+                before.append(line)
+                continue
+            gap.append(line)
+            if len(gap) > 2 * n:
+                # too far from the next change to share context: end the hunk
+                hunk += [('equal', equal_line) for equal_line in gap[:n]]
+                if split:
+                    hunk, start_a, start_b = _balance_context(hunk, start_a, start_b)
+                yield from header
+                header = []
+                yield from fmt(hunk, start_a, start_b)
+                before.extend(gap[len(gap) - n:])
+                hunk = None
+                gap = []
+            continue
+
+        if hunk is not None and hunk_bytes >= max_hunk_bytes and \
+                (len(gap) >= 2 or hunk_bytes >= 2 * max_hunk_bytes):
+            # continue in a new hunk, to bound memory, sharing the gap as context; wait for a
+            # gap that gives both hunks some context, up to twice the budget
+            t = (len(gap) + 1) // 2
+            hunk += [('equal', equal_line) for equal_line in gap[:t]]
+            yield from header
+            header = []
+            yield from fmt(*_balance_context(hunk, start_a, start_b))
+            hunk = [('equal', equal_line) for equal_line in gap[t:]]
+            hunk_bytes = sum(len(equal_line) for equal_line in gap[t:])
+            start_a, start_b = pos_a - len(gap) + t, pos_b - len(gap) + t
+            split = True
+        elif hunk is None:
+            hunk = [('equal', equal_line) for equal_line in before]
+            hunk_bytes = sum(len(equal_line) for equal_line in before)
+            start_a, start_b = pos_a - len(before), pos_b - len(before)
+            before.clear()
+            split = False
+        else:
+            hunk += [('equal', equal_line) for equal_line in gap]
+            hunk_bytes += sum(len(equal_line) for equal_line in gap)
+        gap = []
+        hunk.append((tag, line))
+        hunk_bytes += len(line)
+        if tag == 'delete':
+            pos_a += 1
+        else:
+            pos_b += 1
+
+    if hunk is not None:
+        hunk += [('equal', equal_line) for equal_line in gap[:n]]
+        if split:
+            hunk, start_a, start_b = _balance_context(hunk, start_a, start_b)
+        yield from header
+        yield from fmt(hunk, start_a, start_b)
+
+def diff_files(path_a, path_b, fromfile='', tofile='', n=3, context=False,
+               max_memory=DEFAULT_MAX_MEMORY, encoding_a=None, encoding_b=None):
+    """Compare two text files, yielding lines of a unified (or context) diff
+
+    See :func:`diff_streams`.
+    """
+    with open(path_a, 'r', encoding=encoding_a) as f_a, open(path_b, 'r', encoding=encoding_b) as f_b:
+        yield from diff_streams(f_a, f_b, fromfile=fromfile, tofile=tofile, n=n,
+                                context=context, max_memory=max_memory)
@@ -1,13 +1,19 @@
+import concurrent.futures
 import json
 import sys
+import threading
 import yaml
 
 import materials_commons.api as mcapi
 import materials_commons.cli.functions as clifuncs
 import materials_commons.cli.tmp_functions as tmpfuncs
+import materials_commons.cli.zip_download as clizip
 from materials_commons.cli.list_objects import ListObjects
 from materials_commons.cli.exceptions import MCCLIException
 
+# Default maximum number of dataset zipfiles downloaded at once with --down
+DEFAULT_DOWN_JOBS = 2
+
 def make_parser():
     """Make argparse.ArgumentParser for `mc dataset`"""
     return DatasetSubcommand().make_parser()
@@ -109,19 +115,23 @@ class DatasetSubcommand(ListObjects):
                 'clone_as': 'Are you sure you want to clone this dataset?',
                 'goto': 'You want to goto these datasets in a web browser?',
                 'goto_globus': 'You want to goto the globus manager for these datasets in a web browser?'
-            }
+            },
+            cache_types=('dataset', 'published_dataset'),
+            modifying_actions=('unpublish', 'publish', 'clone_as')
         )
 
     def get_all_from_project(self, proj):
         # # basic call, # TODO: return owner email in dataset data
         # return proj.remote.get_all_datasets(proj.id)
 
-        datasets = proj.remote.get_all_datasets(proj.id)
+        datasets = self.cached_project_list(
+            proj, 'dataset', lambda: proj.remote.get_all_datasets(proj.id), mcapi.Dataset)
         tmpfuncs.add_owner(proj.remote, datasets)
         return datasets
 
     def get_all_from_remote(self, remote):
-        datasets = remote.get_all_published_datasets()
+        datasets = self.cached_list(
+            remote, 'published_dataset', remote.get_all_published_datasets, mcapi.Dataset)
         tmpfuncs.add_owner(remote, datasets)
         return datasets
 
@@ -175,6 +185,9 @@ class DatasetSubcommand(ListObjects):
 
         # --down
         parser.add_argument('--down', action="store_true", default=False, help='Download dataset zipfile')
+        parser.add_argument('--extract', action="store_true", default=False, help='For use with --down: extract each dataset zipfile once downloaded, skipping files that are unchanged.')
+        parser.add_argument('--down-jobs', type=int, default=DEFAULT_DOWN_JOBS, metavar='N', help='For use with --down: maximum number of dataset zipfiles downloaded at once (default ' + str(DEFAULT_DOWN_JOBS) + ').')
+        parser.add_argument('--connections', type=int, default=clizip.DEFAULT_CONNECTIONS, metavar='N', help='For use with --down: maximum number of connections used to download each dataset zipfile (default ' + str(clizip.DEFAULT_CONNECTIONS) + ').')
 
         # --publish, --unpublish
         parser.add_argument('--unpublish', action="store_true", default=False, help='Unpublish a dataset')
@@ -189,8 +202,19 @@ class DatasetSubcommand(ListObjects):
     def down(self, objects, args, out=sys.stdout):
         """Download dataset zipfile, --down
 
+        Up to `--down-jobs` datasets are downloaded at once, and each zipfile is downloaded using up to
+        `--connections` HTTP range requests at once. With `--extract`, each zipfile is extracted
+        into the directory dataset.<dataset_uuid> as soon as its download completes, skipping
+        files that already exist with the same contents.
+
         .. note:: The downloaded dataset is named dataset.<dataset_uuid>.zip
         """
+        if args.down_jobs < 1:
+            raise MCCLIException("--down-jobs must be a positive integer, got: "
+                                 + str(args.down_jobs))
+        if args.connections < 1:
+            raise MCCLIException("--connections must be a positive integer, got: "
+                                 + str(args.connections))
 
         if args.all or not clifuncs.project_exists(self.working_dir):
             remote = self.get_remote(args)
@@ -199,11 +223,39 @@ class DatasetSubcommand(ListObjects):
             remote = proj.remote
         for obj in objects:
             self.print_details(obj, args, out=out)
-            out.write("Downloading...\n")
-            dataset_id = obj.id
+        if not objects:
+            return
+        out.write("Downloading...\n")
+
+        lock = threading.Lock()
+
+        def _down(obj):
             to = "dataset." + obj.uuid + ".zip"
-            remote.download_published_dataset_zipfile(dataset_id, to)
-            out.write("DONE\n\n")
+            clizip.download_dataset_zipfile(remote, obj.id, to, connections=args.connections)
+            msg = to + ": DONE\n"
+            if args.extract:
+                extracted, skipped = clizip.extract_zipfile(to, "dataset." + obj.uuid)
+                msg += "dataset.{0}: extracted {1} file(s), {2} unchanged\n".format(
+                    obj.uuid, len(extracted), len(skipped))
+            with lock:
+                out.write(msg)
+
+        failures = []
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(args.down_jobs, len(objects)),
+                thread_name_prefix="mc-dataset-down") as executor:
+            futures = [executor.submit(_down, obj) for obj in objects]
+            for obj, future in zip(objects, futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    failures.append((obj, e))
+        out.write("\n")
+        if failures:
+            for obj, e in failures:
+                out.write("dataset.{0}.zip: FAILED: {1}\n".format(obj.uuid, e))
+            raise MCCLIException("Failed to download {0} of {1} dataset(s)".format(
+                len(failures), len(objects)))
         return
 
     def create(self, args, out=sys.stdout):
@@ -11,7 +11,11 @@ import materials_commons.cli.functions as clifuncs
 import materials_commons.cli.globus as cliglobus
 import materials_commons.cli.tree_functions as treefuncs
 import materials_commons.cli.file_functions as filefuncs
-from materials_commons.cli.treedb import LocalTree, RemoteTree
+import materials_commons.cli.object_cache as objcache
+import materials_commons.cli.progress as cliprogress
+import materials_commons.cli.retry as cliretry
+import materials_commons.cli.transfer_plan as transfer_plan
+from materials_commons.cli.rate_limit import TransferPool, add_concurrency_options, make_rate_limiter
 
 def _get_current_globus_download(pconfig, proj, verbose=True):
     all_downloads = {download.id:download for download in proj.remote.get_all_globus_download_requests(proj.id)}
@@ -26,6 +30,7 @@ def _get_current_globus_download(pconfig, proj, verbose=True):
     if globus_download_id is None:
         name = clifuncs.random_name()
         download = proj.remote.create_globus_download_request(proj.id, name)
+        objcache.invalidate(('globus_download',), proj_local_path=proj.local_path)
         if verbose:
             print("Created new globus download (name=" + download.name + ", id=" + str(download.id) + ").")
         pconfig.globus_download_id = download.id
@@ -37,8 +42,21 @@ def _get_current_globus_download(pconfig, proj, verbose=True):
 
     return download
 
+def _download(proj_id, file_id, local_path, remote, working_dir, size=0):
+    """Download one file, retrying transient failures, and report progress"""
+    stats = cliprogress.current()
+    stats.start_file(local_path, size)
+    ok = False
+    try:
+        with stats.phase('transfer'):
+            cliretry.default_policy.call(remote.download_file, proj_id, file_id, local_path,
+                                         description=os.path.relpath(local_path, working_dir))
+        ok = True
+    finally:
+        stats.finish_file(local_path, size, ok=ok)
+
 def _check_download_file(proj_id, file_id, local_path, remote, working_dir,
-                         force=False):
+                         force=False, size=0):
     """Prompt user for confirmation before overwriting an existing local file
 
     Arguments
@@ -50,32 +68,100 @@ def _check_download_file(proj_id, file_id, local_path, remote, working_dir,
     working_dir (str): Current working directory, used for finding relative
         paths and printing messages.
     force: bool (optional, default=False) If True, force overwrite existing file without confirmation.
+    size: int (optional, default=0) File size in bytes, for progress reporting.
 
     Returns
     -------
     local_path: str or None, Location of downloaded file or None if not downloaded
     """
-    if not os.path.exists(local_path) or force:
+    if not os.path.exists(local_path) or force or _confirm_overwrite(local_path, working_dir):
         dir = os.path.dirname(local_path)
         if not os.path.isdir(dir):
-            os.makedirs(dir)
-        remote.download_file(proj_id, file_id, local_path)
+            os.makedirs(dir, exist_ok=True)
+        _download(proj_id, file_id, local_path, remote, working_dir, size=size)
         return local_path
-    else:
+    cliprogress.current().skip_file(local_path, size)
+    return None
+
+def _confirm_overwrite(local_path, working_dir):
+    """Prompt user for confirmation before overwriting an existing local file, returns True if 'y'"""
+    with cliprogress.paused():
         print("Overwrite '" + os.path.relpath(local_path, working_dir) + "'?")
         while True:
             ans = input('y/n: ')
-            if ans == 'y':
-                dir = os.path.dirname(local_path)
-                if not os.path.exists(dir):
-                    os.makedirs(dir)
-                remote.download_file(proj_id, file_id, local_path)
-                return local_path
-            elif ans == 'n':
+            if ans == 'y' or ans == 'n':
                 break
-    return None
+    return ans == 'y'
+
+def _download_file_record(proj, path, record, output, working_dir, force=False, journal=None):
+    """Download one remote file, given its treecompare record
+
+    Arguments
+    ---------
+    proj: mcapi.Project, Project to download from
+
+    path: str, Materials Commons style path of the file to download
+
+    record: dict, treecompare data for the file. Expects record['r_type'] == 'file'.
+
+    output: str, Local path to download the file to
+
+    working_dir (str): Current working directory, used for finding relative
+        paths and printing messages.
 
-def standard_download(proj, path, working_dir, force=False, output=None, recursive=False, no_compare=False, localtree=None, remotetree=None):
+    force: bool (optional, default=False) If True, force overwrite existing files without confirmation.
+
+    journal: RetryJournal (optional, default=None)
+        If provided, downloads that fail after retrying are recorded so that they can be retried
+        with `mc down --retry-failed`.
+
+    Returns
+    -------
+    success: bool, True if download succeeds or is not necessary, False otherwise
+    """
+    local_abspath = filefuncs.make_local_abspath(proj.local_path, path)
+    printpath = os.path.relpath(local_abspath, start=working_dir)
+
+    if record['l_type'] == 'directory':
+        print(printpath + ": is local directory and remote file")
+        cliprogress.current().fail_file(output, record['r_size'])
+        return False
+    elif 'eq' in record and record['eq'] and output == local_abspath:
+        print(printpath + ": local is equivalent to remote (skipping)")
+        cliprogress.current().skip_file(output, record['r_size'])
+        return True
+    else:
+        try:
+            result_path =  _check_download_file(proj.id,
+                                                record['id'],
+                                                output, proj.remote,
+                                                working_dir, force=force,
+                                                size=record['r_size'] or 0)
+        except Exception as e:
+            if journal is not None and cliretry.is_transient(e):
+                journal.record_failure(cliretry.DOWNLOAD, path, output, e, force=force)
+            print(printpath + ": " + str(e) + " (skipping)")
+            return False
+        if result_path:
+            if journal is not None:
+                journal.record_success(cliretry.DOWNLOAD, path)
+            if output != local_abspath:
+                print("downloaded:", printpath, "as",
+                      os.path.relpath(output, start=working_dir))
+            else:
+                print("downloaded:", printpath)
+            return True
+        else:
+            return False
+
+def _may_download_in_background(proj, path, record, output, force=False):
+    """True if a file can be downloaded without prompting the user"""
+    if record['r_type'] != 'file' or record['l_type'] == 'directory':
+        return False
+    return force or not os.path.exists(output) or \
+        ('eq' in record and record['eq'] and output == filefuncs.make_local_abspath(proj.local_path, path))
+
+def standard_download(proj, path, working_dir, force=False, output=None, recursive=False, no_compare=False, localtree=None, remotetree=None, pool=None, journal=None):
     """Download files and directories
 
     Arguments
@@ -109,6 +195,15 @@ def standard_download(proj, path, working_dir, force=False, output=None, recursi
         A RemoteTree object stores remote file and directory information to minimize API calls and
         data transfer. Will be used and updated if provided.
 
+    pool: TransferPool (optional, default=None)
+        If provided, files in each directory downloaded recursively are downloaded using the pool,
+        concurrently if the pool is parallel, using the directory comparison data. Files that
+        require confirmation before being overwritten are downloaded one at a time.
+
+    journal: RetryJournal (optional, default=None)
+        If provided, downloads that fail after retrying are recorded so that they can be retried
+        with `mc down --retry-failed`.
+
     Returns
     -------
     success: bool, True if download succeeds, False otherwise
@@ -129,30 +224,9 @@ def standard_download(proj, path, working_dir, force=False, output=None, recursi
     # if remote file:
     if path in files_data and files_data[path]['r_type'] == 'file':
 
-        if files_data[path]['l_type'] == 'directory':
-            print(printpath + ": is local directory and remote file")
-            return False
-        elif 'eq' in files_data[path] and files_data[path]['eq'] and output == local_abspath:
-            print(printpath + ": local is equivalent to remote (skipping)")
-            return True
-        else:
-            try:
-                result_path =  _check_download_file(proj.id,
-                                                    files_data[path]['id'],
-                                                    output, proj.remote,
-                                                    working_dir, force=force)
-            except Exception as e:
-                print(printpath + ": " + str(e) + " (skipping)")
-                return False
-            if result_path:
-                if output != local_abspath:
-                    print("downloaded:", printpath, "as",
-                          os.path.relpath(output, start=working_dir))
-                else:
-                    print("downloaded:", printpath)
-                return True
-            else:
-                return False
+        cliprogress.current().add_planned(output, files_data[path]['r_size'])
+        return _download_file_record(proj, path, files_data[path], output, working_dir,
+                                     force=force, journal=journal)
 
     # if directory:
     elif path in dirs_data and dirs_data[path]['r_type'] == 'directory':
@@ -166,20 +240,317 @@ def standard_download(proj, path, working_dir, force=False, output=None, recursi
             return False
 
         success = True
+        futures = []
         for childpath, record in child_data[path].items():
             childoutput = os.path.join(output, os.path.basename(childpath))
+            if pool is not None and record['r_type'] == 'file':
+                cliprogress.current().add_planned(childoutput, record['r_size'])
+                if _may_download_in_background(proj, childpath, record, childoutput, force=force):
+                    futures.append(pool.submit(_download_file_record, proj, childpath, record,
+                                               childoutput, working_dir, force=force,
+                                               journal=journal))
+                else:
+                    success &= _download_file_record(proj, childpath, record, childoutput,
+                                                     working_dir, force=force, journal=journal)
+                continue
             success &= standard_download(proj, childpath, working_dir,
                                          force=force, output=childoutput,
                                          recursive=recursive,
                                          no_compare=no_compare,
                                          localtree=localtree,
-                                         remotetree=remotetree)
+                                         remotetree=remotetree,
+                                         pool=pool,
+                                         journal=journal)
+        for future in futures:
+            success &= future.result()
         return success
 
     else:
         print(printpath + ": does not exist on remote")
         return False
 
+def expand_dataset_selection(proj, file_selection, working_dir, no_compare=False,
+                             localtree=None, remotetree=None):
+    """Find the remote files selected by a dataset file selection
+
+    The remote tree is searched from the included files and directories, one directory level
+    at a time with one `treecompare` per level, skipping directories that cannot contain selected
+    files.
+
+    Arguments
+    ---------
+    proj: mcapi.Project, Project containing the dataset
+
+    file_selection: dict or FileSelection, The dataset file selection
+
+    working_dir, no_compare, localtree, remotetree: As for `standard_download`
+
+    Returns
+    -------
+    selected: dict of path: CompareRecord, Each selected remote file once, with its comparison
+        data, as from `treecompare`.
+    """
+    if not isinstance(file_selection, filefuncs.FileSelection):
+        file_selection = filefuncs.FileSelection.from_dict(file_selection)
+    checksum = not no_compare
+
+    selected = {}
+    searched = set()
+    level = file_selection.roots()
+    while level:
+        files_data, dirs_data, child_data, not_existing = treefuncs.treecompare(
+            proj, level, checksum=checksum, localtree=localtree, remotetree=remotetree)
+        for path in level:
+            record = files_data.get(path) or dirs_data.get(path)
+            if record is None or record['r_type'] is None:
+                local_abspath = filefuncs.make_local_abspath(proj.local_path, path)
+                print(os.path.relpath(local_abspath, start=working_dir) +
+                      ": does not exist on remote")
+        searched.update(level)
+
+        candidates = [(path, record) for path, record in files_data.items()]
+        for children in child_data.values():
+            candidates += children.items()
+
+        level = []
+        for path, record in candidates:
+            if record['r_type'] == 'file':
+                if path not in selected and file_selection.check(path)[0]:
+                    selected[path] = record
+            elif record['r_type'] == 'directory' and path not in searched \
+                    and file_selection.may_select_under(path):
+                searched.add(path)
+                level.append(path)
+        level.sort()
+    return selected
+
+def download_dataset(proj, dataset_id, working_dir, force=False, no_compare=False,
+                     localtree=None, remotetree=None, pool=None, journal=None):
+    """Download the files selected by a dataset's file selection
+
+    Files are downloaded to their location in the local project directory. Files whose local
+    copy is equivalent to the remote are skipped, unless `no_compare`.
+
+    Arguments
+    ---------
+    proj: mcapi.Project, Project containing the dataset
+
+    dataset_id: int, ID of the dataset
+
+    working_dir, force, no_compare, localtree, remotetree, pool, journal:
+        As for `standard_download`
+
+    Returns
+    -------
+    success: bool, True if all downloads succeed, False otherwise
+    """
+    dataset = proj.remote.get_dataset(proj.id, dataset_id)
+    selected = expand_dataset_selection(proj, dataset.file_selection or {}, working_dir,
+                                        no_compare=no_compare, localtree=localtree,
+                                        remotetree=remotetree)
+    if not selected:
+        print("No files selected in dataset (name=" + str(dataset.name) + ", id=" +
+              str(dataset.id) + ").")
+        return True
+
+    success = True
+    futures = []
+    for path, record in sorted(selected.items()):
+        output = filefuncs.make_local_abspath(proj.local_path, path)
+        cliprogress.current().add_planned(output, record['r_size'])
+        if pool is not None and _may_download_in_background(proj, path, record, output,
+                                                             force=force):
+            futures.append(pool.submit(_download_file_record, proj, path, record, output,
+                                       working_dir, force=force, journal=journal))
+        else:
+            success &= _download_file_record(proj, path, record, output, working_dir,
+                                             force=force, journal=journal)
+    for future in futures:
+        success &= future.result()
+    return success
+
+def retry_failed_downloads(proj, working_dir, journal, no_compare=False, localtree=None,
+                           remotetree=None, pool=None):
+    """Retry the downloads recorded as failed in the retry journal
+
+    The journaled files are compared with one `treecompare`; directories are not walked again.
+
+    Arguments
+    ---------
+    proj: mcapi.Project, Project to download from
+
+    working_dir (str): Current working directory, used for finding relative
+        paths and printing messages.
+
+    journal: RetryJournal, The retry journal. Successful downloads are removed from it when it is
+        saved, failed downloads remain.
+
+    no_compare, localtree, remotetree, pool: As for `standard_download`
+
+    Returns
+    -------
+    success: bool, True if all downloads succeed, False otherwise
+    """
+    entries = journal.pending(cliretry.DOWNLOAD)
+    if not entries:
+        print("No failed downloads to retry.")
+        return True
+
+    files_data, dirs_data, child_data, not_existing = treefuncs.treecompare(
+        proj, sorted(set(entry['path'] for entry in entries)), checksum=not no_compare,
+        localtree=localtree, remotetree=remotetree)
+
+    success = True
+    futures = []
+    for entry in entries:
+        path, output, force = entry['path'], entry['local_abspath'], bool(entry['force'])
+        record = files_data.get(path)
+        if record is None or record['r_type'] != 'file':
+            success &= standard_download(proj, path, working_dir, force=force, output=output,
+                                         no_compare=no_compare, localtree=localtree,
+                                         remotetree=remotetree, journal=journal)
+            continue
+        cliprogress.current().add_planned(output, record['r_size'])
+        if pool is not None and _may_download_in_background(proj, path, record, output,
+                                                             force=force):
+            futures.append(pool.submit(_download_file_record, proj, path, record, output,
+                                       working_dir, force=force, journal=journal))
+        else:
+            success &= _download_file_record(proj, path, record, output, working_dir,
+                                             force=force, journal=journal)
+    for future in futures:
+        success &= future.result()
+    return success
+
+def plan_download(proj, paths, working_dir, force=False, output=None, recursive=False,
+                  no_compare=False, localtree=None, remotetree=None):
+    """Compare remote and local and return the files that need downloading, without downloading
+
+    Arguments
+    ---------
+    proj: mcapi.Project, Project to download from
+
+    paths: list of str, Materials Commons style paths of files or directories to download
+
+    working_dir, force, output, recursive, no_compare, localtree, remotetree:
+        As for `standard_download`. If `output` is given, `paths` must have length 1.
+
+    Returns
+    -------
+    actions: list of dict, Download actions, as expected by `transfer_plan.TransferPlan.save`
+    """
+    actions = []
+    checksum = not no_compare
+
+    def _plan_file(path, record, output):
+        local_abspath = filefuncs.make_local_abspath(proj.local_path, path)
+        if record['l_type'] == 'directory':
+            print(os.path.relpath(local_abspath, start=working_dir) +
+                  ": is local directory and remote file")
+            return
+        if 'eq' in record and record['eq'] and output == local_abspath:
+            return
+        actions.append({'path': path, 'local_abspath': output, 'remote_id': record['id'],
+                        'size': record['r_size'], 'force': force})
+
+    def _plan(path, output):
+        local_abspath = filefuncs.make_local_abspath(proj.local_path, path)
+        printpath = os.path.relpath(local_abspath, start=working_dir)
+        if output is None:
+            output = local_abspath
+
+        files_data, dirs_data, child_data, non_existing = treefuncs.treecompare(
+            proj, [path], checksum=checksum, localtree=localtree, remotetree=remotetree)
+
+        if path in files_data and files_data[path]['r_type'] == 'file':
+            _plan_file(path, files_data[path], output)
+        elif path in dirs_data and dirs_data[path]['r_type'] == 'directory':
+            if not recursive:
+                print(printpath + ": is a directory")
+                return
+            if dirs_data[path]['l_type'] == 'file':
+                print(printpath + ": is local file and remote directory")
+                return
+            for childpath, record in sorted(child_data[path].items()):
+                childoutput = os.path.join(output, os.path.basename(childpath))
+                if record['r_type'] == 'file':
+                    _plan_file(childpath, record, childoutput)
+                elif record['r_type'] == 'directory':
+                    _plan(childpath, childoutput)
+        else:
+            print(printpath + ": does not exist on remote")
+
+    for path in paths:
+        _plan(path, output)
+    return actions
+
+def execute_download_plan(proj, plan, working_dir, pool=None, journal=None):
+    """Download the pending files of a saved plan, marking each action as it completes
+
+    Arguments
+    ---------
+    proj: mcapi.Project, Project to download from
+
+    plan: TransferPlan, The saved download plan
+
+    working_dir (str): Current working directory, used for finding relative
+        paths and printing messages.
+
+    pool: TransferPool (optional, default=None)
+        If provided and parallel, files are downloaded concurrently. Overwriting existing files is
+        confirmed before any download starts. Files that are not overwritten are left pending.
+
+    journal: RetryJournal (optional, default=None)
+        If provided, downloads that fail after retrying are recorded so that they can be retried
+        with `mc down --retry-failed`.
+
+    Returns
+    -------
+    success: bool, True if all downloads succeed, False otherwise
+    """
+    def _download(action, force):
+        printpath = os.path.relpath(action['local_abspath'], start=working_dir)
+        try:
+            result_path = _check_download_file(proj.id, action['remote_id'],
+                                               action['local_abspath'], proj.remote,
+                                               working_dir, force=force,
+                                               size=action['size'] or 0)
+        except Exception as e:
+            if journal is not None and cliretry.is_transient(e):
+                journal.record_failure(cliretry.DOWNLOAD, action['path'], action['local_abspath'],
+                                       e, force=bool(action['force']))
+            print(printpath + ": " + str(e) + " (skipping)")
+            plan.mark(action, transfer_plan.FAILED)
+            return False
+        if not result_path:
+            # not downloaded: leave the action pending
+            return False
+        plan.mark(action, transfer_plan.DONE)
+        if journal is not None:
+            journal.record_success(cliretry.DOWNLOAD, action['path'])
+        print("downloaded:", printpath)
+        return True
+
+    if pool is None:
+        pool = TransferPool(1)
+
+    # confirm overwrites here, before any downloads start, so prompts are not interleaved
+    confirmed = []
+    success = True
+    for action in plan.pending():
+        cliprogress.current().add_planned(action['local_abspath'], action['size'])
+        if action['force'] or not os.path.exists(action['local_abspath']) or \
+                _confirm_overwrite(action['local_abspath'], working_dir):
+            confirmed.append(action)
+        else:
+            cliprogress.current().skip_file(action['local_abspath'], action['size'] or 0)
+            success = False
+
+    futures = [pool.submit(_download, action, True) for action in confirmed]
+    for future in futures:
+        success &= future.result()
+    return success
+
 def download_file_as_string(client, project_id, file_id):
     urlpart = "/projects/" + str(project_id) + "/files/" + str(file_id) + "/download"
     url = client.base_url + urlpart
@@ -223,7 +594,11 @@ def make_parser():
     mc_down_description = "Download files from Materials Commons"
 
     mc_down_usage = """
-    mc down [-r] [-p] [-o] [-f] [--no-compare] <pathspec> [<pathspec> ...]
+    mc down [-r] [-p] [-o] [-f] [--no-compare] [--jobs N|auto] [--max-rps R] [--stats-json PATH] [--ndjson PATH] <pathspec> [<pathspec> ...]
+    mc down --retry-failed [--no-compare]
+    mc down [-r] [-o] [-f] [--no-compare] --plan-only <pathspec> [<pathspec> ...]
+    mc down --from-plan [--jobs N|auto] [--max-rps R]
+    mc down --dataset DATASET_ID [-f] [--no-compare] [--jobs N|auto] [--max-rps R]
     mc down -p <pathspec>
     mc down -g [-r] [--no-compare] [--label] <pathspec> [<pathspec> ...]"""
 
@@ -245,6 +620,20 @@ def make_parser():
                         help='Globus transfer label to make finding tasks simpler.')
     parser.add_argument('--no-compare', action="store_true", default=False,
                         help='Download remote without checking if local is equivalent.')
+    parser.add_argument('--retry-failed', action="store_true", default=False,
+                        help='Retry the downloads that failed in previous `mc down` commands.')
+    parser.add_argument('--plan-only', action="store_true", default=False,
+                        help='Compare remote and local and save the files to download as a plan, '
+                             'without downloading.')
+    parser.add_argument('--dataset', type=int, default=None, metavar='DATASET_ID',
+                        help='Download the files selected by the file selection of a dataset, '
+                             'instead of <pathspec>.')
+    parser.add_argument('--from-plan', action="store_true", default=False,
+                        help='Download the remaining files of the plan saved by `--plan-only`. '
+                             'Files are marked done as they are downloaded, so an interrupted '
+                             'download can be resumed by running this again.')
+    add_concurrency_options(parser)
+    cliprogress.add_progress_options(parser)
     return parser
 
 def down_subcommand(argv, working_dir):
@@ -257,18 +646,17 @@ def down_subcommand(argv, working_dir):
     parser = make_parser()
     args = parser.parse_args(argv)
 
-    pconfig = clifuncs.read_project_config(working_dir)
-    proj = clifuncs.make_local_project(working_dir)
+    ctx = clifuncs.project_context(working_dir, required=True)
+    pconfig = ctx.project_config
+    proj = ctx.proj
     paths = treefuncs.clipaths_to_mcpaths(proj.local_path, args.paths,
                                           working_dir)
 
     localtree = None
     if not args.no_compare:
-        localtree = LocalTree(proj.local_path)
+        localtree = ctx.localtree
 
-    remotetree = None
-    if pconfig.remote_updatetime:
-        remotetree = RemoteTree(proj, pconfig.remote_updatetime)
+    remotetree = ctx.remotetree
 
     # validate
     if args.print and len(args.paths) != 1:
@@ -280,6 +668,14 @@ def down_subcommand(argv, working_dir):
     if args.output and args.globus:
         print("--output option is not supported with --globus")
         raise cliexcept.MCCLIException("Invalid upload request")
+    if (args.plan_only or args.from_plan) and (args.print or args.globus):
+        print("--plan-only and --from-plan options are not supported with --print or --globus")
+        raise cliexcept.MCCLIException("Invalid download request")
+    if args.dataset is not None and (args.paths or args.output or args.print or args.globus
+                                     or args.plan_only or args.from_plan or args.retry_failed):
+        print("--dataset option is not supported with <pathspec>, --output, --print, --globus, "
+              "--plan-only, --from-plan, or --retry-failed")
+        raise cliexcept.MCCLIException("Invalid download request")
 
     if args.globus:
         download = _get_current_globus_download(pconfig, proj)
@@ -331,10 +727,43 @@ def down_subcommand(argv, working_dir):
         if args.output:
             output = os.path.abspath(args.output[0])
 
-        for path in paths:
-            standard_download(proj, path, working_dir, force=args.force,
-                              output=output, recursive=args.recursive,
-                              no_compare=args.no_compare, localtree=localtree,
-                              remotetree=remotetree)
+        plan = transfer_plan.TransferPlan(proj.local_path, cliretry.DOWNLOAD)
+        if args.plan_only:
+            plan.save(plan_download(proj, paths, working_dir, force=args.force, output=output,
+                                    recursive=args.recursive, no_compare=args.no_compare,
+                                    localtree=localtree, remotetree=remotetree))
+            transfer_plan.print_plan_summary(plan, "mc down --from-plan")
+            return
+
+        limiter = make_rate_limiter(proj.remote, jobs=args.jobs, max_rps=args.max_rps)
+        jobs = limiter.max_jobs if limiter else 1
+        journal = cliretry.RetryJournal(proj.local_path)
+        stats = cliprogress.TransferStats('download')
+        with cliprogress.reporting(stats, show=not args.no_progress,
+                                   stats_json=args.stats_json, ndjson=args.ndjson):
+            try:
+                if args.from_plan:
+                    with TransferPool(jobs) as pool:
+                        execute_download_plan(proj, plan, working_dir, pool=pool, journal=journal)
+                    transfer_plan.print_plan_summary(plan, "mc down --from-plan")
+                elif args.dataset is not None:
+                    with TransferPool(jobs) as pool:
+                        download_dataset(proj, args.dataset, working_dir, force=args.force,
+                                         no_compare=args.no_compare, localtree=localtree,
+                                         remotetree=remotetree, pool=pool, journal=journal)
+                elif args.retry_failed:
+                    with TransferPool(jobs) as pool:
+                        retry_failed_downloads(proj, working_dir, journal,
+                                               no_compare=args.no_compare, localtree=localtree,
+                                               remotetree=remotetree, pool=pool)
+                else:
+                    with TransferPool(jobs) as pool:
+                        for path in paths:
+                            standard_download(proj, path, working_dir, force=args.force,
+                                              output=output, recursive=args.recursive,
+                                              no_compare=args.no_compare, localtree=localtree,
+                                              remotetree=remotetree, pool=pool, journal=journal)
+            finally:
+                journal.report(cliretry.DOWNLOAD, "mc down --retry-failed")
 
     return
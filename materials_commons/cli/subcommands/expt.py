@@ -2,6 +2,7 @@ import json
 import sys
 import materials_commons.api as mcapi
 import materials_commons.cli.functions as clifuncs
+import materials_commons.cli.tmp_functions as tmpfuncs
 from materials_commons.cli.list_objects import ListObjects
 
 def set_current_experiment(project_local_path, expt=None):
@@ -35,7 +36,8 @@ class ExptSubcommand(ListObjects):
             creatable=True,
             deletable=True,
             custom_actions=['unset'],
-            custom_selection_actions=['set']
+            custom_selection_actions=['set'],
+            cache_types=('experiment',)
         )
 
     def get_all_from_experiment(self, expt):
@@ -43,12 +45,11 @@ class ExptSubcommand(ListObjects):
 
     def get_all_from_project(self, proj):
 
-        users = proj.remote.list_users()
-        users_by_id = {u.id:u for u in users}
-        all_project_experiments = proj.remote.get_all_experiments(proj.id)
+        all_project_experiments = self.cached_project_list(
+            proj, 'experiment', lambda: proj.remote.get_all_experiments(proj.id), mcapi.Experiment)
         for expt in all_project_experiments:
             expt.project = proj
-            expt.owner = users_by_id[expt.owner_id]
+        tmpfuncs.add_owner(proj.remote, all_project_experiments)
         return all_project_experiments
 
     def list_data(self, obj, args):
@@ -5,13 +5,19 @@ import time
 
 import materials_commons.api as mcapi
 import materials_commons.cli.functions as clifuncs
+import materials_commons.cli.offline as clioffline
 import materials_commons.cli.tree_functions as treefuncs
 import materials_commons.cli.file_functions as filefuncs
 from materials_commons.cli.treedb import LocalTree, RemoteTree
 
 
 def print_fetch_status(pconfig):
-    if pconfig.remote_updatetime:
+    if pconfig.remote_auto_lock:
+        print("Fetch auto-lock on")
+        print("Before cached remote data is used, two requests check whether anything in the project changed.")
+        print("If nothing changed since the last check, all cached data is used without further requests.")
+        print("Do `mc fetch --unlock` to turn off the fetch auto-lock.")
+    elif pconfig.remote_updatetime:
         print("Fetch lock set at:", clifuncs.format_time(pconfig.remote_updatetime))
         print("Project data will at least reflect remote changes that happened before this time.")
         print("**Changes that happen after this time may not be reflected in CLI output**.")
@@ -21,7 +27,7 @@ def print_fetch_status(pconfig):
         print("Project data will always be fetched from remote.")
 
 def make_parser():
-    desc = "By default, remote data is fetched for every request. To be more efficient, some remote data can be fetched and cached using `mc fetch --lock`. When 'locked', remote data is recovered from a local cache if it has been updated since the lock was put in place. Any data fetched before the lock was put in place is still updated as necessary. To the extent possible, the cache will be updated when the remote is modified via the `mc` command line. While the lock is in place, use `mc fetch <path>` to force the update of data for particular files or directories. To reset the lock time, use `mc fetch --lock` again. To stop caching, use `mc fetch --unlock`."
+    desc = "By default, remote data is fetched for every request. To be more efficient, some remote data can be fetched and cached using `mc fetch --lock`. When 'locked', remote data is recovered from a local cache if it has been updated since the lock was put in place. Any data fetched before the lock was put in place is still updated as necessary. To the extent possible, the cache will be updated when the remote is modified via the `mc` command line. While the lock is in place, use `mc fetch <path>` to force the update of data for particular files or directories. To reset the lock time, use `mc fetch --lock` again. To stop caching, use `mc fetch --unlock`. Alternatively, with `mc fetch --auto-lock`, each command first makes one request for the project's change marker (its modification time, file and directory counts, and size) and one for files changed since the marker was last seen. If the marker is unchanged and no files changed, all cached remote data is used without further requests, otherwise remote data is fetched as it is used."
 
     parser = argparse.ArgumentParser(
         description=desc,
@@ -31,6 +37,7 @@ def make_parser():
     parser.add_argument('--verbose', action="store_true", default=False, help='Print verbosely.')
     parser.add_argument('--no-children', action="store_true", default=False, help='Do not update data for children of directories.')
     parser.add_argument('--lock', action="store_true", default=False, help='Only fetch data to replace records older than now.')
+    parser.add_argument('--auto-lock', action="store_true", default=False, help='Use cached data if the project change marker shows no remote changes.')
     parser.add_argument('--unlock', action="store_true", default=False, help='Always fetch data.')
     parser.add_argument('--status', action="store_true", default=False, help='Display fetch lock status.')
     return parser
@@ -41,6 +48,7 @@ def fetch_subcommand(argv, working_dir):
 
     mc fetch [--recursive] [<path>...]
     mc fetch --lock
+    mc fetch --auto-lock
     mc fetch --unlock
     mc fetch --status
 
@@ -48,16 +56,25 @@ def fetch_subcommand(argv, working_dir):
     parser = make_parser()
     args = parser.parse_args(argv)
 
-    proj = clifuncs.make_local_project(working_dir)
-    pconfig = clifuncs.read_project_config(proj.local_path)
+    ctx = clifuncs.project_context(working_dir, required=True)
+    proj = ctx.proj
+    pconfig = ctx.project_config
 
     if args.lock:
         pconfig.remote_updatetime = time.time()
+        pconfig.remote_auto_lock = False
+        pconfig.save()
+        print_fetch_status(pconfig)
+
+    elif args.auto_lock:
+        pconfig.remote_updatetime = None
+        pconfig.remote_auto_lock = True
         pconfig.save()
         print_fetch_status(pconfig)
 
     elif args.unlock:
         pconfig.remote_updatetime = None
+        pconfig.remote_auto_lock = False
         pconfig.save()
         print_fetch_status(pconfig)
 
@@ -69,7 +86,13 @@ def fetch_subcommand(argv, working_dir):
             print("Nothing to fetch")
             return
 
-        remotetree = RemoteTree(proj, time.time())
+        updatetime = time.time()
+        remotetree = RemoteTree(proj, updatetime)
+        if pconfig.remote_auto_lock and not clioffline.enabled():
+            # record the change marker seen before fetching, so that later commands use the
+            # fetched data while the marker is unchanged
+            remotetree.validate()
+            remotetree.updatetime = updatetime
         refpath = os.path.dirname(proj.local_path)
 
         get_children = True
@@ -51,7 +51,9 @@ class GlobusUploadTaskSubcommand(ListObjects):
             request_confirmation_actions={
                 'finish': 'Are you sure you want to finish these uploads and transfer files into your project?',
                 'goto': 'You want to goto these uploads in a web browser?'
-            }
+            },
+            cache_types=('globus_upload',),
+            modifying_actions=('finish',)
         )
 
     def __update_upload_object(self, upload, proj):
@@ -74,19 +76,16 @@ class GlobusUploadTaskSubcommand(ListObjects):
 
     def get_all_from_project(self, proj):
         results = []
-        uploads = proj.remote.get_all_globus_upload_requests(proj.id)
+        uploads = self.cached_project_list(
+            proj, 'globus_upload', lambda: proj.remote.get_all_globus_upload_requests(proj.id),
+            mcapi.GlobusUpload)
         for upload in uploads:
             self.__update_upload_object(upload, proj)
             results.append(upload)
         return results
 
     def get_all_from_remote(self, remote):
-        results = []
-        projects = remote.get_all_projects()
-        for project in projects:
-            project.remote = remote
-            results += self.get_all_from_project(project)
-        return results
+        return self.fan_out_projects(remote, self.get_all_from_project)
 
     def list_data(self, obj, args):
         _is_current = ' '
@@ -292,7 +291,8 @@ class GlobusDownloadTaskSubcommand(ListObjects):
             custom_selection_actions=['goto', 'set'],
             request_confirmation_actions={
                 'goto': 'You want to goto these downloads in a web browser?'
-            }
+            },
+            cache_types=('globus_download',)
         )
 
     def __update_download_object(self, download, proj):
@@ -313,19 +313,16 @@ class GlobusDownloadTaskSubcommand(ListObjects):
 
     def get_all_from_project(self, proj):
         results = []
-        downloads = proj.remote.get_all_globus_download_requests(proj.id)
+        downloads = self.cached_project_list(
+            proj, 'globus_download', lambda: proj.remote.get_all_globus_download_requests(proj.id),
+            mcapi.GlobusDownload)
         for download in downloads:
             self.__update_download_object(download, proj)
             results.append(download)
         return results
 
     def get_all_from_remote(self, remote):
-        results = []
-        projects = remote.get_all_projects()
-        for project in projects:
-            project.remote = remote
-            results += self.get_all_from_project(project)
-        return results
+        return self.fan_out_projects(remote, self.get_all_from_project)
 
     def list_data(self, obj, args):
         _is_current = ' '
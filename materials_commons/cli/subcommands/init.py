@@ -6,6 +6,7 @@ import sys
 
 import materials_commons.api as mcapi
 import materials_commons.cli.functions as clifuncs
+import materials_commons.cli.object_cache as objcache
 from materials_commons.cli.exceptions import MCCLIException
 
 
@@ -65,6 +66,7 @@ def init_project(name, description="", prefix=None, remote_config=None):
     try:
         proj_request = mcapi.CreateProjectRequest(description=description)
         proj = client.create_project(name, attrs=proj_request)
+        objcache.invalidate(('project',))
     except requests.exceptions.ConnectionError as e:
         print(e)
         raise MCCLIException("Could not connect to " + remote_config.mcurl)
@@ -1,5 +1,4 @@
 import argparse
-import copy
 import json
 import os
 import sys
@@ -7,9 +6,11 @@ import time
 
 import materials_commons.api as mcapi
 import materials_commons.cli.functions as clifuncs
+import materials_commons.cli.ndjson as clindjson
+import materials_commons.cli.offline as clioffline
 import materials_commons.cli.tree_functions as treefuncs
 import materials_commons.cli.file_functions as filefuncs
-from materials_commons.cli.treedb import LocalTree, RemoteTree
+from materials_commons.cli.treedb import RemoteTree
 
 #  Want to print() something like:
 #
@@ -72,9 +73,8 @@ def _format_path_data(proj, data, columns, refpath=None, checksum=False):
         local_abspath = filefuncs.make_local_abspath(proj.local_path, mcpath)
         return relpath(local_abspath, refpath)
 
-    for path in sorted(data.keys()):
-        record = copy.deepcopy(record_init)
-        rec = data[path]
+    for path, rec in data.items():
+        record = dict(record_init)
 
         if not rec['l_type'] and not rec['r_type']:
             continue
@@ -103,7 +103,24 @@ def _format_path_data(proj, data, columns, refpath=None, checksum=False):
 
         path_data.append(record)
 
-    return sorted(path_data, key=lambda k: k['name'])
+    return clifuncs.sort_records(path_data, ['name'])
+
+# treecompare values included in `mc ls --ndjson` records, when present
+NDJSON_KEYS = ['l_type', 'l_mtime', 'l_size', 'l_checksum', 'r_type', 'r_mtime', 'r_size',
+               'r_checksum', 'id', 'eq', 'selected', 'selected_by']
+
+def _ls_print_ndjson(writer, data):
+    """Write one NDJSON record per path of treecompare output, with unformatted values"""
+    for path in sorted(data.keys()):
+        rec = data[path]
+        if not rec['l_type'] and not rec['r_type']:
+            continue
+        record = {'path': path}
+        for key in NDJSON_KEYS:
+            value = rec.get(key)
+            if value is not None:
+                record[key] = value
+        writer.write(record)
 
 def _ls_print(proj, data, refpath=None, printjson=False, checksum=False, checkdset=False):
     """Print treecompare output for a set of files, or directory children"""
@@ -144,6 +161,7 @@ def make_parser():
     parser.add_argument('paths', nargs='*', default=[os.getcwd()], help='Files or directories')
     parser.add_argument('--checksum', action="store_true", default=False, help='Calculate MD5 checksum for local files')
     parser.add_argument('--json', action="store_true", default=False, help='Print JSON exactly')
+    parser.add_argument('--ndjson', action="store_true", default=False, help='Print one compact JSON record per file or directory, with local and remote data')
 
     # TODO: re-implement w/datasets
     # # --include file_or_dir
@@ -175,8 +193,11 @@ def change_dataset_file_selection(proj, dataset_id, mcpaths, files_data,
         The file selection dict, updated.
 
     """
-    file_selection = proj.remote.get_dataset(proj.id, dataset_id).file_selection
+    selection = filefuncs.FileSelection.from_dict(
+        proj.remote.get_dataset(proj.id, dataset_id).file_selection)
 
+    files = []
+    dirs = []
     for p in mcpaths:
         local_abspath = filefuncs.make_local_abspath(proj.local_path, p)
         printpath = os.path.relpath(local_abspath)
@@ -185,34 +206,19 @@ def change_dataset_file_selection(proj, dataset_id, mcpaths, files_data,
             out.write(printpath + ": Local and remote types do not match, skipping\n")
             continue
 
-        if include:
-            if p in files_data:
-                file_selection['include_files'].append(p)
-                if p in file_selection['exclude_files']:
-                    file_selection['exclude_files'].remove(p)
-            if p in dirs_data:
-                file_selection['include_dirs'].append(p)
-                if p in file_selection['exclude_dirs']:
-                    file_selection['exclude_dirs'].remove(p)
-        elif exclude:
-            if p in files_data:
-                file_selection['exclude_files'].append(p)
-                if p in file_selection['include_files']:
-                    file_selection['include_files'].remove(p)
-            elif p in dirs_data:
-                file_selection['exclude_dirs'].append(p)
-                if p in file_selection['include_dirs']:
-                    file_selection['include_dirs'].remove(p)
-        elif clear:
-            for name in ['include_files', 'exclude_files', 'include_dirs', 'exclude_dirs']:
-                if p in file_selection[name]:
-                    file_selection[name].remove(p)
-
-    # remove duplicates
-    for name in ['include_files', 'exclude_files', 'include_dirs', 'exclude_dirs']:
-        file_selection[name] = list(set(file_selection[name]))
-
-    return proj.remote.change_dataset_file_selection(proj.id, dataset_id, file_selection).file_selection
+        if p in files_data:
+            files.append(p)
+        if p in dirs_data:
+            dirs.append(p)
+
+    if include:
+        selection.include(files=files, dirs=dirs)
+    elif exclude:
+        selection.exclude(files=files, dirs=dirs)
+    elif clear:
+        selection.clear(mcpaths)
+
+    return proj.remote.change_dataset_file_selection(proj.id, dataset_id, selection.to_dict()).file_selection
 
 def ls_subcommand(argv, working_dir):
     """
@@ -225,63 +231,74 @@ def ls_subcommand(argv, working_dir):
     args = parser.parse_args(argv)
     updatetime = time.time()
 
-    proj = clifuncs.make_local_project(working_dir)
-    pconfig = clifuncs.read_project_config(proj.local_path)
+    ctx = clifuncs.project_context(working_dir, required=True)
+    proj = ctx.proj
+    pconfig = ctx.project_config
 
     # convert cli input to materials commons path convention: /path/to/file_or_dir
     mcpaths = treefuncs.clipaths_to_mcpaths(proj.local_path, args.paths,
                                             working_dir)
 
     if args.checksum:
-        localtree = LocalTree(proj.local_path)
+        localtree = ctx.localtree
     else:
         localtree = None
 
     if args.json:
+        clioffline.require_online("`mc ls --json`")
         remotetree = None
     else:
-        remotetree = RemoteTree(proj, pconfig.remote_updatetime)
+        remotetree = RemoteTree(proj, pconfig.remote_updatetime,
+                                auto_lock=pconfig.remote_auto_lock)
 
     # compare local and remote tree
     files_data, dirs_data, child_data, not_existing = treefuncs.treecompare(
         proj, mcpaths, checksum=args.checksum,
         localtree=localtree, remotetree=remotetree)
 
+    # with --ndjson, stdout only gets records
+    msg_out = sys.stderr if args.ndjson else sys.stdout
+
     for p in mcpaths:
         if treefuncs.is_type_mismatch(p, files_data, dirs_data):
-            print("** WARNING: ", p, "local and remote types do not match! **")
+            print("** WARNING: ", p, "local and remote types do not match! **", file=msg_out)
     for dirpath in child_data:
         for childpath, record in child_data[dirpath].items():
             if treefuncs.is_child_data_mismatch(record):
-                print("** WARNING: ", childpath, "local and remote types do not match! **")
+                print("** WARNING: ", childpath, "local and remote types do not match! **", file=msg_out)
 
-    if pconfig.remote_updatetime:
-        print("** Fetch lock ON at:", clifuncs.format_time(pconfig.remote_updatetime), "**")
+    if clioffline.enabled():
+        print("** Offline: showing cached remote data **", file=msg_out)
+    elif pconfig.remote_auto_lock:
+        print("** Fetch auto-lock ON **", file=msg_out)
+    elif pconfig.remote_updatetime:
+        print("** Fetch lock ON at:", clifuncs.format_time(pconfig.remote_updatetime), "**", file=msg_out)
 
     if not_existing:
         for path in not_existing:
             local_abspath = filefuncs.make_local_abspath(proj.local_path, path)
-            print(os.path.relpath(local_abspath) + ": No such file or directory")
-        print("")
+            print(os.path.relpath(local_abspath) + ": No such file or directory", file=msg_out)
+        print("", file=msg_out)
 
     if args.dataset:
         if args.include or args.exclude or args.clear:
-            file_selection = change_dataset_file_selection(proj, args.dataset, mcpaths, files_data, dirs_data, include=args.include, exclude=args.exclude, clear=args.clear, out=sys.stdout)
+            file_selection = change_dataset_file_selection(proj, args.dataset, mcpaths, files_data, dirs_data, include=args.include, exclude=args.exclude, clear=args.clear, out=msg_out)
         else:
             file_selection = proj.remote.get_dataset(proj.id, args.dataset).file_selection
 
-        for f in files_data:
-            selected, selected_by = filefuncs.check_file_selection(f, file_selection)
-            files_data[f]['selected'] = selected
-            if selected_by:
-                files_data[f]['selected_by'] = selected_by
-
-        for key, child_files_data in child_data.items():
-            for f in child_files_data:
-                selected, selected_by = filefuncs.check_file_selection(f, file_selection)
-                child_files_data[f]['selected'] = selected
+        selection = filefuncs.FileSelection.from_dict(file_selection)
+        for data in [files_data] + list(child_data.values()):
+            for f, (selected, selected_by) in selection.check_all(data).items():
+                data[f]['selected'] = selected
                 if selected_by:
-                    child_files_data[f]['selected_by'] = selected_by
+                    data[f]['selected_by'] = selected_by
+
+    if args.ndjson:
+        writer = clindjson.NDJSONWriter()
+        _ls_print_ndjson(writer, files_data)
+        for d in child_data:
+            _ls_print_ndjson(writer, child_data[d])
+        return
 
     # print files
     _ls_print(proj, files_data, refpath=None, printjson=args.json, checksum=args.checksum, checkdset=args.dataset)
@@ -5,7 +5,6 @@ import sys
 import materials_commons.api as mcapi
 import materials_commons.cli.functions as clifuncs
 import materials_commons.cli.tree_functions as treefuncs
-from materials_commons.cli.treedb import RemoteTree
 
 def make_parser():
     """Make argparse.ArgumentParser for `mc mkdir`"""
@@ -28,16 +27,15 @@ def mkdir_subcommand(argv, working_dir):
     parser = make_parser()
     args = parser.parse_args(argv)
 
-    proj = clifuncs.make_local_project(working_dir)
-    pconfig = clifuncs.read_project_config(proj.local_path)
+    ctx = clifuncs.project_context(working_dir, required=True)
+    proj = ctx.proj
+    pconfig = ctx.project_config
 
     # convert cli input to materials commons path convention: /path/to/file_or_dir
     mcpaths = treefuncs.clipaths_to_mcpaths(proj.local_path, args.paths,
                                             working_dir)
 
-    remotetree = None
-    if pconfig.remote_updatetime:
-        remotetree = RemoteTree(proj, pconfig.remote_updatetime)
+    remotetree = ctx.remotetree
 
     for path in mcpaths:
         treefuncs.mkdir(proj, path, remote_only=args.remote_only, create_intermediates=args.p, remotetree=remotetree)
@@ -5,7 +5,6 @@ import sys
 import materials_commons.cli.exceptions as cliexcept
 import materials_commons.cli.functions as clifuncs
 import materials_commons.cli.tree_functions as treefuncs
-from materials_commons.cli.treedb import RemoteTree
 
 def make_parser():
     """Make argparse.ArgumentParser for `mc mv`"""
@@ -34,14 +33,13 @@ def mv_subcommand(argv, working_dir):
         print("Expects 2 or more paths: `mc mv <src> <target>` or `mc mv <src> ... <directory>`")
         raise cliexcept.MCCLIException("Invalid mv request")
 
-    proj = clifuncs.make_local_project(working_dir)
-    pconfig = clifuncs.read_project_config(proj.local_path)
+    ctx = clifuncs.project_context(working_dir, required=True)
+    proj = ctx.proj
+    pconfig = ctx.project_config
 
     localtree = None
 
-    remotetree = None
-    if pconfig.remote_updatetime:
-        remotetree = RemoteTree(proj, pconfig.remote_updatetime)
+    remotetree = ctx.remotetree
 
     # convert cli input to materials commons path convention: /path/to/file_or_dir
     mcpaths = treefuncs.clipaths_to_mcpaths(proj.local_path, args.paths,
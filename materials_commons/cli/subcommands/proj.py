@@ -25,7 +25,8 @@ class ProjSubcommand(ListObjects):
             custom_selection_actions=['goto'],
             request_confirmation_actions={
                 'goto': 'You want to goto these projects in a web browser?'
-            }
+            },
+            cache_types=('project',)
         )
 
     def get_all_from_experiment(self, expt):
@@ -39,7 +40,7 @@ class ProjSubcommand(ListObjects):
         # return remote.get_all_projects()
 
         # add owner to project
-        projects = remote.get_all_projects()
+        projects = self.cached_list(remote, 'project', remote.get_all_projects, models.Project)
         return projects
 
     def list_data(self, obj, args):
@@ -4,7 +4,6 @@ import sys
 
 import materials_commons.cli.functions as clifuncs
 import materials_commons.cli.tree_functions as treefuncs
-from materials_commons.cli.treedb import LocalTree, RemoteTree
 
 def make_parser():
     """Make argparse.ArgumentParser for `mc rm`"""
@@ -34,8 +33,9 @@ def rm_subcommand(argv, working_dir):
     parser = make_parser()
     args = parser.parse_args(argv)
 
-    proj = clifuncs.make_local_project(working_dir)
-    pconfig = clifuncs.read_project_config(proj.local_path)
+    ctx = clifuncs.project_context(working_dir, required=True)
+    proj = ctx.proj
+    pconfig = ctx.project_config
 
     # convert cli input to materials commons path convention: <projectname>/path/to/file_or_dir
     paths = treefuncs.clipaths_to_mcpaths(proj.local_path, args.paths,
@@ -43,11 +43,9 @@ def rm_subcommand(argv, working_dir):
 
     localtree = None
     if args.no_compare == False:
-        localtree = LocalTree(proj.local_path)
+        localtree = ctx.localtree
 
-    remotetree = None
-    if pconfig.remote_updatetime:
-        remotetree = RemoteTree(proj, pconfig.remote_updatetime)
+    remotetree = ctx.remotetree
 
     remover = treefuncs.remove(proj, paths, recursive=args.recursive, no_compare=args.no_compare, remote_only=args.remote_only, localtree=localtree, remotetree=remotetree)
 
@@ -3,8 +3,12 @@ import argparse
 import materials_commons.cli.exceptions as cliexcept
 import materials_commons.cli.functions as clifuncs
 import materials_commons.cli.globus as cliglobus
+import materials_commons.cli.object_cache as objcache
+import materials_commons.cli.progress as cliprogress
+import materials_commons.cli.retry as cliretry
+import materials_commons.cli.transfer_plan as transfer_plan
 import materials_commons.cli.tree_functions as treefuncs
-from materials_commons.cli.treedb import LocalTree, RemoteTree
+from materials_commons.cli.rate_limit import TransferPool, add_concurrency_options, make_rate_limiter
 
 
 def make_parser():
@@ -13,7 +17,10 @@ def make_parser():
     mc_up_description = "Upload files to Materials Commons"
 
     mc_up_usage = """
-    mc up [-r] [--no-compare] [--limit] <pathspec> [<pathspec> ...]
+    mc up [-r] [--no-compare] [--limit] [--jobs N|auto] [--max-rps R] [--stats-json PATH] [--ndjson PATH] <pathspec> [<pathspec> ...]
+    mc up --retry-failed [--limit] [--jobs N|auto] [--max-rps R]
+    mc up [-r] [--no-compare] [--limit] --plan-only <pathspec> [<pathspec> ...]
+    mc up --from-plan [--limit] [--jobs N|auto] [--max-rps R]
     mc up -g [-r] [--no-compare] [--label] <pathspec> [<pathspec> ...]"""
 
     globus_help = """Use globus to upload files. Uses the current active upload or creates a new upload.
@@ -35,25 +42,37 @@ def make_parser():
     parser.add_argument('--no-compare', action="store_true", default=False,
                         help='Upload without checking if remote is equivalent.')
     parser.add_argument('--upload-as', nargs=1, default=None, help='Upload to a different location than standard upload. Specified as if it were a local path.')
+    parser.add_argument('--retry-failed', action="store_true", default=False,
+                        help='Retry the uploads that failed in previous `mc up` commands.')
+    parser.add_argument('--plan-only', action="store_true", default=False,
+                        help='Compare local and remote and save the files to upload as a plan, '
+                             'without uploading.')
+    parser.add_argument('--from-plan', action="store_true", default=False,
+                        help='Upload the remaining files of the plan saved by `--plan-only`. '
+                             'Files are marked done as they are uploaded, so an interrupted '
+                             'upload can be resumed by running this again.')
+    add_concurrency_options(parser)
+    cliprogress.add_progress_options(parser)
     return parser
 
 def up_subcommand(argv, working_dir):
     """
     upload files to Materials Commons
 
-    mc up [-r] [--no-compare] [--limit] <pathspec> [<pathspec> ...]
+    mc up [-r] [--no-compare] [--limit] [--jobs N|auto] [--max-rps R] [--stats-json PATH] [--ndjson PATH] <pathspec> [<pathspec> ...]
+    mc up --retry-failed [--limit] [--jobs N|auto] [--max-rps R]
+    mc up [-r] [--no-compare] [--limit] --plan-only <pathspec> [<pathspec> ...]
+    mc up --from-plan [--limit] [--jobs N|auto] [--max-rps R]
     mc up -g [-r] [--no-compare] [--label] <pathspec> [<pathspec> ...]
 
     """
     parser = make_parser()
     args = parser.parse_args(argv)
 
-    proj = clifuncs.make_local_project(working_dir)
-
-    pconfig = clifuncs.read_project_config(proj.local_path)
-    remotetree = None
-    if pconfig.remote_updatetime:
-        remotetree = RemoteTree(proj, pconfig.remote_updatetime)
+    ctx = clifuncs.project_context(working_dir, required=True)
+    proj = ctx.proj
+    pconfig = ctx.project_config
+    remotetree = ctx.remotetree
 
     # validate
     if args.upload_as and len(args.paths) != 1:
@@ -62,6 +81,9 @@ def up_subcommand(argv, working_dir):
     if args.upload_as and args.globus:
         print("--upload-as option is not supported with --globus")
         raise cliexcept.MCCLIException("Invalid upload request")
+    if (args.plan_only or args.from_plan) and (args.upload_as or args.globus):
+        print("--plan-only and --from-plan options are not supported with --upload-as or --globus")
+        raise cliexcept.MCCLIException("Invalid upload request")
 
     upload_as = None
     if args.upload_as:
@@ -92,6 +114,7 @@ def up_subcommand(argv, working_dir):
         if globus_upload_id is None:
             name = clifuncs.random_name()
             upload = proj.remote.create_globus_upload_request(proj.id, name)
+            objcache.invalidate(('globus_upload',), proj_local_path=proj.local_path)
             print("Created new globus upload (name=" + upload.name + ", id=" + str(upload.id) + ").")
             pconfig.globus_upload_id = upload.id
             pconfig.save()
@@ -122,12 +145,40 @@ def up_subcommand(argv, working_dir):
     else:
         localtree = None
         if not args.no_compare:
-            localtree = LocalTree(proj.local_path)
-
-        treefuncs.standard_upload_v2(proj, args.paths, working_dir,
-                                  recursive=args.recursive, limit=args.limit[0],
-                                  no_compare=args.no_compare,
-                                  upload_as=upload_as, localtree=localtree,
-                                  remotetree=remotetree)
+            localtree = ctx.localtree
+
+        plan = transfer_plan.TransferPlan(proj.local_path, cliretry.UPLOAD)
+        if args.plan_only:
+            plan.save(treefuncs.plan_upload(proj, args.paths, working_dir,
+                                            recursive=args.recursive, limit=args.limit[0],
+                                            no_compare=args.no_compare, localtree=localtree,
+                                            remotetree=remotetree))
+            transfer_plan.print_plan_summary(plan, "mc up --from-plan")
+            return
+
+        limiter = make_rate_limiter(proj.remote, jobs=args.jobs, max_rps=args.max_rps)
+        jobs = limiter.max_jobs if limiter else 1
+        journal = cliretry.RetryJournal(proj.local_path)
+        stats = cliprogress.TransferStats('upload')
+        with cliprogress.reporting(stats, show=not args.no_progress,
+                                   stats_json=args.stats_json, ndjson=args.ndjson):
+            try:
+                with TransferPool(jobs) as pool:
+                    if args.from_plan:
+                        treefuncs.execute_upload_plan(proj, plan, working_dir, limit=args.limit[0],
+                                                      pool=pool, journal=journal)
+                        transfer_plan.print_plan_summary(plan, "mc up --from-plan")
+                    elif args.retry_failed:
+                        treefuncs.retry_failed_uploads(proj, working_dir, journal,
+                                                       limit=args.limit[0], localtree=localtree,
+                                                       remotetree=remotetree, pool=pool)
+                    else:
+                        treefuncs.standard_upload_v2(proj, args.paths, working_dir,
+                                                  recursive=args.recursive, limit=args.limit[0],
+                                                  no_compare=args.no_compare,
+                                                  upload_as=upload_as, localtree=localtree,
+                                                  remotetree=remotetree, pool=pool, journal=journal)
+            finally:
+                journal.report(cliretry.UPLOAD, "mc up --retry-failed")
 
     return
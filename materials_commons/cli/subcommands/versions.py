@@ -1,14 +1,24 @@
 import argparse
+import contextlib
 import difflib
 import os
+import shutil
 import sys
 
 import materials_commons.api as mcapi
+import materials_commons.cli.blob_cache as blobcache
+import materials_commons.cli.exceptions as cliexcept
 import materials_commons.cli.functions as clifuncs
 import materials_commons.cli.file_functions as filefuncs
+import materials_commons.cli.stream_diff as clidiff
 import materials_commons.cli.tmp_functions as tmpfuncs
 from materials_commons.cli.print_formatter import PrintFormatter
 
+# Versions are compared in memory, with difflib, if their total size is at most
+# min(max_memory / IN_MEMORY_FACTOR, IN_MEMORY_MAX_SIZE), otherwise with a streaming diff
+IN_MEMORY_FACTOR = 8
+IN_MEMORY_MAX_SIZE = 8 * 1024 * 1024
+
 def make_version_record(file, is_current):
     return {
         'current': is_current,
@@ -23,13 +33,13 @@ def make_versions(proj, path):
     file = filefuncs.get_by_path_if_exists(proj.remote, proj.id, path)
 
     if not file:
-        print(p + ": No such file or directory on remote")
+        print(path + ": No such file or directory on remote")
         return None
     if filefuncs.isdir(file):
-        print(p + ": Is a directory on remote")
+        print(path + ": Is a directory on remote")
         return None
     if not filefuncs.isfile(file):
-        print(p + ": Not a file on remote")
+        print(path + ": Not a file on remote")
         return None
     file_versions = proj.remote.get_file_versions(proj.id, file.id)
 
@@ -72,8 +82,21 @@ def list_versions(proj, path):
     headers=['', 'owner', 'created_at', 'size', 'checksum', 'id']
     clifuncs.print_table(versions, columns=columns, headers=headers)
 
-def version_as_str(proj, path, versions, vers_indicator):
-    """Return version as str and standardized version name
+def select_version(versions, vers_indicator):
+    """Return the version record for a version ID, or 'remote' for current remote version, or None"""
+    for version in versions:
+        if vers_indicator == 'remote' and version['current'] == '*':
+            return version
+        elif str(version['id']) == str(vers_indicator):
+            return version
+    return None
+
+@contextlib.contextmanager
+def version_file(proj, path, versions, vers_indicator):
+    """Context manager giving a local file with the contents of a version
+
+    Remote versions are read from the file version cache, downloading them only if they are not
+    already cached (see :mod:`materials_commons.cli.blob_cache`).
 
     Arguments
     ---------
@@ -81,10 +104,10 @@ def version_as_str(proj, path, versions, vers_indicator):
     versions: list of version records, output from `make_versions`
     vers_indicator: int or str, version ID, or 'local', or 'remote' for current remote version
 
-    Returns
-    -------
-    (s, verspath):
-        s: str, File version as a string
+    Yields
+    ------
+    (local_path, verspath):
+        local_path: str, Path to a local file with the version contents. It must not be modified.
         verspath: str, Standardized version path
     """
     if vers_indicator == 'local':
@@ -96,22 +119,36 @@ def version_as_str(proj, path, versions, vers_indicator):
         elif not os.path.isfile(local_abspath):
             print(path + ": is not a file locally")
             raise cliexcept.MCCLIException("Invalid versions request")
-        versname = path + "-local"
-        return (open(local_abspath, 'r').read(), versname)
+        yield (local_abspath, path + "-local")
     else:
-        def select_version(versions):
-            for version in versions:
-                if vers_indicator == 'remote' and version['current'] == '*':
-                    return version
-                elif str(version['id']) == str(vers_indicator):
-                    return version
-            return None
-        version = select_version(versions)
+        version = select_version(versions, vers_indicator)
         if version is None:
-            print(vers_indicator + ": version not found")
+            print(str(vers_indicator) + ": version not found")
             raise cliexcept.MCCLIException("Invalid versions request")
         versname = path + "-" + str(version['id'])
-        return (filefuncs.download_file_as_string(proj.remote, proj.id, version['id']), versname)
+        with blobcache.blob_cache().version_file(
+                proj.remote, proj.id, version['id'], version['checksum']) as local_path:
+            yield (local_path, versname)
+
+def version_as_str(proj, path, versions, vers_indicator):
+    """Return version as str and standardized version name
+
+    Arguments
+    ---------
+    path: str, File path
+    versions: list of version records, output from `make_versions`
+    vers_indicator: int or str, version ID, or 'local', or 'remote' for current remote version
+
+    Returns
+    -------
+    (s, verspath):
+        s: str, File version as a string
+        verspath: str, Standardized version path
+    """
+    with version_file(proj, path, versions, vers_indicator) as (local_path, versname):
+        encoding = None if vers_indicator == 'local' else 'utf-8'
+        with open(local_path, 'r', encoding=encoding) as f:
+            return (f.read(), versname)
 
 def print_version(proj, path, vers_indicator):
     """
@@ -123,11 +160,14 @@ def print_version(proj, path, vers_indicator):
         Version number (positive or negative), or 'local', or 'remote' (=="-1")
     """
     versions = make_versions(proj, path)
-    s, verspath = version_as_str(proj, path, versions, vers_indicator)
-    refpath = os.path.dirname(proj.local_path)
-    local_verspath = os.path.join(refpath, verspath)
-    print(os.path.relpath(local_verspath) + ":")
-    print(s)
+    with version_file(proj, path, versions, vers_indicator) as (local_path, verspath):
+        refpath = os.path.dirname(proj.local_path)
+        local_verspath = os.path.join(refpath, verspath)
+        print(os.path.relpath(local_verspath) + ":")
+        encoding = None if vers_indicator == 'local' else 'utf-8'
+        with open(local_path, 'r', encoding=encoding) as f:
+            shutil.copyfileobj(f, sys.stdout)
+        print()
 
 def download_version(proj, path, vers_indicator):
     """
@@ -139,25 +179,28 @@ def download_version(proj, path, vers_indicator):
         Version number (positive or negative), or 'local', or 'remote' (=="-1")
     """
     versions = make_versions(proj, path)
-    s, verspath = version_as_str(proj, path, versions, vers_indicator)
-
-    refpath = os.path.dirname(proj.local_path)
-    local_verspath = os.path.join(refpath, verspath)
-    if os.path.exists(local_verspath):
-        while True:
-            print("Overwrite '" + os.path.relpath(local_verspath) + "'?")
-            ans = input('y/n: ')
-            if ans == 'y':
-                break
-            elif ans == 'n':
-                return
-    with open(local_verspath, 'w') as f:
-        f.write(s)
+    with version_file(proj, path, versions, vers_indicator) as (local_path, verspath):
+        refpath = os.path.dirname(proj.local_path)
+        local_verspath = os.path.join(refpath, verspath)
+        if os.path.exists(local_verspath):
+            while True:
+                print("Overwrite '" + os.path.relpath(local_verspath) + "'?")
+                ans = input('y/n: ')
+                if ans == 'y':
+                    break
+                elif ans == 'n':
+                    return
+        shutil.copyfile(local_path, local_verspath)
     print("wrote:", os.path.relpath(local_verspath))
 
 
-def diff_versions(proj, path, vers_indicator_a, vers_indicator_b, method):
+def diff_versions(proj, path, vers_indicator_a, vers_indicator_b, method, max_memory=None):
     """
+    Versions with the same checksum, or the same contents, are not compared line by line. Versions
+    small enough are compared in memory using `method`. Larger versions are read from disk (or the
+    file version cache) in chunks and compared using :func:`materials_commons.cli.stream_diff.diff_files`,
+    in the same output format.
+
     Arguments
     ---------
     proj: mcapi.Project
@@ -168,17 +211,49 @@ def diff_versions(proj, path, vers_indicator_a, vers_indicator_b, method):
         Version number (positive or negative), or 'local', or 'remote' (=="-1") of 'to' file.
     method: function,
         libdiff method to use to compare files
+    max_memory: int or None,
+        Memory budget (bytes) for comparing versions. Default is stream_diff.DEFAULT_MAX_MEMORY.
     """
+    if max_memory is None:
+        max_memory = clidiff.DEFAULT_MAX_MEMORY
     versions = make_versions(proj, path)
-    s_a, verspath_a = version_as_str(proj, path, versions, vers_indicator_a)
-    s_b, verspath_b = version_as_str(proj, path, versions, vers_indicator_b)
 
-    refpath = os.path.dirname(proj.local_path)
-    local_verspath_a = os.path.join(refpath, verspath_a)
-    local_verspath_b = os.path.join(refpath, verspath_b)
+    def checksum(vers_indicator):
+        version = select_version(versions, vers_indicator)
+        if vers_indicator == 'local' or version is None:
+            return None
+        return version['checksum']
 
-    result = method(s_a.splitlines(keepends=True), s_b.splitlines(keepends=True), fromfile=os.path.relpath(local_verspath_a), tofile=os.path.relpath(local_verspath_b))
-    sys.stdout.writelines(result)
+    def encoding(vers_indicator):
+        return None if vers_indicator == 'local' else 'utf-8'
+
+    checksum_a, checksum_b = checksum(vers_indicator_a), checksum(vers_indicator_b)
+    if checksum_a and checksum_a == checksum_b:
+        return
+
+    refpath = os.path.dirname(proj.local_path)
+    with version_file(proj, path, versions, vers_indicator_a) as (local_path_a, verspath_a), \
+            version_file(proj, path, versions, vers_indicator_b) as (local_path_b, verspath_b):
+        fromfile = os.path.relpath(os.path.join(refpath, verspath_a))
+        tofile = os.path.relpath(os.path.join(refpath, verspath_b))
+
+        if clidiff.files_equal(local_path_a, local_path_b, checksum_a, checksum_b):
+            return
+
+        size = os.path.getsize(local_path_a) + os.path.getsize(local_path_b)
+        if size <= min(max_memory // IN_MEMORY_FACTOR, IN_MEMORY_MAX_SIZE):
+            with open(local_path_a, 'r', encoding=encoding(vers_indicator_a)) as f:
+                lines_a = f.read().splitlines(keepends=True)
+            with open(local_path_b, 'r', encoding=encoding(vers_indicator_b)) as f:
+                lines_b = f.read().splitlines(keepends=True)
+            result = method(lines_a, lines_b, fromfile=fromfile, tofile=tofile)
+        else:
+            result = clidiff.diff_files(local_path_a, local_path_b, fromfile=fromfile, tofile=tofile,
+                                        context=(method is difflib.context_diff),
+                                        max_memory=max_memory,
+                                        encoding_a=encoding(vers_indicator_a),
+                                        encoding_b=encoding(vers_indicator_b))
+        sys.stdout.writelines(result)
 
 def make_parser():
     """Make argparse.ArgumentParser for `mc versions`"""
@@ -189,7 +264,7 @@ def make_parser():
     mc versions <pathspec>
     mc versions <pathspec> --print --version <version_indicator>
     mc versions <pathspec> --down --version <version_indicator>
-    mc versions <pathspec> --diff --version <version_indicator> <version_indicator> [--context]"""
+    mc versions <pathspec> --diff --version <version_indicator> <version_indicator> [--context] [--max-memory <size>]"""
 
     parser = argparse.ArgumentParser(
         description=mc_versions_description,
@@ -201,6 +276,7 @@ def make_parser():
     parser.add_argument('--down', action="store_true", default=False, help='Download selected version')
     parser.add_argument('--diff', action="store_true", default=False, help='Compare selected versions. By default, \'--versions remote local\' is used')
     parser.add_argument('--context', action="store_true", default=False, help='Print diff using \'context diff\' method')
+    parser.add_argument('--max-memory', type=str, default=None, metavar='SIZE', help='For use with --diff: memory to use comparing versions, ex: 512M (default ' + clifuncs.humanize(clidiff.DEFAULT_MAX_MEMORY) + '). Large versions are compared in chunks, using a faster line matching method that may give a longer diff.')
     return parser
 
 def versions_subcommand(argv, working_dir):
@@ -213,8 +289,9 @@ def versions_subcommand(argv, working_dir):
     parser = make_parser()
     args = parser.parse_args(argv)
 
-    proj = clifuncs.make_local_project(working_dir)
-    pconfig = clifuncs.read_project_config(proj.local_path)
+    ctx = clifuncs.project_context(working_dir, required=True)
+    proj = ctx.proj
+    pconfig = ctx.project_config
 
     # convert cli input to materials commons path convention: <projectname>/path/to/file_or_dir
     refpath = os.path.dirname(proj.local_path)
@@ -244,7 +321,11 @@ def versions_subcommand(argv, working_dir):
             else:
                 method = difflib.unified_diff
 
-            diff_versions(proj, path, args.version[0], args.version[1], method)
+            max_memory = None
+            if args.max_memory is not None:
+                max_memory = clifuncs.parse_size(args.max_memory)
+            diff_versions(proj, path, args.version[0], args.version[1], method,
+                          max_memory=max_memory)
         else:
             list_versions(proj, path)
 
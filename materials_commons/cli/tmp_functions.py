@@ -2,6 +2,7 @@
 import json
 import os.path
 from collections.abc import Iterable
+import materials_commons.cli.object_cache as objcache
 from materials_commons.cli.exceptions import MCCLIException
 
 def get_dataset(client, project_id, dataset_id):
@@ -15,12 +16,10 @@ def _add_owner(client, obj):
     if hasattr(obj, 'owner'):
         return
     elif hasattr(obj, 'owner_id'):
-        if not hasattr(client, '_users_by_id') or obj.owner_id not in client._users_by_id:
-            users = client.list_users()
-            client._users_by_id = {u.id:u for u in users}
-        if obj.owner_id not in client._users_by_id:
-            raise MCCLIException("Could not find owner_id:" + str(owner_id))
-        obj.owner = client._users_by_id[obj.owner_id]
+        users_by_id = objcache.get_user_cache(client).get_users([obj.owner_id])
+        if obj.owner_id not in users_by_id:
+            raise MCCLIException("Could not find owner_id:" + str(obj.owner_id))
+        obj.owner = users_by_id[obj.owner_id]
     else:
         raise MCCLIException("Object does not have owner or owner_id")
 
@@ -32,9 +31,14 @@ def add_owner(client, objects):
         objects (object or Iterable of objects): Objects with 'owner_id'
 
     Notes:
-        This will create a cache, client._user_by_id, a dict of owner_id:materials_commons.api.User.
+        Users are looked up with one batch query of the per-user cache (see
+        :class:`materials_commons.cli.object_cache.UserCache`), which calls `client.list_users()`
+        only if an owner is not cached or the cached users have expired.
     """
     if isinstance(objects, Iterable):
+        objects = list(objects)
+        objcache.get_user_cache(client).get_users(
+            set(obj.owner_id for obj in objects if not hasattr(obj, 'owner') and hasattr(obj, 'owner_id')))
         for obj in objects:
             _add_owner(client, obj)
     else:
@@ -0,0 +1,376 @@
+"""Trace Materials Commons API calls, SQLite queries, and lookup cache use
+
+Tracing is enabled for one `mc` command with the global ``--trace`` option, or with the environment
+variable ``MC_TRACE=1``: ::
+
+    mc --trace ls somedir
+    mc --trace=trace.json up -r data
+    MC_TRACE=1 MC_TRACE_FILE=trace.json mc down -r data
+
+When enabled, each request made by any :class:`materials_commons.api.Client`, each SQLite
+statement executed through :class:`materials_commons.cli.sqltable.SqlTable`, and each lookup cache
+hit or miss (see :class:`materials_commons.cli.file_functions.LookupMemo`) is recorded. When the
+command finishes, a summary is printed to stderr: calls per endpoint, total time, p50 and p95
+latency, share of traced time, and bytes transferred.
+
+If a trace file is given (``--trace=FILE`` or ``MC_TRACE_FILE``), a Chrome trace event JSON
+timeline is also written, which can be opened with https://ui.perfetto.dev or chrome://tracing.
+
+Endpoints are grouped with numeric IDs replaced by "{id}", for example
+"GET /projects/{id}/directories/{id}/list".
+"""
+import contextlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+import materials_commons.api as mcapi
+
+# Client methods that make one HTTP request, and their HTTP method
+_REQUEST_METHODS = {
+    '_get': 'GET',
+    '_get_no_value': 'GET',
+    '_post': 'POST',
+    '_put': 'PUT',
+    '_delete': 'DELETE',
+    '_delete_with_value': 'DELETE',
+    '_download': 'GET',
+    '_upload': 'POST',
+    '_upload_raw': 'POST',
+    '_upload_to_path': 'POST'
+}
+_UPLOAD_METHODS = ('_upload', '_upload_raw', '_upload_to_path')
+
+_ID_RE = re.compile(r"/\d+(?=/|$)")
+_SQL_RE = re.compile(r"^\s*(\w+)\b.*?\b(?:FROM|INTO|UPDATE|TABLE)\s+(\w+)", re.IGNORECASE | re.DOTALL)
+
+_tracer = None
+_local = threading.local()
+_originals = {}
+
+
+def endpoint_name(method, urlpart):
+    """Returns "<method> <urlpart>" with numeric IDs replaced by "{id}" and no query string"""
+    return method + " " + _ID_RE.sub("/{id}", urlpart.split('?')[0])
+
+
+def statement_name(sql):
+    """Returns a short name for a SQL statement, its verb and table, like "SELECT remotetree" """
+    m = _SQL_RE.match(sql)
+    if m:
+        if m.group(1).upper() == 'UPDATE':
+            return "UPDATE " + m.group(2)
+        return m.group(1).upper() + " " + m.group(2)
+    return sql.split(None, 1)[0].upper() if sql.strip() else sql
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+class Tracer(object):
+    """Collects trace events
+
+    Each event is a dict with keys 'cat' ('http', 'sqlite', or 'cache'), 'name', 'start' and 'dur'
+    (seconds, relative to the tracer start), 'tid', and 'args'.
+    """
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.events = []
+        self._lock = threading.Lock()
+
+    def add(self, cat, name, start, end, **args):
+        """Record an event that ran from perf_counter time `start` to `end`"""
+        event = {
+            'cat': cat,
+            'name': name,
+            'start': start - self.t0,
+            'dur': end - start,
+            'tid': threading.get_ident(),
+            'args': args
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def elapsed(self):
+        return time.perf_counter() - self.t0
+
+    def summary(self):
+        """Returns list of dict, one per (cat, name), sorted by total time (descending)"""
+        groups = {}
+        with self._lock:
+            events = list(self.events)
+        for event in events:
+            groups.setdefault((event['cat'], event['name']), []).append(event)
+        traced_time = sum(event['dur'] for event in events if event['cat'] != 'cache')
+
+        rows = []
+        for (cat, name), group in groups.items():
+            durations = sorted(event['dur'] for event in group)
+            total = sum(durations)
+            row = {
+                'cat': cat,
+                'name': name,
+                'calls': len(group),
+                'total': total,
+                'p50': _percentile(durations, 0.5),
+                'p95': _percentile(durations, 0.95),
+                'share': total / traced_time if traced_time > 0 else 0.0,
+                'bytes': sum(event['args'].get('bytes_in', 0) + event['args'].get('bytes_out', 0)
+                             for event in group),
+                'hits': sum(1 for event in group if event['args'].get('hit') is True),
+                'misses': sum(1 for event in group if event['args'].get('hit') is False)
+            }
+            rows.append(row)
+        rows.sort(key=lambda row: row['total'], reverse=True)
+        return rows
+
+    def print_summary(self, out=None):
+        """Print tables of HTTP requests, SQLite statements, and lookup cache use"""
+        from tabulate import tabulate
+        from materials_commons.cli.functions import humanize
+        if out is None:
+            out = sys.stderr
+        rows = self.summary()
+
+        out.write("\nTrace summary ({0:.3f}s elapsed)\n".format(self.elapsed()))
+        for cat, title in [('http', 'API requests'), ('sqlite', 'SQLite statements')]:
+            table = [[row['name'], row['calls'], "{0:.3f}".format(row['total']),
+                      "{0:.1f}".format(1000 * row['p50']), "{0:.1f}".format(1000 * row['p95']),
+                      "{0:.1f}%".format(100 * row['share']), humanize(row['bytes'])]
+                     for row in rows if row['cat'] == cat]
+            if table:
+                out.write("\n" + title + ":\n")
+                out.write(tabulate(table, headers=['name', 'calls', 'total (s)', 'p50 (ms)',
+                                                   'p95 (ms)', 'share', 'bytes']) + "\n")
+        table = [[row['name'], row['hits'], row['misses']] for row in rows if row['cat'] == 'cache']
+        if table:
+            out.write("\nLookup cache:\n")
+            out.write(tabulate(table, headers=['name', 'hits', 'misses']) + "\n")
+
+    def chrome_trace(self):
+        """Returns a dict in Chrome trace event format"""
+        pid = os.getpid()
+        trace_events = []
+        with self._lock:
+            events = list(self.events)
+        for event in events:
+            e = {
+                'name': event['name'],
+                'cat': event['cat'],
+                'ts': 1e6 * event['start'],
+                'pid': pid,
+                'tid': event['tid'],
+                'args': event['args']
+            }
+            if event['cat'] == 'cache':
+                e['ph'] = 'i'
+                e['s'] = 't'
+            else:
+                e['ph'] = 'X'
+                e['dur'] = 1e6 * event['dur']
+            trace_events.append(e)
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+def enabled():
+    """True if tracing is active"""
+    return _tracer is not None
+
+
+def record_cache(name, hit):
+    """Record a lookup cache hit or miss, if tracing"""
+    tracer = _tracer
+    if tracer is not None:
+        now = time.perf_counter()
+        tracer.add('cache', name, now, now, hit=hit)
+
+
+def _response_bytes(r):
+    if r is None:
+        return 0
+    content = getattr(r, '_content', None)
+    if isinstance(content, bytes):
+        return len(content)
+    try:
+        return int(r.headers.get('content-length', 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _wrap_request(name, fn, http_method=None):
+    if http_method is None:
+        http_method = _REQUEST_METHODS[name]
+
+    def wrapper(self, urlpart, *args, **kwargs):
+        tracer = _tracer
+        if tracer is None:
+            return fn(self, urlpart, *args, **kwargs)
+        _local.response = None
+        args_out = {}
+        if name in _UPLOAD_METHODS and args:
+            try:
+                args_out['bytes_out'] = os.path.getsize(args[0])
+            except (TypeError, OSError):
+                pass
+        start = time.perf_counter()
+        try:
+            return fn(self, urlpart, *args, **kwargs)
+        except Exception as e:
+            args_out['error'] = type(e).__name__
+            raise
+        finally:
+            end = time.perf_counter()
+            r = getattr(_local, 'response', None)
+            if r is not None:
+                args_out['status'] = r.status_code
+            # streamed downloads are read after the response is handled
+            args_out['bytes_in'] = _response_bytes(r)
+            tracer.add('http', endpoint_name(http_method, urlpart), start, end, **args_out)
+    wrapper.__wrapped__ = fn
+    return wrapper
+
+
+def traced_request(fn, http_method='GET'):
+    """Returns `fn(client, urlpart, ...)`, a request made outside of the mcapi.Client request
+    methods, wrapped so that it is traced like them while tracing is active"""
+    return _wrap_request(None, fn, http_method=http_method)
+
+
+def _wrap_handle(fn):
+    def wrapper(self, r):
+        _local.response = r
+        return fn(self, r)
+    wrapper.__wrapped__ = fn
+    return wrapper
+
+
+class TracingCursor(object):
+    """Wraps a sqlite3.Cursor, recording the time to execute each statement"""
+
+    def __init__(self, curs):
+        self._curs = curs
+
+    def _traced(self, fn, sql, *args):
+        tracer = _tracer
+        if tracer is None:
+            return fn(sql, *args)
+        start = time.perf_counter()
+        try:
+            return fn(sql, *args)
+        finally:
+            tracer.add('sqlite', statement_name(sql), start, time.perf_counter(), rows=self._curs.rowcount)
+
+    def execute(self, sql, *args):
+        self._traced(self._curs.execute, sql, *args)
+        return self
+
+    def executemany(self, sql, *args):
+        self._traced(self._curs.executemany, sql, *args)
+        return self
+
+    def __iter__(self):
+        return iter(self._curs)
+
+    def __getattr__(self, name):
+        return getattr(self._curs, name)
+
+
+def trace_cursor(curs):
+    """Returns `curs` wrapped in a TracingCursor if tracing, else `curs`"""
+    if _tracer is None:
+        return curs
+    return TracingCursor(curs)
+
+
+def start():
+    """Start tracing: wrap mcapi.Client request methods and begin collecting events
+
+    Returns:
+        Tracer: The active tracer.
+    """
+    global _tracer
+    if not _originals:
+        for name in _REQUEST_METHODS:
+            fn = getattr(mcapi.Client, name, None)
+            if fn is not None:
+                _originals[name] = fn
+                setattr(mcapi.Client, name, _wrap_request(name, fn))
+        _originals['_handle'] = mcapi.Client._handle
+        mcapi.Client._handle = _wrap_handle(mcapi.Client._handle)
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop():
+    """Stop tracing and restore mcapi.Client
+
+    Returns:
+        Tracer or None: The tracer that was active.
+    """
+    global _tracer
+    tracer, _tracer = _tracer, None
+    for name, fn in _originals.items():
+        setattr(mcapi.Client, name, fn)
+    _originals.clear()
+    return tracer
+
+
+def parse_trace_options(argv, environ=None):
+    """Remove the global "--trace" / "--trace=FILE" options from the start of argv
+
+    Arguments:
+        argv (list of str): Command line, including program name.
+        environ (dict): Environment, default os.environ. MC_TRACE=1 enables tracing, and
+            MC_TRACE_FILE=FILE sets the trace file.
+
+    Returns:
+        (argv, enabled, trace_file): argv without trace options, whether tracing is enabled,
+        and the Chrome trace file path or None.
+    """
+    if environ is None:
+        environ = os.environ
+    enabled = environ.get('MC_TRACE', '') not in ('', '0')
+    trace_file = environ.get('MC_TRACE_FILE') or None
+    argv = list(argv)
+    while len(argv) > 1 and argv[1].startswith('--trace'):
+        option = argv.pop(1)
+        if option == '--trace':
+            enabled = True
+        elif option.startswith('--trace='):
+            enabled = True
+            trace_file = option[len('--trace='):]
+        else:
+            argv.insert(1, option)
+            break
+    if trace_file:
+        enabled = True
+    return (argv, enabled, trace_file)
+
+
+@contextlib.contextmanager
+def tracing(enabled=True, trace_file=None, out=None):
+    """Context manager that traces its body, then prints a summary and writes the trace file"""
+    if not enabled:
+        yield None
+        return
+    tracer = start()
+    try:
+        yield tracer
+    finally:
+        stop()
+        tracer.print_summary(out=out)
+        if trace_file:
+            tracer.write_chrome_trace(trace_file)
+            (out or sys.stderr).write("Wrote trace: " + trace_file + "\n")
@@ -0,0 +1,187 @@
+"""Persisted transfer plans, for resuming large uploads and downloads
+
+`mc up -r --plan-only` and `mc down -r --plan-only` compare local and remote and save the list of
+files to transfer in the ``transferplan`` table of ``.mc/project.db``, without transferring
+anything. `--from-plan` then transfers the remaining files of the saved plan, marking each one
+done as soon as it completes. If the process is interrupted, running the same `--from-plan`
+command again skips straight to the files not yet transferred, without comparing again.
+
+Each action has a status:
+
+- 'pending': not yet transferred
+- 'done': transferred, or found to be unnecessary
+- 'failed': failed after retrying, and recorded in the retry journal
+  (see :mod:`materials_commons.cli.retry`)
+
+"""
+import threading
+import time
+
+from materials_commons.cli.sqltable import SqlTable, sql_iter
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class TransferPlanTable(SqlTable):
+    """Files to upload or download, stored in the project database
+
+    Values:
+        id: int, order of the action in the plan
+        operation: str, 'upload' or 'download'
+        path: str, Materials Commons style path
+        local_abspath: str, local file uploaded from or downloaded to
+        remote_id: int, for an upload the parent directory ID if known, for a download the file ID
+        size: int, file size in bytes
+        force: int, 1 if a download should overwrite an existing local file
+        status: str, 'pending', 'done', or 'failed'
+        donetime: real, time the action completed (s since epoch)
+    """
+
+    @staticmethod
+    def default_print_fmt():
+        from materials_commons.cli.functions import as_is, format_time, humanize
+        # (key, header, fmt, size, function)
+        return [
+            ("operation", "operation", "<", 10, as_is),
+            ("path", "path", "<", 60, as_is),
+            ("size", "size", "<", 8, humanize),
+            ("status", "status", "<", 8, as_is),
+            ("donetime", "donetime", "<", 24, format_time)
+        ]
+
+    @staticmethod
+    def tablecolumns():
+        return {
+            "id": ["integer", "PRIMARY KEY"],
+            "operation": ["text"],
+            "path": ["text"],
+            "local_abspath": ["text"],
+            "remote_id": ["integer"],
+            "size": ["integer"],
+            "force": ["integer"],
+            "status": ["text"],
+            "donetime": ["real"]
+        }
+
+    @staticmethod
+    def tablename():
+        return "transferplan"
+
+    def delete_by_operation(self, operation):
+        self.curs.execute("DELETE FROM " + self.tablename() + " WHERE operation=?", (operation,))
+        self.conn.commit()
+
+    def insert_many(self, records):
+        """Insert records in one transaction. All records must have the same keys."""
+        if not records:
+            return
+        (colstr, questionstr, valtuple) = self._sql_insert_or_replace_str(records[0])
+        insertstr = "INSERT INTO {0} {1} VALUES {2}".format(self.tablename(), colstr, questionstr)
+        self.curs.executemany(insertstr, [tuple(record.values()) for record in records])
+        self.conn.commit()
+
+    def select_by_operation(self, operation, status=None):
+        """Returns list of records for `operation`, in plan order, optionally only with `status`"""
+        if status is None:
+            self.curs.execute("SELECT * FROM " + self.tablename() + " WHERE operation=? ORDER BY id",
+                              (operation,))
+        else:
+            self.curs.execute("SELECT * FROM " + self.tablename() +
+                              " WHERE operation=? AND status=? ORDER BY id", (operation, status))
+        return [dict(record) for record in sql_iter(self.curs)]
+
+    def set_status(self, id, status):
+        self.curs.execute("UPDATE " + self.tablename() + " SET status=?, donetime=? WHERE id=?",
+                          (status, time.time(), id))
+        self.conn.commit()
+
+
+class TransferPlan(object):
+    """The saved plan for one operation ('upload' or 'download')
+
+    Status updates may be made from any thread; each is committed immediately, so the plan
+    reflects every completed action even if the process is killed.
+
+    Arguments:
+        proj_local_path (str): Local project path
+        operation (str): 'upload' or 'download'
+    """
+
+    def __init__(self, proj_local_path, operation):
+        self.operation = operation
+        self.table = TransferPlanTable(proj_local_path)
+        self._lock = threading.Lock()
+
+    def save(self, actions):
+        """Replace the saved plan with `actions`
+
+        Arguments:
+            actions (list of dict): Each with keys 'path', 'local_abspath', and optionally
+                'remote_id', 'size', and 'force'.
+        """
+        records = []
+        for action in actions:
+            records.append({
+                "operation": self.operation,
+                "path": action['path'],
+                "local_abspath": action['local_abspath'],
+                "remote_id": action.get('remote_id'),
+                "size": action.get('size'),
+                "force": int(bool(action.get('force', False))),
+                "status": PENDING,
+                "donetime": None
+            })
+        with self._lock:
+            self.table.connect()
+            try:
+                self.table.delete_by_operation(self.operation)
+                self.table.insert_many(records)
+            finally:
+                self.table.close()
+
+    def actions(self, status=None):
+        """Returns saved actions, in plan order, optionally only those with `status`"""
+        with self._lock:
+            self.table.connect()
+            try:
+                return self.table.select_by_operation(self.operation, status=status)
+            finally:
+                self.table.close()
+
+    def pending(self):
+        """Returns the actions not yet done, in plan order"""
+        return self.actions(status=PENDING)
+
+    def mark(self, action, status=DONE):
+        """Set the status of `action` (a dict from :func:`pending`) and commit"""
+        with self._lock:
+            self.table.connect()
+            try:
+                self.table.set_status(action['id'], status)
+            finally:
+                self.table.close()
+
+    def summary(self):
+        """Returns dict of status: (count, total size in bytes)"""
+        result = {}
+        for action in self.actions():
+            count, size = result.get(action['status'], (0, 0))
+            result[action['status']] = (count + 1, size + (action['size'] or 0))
+        return result
+
+
+def print_plan_summary(plan, command=None):
+    """Print the number and size of planned files by status, and how to continue the plan"""
+    from materials_commons.cli.functions import humanize
+    summary = plan.summary()
+    if not summary:
+        print("No files to " + plan.operation + ".")
+        return
+    for status in (DONE, FAILED, PENDING):
+        if status in summary:
+            count, size = summary[status]
+            print(status + ": " + str(count) + " file(s), " + humanize(size))
+    if command and PENDING in summary:
+        print("Use `" + command + "` to " + plan.operation + " the remaining files.")
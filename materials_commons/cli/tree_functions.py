@@ -1,4 +1,3 @@
-import copy
 import igittigitt
 import json
 import os
@@ -12,6 +11,13 @@ import materials_commons.api as mcapi
 import materials_commons.cli.exceptions as cliexcept
 import materials_commons.cli.functions as clifuncs
 import materials_commons.cli.file_functions as filefuncs
+import materials_commons.cli.offline as clioffline
+import materials_commons.cli.progress as cliprogress
+import materials_commons.cli.retry as cliretry
+import materials_commons.cli.transfer_plan as transfer_plan
+from materials_commons.cli.async_client import AsyncClient
+from materials_commons.cli.rate_limit import TransferPool
+from materials_commons.cli.records import CompareRecord
 
 def clipaths_to_local_abspaths(proj_local_path, clipaths, working_dir):
     """Convert CLI paths input to local absolute paths
@@ -112,7 +118,39 @@ def make_mcpaths_for_upload(proj_local_path, paths):
             _paths.append(path)
     return _paths
 
-def upload_file(proj, local_abspath, mcpath, working_dir, parent_id=None, limit=750, remotetree=None, update_remotetree=True):
+def _fresh_get_by_path(proj, path):
+    """Get file or directory by path, bypassing memoized lookups, or None if it does not exist"""
+    filefuncs.invalidate_lookup(proj.remote, proj.id, path)
+    return filefuncs.get_by_path_if_exists(proj.remote, proj.id, path)
+
+def _uploaded_file_if_equal(proj, mcpath, local_abspath):
+    """Returns the remote file at mcpath if its checksum matches the local file, else None"""
+    obj = _fresh_get_by_path(proj, mcpath)
+    if filefuncs.isfile(obj) and obj.checksum == clifuncs.checksum(local_abspath):
+        return obj
+    return None
+
+def _existing_directory(proj, path):
+    """Returns the remote directory at path, or None if it does not exist"""
+    obj = _fresh_get_by_path(proj, path)
+    if filefuncs.isdir(obj):
+        return obj
+    return None
+
+def _moved_object(proj, path, id):
+    """Returns the remote file or directory at path if it has the given id, else None"""
+    obj = _fresh_get_by_path(proj, path)
+    if obj is not None and obj.id == id:
+        return obj
+    return None
+
+def _is_removed(proj, path):
+    """Returns True if nothing exists at the remote path, else None"""
+    if _fresh_get_by_path(proj, path) is None:
+        return True
+    return None
+
+def upload_file(proj, local_abspath, mcpath, working_dir, parent_id=None, limit=750, remotetree=None, update_remotetree=True, journal=None):
     """Upload one file
 
     Notes:
@@ -138,6 +176,8 @@ def upload_file(proj, local_abspath, mcpath, working_dir, parent_id=None, limit=
             Optional, will be used and updated if provided.
         update_remotetree (bool): Set to False to skip updating remotetree for the uploaded
             file. Used when updating via parent directory is preferrable.
+        journal (RetryJournal): Optional, if provided, uploads that fail after retrying are
+            recorded so that they can be retried with `mc up --retry-failed`.
 
     Returns:
         (file_result, error_result):
@@ -152,6 +192,8 @@ def upload_file(proj, local_abspath, mcpath, working_dir, parent_id=None, limit=
     error_result = None
 
     printpath = os.path.relpath(local_abspath, start=working_dir)
+    stats = cliprogress.current()
+    file_size = os.path.getsize(local_abspath)
 
     # for upload_as, if destination basename differs from source, we do a rename
     if os.path.basename(local_abspath) != os.path.basename(mcpath):
@@ -161,6 +203,7 @@ def upload_file(proj, local_abspath, mcpath, working_dir, parent_id=None, limit=
             "name, or upload a file to a different directory. To change a file name, first "\
             "upload, then mv."
         print(extended_msg)
+        stats.fail_file(local_abspath, file_size)
         return (file_result, msg)
 
     # if remote parent does not exist / not known -> mkdir
@@ -174,23 +217,46 @@ def upload_file(proj, local_abspath, mcpath, working_dir, parent_id=None, limit=
             msg += " expected parent.path=" + os.path.dirname(parent_mcpath)
             msg += " got parent.path=" + parent.path
             print(msg)
+            stats.fail_file(local_abspath, file_size)
             return (file_result, msg)
         parent_id = parent.id
 
     # if file size > limit -> error
-    file_size_mb = os.path.getsize(local_abspath) >> 20
+    file_size_mb = file_size >> 20
     if file_size_mb > limit:
         msg = printpath + ": file too large (size={1}MB, limit={0}MB) (not uploaded)".\
             format(limit, file_size_mb)
         print(msg)
+        stats.fail_file(local_abspath, file_size)
         return (file_result, msg)
 
     # else: -> upload, return results
-    file_result = proj.remote.upload_file(proj.id, parent_id, local_abspath)
+    # before retrying, check if an upload whose response was lost succeeded
+    stats.start_file(local_abspath, file_size)
+    try:
+        with stats.phase('transfer'):
+            file_result = cliretry.default_policy.call(
+                proj.remote.upload_file, proj.id, parent_id, local_abspath,
+                already_done=lambda: _uploaded_file_if_equal(proj, mcpath, local_abspath),
+                description=printpath)
+    except Exception as e:
+        stats.finish_file(local_abspath, file_size, ok=False)
+        if journal is None or not cliretry.is_transient(e):
+            raise
+        filefuncs.invalidate_lookup(proj.remote, proj.id, mcpath)
+        journal.record_failure(cliretry.UPLOAD, mcpath, local_abspath, e)
+        msg = printpath + ": " + str(e) + " (not uploaded)"
+        print(msg)
+        return (None, msg)
+    stats.finish_file(local_abspath, file_size, ok=filefuncs.isfile(file_result))
     if not filefuncs.isfile(file_result):
+        filefuncs.invalidate_lookup(proj.remote, proj.id, mcpath)
         msg = printpath + ": unknown error (not uploaded)"
         print(msg)
         return (file_result, msg)
+    filefuncs.invalidate_lookup(proj.remote, proj.id, mcpath, obj=file_result)
+    if journal is not None:
+        journal.record_success(cliretry.UPLOAD, mcpath)
 
     if remotetree and update_remotetree and file_result:
         print("upload_file remotetree.update")
@@ -210,7 +276,7 @@ def upload_file(proj, local_abspath, mcpath, working_dir, parent_id=None, limit=
 
 def check_and_upload_file(proj, local_abspath, working_dir, limit=750, no_compare=False,
     upload_as=None, localtree=None, remotetree=None, parent_id=None, child_data=None,
-    update_remotetree=True):
+    update_remotetree=True, journal=None):
     """Checks validity and upload one file
 
     Notes:
@@ -247,6 +313,8 @@ def check_and_upload_file(proj, local_abspath, working_dir, limit=750, no_compar
             comparing the local and remote files might already be available.
         update_remotetree (bool): Set to False to skip updating remotetree for the uploaded
             file. Used when updating via parent directory is preferrable.
+        journal (RetryJournal): Optional, if provided, uploads that fail after retrying are
+            recorded so that they can be retried with `mc up --retry-failed`.
 
     Returns:
         (file_result, error_result):
@@ -257,8 +325,7 @@ def check_and_upload_file(proj, local_abspath, working_dir, limit=750, no_compar
         error_results: str
             Error messages for unsuccessful file uploads
     """
-    file_results = {}
-    error_results = {}
+    file_result = None
 
     printpath = os.path.relpath(local_abspath, start=working_dir)
 
@@ -281,15 +348,15 @@ def check_and_upload_file(proj, local_abspath, working_dir, limit=750, no_compar
         if child_data[mcpath]['r_type'] == 'directory':
             msg = printpath + ": remote is directory (skipping)"
             print(msg)
-            error_results[local_abspath] = msg
-            return (file_results, error_results)
+            cliprogress.current().fail_file(local_abspath, os.path.getsize(local_abspath))
+            return (file_result, msg)
 
         # if local and remote files exists, and checksums known and match -> skip, continue
         if 'eq' in child_data[mcpath] and child_data[mcpath]['eq'] is True:
             msg = printpath + ": local is equivalent to remote (skipping)"
             print(msg)
-            # error_results[child_local_abspath] = msg
-            return (file_results, error_results)
+            cliprogress.current().skip_file(local_abspath, os.path.getsize(local_abspath))
+            return (file_result, msg)
 
         # else, get parent_id if not already known (might be None)
         if parent_id is None:
@@ -305,7 +372,8 @@ def check_and_upload_file(proj, local_abspath, working_dir, limit=750, no_compar
         if mcpath in dirs_data and dirs_data[mcpath]['r_type'] == 'directory':
             msg = printpath + ": remote is directory (skipping)"
             print(msg)
-            return (file_results, msg)
+            cliprogress.current().fail_file(local_abspath, os.path.getsize(local_abspath))
+            return (file_result, msg)
 
         # if remote file exists
         if mcpath in files_data:
@@ -315,7 +383,8 @@ def check_and_upload_file(proj, local_abspath, working_dir, limit=750, no_compar
             if 'eq' in file_data and file_data['eq'] is True:
                 msg = printpath + ": local is equivalent to remote (skipping)"
                 print(msg)
-                return (file_results, msg)
+                cliprogress.current().skip_file(local_abspath, os.path.getsize(local_abspath))
+                return (file_result, msg)
 
             # else, get parent_id if not already known (still might be None)
             if parent_id is None:
@@ -323,7 +392,7 @@ def check_and_upload_file(proj, local_abspath, working_dir, limit=750, no_compar
 
     return upload_file(proj, local_abspath, mcpath, working_dir, parent_id=parent_id,
                        limit=limit, remotetree=remotetree,
-                       update_remotetree=update_remotetree)
+                       update_remotetree=update_remotetree, journal=journal)
 
 
 def filter_local_abspaths(proj_local_path, local_abspaths, working_dir):
@@ -355,7 +424,8 @@ def filter_local_abspaths(proj_local_path, local_abspaths, working_dir):
 
 
 def check_and_upload_directory(proj, local_abspath, working_dir, limit=750,
-    no_compare=False, upload_as=None, localtree=None, remotetree=None, parent_id=None):
+    no_compare=False, upload_as=None, localtree=None, remotetree=None, parent_id=None,
+    pool=None, journal=None):
     """Checks validity and uploads a directory and contents recursively
 
     Notes:
@@ -384,7 +454,10 @@ def check_and_upload_directory(proj, local_abspath, working_dir, limit=750,
             Optional, will be used and updated if provided.
         parent_id (str): ID of parent directory where the file will be uploaded. May be
             None, in which case the directory will be created if necessary.
-
+        pool (TransferPool): If provided and parallel, files in each directory are uploaded
+            concurrently using the pool. Then remotetree is updated once per directory.
+        journal (RetryJournal): Optional, if provided, uploads that fail after retrying are
+            recorded so that they can be retried with `mc up --retry-failed`.
 
     Returns:
         (file_results, error_results):
@@ -456,6 +529,15 @@ def check_and_upload_directory(proj, local_abspath, working_dir, limit=750,
     # filter out .mc and those specified by .mcignore
     child_local_abspaths = filter_local_abspaths(proj.local_path, child_local_abspaths, working_dir)
 
+    # files are uploaded using the pool; if parallel, the sqlite trees are only used from this
+    # thread and remotetree is updated once for the directory after the files are uploaded
+    if pool is None:
+        pool = TransferPool(1)
+    file_localtree, file_remotetree = localtree, remotetree
+    if pool.parallel:
+        file_localtree, file_remotetree = None, None
+    file_futures = []
+
     # upload children
     for child_local_abspath in child_local_abspaths:
         child_upload_as = None
@@ -465,14 +547,14 @@ def check_and_upload_directory(proj, local_abspath, working_dir, limit=750,
         # for each child file: do check_and_upload_file
         if os.path.isfile(child_local_abspath):
 
-            file_result, error_msg = check_and_upload_file(proj, child_local_abspath, working_dir,
-                limit=limit, no_compare=no_compare, upload_as=child_upload_as, localtree=localtree,
-                remotetree=remotetree, parent_id=id, child_data=child_data, update_remotetree=True)
-
-            if file_result is not None:
-                file_results[child_local_abspath] = file_result
-            if error_msg is not None:
-                error_results[child_local_abspath] = error_msg
+            cliprogress.current().add_planned(child_local_abspath,
+                                              os.path.getsize(child_local_abspath))
+            future = pool.submit(check_and_upload_file, proj, child_local_abspath, working_dir,
+                limit=limit, no_compare=no_compare, upload_as=child_upload_as,
+                localtree=file_localtree, remotetree=file_remotetree, parent_id=id,
+                child_data=child_data.get(mcpath), update_remotetree=not pool.parallel,
+                journal=journal)
+            file_futures.append((child_local_abspath, future))
 
         # for each child directory: do recursive check_and_upload_directory
         elif os.path.isdir(child_local_abspath):
@@ -480,7 +562,7 @@ def check_and_upload_directory(proj, local_abspath, working_dir, limit=750,
             file_results_tmp, error_results_tmp = \
                 check_and_upload_directory(proj, child_local_abspath, working_dir, limit=limit,
                     no_compare=no_compare, upload_as=child_upload_as, localtree=localtree,
-                    remotetree=remotetree, parent_id=id)
+                    remotetree=remotetree, parent_id=id, pool=pool, journal=journal)
 
             for tpath in file_results_tmp:
                 file_results[tpath] = file_results_tmp[tpath]
@@ -491,10 +573,22 @@ def check_and_upload_directory(proj, local_abspath, working_dir, limit=750,
         else:
             pass
 
+    for child_local_abspath, future in file_futures:
+        file_result, error_msg = future.result()
+        if file_result is not None:
+            file_results[child_local_abspath] = file_result
+        if error_msg is not None:
+            error_results[child_local_abspath] = error_msg
+
+    if pool.parallel and remotetree and file_futures:
+        remotetree.connect()
+        remotetree.update(mcpath, force=True, get_children=True)
+        remotetree.close()
+
     return (file_results, error_results)
 
 
-def standard_upload_v2(proj, paths, working_dir, recursive=False, limit=750, no_compare=False, upload_as=None, localtree=None, remotetree=None):
+def standard_upload_v2(proj, paths, working_dir, recursive=False, limit=750, no_compare=False, upload_as=None, localtree=None, remotetree=None, pool=None, journal=None):
     """Upload files and directories to Materials Commons
 
     Args:
@@ -520,6 +614,10 @@ def standard_upload_v2(proj, paths, working_dir, recursive=False, limit=750, no_
         remotetree (RemoteTree): A RemoteTree object stores remote file and
             directory information to minimize API calls and data transfer.
             Optional, will be used and updated if provided.
+        pool (TransferPool): Optional, if provided and parallel, files in each directory
+            uploaded recursively are uploaded concurrently.
+        journal (RetryJournal): Optional, if provided, uploads that fail after retrying are
+            recorded so that they can be retried with `mc up --retry-failed`.
 
     Returns:
         (file_results, error_results):
@@ -552,9 +650,10 @@ def standard_upload_v2(proj, paths, working_dir, recursive=False, limit=750, no_
     for local_abspath in local_abspaths:
         if os.path.isfile(local_abspath):
 
+            cliprogress.current().add_planned(local_abspath, os.path.getsize(local_abspath))
             file_result, error_msg = check_and_upload_file(proj, local_abspath, working_dir,
                 limit=limit, no_compare=no_compare, upload_as=upload_as, localtree=localtree,
-                remotetree=remotetree)
+                remotetree=remotetree, journal=journal)
 
             if file_result is not None:
                 file_results[local_abspath] = file_result
@@ -573,7 +672,7 @@ def standard_upload_v2(proj, paths, working_dir, recursive=False, limit=750, no_
             file_results_tmp, error_results_tmp = \
                 check_and_upload_directory(proj, local_abspath, working_dir, limit=limit,
                     no_compare=no_compare, upload_as=upload_as, localtree=localtree,
-                    remotetree=remotetree)
+                    remotetree=remotetree, pool=pool, journal=journal)
 
             for tpath in file_results_tmp:
                 file_results[tpath] = file_results_tmp[tpath]
@@ -590,6 +689,238 @@ def standard_upload_v2(proj, paths, working_dir, recursive=False, limit=750, no_
 
 
 
+def retry_failed_uploads(proj, working_dir, journal, limit=750, localtree=None, remotetree=None,
+                         pool=None):
+    """Retry the uploads recorded as failed in the retry journal
+
+    Only the journaled files are compared and uploaded; directories are not walked again.
+    Files which no longer exist locally are dropped from the journal.
+
+    Args:
+        proj (:class:`materials_commons.api.Project`): Project instance with
+            proj.local_path indicating local project location
+        working_dir (str): Current working directory, used for making relative
+            paths and printing messages.
+        journal (RetryJournal): The retry journal. Successful uploads are removed from it when
+            it is saved, failed uploads remain.
+        limit (int): The limit in MB on the size of the file allowed to be uploaded.
+        localtree (LocalTree): Optional, used and updated if provided.
+        remotetree (RemoteTree): Optional, used and updated if provided.
+        pool (TransferPool): Optional, if provided and parallel, files are uploaded concurrently.
+
+    Returns:
+        (file_results, error_results): As for :func:`standard_upload_v2`
+    """
+    file_results = {}
+    error_results = {}
+
+    entries = journal.pending(cliretry.UPLOAD)
+    if not entries:
+        print("No failed uploads to retry.")
+        return (file_results, error_results)
+
+    if pool is None:
+        pool = TransferPool(1)
+    if pool.parallel:
+        localtree, remotetree = None, None
+
+    futures = []
+    for entry in entries:
+        local_abspath = entry['local_abspath']
+        if not os.path.isfile(local_abspath):
+            msg = os.path.relpath(local_abspath, start=working_dir) + ": does not exist (skipping)"
+            print(msg)
+            journal.record_success(cliretry.UPLOAD, entry['path'])
+            error_results[local_abspath] = msg
+            continue
+        upload_as = None
+        if entry['path'] != filefuncs.make_mcpath(proj.local_path, local_abspath):
+            upload_as = entry['path']
+        cliprogress.current().add_planned(local_abspath, os.path.getsize(local_abspath))
+        future = pool.submit(check_and_upload_file, proj, local_abspath, working_dir,
+            limit=limit, upload_as=upload_as, localtree=localtree, remotetree=remotetree,
+            journal=journal)
+        futures.append((local_abspath, future))
+
+    for local_abspath, future in futures:
+        file_result, error_msg = future.result()
+        if file_result is not None:
+            file_results[local_abspath] = file_result
+        if error_msg is not None:
+            error_results[local_abspath] = error_msg
+
+    return (file_results, error_results)
+
+def _plan_upload_file(proj, local_abspath, mcpath, record, parent_id, working_dir, limit, actions):
+    """Append an upload action for one file to `actions`, unless the upload is unnecessary"""
+    printpath = os.path.relpath(local_abspath, start=working_dir)
+    if record is not None:
+        if record['r_type'] == 'directory':
+            print(printpath + ": remote is directory (skipping)")
+            return
+        if record.get('eq') is True:
+            return
+        if parent_id is None:
+            parent_id = record['parent_id']
+    size = os.path.getsize(local_abspath)
+    if (size >> 20) > limit:
+        print(printpath + ": file too large (size={1}MB, limit={0}MB) (not uploaded)".\
+            format(limit, size >> 20))
+        return
+    actions.append({'path': mcpath, 'local_abspath': local_abspath, 'remote_id': parent_id,
+                    'size': size})
+
+def _plan_upload_directory(proj, local_abspath, working_dir, limit, checksum, localtree,
+                           remotetree, actions):
+    """Append upload actions for a directory's contents to `actions`, recursively"""
+    printpath = os.path.relpath(local_abspath, start=working_dir)
+    mcpath = filefuncs.make_mcpath(proj.local_path, local_abspath)
+
+    files_data, dirs_data, child_data, non_existing = treecompare(
+        proj, [mcpath], checksum=checksum, localtree=localtree,
+        remotetree=remotetree, get_children=True)
+
+    if mcpath in files_data and files_data[mcpath]['r_type'] == 'file':
+        print(printpath + ": remote is file (skipping)")
+        return
+
+    id = None
+    if mcpath in dirs_data and dirs_data[mcpath]['r_type'] == 'directory':
+        id = dirs_data[mcpath]['id']
+
+    child_local_abspaths = [os.path.join(local_abspath, name) for name in os.listdir(local_abspath)]
+    child_local_abspaths = filter_local_abspaths(proj.local_path, child_local_abspaths, working_dir)
+
+    for child_local_abspath in sorted(child_local_abspaths):
+        if os.path.isfile(child_local_abspath):
+            child_mcpath = filefuncs.make_mcpath(proj.local_path, child_local_abspath)
+            record = child_data.get(mcpath, {}).get(child_mcpath)
+            _plan_upload_file(proj, child_local_abspath, child_mcpath, record, id, working_dir,
+                              limit, actions)
+        elif os.path.isdir(child_local_abspath):
+            _plan_upload_directory(proj, child_local_abspath, working_dir, limit, checksum,
+                                   localtree, remotetree, actions)
+
+def plan_upload(proj, paths, working_dir, recursive=False, limit=750, no_compare=False,
+                localtree=None, remotetree=None):
+    """Compare local and remote and return the files that need uploading, without uploading
+
+    Args:
+        proj (:class:`materials_commons.api.Project`): Project instance with
+            proj.local_path indicating local project location
+        paths (List of str):
+            List of paths to upload. Expects local absolute paths, or paths
+            relative to working_dir.
+        working_dir (str): Current working directory, used for finding relative
+            paths and printing messages.
+        recursive (bool): If True, upload directories recursively.
+        limit (int): The limit in MB on the size of the file allowed to be uploaded.
+        no_compare (bool): If True, plan to upload all files, even if an equivalent remote file
+            exists.
+        localtree (LocalTree): Optional, used and updated if provided.
+        remotetree (RemoteTree): Optional, used and updated if provided.
+
+    Returns:
+        list of dict: Upload actions, as expected by :func:`transfer_plan.TransferPlan.save`.
+    """
+    actions = []
+    checksum = not no_compare
+
+    local_abspaths = clipaths_to_local_abspaths(proj.local_path, paths, working_dir)
+    local_abspaths = filter_local_abspaths(proj.local_path, local_abspaths, working_dir)
+
+    local_file_abspaths = [p for p in local_abspaths if os.path.isfile(p)]
+    if local_file_abspaths:
+        mcpaths = [filefuncs.make_mcpath(proj.local_path, p) for p in local_file_abspaths]
+        files_data, dirs_data, child_data, non_existing = treecompare(
+            proj, mcpaths, checksum=checksum, localtree=localtree,
+            remotetree=remotetree, get_children=False)
+        for local_abspath, mcpath in zip(local_file_abspaths, mcpaths):
+            record = files_data.get(mcpath, dirs_data.get(mcpath))
+            _plan_upload_file(proj, local_abspath, mcpath, record, None, working_dir, limit,
+                              actions)
+
+    for local_abspath in local_abspaths:
+        if os.path.isdir(local_abspath):
+            if not recursive:
+                print(os.path.relpath(local_abspath, start=working_dir) +
+                      ": is a directory (not uploaded)")
+                continue
+            _plan_upload_directory(proj, local_abspath, working_dir, limit, checksum, localtree,
+                                   remotetree, actions)
+
+    return actions
+
+def execute_upload_plan(proj, plan, working_dir, limit=750, pool=None, journal=None):
+    """Upload the pending files of a saved plan, marking each action as it completes
+
+    Args:
+        proj (:class:`materials_commons.api.Project`): Project instance with
+            proj.local_path indicating local project location
+        plan (TransferPlan): The saved upload plan.
+        working_dir (str): Current working directory, used for making relative
+            paths and printing messages.
+        limit (int): The limit in MB on the size of the file allowed to be uploaded.
+        pool (TransferPool): Optional, if provided and parallel, files are uploaded concurrently.
+        journal (RetryJournal): Optional, if provided, uploads that fail after retrying are
+            recorded so that they can be retried with `mc up --retry-failed`.
+
+    Returns:
+        (file_results, error_results): As for :func:`standard_upload_v2`
+    """
+    file_results = {}
+    error_results = {}
+
+    if pool is None:
+        pool = TransferPool(1)
+
+    def _upload(action):
+        local_abspath = action['local_abspath']
+        if not os.path.isfile(local_abspath):
+            msg = os.path.relpath(local_abspath, start=working_dir) + ": does not exist (skipping)"
+            print(msg)
+            cliprogress.current().fail_file(local_abspath, action['size'])
+            plan.mark(action, transfer_plan.DONE)
+            return (None, msg)
+        parent_id = action['remote_id']
+        if parent_id is None:
+            parent_id = parent_ids.get(os.path.dirname(action['path']))
+        file_result, error_msg = upload_file(proj, local_abspath, action['path'], working_dir,
+            parent_id=parent_id, limit=limit, journal=journal)
+        plan.mark(action, transfer_plan.DONE if file_result is not None else transfer_plan.FAILED)
+        return (file_result, error_msg)
+
+    # create missing parent directories here, one at a time, so that concurrent uploads do not
+    # try to create the same directories
+    actions = plan.pending()
+    parent_ids = {}
+    for action in actions:
+        parent_mcpath = os.path.dirname(action['path'])
+        if action['remote_id'] is not None or parent_mcpath in parent_ids:
+            continue
+        if not os.path.isfile(action['local_abspath']):
+            continue
+        try:
+            parent = mkdir(proj, parent_mcpath, remote_only=True, create_intermediates=True)
+        except cliexcept.MCCLIException:
+            # upload_file reports the error for each file
+            continue
+        if parent is not None and parent.path == parent_mcpath:
+            parent_ids[parent_mcpath] = parent.id
+
+    futures = []
+    for action in actions:
+        cliprogress.current().add_planned(action['local_abspath'], action['size'])
+        futures.append((action['local_abspath'], pool.submit(_upload, action)))
+    for local_abspath, future in futures:
+        file_result, error_msg = future.result()
+        if file_result is not None:
+            file_results[local_abspath] = file_result
+        if error_msg is not None:
+            error_results[local_abspath] = error_msg
+
+    return (file_results, error_results)
+
 def standard_upload(proj, paths, working_dir, recursive=False, limit=750, no_compare=False, upload_as=None, localtree=None, remotetree=None):
     """Upload files to Materials Commons
 
@@ -723,6 +1054,7 @@ def standard_upload(proj, paths, working_dir, recursive=False, limit=750, no_com
                     print(error_msg)
                     continue
                 result = proj.remote.upload_file(proj.id, parent.id, local_abspath)
+                filefuncs.invalidate_lookup(proj.remote, proj.id, dest_path)
                 if not filefuncs.isfile(result):
                     error_msg = printpath + ": unknown error (not uploaded)"
                     error_results[local_abspath] = error_msg
@@ -738,6 +1070,7 @@ def standard_upload(proj, paths, working_dir, recursive=False, limit=750, no_com
             elif os.path.isdir(local_abspath):
                 if recursive:
                     proj.remote.create_directory(proj.id, os.path.basename(dest_path), parent.id)
+                    filefuncs.invalidate_lookup(proj.remote, proj.id, dest_path)
                     if upload_as is None:
                         child_paths = [os.path.join(local_abspath, name) for name in os.listdir(local_abspath)]
                         file_results_tmp, error_results_tmp = \
@@ -809,8 +1142,7 @@ class _TreeCompare(object):
         self.localtree = localtree
         self.remotetree = remotetree
 
-        columns = ['l_mtime', 'l_size', 'l_type', 'l_checksum', 'r_mtime', 'r_size', 'r_type', 'r_checksum', 'r_obj', 'path', 'id', 'parent_id']
-        self.record_init = {k: None for k in columns}
+        self.remote_prefetch = {}
 
     def _update_local_via_tree(self, path):
         # update self.localtree for path (and if it is a directory, update the children)
@@ -838,12 +1170,12 @@ class _TreeCompare(object):
 
         if os.path.isfile(local_abspath):
             if path not in self.files_data:
-                self.files_data[path] = copy.deepcopy(self.record_init)
+                self.files_data[path] = CompareRecord()
             self._update_local_record(self.files_data[path], local_abspath, checksum=checksum)
 
         elif os.path.isdir(local_abspath):
             if path not in self.dirs_data:
-                self.dirs_data[path] = copy.deepcopy(self.record_init)
+                self.dirs_data[path] = CompareRecord()
             self._update_local_record(self.dirs_data[path], local_abspath, checksum=checksum)
 
             # children
@@ -855,7 +1187,7 @@ class _TreeCompare(object):
                 childpath = os.path.join(path, child)
                 local_childpath = os.path.join(local_abspath, child)
                 if childpath not in self.child_data[path]:
-                    self.child_data[path][childpath] = copy.deepcopy(self.record_init)
+                    self.child_data[path][childpath] = CompareRecord()
                 self._update_local_record(self.child_data[path][childpath], local_childpath, checksum=checksum)
 
         else:
@@ -870,11 +1202,13 @@ class _TreeCompare(object):
         self._update_data_from_tree(path, self.remotetree, 'r')
         self.remotetree.close()
 
-    def _update_remote_record(self, record, obj):
+    def _update_remote_record(self, record, obj, r_mtime=None):
         record['id'] = obj.id
         record['parent_id'] = obj.directory_id
         record['r_size'] = obj.size
-        record['r_mtime'] = clifuncs.epoch_time(obj.updated_at)
+        if r_mtime is None:
+            r_mtime = clifuncs.epoch_time(obj.updated_at)
+        record['r_mtime'] = r_mtime
         record['r_obj'] = obj
         if filefuncs.isfile(obj):
             record['r_type'] = 'file'
@@ -883,20 +1217,33 @@ class _TreeCompare(object):
             record['r_type'] = 'directory'
         return
 
+    def _prefetch_remote(self, paths):
+        """Concurrently get remote files or directories (and children) for multiple paths"""
+        self.remote_prefetch = {}
+        if self.remotetree or len(paths) < 2:
+            return
+        with AsyncClient(self.proj.remote) as aclient:
+            self.remote_prefetch = aclient.run(
+                aclient.get_by_paths(self.proj.id, paths, get_children=self.get_children))
+
     def _update_remote(self, path):
         """Get remote file or directory (and children) information"""
-        obj = filefuncs.get_by_path_if_exists(self.proj.remote, self.proj.id, path)
+        children = None
+        if path in self.remote_prefetch:
+            obj, children = self.remote_prefetch[path]
+        else:
+            obj = filefuncs.get_by_path_if_exists(self.proj.remote, self.proj.id, path)
         if obj is not None:
             if obj._data.get('deleted_at', False) is not None:
                 return
             if filefuncs.isfile(obj):
                 if path not in self.files_data:
-                    self.files_data[path] = copy.deepcopy(self.record_init)
+                    self.files_data[path] = CompareRecord()
                 self._update_remote_record(self.files_data[path], obj)
 
             elif filefuncs.isdir(obj):
                 if path not in self.dirs_data:
-                    self.dirs_data[path] = copy.deepcopy(self.record_init)
+                    self.dirs_data[path] = CompareRecord()
                 self._update_remote_record(self.dirs_data[path], obj)
 
                 # children
@@ -904,11 +1251,14 @@ class _TreeCompare(object):
                     return
                 if path not in self.child_data:
                     self.child_data[path] = {}
-                for child in self.proj.remote.list_directory(self.proj.id, obj.id):
+                if children is None:
+                    children = filefuncs.list_directory(self.proj.remote, self.proj.id, obj.id)
+                r_mtimes = clifuncs.epoch_times([child.updated_at for child in children])
+                for child, r_mtime in zip(children, r_mtimes):
                     childpath = os.path.join(path, child.name)
                     if childpath not in self.child_data[path]:
-                        self.child_data[path][childpath] = copy.deepcopy(self.record_init)
-                    self._update_remote_record(self.child_data[path][childpath], child)
+                        self.child_data[path][childpath] = CompareRecord()
+                    self._update_remote_record(self.child_data[path][childpath], child, r_mtime=r_mtime)
             else:
                 raise cliexcept.MCCLIException("TreeCompare error: get_by_path type error for '" + path + "'")
 
@@ -936,12 +1286,12 @@ class _TreeCompare(object):
 
         if file_or_dir['otype'] == 'file':
             if path not in self.files_data:
-                self.files_data[path] = copy.deepcopy(self.record_init)
+                self.files_data[path] = CompareRecord()
             self._update_record_from_tree(self.files_data[path], file_or_dir, prefix)
 
         elif file_or_dir['otype'] == 'directory':
             if path not in self.dirs_data:
-                self.dirs_data[path] = copy.deepcopy(self.record_init)
+                self.dirs_data[path] = CompareRecord()
             self._update_record_from_tree(self.dirs_data[path], file_or_dir, prefix)
 
             # children
@@ -953,7 +1303,7 @@ class _TreeCompare(object):
             for file_or_dir in results:
                 childpath = file_or_dir['path']
                 if childpath not in self.child_data[path]:
-                    self.child_data[path][childpath] = copy.deepcopy(self.record_init)
+                    self.child_data[path][childpath] = CompareRecord()
                 self._update_record_from_tree(self.child_data[path][childpath], file_or_dir, prefix)
 
         elif file_or_dir['otype'] == None:
@@ -996,7 +1346,7 @@ class _TreeCompare(object):
             not_existing: list of str
                 Paths that do not exist locally or remotely
 
-            For each file or directory the comparison data is:
+            For each file or directory the comparison data is a :class:`records.CompareRecord`, with:
                 'l_mtime': float, local file modify time (seconds since epoch)
                 'l_size': int, local file size in bytes
                 'l_type': str, local file type ('file' or 'directory')
@@ -1024,11 +1374,15 @@ class _TreeCompare(object):
 
             Remote objects, 'r_obj', are only returned if remotetree is None.
 
+        In offline mode (see :mod:`materials_commons.cli.offline`), remote data is read only from
+        the remote tree cache, and a RemoteTree is used even if remotetree is None.
+
         """
         self.files_data = {}
         self.dirs_data = {}
         self.child_data = {}
         self.get_children = get_children
+        self._prefetch_remote(paths)
 
         for path in paths:
             if self.localtree and checksum:
@@ -1104,7 +1458,7 @@ def treecompare(proj, paths, checksum=False, localtree=None, remotetree=None,
         not_existing: list of str
             Paths that do not exist locally or remotely
 
-        For each file or directory the comparison data is:
+        For each file or directory the comparison data is a :class:`records.CompareRecord`, with:
             'l_mtime': float, local file modify time (seconds since epoch)
             'l_size': int, local file size in bytes
             'l_type': str, local file type ('file' or 'directory')
@@ -1132,9 +1486,16 @@ def treecompare(proj, paths, checksum=False, localtree=None, remotetree=None,
 
         Remote objects, 'r_obj', are only returned if remotetree is None.
 
+        In offline mode (see :mod:`materials_commons.cli.offline`), remote data is read only from
+        the remote tree cache, and a RemoteTree is used even if remotetree is None.
+
     """
-    _treecomparer = _TreeCompare(proj, localtree=localtree, remotetree=remotetree)
-    return _treecomparer(paths, checksum=checksum, get_children=get_children)
+    if remotetree is None and clioffline.enabled():
+        from materials_commons.cli.treedb import RemoteTree
+        remotetree = RemoteTree(proj, None)
+    with cliprogress.current().phase('compare'):
+        _treecomparer = _TreeCompare(proj, localtree=localtree, remotetree=remotetree)
+        return _treecomparer(paths, checksum=checksum, get_children=get_children)
 
 def get_types(path, files_data, dirs_data):
     """Use treecompare output to get local and remote types
@@ -1200,19 +1561,31 @@ class _Mover(object):
         self.localtree = localtree
         self.remotetree = remotetree
 
+    def _retry_move(self, fn, id, dest_path, *args):
+        """Call a move or rename function, retrying transient failures unless already done"""
+        cliretry.default_policy.call(
+            fn, self.proj.id, id, *args,
+            already_done=lambda: _moved_object(self.proj, dest_path, id),
+            description=dest_path)
+
     def _move_remote_file(self, path, to_directory_path, to_directory_id, name=None):
         file_id = self.files_data[path]['id']
+        moved_path = os.path.join(to_directory_path, os.path.basename(path))
         if os.path.dirname(path) != to_directory_path:
-            self.proj.remote.move_file(self.proj.id, file_id, to_directory_id)
+            self._retry_move(self.proj.remote.move_file, file_id, moved_path, to_directory_id)
         if name:
-            self.proj.remote.rename_file(self.proj.id, file_id, name)
+            self._retry_move(self.proj.remote.rename_file, file_id,
+                             os.path.join(to_directory_path, name), name)
 
     def _move_remote_directory(self, path, to_directory_path, to_directory_id, name=None):
         directory_id = self.dirs_data[path]['id']
+        moved_path = os.path.join(to_directory_path, os.path.basename(path))
         if os.path.dirname(path) != to_directory_path:
-            self.proj.remote.move_directory(self.proj.id, directory_id, to_directory_id)
+            self._retry_move(self.proj.remote.move_directory, directory_id, moved_path,
+                             to_directory_id)
         if name:
-            self.proj.remote.rename_directory(self.proj.id, directory_id, name)
+            self._retry_move(self.proj.remote.rename_directory, directory_id,
+                             os.path.join(to_directory_path, name), name)
 
     def _move_remote(self, path, to_directory_path, to_directory_id, name=None):
         """ Move file or directory on remote
@@ -1223,10 +1596,17 @@ class _Mover(object):
             to_directory_path: str, Destination directory
             name: str or None, If name is not None, rename file or directory after moving
         """
-        if path in self.files_data:
-            self._move_remote_file(path, to_directory_path, to_directory_id, name=name)
-        else:
-            self._move_remote_directory(path, to_directory_path, to_directory_id, name=name)
+        try:
+            if path in self.files_data:
+                self._move_remote_file(path, to_directory_path, to_directory_id, name=name)
+            else:
+                self._move_remote_directory(path, to_directory_path, to_directory_id, name=name)
+        finally:
+            if name is None:
+                name = os.path.basename(path)
+            filefuncs.invalidate_lookup(self.proj.remote, self.proj.id, path)
+            filefuncs.invalidate_lookup(self.proj.remote, self.proj.id,
+                                        os.path.join(to_directory_path, name))
 
     def _move_local(self, path, to_directory_path, name=None):
         if name is None:
@@ -1444,7 +1824,10 @@ class _Remover(object):
         else:
             print("rm remote:", path)
             try:
-                self.proj.remote.delete_file(self.proj.id, record['id'])
+                cliretry.default_policy.call(
+                    self.proj.remote.delete_file, self.proj.id, record['id'],
+                    already_done=lambda: _is_removed(self.proj, path), description=path)
+                filefuncs.invalidate_lookup(self.proj.remote, self.proj.id, path)
                 return True
             except requests.exceptions.HTTPError as e:
                 try:
@@ -1516,7 +1899,10 @@ class _Remover(object):
         else:
             try:
                 print("rm remote:", path)
-                self.proj.remote.delete_directory(self.proj.id, record['id'])
+                cliretry.default_policy.call(
+                    self.proj.remote.delete_directory, self.proj.id, record['id'],
+                    already_done=lambda: _is_removed(self.proj, path), description=path)
+                filefuncs.invalidate_lookup(self.proj.remote, self.proj.id, path)
                 return True
             except requests.exceptions.HTTPError as e:
                 try:
@@ -1640,6 +2026,13 @@ def remove(proj, paths, recursive=False, no_compare=False, remote_only=False, lo
         _remover(p)
 
 
+def _create_directory(proj, path, parent_id):
+    """Create a remote directory, retrying transient failures unless it was created"""
+    with cliprogress.current().phase('mkdir'):
+        return cliretry.default_policy.call(
+            proj.remote.create_directory, proj.id, os.path.basename(path), parent_id,
+            already_done=lambda: _existing_directory(proj, path), description=path)
+
 def mkdir(proj, path, remote_only=False, create_intermediates=False, remotetree=None,
           parent_id=None):
     """Make directories
@@ -1692,7 +2085,8 @@ def mkdir(proj, path, remote_only=False, create_intermediates=False, remotetree=
             raise cliexcept.MCCLIException(path + ": is a local file")
 
     if parent_id is not None:
-        result = proj.remote.create_directory(proj.id, os.path.basename(path), parent_id)
+        result = _create_directory(proj, path, parent_id)
+        filefuncs.invalidate_lookup(proj.remote, proj.id, path, obj=result)
         if remotetree:
             remotetree.connect()
             remotetree.update(os.path.dirname(path), force=True)
@@ -1713,7 +2107,8 @@ def mkdir(proj, path, remote_only=False, create_intermediates=False, remotetree=
         if create_intermediates:
             parent = mkdir(proj, parent_path, remote_only=remote_only,
                 create_intermediates=create_intermediates, remotetree=remotetree)
-            result = proj.remote.create_directory(proj.id, os.path.basename(path), parent.id)
+            result = _create_directory(proj, path, parent.id)
+            filefuncs.invalidate_lookup(proj.remote, proj.id, path, obj=result)
             if remotetree:
                 remotetree.connect()
                 remotetree.update(parent_path, force=True)
@@ -1727,7 +2122,8 @@ def mkdir(proj, path, remote_only=False, create_intermediates=False, remotetree=
                 raise cliexcept.MCCLIException(parent_path + ": is a remote file")
             if parent is None:
                 raise cliexcept.MCCLIException(parent_path + ": parent directory does not exist")
-            result = proj.remote.create_directory(proj.id, os.path.basename(path), parent.id)
+            result = _create_directory(proj, path, parent.id)
+            filefuncs.invalidate_lookup(proj.remote, proj.id, path, obj=result)
             if remotetree:
                 remotetree.connect()
                 remotetree.update(os.path.dirname(path), force=True)
@@ -1,3 +1,4 @@
+import json
 import os
 import sqlite3
 import time
@@ -9,6 +10,9 @@ import materials_commons.api as mcapi
 import materials_commons.cli.exceptions as cliexcept
 import materials_commons.cli.functions as clifuncs
 import materials_commons.cli.file_functions as filefuncs
+import materials_commons.cli.offline as clioffline
+import materials_commons.cli.progress as cliprogress
+from materials_commons.cli.records import TreeRecord
 from materials_commons.cli.sqltable import SqlTable, sql_iter
 
 
@@ -68,6 +72,9 @@ class TreeTable(SqlTable):
 
     """
 
+    # rows are returned as TreeRecord
+    row_factory = staticmethod(TreeRecord.row_factory)
+
     # column name: ([type, (optional) constraints], fmt)
     @staticmethod
     def tablecolumns():
@@ -143,6 +150,11 @@ class TreeTable(SqlTable):
             verbose: bool
                 If True, print status.
         """
+        with cliprogress.current().phase('cache_update'):
+            self._update(path, get_children=get_children, recurs=recurs, verbose=verbose,
+                         force=force)
+
+    def _update(self, path, get_children=True, recurs=False, verbose=False, force=False):
         if verbose:
             print(path, end='')
 
@@ -228,7 +240,7 @@ class TreeTable(SqlTable):
         """Select all records
 
         Yields:
-             sqlite3.Row or None, if no records left
+             TreeRecord or None, if no records left
         """
         self.curs.execute("SELECT * FROM " + self.tablename())
         for r in sql_iter(self.curs, fetchsize=fetchsize):   #pylint: disable=invalid-name
@@ -238,7 +250,7 @@ class TreeTable(SqlTable):
         """Select records by path
 
         Returns:
-             List of sqlite3.Row
+             List of TreeRecord
         """
         self.curs.execute("SELECT * FROM " + self.tablename() + " WHERE path=?", (path, ))
         return self.curs.fetchall()
@@ -247,7 +259,7 @@ class TreeTable(SqlTable):
         """Select record by id
 
         Returns:
-             sqlite3.Row or None
+             TreeRecord or None
         """
         self.curs.execute("SELECT * FROM " + self.tablename() + " WHERE id=?", (id, ))
         return self.curs.fetchone()
@@ -256,7 +268,7 @@ class TreeTable(SqlTable):
         """Select records by parent_path
 
         Returns:
-             List of sqlite3.Row
+             List of TreeRecord
         """
         self.curs.execute("SELECT * FROM " + self.tablename() + " WHERE parent_path=?", (parent_path, ))
         return self.curs.fetchall()
@@ -265,7 +277,7 @@ class TreeTable(SqlTable):
         """Select records by parent_id
 
         Returns:
-             List of sqlite3.Row
+             List of TreeRecord
         """
         self.curs.execute("SELECT * FROM " + self.tablename() + " WHERE parent_id=?", (parent_path, ))
         return self.curs.fetchall()
@@ -342,15 +354,106 @@ class RemoteTree(TreeTable):
     def tablename():
         return "remotetree"
 
-    def __init__(self, proj, updatetime):
+    def __init__(self, proj, updatetime, auto_lock=False, change_marker=None,
+                 files_changed=None):
+        """
+
+        Arguments:
+            proj: mcapi.Project
+                Project instance with proj.local_path and proj.remote.
+            updatetime: float or None
+                Records checked before this time (s since epoch) are updated when used. If None,
+                records are always updated.
+            auto_lock: bool
+                If True, validate the whole cache with the project change marker before the first
+                update (see :func:`validate`).
+            change_marker: callable or None
+                Function with no arguments returning (marker, checktime) for the remote project,
+                where marker is a str, or None if not available, and checktime is the time
+                (s since epoch) just before the marker was read. Default uses
+                :func:`project_change_marker` with the project data from the remote.
+            files_changed: callable or None
+                Function with argument `since` (s since epoch) returning True if any file in the
+                remote project may have changed since then. Default asks the remote for files
+                changed since `since`, less CHANGES_SINCE_MARGIN.
+        """
         super(RemoteTree, self).__init__(proj.local_path)
         self.updatetime = updatetime
         self.proj = proj
+        self.auto_lock = auto_lock
+        self.change_marker = change_marker or self._remote_change_marker
+        self.files_changed = files_changed or self._remote_files_changed
+        self._validated = False
+
+    def _remote_change_marker(self):
+        checktime = getattr(self.proj, 'remote_checktime', None)
+        if checktime is not None:
+            # project data was already fetched from the remote by this process
+            return (project_change_marker(self.proj._data), checktime)
+        checktime = time.time()
+        data = self.proj.remote.get_project(self.proj.id)._data
+        return (project_change_marker(data), checktime)
+
+    def _remote_files_changed(self, since):
+        since_str = time.strftime("%Y-%m-%d %H:%M:%S",
+                                  time.gmtime(since - CHANGES_SINCE_MARGIN))
+        try:
+            page = next(self.proj.remote.list_files_changed_since(self.proj.id, since_str,
+                                                                   page_size=1))
+        except mcapi.MCAPIError:
+            # not available: assume files changed
+            return True
+        return bool(page.data)
+
+    def validate(self):
+        """Validate the whole cache with the project change marker
+
+        If the marker is the same as when it was last recorded, and the remote reports no files
+        changed since then, nothing in the project has changed, so all records checked after the
+        marker was first seen are used without further requests. Otherwise the marker is recorded
+        with the current time and records are updated as they are used. If the remote does not
+        provide a marker, `updatetime` is unchanged.
+
+        Returns:
+            bool: True if the marker is unchanged.
+        """
+        self._validated = True
+        marker, checktime = self.change_marker()
+        if marker is None:
+            return False
+        marker_table = ChangeMarkerTable(self.proj.local_path)
+        marker_table.connect()
+        try:
+            existing = marker_table.select_by_project_id(self.proj.id)
+            if existing is not None and existing['marker'] == marker \
+                    and not self.files_changed(existing['checktime']):
+                self.updatetime = existing['checktime']
+                return True
+            marker_table.insert_or_replace({
+                'project_id': self.proj.id,
+                'marker': marker,
+                'checktime': checktime
+            })
+            self.updatetime = checktime
+            return False
+        finally:
+            marker_table.close()
+
+    def update(self, path, get_children=True, recurs=False, verbose=False, force=False):
+        if self.auto_lock and not self._validated and not clioffline.enabled():
+            self.validate()
+        super(RemoteTree, self).update(path, get_children=get_children, recurs=recurs,
+                                       verbose=verbose, force=force)
 
     def needs_update(self, existing, get_children):
         if not existing['checktime']:
             return True
 
+        if clioffline.enabled():
+            # offline, any cached record is used regardless of age
+            return existing['otype'] == 'directory' and get_children is True \
+                and existing['children_checktime'] is None
+
         if self.updatetime:
             if existing['otype'] == 'directory':
                 if get_children is True:
@@ -378,16 +481,12 @@ class RemoteTree(TreeTable):
             checktime = time.time()
         checktime = checktime
 
-        record = {
-            "path":path,
-            "name": os.path.basename(path),
-            "parent_path": parent_path,
-            "checktime": checktime
-        }
+        record = TreeRecord(path=path, name=os.path.basename(path), parent_path=parent_path,
+                            checktime=checktime)
         self.insert_or_replace(record, verbose=verbose)
         return
 
-    def _make_record(self, file_or_dir, checktime, children_checktime=None):
+    def _make_record(self, file_or_dir, checktime, children_checktime=None, mtime=None):
         """Make a record dict from a mcapi.File instance
 
         Arguments:
@@ -398,45 +497,34 @@ class RemoteTree(TreeTable):
             children_checktime: float or None
                 Time the API call to check the directory children was made (s since the
                 epoch).
+            mtime: float or None
+                file_or_dir.updated_at in s since the epoch, if already converted.
 
         Returns:
-            record: dict, suitable for database insertion
+            record: TreeRecord, suitable for database insertion
         """
-        record = {}
-        for key in self.tablecolumns():
-            if key == "id":
-                if file_or_dir.id:
-                    record["id"] = str(file_or_dir.id)
-            elif key == "parent_id":
-                if file_or_dir.directory_id:
-                    record["parent_id"] = str(file_or_dir.directory_id)
-            elif key == "checktime":
-                record["checktime"] = checktime
-            elif key == "children_checktime":
-                record["children_checktime"] = children_checktime
-            elif key == "mtime":
-                record["mtime"] = clifuncs.epoch_time(file_or_dir.updated_at)
-            elif key == "path":
-                record["path"] = file_or_dir.path
-            elif key == "parent_path":
-                parent_path = os.path.dirname(file_or_dir.path)
-                if parent_path != file_or_dir.path:
-                    record["parent_path"] = parent_path
-            elif key == "otype":
-                if filefuncs.isfile(file_or_dir):
-                    record["otype"] = "file"
-                elif filefuncs.isdir(file_or_dir):
-                    record["otype"] = "directory"
-                else:
-                    raise cliexcept.MCCLIException("Invalid file_or_dir type: " + str(type(file_or_dir)))
-            elif key not in file_or_dir._data:
-                continue
-            elif file_or_dir._data[key] is None:
-                continue
-            elif isinstance(file_or_dir._data[key], str) and not file_or_dir._data[key]:
-                continue
-            else:
-                record[key] = file_or_dir._data[key]
+        if filefuncs.isfile(file_or_dir):
+            otype = "file"
+        elif filefuncs.isdir(file_or_dir):
+            otype = "directory"
+        else:
+            raise cliexcept.MCCLIException("Invalid file_or_dir type: " + str(type(file_or_dir)))
+        if mtime is None:
+            mtime = clifuncs.epoch_time(file_or_dir.updated_at)
+        parent_path = os.path.dirname(file_or_dir.path)
+
+        record = TreeRecord()
+        record.id = str(file_or_dir.id) if file_or_dir.id else None
+        record.parent_id = str(file_or_dir.directory_id) if file_or_dir.directory_id else None
+        record.name = file_or_dir.name or None
+        record.path = file_or_dir.path
+        record.parent_path = parent_path if parent_path != file_or_dir.path else None
+        record.mtime = mtime
+        record.size = file_or_dir.size
+        record.checksum = file_or_dir.checksum or None
+        record.otype = otype
+        record.checktime = checktime
+        record.children_checktime = children_checktime
         return record
 
     def _check(self, path, checktime=None, get_children=True):
@@ -461,6 +549,11 @@ class RemoteTree(TreeTable):
         file_or_dir = None
         children = None
 
+        if clioffline.enabled():
+            raise clioffline.OfflineError(
+                "Offline: " + str(path) + (" and its contents are" if get_children else " is")
+                + " not in the remote tree cache. Run `mc fetch` while online to fill the cache.")
+
         if checktime is None:
             checktime = time.time()
         checktime = checktime
@@ -488,14 +581,81 @@ class RemoteTree(TreeTable):
         if get_children:
             children = []
             if file_or_dir_obj is not None and filefuncs.isdir(file_or_dir_obj):
-                for child in self.proj.remote.list_directory(self.proj.id, file_or_dir_obj.id):
-                    if child._data.get('deleted_at', False) is not None:
-                        continue
-                    _checktime = checktime
-                    children.append(self._make_record(child, _checktime))
+                listing = [child for child in filefuncs.list_directory(self.proj.remote, self.proj.id, file_or_dir_obj.id)
+                           if child._data.get('deleted_at', False) is None]
+                mtimes = clifuncs.epoch_times([child.updated_at for child in listing])
+                for child, mtime in zip(listing, mtimes):
+                    children.append(self._make_record(child, checktime, mtime=mtime))
 
         return (file_or_dir, children)
 
+# project fields that change when files or directories in the project change
+CHANGE_MARKER_FIELDS = ('updated_at', 'file_count', 'directory_count', 'size')
+
+# Margin (s) subtracted from the marker time when asking the remote for changed files, for clock
+# differences between the remote and this machine
+CHANGES_SINCE_MARGIN = 60
+
+def project_change_marker(data):
+    """Returns a str summarizing the project fields that change when project contents change
+
+    The marker alone may miss changes that leave the file and directory counts and the project
+    size the same, such as replacing a file with contents of the same size or moving a file, if
+    the remote does not also update the project's `updated_at`. So :func:`RemoteTree.validate`
+    also asks the remote for files changed since the marker was recorded.
+
+    Arguments:
+        data: dict
+            Project data, as returned by the Materials Commons API.
+
+    Returns:
+        str or None: The marker, or None if the project data includes none of the
+        CHANGE_MARKER_FIELDS.
+    """
+    values = {key: data[key] for key in CHANGE_MARKER_FIELDS if data.get(key) is not None}
+    if not values:
+        return None
+    return json.dumps(values, sort_keys=True)
+
+class ChangeMarkerTable(SqlTable):
+    """Stores the last seen project change marker, used to validate the RemoteTree cache
+
+    Values:
+        project_id: integer, Materials Commons project id
+        marker: str, change marker (see :func:`project_change_marker`)
+        checktime: real, time the marker was first seen (s since epoch)
+    """
+
+    @staticmethod
+    def default_print_fmt():
+        from materials_commons.cli.functions import as_is, format_time
+        return [
+            ("project_id", "project_id", "<", 12, as_is),
+            ("marker", "marker", "<", 80, as_is),
+            ("checktime", "checktime", "<", 24, format_time)
+        ]
+
+    @staticmethod
+    def tablecolumns():
+        return {
+            "project_id": ["integer", "UNIQUE"],
+            "marker": ["text"],
+            "checktime": ["real"]
+        }
+
+    @staticmethod
+    def tablename():
+        return "changemarker"
+
+    def select_by_project_id(self, project_id):
+        """Select the marker record for a project
+
+        Returns:
+            sqlite3.Row or None
+        """
+        self.curs.execute("SELECT * FROM " + self.tablename() + " WHERE project_id=?", (project_id,))
+        return self.curs.fetchone()
+
 class LocalTree(TreeTable):
     """Store information on files and directories in the working tree
 
@@ -567,9 +727,9 @@ class LocalTree(TreeTable):
                 epoch).
 
         Returns:
-            record: dict, suitable for database insertion
+            record: TreeRecord, suitable for database insertion
         """
-        record = {}
+        record = TreeRecord()
         if os.path.isdir(local_abspath):
             record['otype'] = 'directory'
         elif os.path.isfile(local_abspath):
@@ -59,6 +59,8 @@ class Config(object):
             },
             "developer_mode": False,
             "REST_logging": False,
+            "cache_ttl": {<object type>: <seconds>, ...},
+            "blob_cache_size": <bytes>,
             "mcurl": <url>, # (deprecated) use if no 'default_remote'
             "apikey": <apikey> # (deprecated) use if no 'default_remote'
         }
@@ -67,6 +69,10 @@ class Config(object):
         remotes: Dict of RemoteConfig, mapping of remote name to RemoteConfig instance
         default_remote: RemoteConfig, configuration for default Remote
         globus: GlobusConfig, globus configuration settings
+        cache_ttl: Dict of object type to seconds, overrides default time-to-live for cached
+            object lists and for cached users, "user" (see :mod:`materials_commons.cli.object_cache`)
+        blob_cache_size: Maximum total size (bytes) of cached file version contents, or None for
+            the default (see :mod:`materials_commons.cli.blob_cache`)
 
     Arguments:
         config_dir_path: str, path to config directory. Defaults to ~/.materialscommons.
@@ -137,6 +143,8 @@ class Config(object):
 
         self.developer_mode = config.get('developer_mode', False)
         self.REST_logging = config.get('REST_logging', False)
+        self.cache_ttl = config.get('cache_ttl', {})
+        self.blob_cache_size = config.get('blob_cache_size', None)
 
     def save(self):
         config = {
@@ -144,8 +152,11 @@ class Config(object):
             'remotes': [vars(value) for value in self.remotes],
             'globus': vars(self.globus),
             'developer_mode': self.developer_mode,
-            'REST_logging': self.REST_logging
+            'REST_logging': self.REST_logging,
+            'cache_ttl': self.cache_ttl
         }
+        if self.blob_cache_size is not None:
+            config['blob_cache_size'] = self.blob_cache_size
         if not os.path.exists(self.config_file):
             user = getpass.getuser()
             config_dir_path = join(os.path.expanduser('~' + user), '.materialscommons')
@@ -155,6 +166,9 @@ class Config(object):
             f.write(json.dumps(config, indent=2))
         os.chmod(self.config_file, 0o600)
 
+        from materials_commons.cli.functions import invalidate_project_context
+        invalidate_project_context()
+
 def get_remote_config_and_login_if_necessary(email=None, mcurl=None):
     """Prompt for login if remote is not stored in Config
 
@@ -0,0 +1,176 @@
+"""Check PyPI for newer releases of the CLI without delaying commands
+
+The check runs at most once per day in a detached background process with a
+hard timeout. Its result is cached and any upgrade notice is shown by the next
+`mc` command, so the command that triggers a check never waits on the network.
+A failed check is recorded too, so it is not retried until the next day. The
+upgrade notice is also shown at most once per day.
+
+Cache file ``~/.materialscommons/.cli-version-cache.json`` format: ::
+
+    {
+        "last_check": <ISO 8601 datetime of last check, successful or not>,
+        "latest_version": <latest version found on PyPI, or null>,
+        "last_notice": <ISO 8601 datetime the upgrade notice was last shown, or null>
+    }
+
+"""
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+PACKAGE_NAME = 'materials-commons-cli'
+PYPI_URL = "https://pypi.org/pypi/" + PACKAGE_NAME + "/json"
+CLI_VERSION_CACHE_FILE = os.path.expanduser('~/.materialscommons/.cli-version-cache.json')
+CHECK_INTERVAL = timedelta(days=1)
+CHECK_TIMEOUT = 5.0     # seconds, for the PyPI request
+
+
+def read_version_cache():
+    """Returns the version cache dict, or {} if it does not exist or can not be read"""
+    try:
+        with open(CLI_VERSION_CACHE_FILE) as f:
+            cache = json.load(f)
+        if isinstance(cache, dict):
+            return cache
+    except Exception:
+        pass
+    return {}
+
+
+def _write_version_cache(cache):
+    try:
+        cache_dir = os.path.dirname(CLI_VERSION_CACHE_FILE)
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        tmp_path = CLI_VERSION_CACHE_FILE + "." + str(os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, CLI_VERSION_CACHE_FILE)
+    except Exception:
+        pass
+
+
+def update_version_cache(latest_version):
+    """Write the check time and latest version found to the version cache"""
+    cache = read_version_cache()
+    cache['last_check'] = datetime.now().isoformat()
+    cache['latest_version'] = latest_version
+    _write_version_cache(cache)
+
+
+def record_notice_shown(cache=None):
+    """Write the time the upgrade notice was shown to the version cache"""
+    if cache is None:
+        cache = read_version_cache()
+    cache['last_notice'] = datetime.now().isoformat()
+    _write_version_cache(cache)
+
+
+def _elapsed_at_least(cache, key, interval):
+    try:
+        if datetime.now() - datetime.fromisoformat(cache[key]) < interval:
+            return False
+    except Exception:
+        pass
+    return True
+
+
+def should_check_version(cache=None):
+    """Returns True if the last check is older than CHECK_INTERVAL"""
+    if cache is None:
+        cache = read_version_cache()
+    return _elapsed_at_least(cache, 'last_check', CHECK_INTERVAL)
+
+
+def current_version():
+    """Returns the installed CLI version, or None if it can not be determined"""
+    try:
+        import pkg_resources
+        return pkg_resources.get_distribution(PACKAGE_NAME).version
+    except Exception:
+        return None
+
+
+def fetch_latest_version(timeout=CHECK_TIMEOUT):
+    """Query PyPI for the latest released version, raises on failure"""
+    import requests
+    response = requests.get(PYPI_URL, timeout=timeout)
+    response.raise_for_status()
+    return response.json()["info"]["version"]
+
+
+def print_upgrade_notice(cache=None, out=None):
+    """Print a warning if the cached latest version differs from the installed version
+
+    Returns:
+        bool: True if the warning was printed.
+    """
+    if cache is None:
+        cache = read_version_cache()
+    if out is None:
+        out = sys.stderr
+    latest_version = cache.get('latest_version')
+    installed_version = current_version()
+    if not latest_version or not installed_version or latest_version == installed_version:
+        return False
+    out.write(
+        f"\nWarning: You are using an older version of the Materials Commons CLI ({installed_version}).\n"
+        f"A newer version is available ({latest_version}).\n"
+        f"It is recommended you upgrade to the newest version: pip install --upgrade {PACKAGE_NAME}\n\n")
+    return True
+
+
+def start_background_check():
+    """Launch a detached process that refreshes the version cache
+
+    The child process is started in its own session with no standard streams, so
+    it neither blocks nor prints to the terminal, and it outlives the command
+    that started it.
+    """
+    try:
+        kwargs = {}
+        if os.name == 'nt':
+            kwargs['creationflags'] = getattr(subprocess, 'DETACHED_PROCESS', 0) | \
+                getattr(subprocess, 'CREATE_NEW_PROCESS_GROUP', 0)
+        else:
+            kwargs['start_new_session'] = True
+        subprocess.Popen(
+            [sys.executable, '-m', 'materials_commons.cli.version_check'],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            close_fds=True, **kwargs)
+    except Exception:
+        pass
+
+
+def check_package_version():
+    """Show any cached upgrade notice, at most once per CHECK_INTERVAL, then refresh the cache in
+    the background if it is stale"""
+    if os.environ.get('MC_NO_VERSION_CHECK'):
+        return
+    cache = read_version_cache()
+    if _elapsed_at_least(cache, 'last_notice', CHECK_INTERVAL) and print_upgrade_notice(cache):
+        record_notice_shown(cache)
+    if should_check_version(cache):
+        start_background_check()
+
+
+def main():
+    """Entry point for the background process: query PyPI and update the cache
+
+    If the query fails, the check time is still updated, keeping the previously found latest
+    version, so that the check is not repeated by every command until PyPI can be reached.
+    """
+    try:
+        latest_version = fetch_latest_version()
+    except Exception:
+        update_version_cache(read_version_cache().get('latest_version'))
+        return 1
+    update_version_cache(latest_version)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""Download and extract dataset zipfiles
+
+Dataset zipfiles can be large, so :func:`download_ranged` fetches them over several HTTP
+connections at once, each requesting one part of the file with a ``Range`` header. If the server
+does not support range requests the file is downloaded over a single connection, as with
+:func:`materials_commons.api.Client.download_published_dataset_zipfile`.
+
+:func:`extract_zipfile` unpacks a downloaded zipfile, streaming each entry to disk and skipping
+entries whose size and CRC-32 already match the local file.
+
+Example: ::
+
+    path = "dataset." + dataset.uuid + ".zip"
+    download_dataset_zipfile(client, dataset.id, path, connections=4)
+    extracted, skipped = extract_zipfile(path, "dataset." + dataset.uuid)
+
+"""
+import concurrent.futures
+import os
+import re
+import zipfile
+import zlib
+
+import requests
+
+import materials_commons.api.client as mcapi_client
+import materials_commons.cli.offline as clioffline
+import materials_commons.cli.rate_limit as rate_limit
+import materials_commons.cli.retry as cliretry
+import materials_commons.cli.trace as clitrace
+
+DEFAULT_CONNECTIONS = 4
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+def _content_range_total(value):
+    """Parse the total size from a "bytes <start>-<end>/<total>" Content-Range header, or None"""
+    match = re.match(r"^bytes\s+\d+-\d+/(\d+)$", (value or "").strip())
+    if not match:
+        return None
+    return int(match.group(1))
+
+
+def _request(client, urlpart, start=None, end=None):
+    headers = dict(client.headers)
+    if start is not None:
+        headers['Range'] = "bytes={0}-{1}".format(start, end)
+    client._throttle()
+    r = mcapi_client.requests.get(client.base_url + urlpart, stream=True,
+                                  verify=client._verify_tls_cert, headers=headers)
+    if r.status_code == 416 and start == 0:
+        # range not satisfiable, i.e. an empty file: request it whole
+        r.close()
+        return _request(client, urlpart)
+    client._handle(r)
+    return r
+
+
+_traced_request = clitrace.traced_request(_request)
+
+
+def _get(client, urlpart, start=None, end=None):
+    """Start a streaming GET of urlpart, for bytes [start, end] if start is not None
+
+    The request is made like the mcapi.Client request methods: it fails in offline mode, is
+    traced with `--trace`, and goes through the client's rate limiter, if installed.
+    """
+    clioffline.require_online("Downloading '" + urlpart + "'")
+    return rate_limit.rate_limited(client, _traced_request, kind=rate_limit.TRANSFER)(
+        client, urlpart, start, end)
+
+
+def _write_response(r, f, expected=None):
+    """Write the body of a streaming response to f, returning the number of bytes written"""
+    nbytes = 0
+    for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+        if chunk:
+            f.write(chunk)
+            nbytes += len(chunk)
+    if expected is not None and nbytes != expected:
+        raise requests.exceptions.ChunkedEncodingError(
+            "Incomplete download: expected {0} bytes, got {1}".format(expected, nbytes))
+    return nbytes
+
+
+def _download_part(client, urlpart, to, start, end):
+    with _get(client, urlpart, start, end) as r:
+        if r.status_code != 206:
+            raise requests.exceptions.HTTPError(
+                "Range request for bytes {0}-{1} was not honored".format(start, end), response=r)
+        with open(to, 'r+b') as f:
+            f.seek(start)
+            _write_response(r, f, expected=end - start + 1)
+
+
+def download_ranged(client, urlpart, to, connections=DEFAULT_CONNECTIONS,
+                    part_size=DEFAULT_PART_SIZE):
+    """Download a file using parallel HTTP range requests
+
+    The first part is requested on its own. If the server answers with "206 Partial Content",
+    the file is preallocated and the remaining parts are requested using up to `connections`
+    connections at once, each writing at its own offset. Otherwise the whole response is written.
+    Each part is retried on transient failures (see :mod:`materials_commons.cli.retry`).
+
+    Arguments:
+        client (:class:`materials_commons.api.Client`): Client to download with.
+        urlpart (str): URL of the file, relative to client.base_url.
+        to (str): Local path to write the file to.
+        connections (int): Maximum number of connections used at once.
+        part_size (int): Number of bytes requested per range request.
+
+    Returns:
+        int: Size of the downloaded file, in bytes.
+    """
+    connections = max(1, int(connections))
+    part_size = max(1, int(part_size))
+    with _get(client, urlpart, 0, part_size - 1) as r:
+        total = _content_range_total(r.headers.get('Content-Range')) \
+            if r.status_code == 206 else None
+        with open(to, 'wb') as f:
+            first = _write_response(r, f)
+            if total is None:
+                return first
+            f.truncate(total)
+
+    parts = [(start, min(start + part_size, total) - 1)
+             for start in range(first, total, part_size)]
+    if not parts:
+        return total
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(connections, len(parts)), thread_name_prefix="mc-range") as executor:
+        futures = [executor.submit(cliretry.default_policy.call, _download_part,
+                                   client, urlpart, to, start, end,
+                                   description=os.path.basename(to))
+                   for start, end in parts]
+        for future in futures:
+            future.result()
+    return total
+
+
+def download_dataset_zipfile(client, dataset_id, to, connections=DEFAULT_CONNECTIONS,
+                             part_size=DEFAULT_PART_SIZE):
+    """Download a published dataset zipfile, see :func:`download_ranged`"""
+    urlpart = "/published/datasets/" + str(dataset_id) + "/download_zipfile"
+    return download_ranged(client, urlpart, to, connections=connections, part_size=part_size)
+
+
+def _file_crc32(path):
+    crc = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            crc = zlib.crc32(chunk, crc)
+    return crc & 0xffffffff
+
+
+def _is_equivalent(info, path):
+    """True if path is a file with the size and CRC-32 of zipfile entry `info`"""
+    if not os.path.isfile(path) or os.path.getsize(path) != info.file_size:
+        return False
+    return _file_crc32(path) == info.CRC
+
+
+def extract_zipfile(zip_path, dest_dir):
+    """Extract a zipfile into dest_dir, skipping entries that match existing local files
+
+    Entries are streamed to disk, so they are never held in memory. Entries with absolute paths or
+    paths outside of dest_dir are rejected with zipfile.BadZipFile.
+
+    Returns:
+        (extracted, skipped): Lists of the extracted and skipped entry names.
+    """
+    dest_dir = os.path.abspath(dest_dir)
+    extracted = []
+    skipped = []
+    with zipfile.ZipFile(zip_path) as zf:
+        for info in zf.infolist():
+            path = os.path.normpath(os.path.join(dest_dir, info.filename))
+            if os.path.isabs(info.filename) or \
+                    os.path.commonpath([dest_dir, path]) != dest_dir:
+                raise zipfile.BadZipFile("Unsafe path in zipfile: " + info.filename)
+            if info.is_dir():
+                os.makedirs(path, exist_ok=True)
+                continue
+            if _is_equivalent(info, path):
+                skipped.append(info.filename)
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with zf.open(info) as src, open(path, 'wb') as dst:
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                    dst.write(chunk)
+            extracted.append(info.filename)
+    return (extracted, skipped)
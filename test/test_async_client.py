@@ -0,0 +1,54 @@
+import threading
+import time
+import unittest
+
+from materials_commons.cli.async_client import AsyncClient
+
+
+class _SlowClient(object):
+    """Counts the maximum number of concurrent calls"""
+
+    def __init__(self, delay=0.02):
+        self.base_url = "https://example.org/api"
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+
+    def list_directory(self, project_id, directory_id):
+        with self.lock:
+            self.in_flight += 1
+            self.calls += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        if directory_id == "fail":
+            raise ValueError("fail")
+        return [directory_id]
+
+
+class TestAsyncClient(unittest.TestCase):
+
+    def test_bounded_concurrency(self):
+        client = _SlowClient()
+        with AsyncClient(client, max_concurrency=8, per_host_limit=4) as aclient:
+            results = aclient.run(aclient.gather(
+                *[aclient.list_directory(1, i) for i in range(20)]))
+        self.assertEqual(results, [[i] for i in range(20)])
+        self.assertEqual(client.max_in_flight, 4)
+
+    def test_map(self):
+        client = _SlowClient(delay=0.0)
+        with AsyncClient(client) as aclient:
+            results = aclient.map(lambda i: client.list_directory(1, i), range(5))
+        self.assertEqual(results, [[i] for i in range(5)])
+
+    def test_cancel_on_failure(self):
+        client = _SlowClient(delay=0.05)
+        with AsyncClient(client, max_concurrency=1, per_host_limit=1) as aclient:
+            with self.assertRaises(ValueError):
+                aclient.run(aclient.gather(
+                    *[aclient.list_directory(1, "fail")] + [aclient.list_directory(1, i) for i in range(10)]))
+        self.assertLess(client.calls, 11)
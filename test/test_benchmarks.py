@@ -0,0 +1,52 @@
+import unittest
+
+import materials_commons.api as mcapi
+from benchmarks.bench import run_scenario
+from benchmarks.fake_server import FakeServer, synthetic_tree
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_fake_server(self):
+        server = FakeServer()
+        proj_id = server.create_project("bench")
+        server.populate(proj_id, synthetic_tree(4, shape='deep', depth=2, file_size=10))
+        self.assertEqual(server.paths(proj_id), [
+            "/", "/level_0", "/level_0/file_0.dat", "/level_0/file_2.dat", "/level_0/level_1",
+            "/level_0/level_1/file_1.dat", "/level_0/level_1/file_3.dat"])
+
+        with server.installed():
+            client = mcapi.Client("apikey", base_url=server.base_url)
+            directory = client.get_file_by_path(proj_id, "/level_0")
+            children = client.list_directory(proj_id, directory.id)
+            self.assertEqual(sorted(child.name for child in children),
+                             ["file_0.dat", "file_2.dat", "level_1"])
+            with self.assertRaises(mcapi.MCAPIError) as cm:
+                client.get_file_by_path(proj_id, "/missing")
+            self.assertEqual(cm.exception.response.status_code, 404)
+
+        self.assertEqual(server.calls["POST /files/by_path"], 2)
+        self.assertEqual(server.calls["GET /projects/{id}/directories/{id}/list"], 1)
+
+    def test_run_scenario(self):
+        options = {'files': 20, 'shape': 'wide', 'file_size': 100, 'latency': 0.0,
+                   'bandwidth': None, 'jobs': '2'}
+        up = run_scenario('up', options)
+        self.assertEqual(up['api_calls_by_endpoint']["POST /projects/{id}/files/{id}/upload"], 20)
+        self.assertEqual(up['bytes_sent'], 2000)
+
+        down = run_scenario('down', options)
+        self.assertEqual(down['api_calls_by_endpoint']["GET /projects/{id}/files/{id}/download"], 20)
+        self.assertEqual(down['bytes_received'], 2000)
+        self.assertGreater(down['peak_rss'], 0)
+
+    def test_micro(self):
+        from benchmarks.micro import run_all, SCHEMA_VERSION
+        output = run_all(scale=0.001, repeat=1, name_filter="functions.")
+        self.assertEqual(output["schema_version"], SCHEMA_VERSION)
+        names = [r["name"] for r in output["results"]]
+        self.assertEqual(names, sorted(names))
+        self.assertIn("functions.epoch_time_str", names)
+        for r in output["results"]:
+            self.assertGreater(r["n"], 0)
+            self.assertGreaterEqual(r["median"], r["min"])
@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+import materials_commons.api as mcapi
+import materials_commons.cli.blob_cache as blobcache
+import materials_commons.cli.offline as clioffline
+import materials_commons.cli.subcommands.versions as versions
+from benchmarks.bench import _environment, APIKEY
+from benchmarks.fake_server import FakeServer, synthetic_content, synthetic_tree
+from materials_commons.cli.blob_cache import BlobCache
+
+DOWNLOAD = "GET /projects/{id}/files/{id}/download"
+
+
+class TestBlobCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="mc-test-blob-cache-")
+        self.server = FakeServer()
+        self.proj_id = self.server.create_project("proj")
+        self.server.populate(self.proj_id, synthetic_tree(4, shape='wide', fanout=1, file_size=100))
+        self.client = mcapi.Client(APIKEY, base_url=self.server.base_url)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _file(self, path):
+        return self.server._objects[self.server._by_path[(self.proj_id, path)]]
+
+    def _read(self, cache, path, checksum=None):
+        record = self._file(path)
+        if checksum is None:
+            checksum = record['checksum']
+        with cache.version_file(self.client, self.proj_id, record['id'], checksum) as local_path:
+            with open(local_path, 'rb') as f:
+                return (local_path, f.read())
+
+    def test_version_file(self):
+        cache = BlobCache(os.path.join(self.tmpdir, "cache"), max_size=1000)
+        with self.server.installed():
+            local_path, content = self._read(cache, "/dir_0/file_0.dat")
+            self.assertEqual(content, synthetic_content("/dir_0/file_0.dat", 100))
+            self.assertEqual(self.server.calls[DOWNLOAD], 1)
+            self.assertEqual(local_path, cache.blob_path(self._file("/dir_0/file_0.dat")['checksum']))
+
+            self.assertEqual(self._read(cache, "/dir_0/file_0.dat")[1], content)
+            self.assertEqual(self.server.calls[DOWNLOAD], 1)
+
+            # a checksum mismatch is not cached, and the download is removed
+            local_path, content = self._read(cache, "/dir_0/file_1.dat", checksum="0" * 32)
+            self.assertEqual(content, synthetic_content("/dir_0/file_1.dat", 100))
+            self.assertFalse(os.path.exists(local_path))
+            self._read(cache, "/dir_0/file_1.dat", checksum="0" * 32)
+            self.assertEqual(self.server.calls[DOWNLOAD], 3)
+
+        with clioffline.offline():
+            self.assertEqual(self._read(cache, "/dir_0/file_0.dat")[1],
+                             synthetic_content("/dir_0/file_0.dat", 100))
+            with self.assertRaises(clioffline.OfflineError):
+                self._read(cache, "/dir_0/file_2.dat")
+
+    def test_lru(self):
+        cache = BlobCache(os.path.join(self.tmpdir, "cache"), max_size=250)
+        checksums = [self._file("/dir_0/file_" + str(i) + ".dat")['checksum'] for i in range(3)]
+        with self.server.installed():
+            self._read(cache, "/dir_0/file_0.dat")
+            self._read(cache, "/dir_0/file_1.dat")
+            self._read(cache, "/dir_0/file_0.dat")
+            self._read(cache, "/dir_0/file_2.dat")
+        self.assertEqual([os.path.exists(cache.blob_path(c)) for c in checksums], [True, False, True])
+        self.assertIsNone(cache.get(None, checksums[1]))
+
+    def test_version_as_str(self):
+        proj = types.SimpleNamespace(remote=self.client, id=self.proj_id,
+                                     local_path=os.path.join(self.tmpdir, "proj"))
+        record = self._file("/dir_0/file_3.dat")
+        records = [{'current': '*', 'id': record['id'], 'checksum': record['checksum']}]
+        with mock.patch.object(blobcache, 'BLOB_CACHE_DIR', os.path.join(self.tmpdir, "cache")), \
+                _environment(self.server, self.tmpdir):
+            for i in range(2):
+                s, versname = versions.version_as_str(proj, "proj/dir_0/file_3.dat", records, 'remote')
+                self.assertEqual(s, synthetic_content("/dir_0/file_3.dat", 100).decode('utf-8'))
+                self.assertEqual(versname, "proj/dir_0/file_3.dat-" + str(record['id']))
+        self.assertEqual(self.server.calls[DOWNLOAD], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import materials_commons.cli.functions as clifuncs
+from benchmarks.bench import _environment, EMAIL, APIKEY
+from benchmarks.fake_server import FakeServer, synthetic_tree
+from materials_commons.cli.subcommands.down import down_subcommand
+from materials_commons.cli.user_config import RemoteConfig
+
+DOWNLOAD = "GET /projects/{id}/files/{id}/download"
+
+
+class TestDownDataset(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="mc-test-down-dataset-")
+
+    def tearDown(self):
+        clifuncs.invalidate_project_context()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _local_files(self, proj_path):
+        results = []
+        for dirpath, dirnames, filenames in os.walk(proj_path):
+            dirnames[:] = [d for d in dirnames if d != ".mc"]
+            for name in filenames:
+                results.append("/" + os.path.relpath(os.path.join(dirpath, name), proj_path))
+        return sorted(results)
+
+    def test_down_dataset(self):
+        server = FakeServer()
+        proj_id = server.create_project("proj")
+        # /dir_<i % 4>/file_<i>.dat, and /dir_0/sub/file_<i>.dat
+        server.populate(proj_id, synthetic_tree(16, shape='wide', fanout=4, file_size=10))
+        server.populate(proj_id, (["/dir_0/sub"], [("/dir_0/sub/file_a.dat", 10),
+                                                   ("/dir_0/sub/file_b.dat", 10)]))
+        dataset_id = server.create_dataset(proj_id, "ds", {
+            'include_dirs': ["/dir_0", "/dir_1", "/dir_0/sub"],
+            'exclude_dirs': ["/dir_3"],
+            'include_files': ["/dir_2/file_2.dat", "/dir_0/file_4.dat", "/missing.dat"],
+            'exclude_files': ["/dir_1/file_5.dat", "/dir_0/sub/file_b.dat"]
+        })
+        expected = ["/dir_0/file_0.dat", "/dir_0/file_12.dat", "/dir_0/file_4.dat",
+                    "/dir_0/file_8.dat", "/dir_0/sub/file_a.dat", "/dir_1/file_1.dat",
+                    "/dir_1/file_13.dat", "/dir_1/file_9.dat", "/dir_2/file_2.dat"]
+
+        with _environment(server, self.tmpdir):
+            remote_config = RemoteConfig(mcurl=server.base_url, email=EMAIL, mcapikey=APIKEY)
+            proj_path = clifuncs.clone_project(remote_config, proj_id, self.tmpdir).local_path
+
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                down_subcommand(['--dataset', str(dataset_id), '--jobs', '4'], proj_path)
+            self.assertEqual(self._local_files(proj_path), expected)
+            self.assertEqual(server.calls[DOWNLOAD], len(expected))
+            self.assertIn("missing.dat: does not exist on remote", out.getvalue())
+
+            # equivalent local files are skipped
+            clifuncs.invalidate_project_context()
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                down_subcommand(['--dataset', str(dataset_id)], proj_path)
+            self.assertEqual(server.calls[DOWNLOAD], len(expected))
+            self.assertIn("local is equivalent to remote (skipping)", out.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
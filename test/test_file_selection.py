@@ -0,0 +1,74 @@
+import random
+import unittest
+
+import materials_commons.cli.file_functions as filefuncs
+from materials_commons.cli.file_functions import FileSelection
+
+
+class TestFileSelection(unittest.TestCase):
+
+    def _tree(self):
+        paths = ["/"]
+        for a in range(4):
+            paths.append("/d" + str(a))
+            paths.append("/f" + str(a) + ".txt")
+            for b in range(4):
+                paths.append("/d" + str(a) + "/d" + str(b))
+                paths.append("/d" + str(a) + "/f" + str(b) + ".txt")
+                for c in range(3):
+                    paths.append("/d" + str(a) + "/d" + str(b) + "/f" + str(c) + ".txt")
+        return paths
+
+    def test_matches_check_file_selection(self):
+        paths = self._tree()
+        rng = random.Random(0)
+        for i in range(20):
+            file_selection = {key: rng.sample(paths, 6) for key in FileSelection.KEYS}
+            selection = FileSelection.from_dict(file_selection)
+            results = selection.check_all(paths)
+            for path in paths:
+                self.assertEqual(results[path], filefuncs.check_file_selection(path, file_selection),
+                                 msg=str((path, file_selection)))
+                self.assertEqual(filefuncs.check_file_selection(path, selection), results[path])
+
+    def test_edits(self):
+        selection = FileSelection.from_dict({
+            'include_files': ["/a/x.txt"],
+            'exclude_files': [],
+            'include_dirs': ["/a"],
+            'exclude_dirs': ["/a/b"]
+        })
+        self.assertEqual(selection.check("/a/b/y.txt"), (False, "/a/b"))
+        self.assertEqual(selection.check("/a/c/y.txt"), (True, "/a"))
+        self.assertEqual(selection.check("/a"), (True, "(self)"))
+        self.assertEqual(selection.check("/z.txt"), (False, None))
+
+        selection.include(dirs=["/a/b"])
+        self.assertEqual(selection.check("/a/b/y.txt"), (True, "/a/b"))
+        selection.exclude(files=["/a/x.txt"], dirs=["/a"])
+        self.assertEqual(selection.check("/a/x.txt"), (False, "(self)"))
+        self.assertEqual(selection.check("/a/c/y.txt"), (False, "/a"))
+        selection.clear(["/a", "/a/b", "/a/x.txt"])
+        self.assertEqual(selection.check("/a/b/y.txt"), (False, None))
+
+        selection.include(files=["/b.txt", "/a.txt"])
+        self.assertEqual(selection.to_dict(), {
+            'include_files': ["/a.txt", "/b.txt"],
+            'exclude_files': [],
+            'include_dirs': [],
+            'exclude_dirs': []
+        })
+
+    def test_roots(self):
+        selection = FileSelection(include_files=["/a/x.txt", "/c/y.txt"],
+                                  include_dirs=["/a", "/a/b/c", "/d"],
+                                  exclude_dirs=["/a/b", "/e"])
+        self.assertEqual(selection.roots(), ["/a", "/c/y.txt", "/d"])
+        self.assertTrue(selection.may_select_under("/a/b"))
+        self.assertFalse(selection.may_select_under("/a/b/other"))
+        self.assertTrue(selection.may_select_under("/c"))
+        self.assertFalse(selection.may_select_under("/e"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -88,3 +88,16 @@ class TestFunctions(unittest.TestCase):
         # clean
         remove_hidden_project_files(cloned_proj.local_path)
         rmdir_if(cloned_proj.local_path)
+
+    def test_time_conversion(self):
+        import dateutil.parser
+        values = ["2023-04-05T06:07:08.123456Z", "2023-04-05T06:07:08Z", "2023-04-05T06:07:08.5Z",
+                  "2023-04-05T06:07:08+00:00", "2023-04-05T06:07:08-05:00", "2023-04-05 06:07:08",
+                  "Apr 5 2023 06:07"]
+        for value in values:
+            expected = dateutil.parser.parse(value)
+            self.assertEqual(clifuncs.epoch_time(value), expected.timestamp())
+            self.assertEqual(clifuncs.parse_time(value), expected)
+            self.assertEqual(clifuncs.format_time(value), expected.astimezone().strftime("%Y %b %d %H:%M:%S"))
+        self.assertEqual(clifuncs.epoch_times(values + [None, 5]),
+                         [clifuncs.epoch_time(value) for value in values] + [None, 5.0])
@@ -0,0 +1,123 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import materials_commons.api as mcapi
+import materials_commons.cli.object_cache as objcache
+from materials_commons.cli.exceptions import MCCLIException
+from materials_commons.cli.subcommands.globus import GlobusUploadTaskSubcommand
+
+
+class FakeGlobusClient(object):
+    """Serves projects and Globus uploads, tracking the number of requests in flight"""
+
+    def __init__(self, n_projects, failing=()):
+        self.apikey = "apikey"
+        self.base_url = "http://localhost/api"
+        self.n_projects = n_projects
+        self.failing = failing
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get_all_projects(self):
+        return [mcapi.Project({'id': i, 'name': "proj_" + str(i)}) for i in range(self.n_projects)]
+
+    def get_all_globus_upload_requests(self, project_id):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(0.02)
+            if project_id in self.failing:
+                raise mcapi.MCAPIError("request failed", None)
+            return [mcapi.GlobusUpload({'id': 100 + project_id, 'name': "upload", 'status': 2,
+                                        'project_id': project_id})]
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class TestFanOutProjects(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="mc-test-list-objects-")
+        self.patcher = mock.patch.object(
+            objcache, 'USER_CACHE_PATH', os.path.join(self.tmpdir, "cache.db"))
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _subcommand(self, jobs):
+        subcommand = GlobusUploadTaskSubcommand()
+        subcommand.jobs = jobs
+        subcommand.refresh = True
+        return subcommand
+
+    def test_concurrent(self):
+        remote = FakeGlobusClient(12)
+        uploads = self._subcommand(4).get_all_from_remote(remote)
+        self.assertEqual([u.id for u in uploads], [100 + i for i in range(12)])
+        self.assertEqual(uploads[3].project_name, "proj_3")
+        self.assertGreater(remote.max_in_flight, 1)
+        self.assertLessEqual(remote.max_in_flight, 4)
+
+        remote = FakeGlobusClient(5)
+        self._subcommand(1).get_all_from_remote(remote)
+        self.assertEqual(remote.max_in_flight, 1)
+
+    def test_partial_failure(self):
+        subcommand = self._subcommand(4)
+        uploads = subcommand.get_all_from_remote(FakeGlobusClient(6, failing=(4, 1)))
+        self.assertEqual([u.project_id for u in uploads], [0, 2, 3, 5])
+        self.assertEqual([p.id for p, e in subcommand.fan_out_failures], [1, 4])
+
+        with self.assertRaises(mcapi.MCAPIError):
+            subcommand.get_all_from_remote(FakeGlobusClient(2, failing=(0, 1)))
+
+    def test_reported(self):
+        subcommand = GlobusUploadTaskSubcommand()
+        subcommand.working_dir = self.tmpdir
+        remote = FakeGlobusClient(3, failing=(1,))
+        args = subcommand.parse_args(['--all', '--jobs', '2', '--refresh'])
+        out = io.StringIO()
+        with mock.patch.object(subcommand, 'get_remote', return_value=remote):
+            subcommand.refresh = True
+            uploads = subcommand.get_all_objects(args, out)
+        self.assertEqual(len(uploads), 2)
+        self.assertIn("could not get Uploads from 1 project(s)", out.getvalue())
+        self.assertIn("proj_1 (id=1): request failed", out.getvalue())
+
+        with self.assertRaises(MCCLIException):
+            subcommand(['--all', '--jobs', '0'], self.tmpdir)
+
+
+class TestInvalidation(unittest.TestCase):
+
+    def test_modifying_actions(self):
+        subcommand = GlobusUploadTaskSubcommand()
+        subcommand.working_dir = tempfile.gettempdir()
+        with mock.patch.object(objcache, 'invalidate') as invalidate:
+            for name in ['goto', 'set', 'unset']:
+                with subcommand._invalidating_cache(name):
+                    pass
+            invalidate.assert_not_called()
+            for name in ['create', 'delete', 'finish']:
+                with subcommand._invalidating_cache(name):
+                    pass
+            self.assertEqual(invalidate.call_count, 3)
+            with self.assertRaises(ValueError):
+                with subcommand._invalidating_cache('finish'):
+                    raise ValueError("failed")
+            self.assertEqual(invalidate.call_count, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import threading
+import time
+import unittest
+
+import materials_commons.api as mcapi
+import materials_commons.cli.file_functions as filefuncs
+
+
+class _CountingClient(object):
+    """Returns a File for any path, counting calls"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.calls = []
+
+    def get_file_by_path(self, project_id, file_path):
+        with self.lock:
+            self.calls.append(('get_file_by_path', file_path))
+        time.sleep(self.delay)
+        return mcapi.File(data={'id': len(self.calls), 'path': file_path, 'mime_type': 'directory'})
+
+    def list_directory(self, project_id, directory_id):
+        with self.lock:
+            self.calls.append(('list_directory', directory_id))
+        return []
+
+
+class TestLookupMemo(unittest.TestCase):
+
+    def test_no_scope(self):
+        client = _CountingClient()
+        filefuncs.get_by_path_if_exists(client, 1, "/A")
+        filefuncs.get_by_path_if_exists(client, 1, "/A")
+        self.assertEqual(len(client.calls), 2)
+
+    def test_memoized(self):
+        client = _CountingClient()
+        with filefuncs.lookup_memo_scope():
+            a = filefuncs.get_by_path_if_exists(client, 1, "/A")
+            self.assertIs(filefuncs.get_by_path_if_exists(client, 1, "/A"), a)
+            filefuncs.list_directory(client, 1, a.id)
+            filefuncs.list_directory(client, 1, a.id)
+        self.assertEqual(len(client.calls), 2)
+
+        filefuncs.get_by_path_if_exists(client, 1, "/A")
+        self.assertEqual(len(client.calls), 3)
+
+    def test_in_flight_dedupe(self):
+        client = _CountingClient(delay=0.05)
+        results = []
+        with filefuncs.lookup_memo_scope():
+            def _get():
+                results.append(filefuncs.get_by_path_if_exists(client, 1, "/A"))
+            threads = [threading.Thread(target=_get) for i in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(len(client.calls), 1)
+        self.assertEqual(len(results), 8)
+        for r in results:
+            self.assertIs(r, results[0])
+
+    def test_invalidate(self):
+        client = _CountingClient()
+        with filefuncs.lookup_memo_scope():
+            a = filefuncs.get_by_path_if_exists(client, 1, "/A")
+            filefuncs.get_by_path_if_exists(client, 1, "/A/B")
+            filefuncs.get_by_path_if_exists(client, 1, "/A/B/C")
+            filefuncs.get_by_path_if_exists(client, 1, "/AB")
+            filefuncs.list_directory(client, 1, a.id)
+            self.assertEqual(len(client.calls), 5)
+
+            filefuncs.invalidate_lookup(client, 1, "/A/B")
+            filefuncs.get_by_path_if_exists(client, 1, "/A")
+            filefuncs.get_by_path_if_exists(client, 1, "/AB")
+            self.assertEqual(len(client.calls), 5)
+
+            filefuncs.get_by_path_if_exists(client, 1, "/A/B")
+            filefuncs.get_by_path_if_exists(client, 1, "/A/B/C")
+            filefuncs.list_directory(client, 1, a.id)
+            self.assertEqual(len(client.calls), 8)
+
+            new_obj = mcapi.File(data={'id': 100, 'path': "/A/D", 'mime_type': 'directory'})
+            filefuncs.invalidate_lookup(client, 1, "/A/D", obj=new_obj)
+            self.assertIs(filefuncs.get_by_path_if_exists(client, 1, "/A/D"), new_obj)
+            self.assertEqual(len(client.calls), 8)
@@ -0,0 +1,108 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import materials_commons.cli.functions as clifuncs
+import materials_commons.cli.ndjson as clindjson
+import materials_commons.cli.object_cache as objcache
+import materials_commons.cli.progress as cliprogress
+from benchmarks.bench import _environment, EMAIL, APIKEY
+from benchmarks.fake_server import FakeServer, synthetic_tree, write_local_tree
+from materials_commons.cli.progress import TransferStats
+from materials_commons.cli.subcommands.down import down_subcommand
+from materials_commons.cli.subcommands.ls import ls_subcommand
+from materials_commons.cli.subcommands.proj import ProjSubcommand
+from materials_commons.cli.subcommands.up import up_subcommand
+from materials_commons.cli.user_config import RemoteConfig
+
+
+class TestNDJSON(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="mc-test-ndjson-")
+
+    def tearDown(self):
+        clifuncs.invalidate_project_context()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _records(self, text):
+        return [json.loads(line) for line in text.splitlines()]
+
+    def test_writer(self):
+        out = io.StringIO()
+        writer = clindjson.NDJSONWriter(out)
+        writer.write({'name': "a b", 'size': 10})
+        writer.write({'path': "/x", 'obj': object()})
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], '{"name":"a b","size":10}')
+        self.assertEqual(json.loads(lines[1])['path'], "/x")
+
+    def test_transfer_events(self):
+        path = os.path.join(self.tmpdir, "events.ndjson")
+        stats = TransferStats('upload')
+        with cliprogress.reporting(stats, show=False, ndjson=path):
+            for name in ['a', 'b', 'c']:
+                stats.add_planned(name, 10)
+            stats.start_file('a', 10)
+            stats.finish_file('a', 10)
+            stats.skip_file('b', 10)
+            stats.fail_file('c', 10)
+        with open(path) as f:
+            records = self._records(f.read())
+        self.assertEqual([(r['event'], r.get('path')) for r in records],
+                         [('finish', 'a'), ('skip', 'b'), ('fail', 'c'), ('summary', None)])
+        self.assertEqual(records[-1]['files']['done'], 1)
+
+    def test_proj_and_ls(self):
+        server = FakeServer()
+        proj_id = server.create_project("proj_A")
+        server.create_project("proj_B")
+        server.populate(proj_id, synthetic_tree(4, shape='wide', fanout=1, file_size=10))
+
+        with mock.patch.object(objcache, 'USER_CACHE_PATH', os.path.join(self.tmpdir, "cache.db")), \
+                _environment(server, self.tmpdir):
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                ProjSubcommand()(['--ndjson'], self.tmpdir)
+            self.assertEqual(sorted(r['name'] for r in self._records(out.getvalue())),
+                             ["proj_A", "proj_B"])
+
+            remote_config = RemoteConfig(mcurl=server.base_url, email=EMAIL, mcapikey=APIKEY)
+            proj_path = clifuncs.clone_project(remote_config, proj_id, self.tmpdir).local_path
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                ls_subcommand([os.path.join(proj_path, 'dir_0'), '--ndjson'], proj_path)
+            records = self._records(out.getvalue())
+            self.assertEqual(len(records), 4)
+            self.assertTrue(all(r['path'].startswith("/") and r['r_type'] == 'file' for r in records))
+            self.assertTrue(all('l_type' not in r and r['r_size'] == 10 for r in records))
+
+    def test_transfers_to_stdout(self):
+        server = FakeServer()
+        proj_id = server.create_project("proj")
+        server.populate(proj_id, synthetic_tree(4, shape='wide', fanout=1, file_size=10))
+
+        with mock.patch.object(objcache, 'USER_CACHE_PATH', os.path.join(self.tmpdir, "cache.db")), \
+                _environment(server, self.tmpdir):
+            remote_config = RemoteConfig(mcurl=server.base_url, email=EMAIL, mcapikey=APIKEY)
+            proj_path = clifuncs.clone_project(remote_config, proj_id, self.tmpdir).local_path
+            write_local_tree(proj_path, (["/new"], [("/new/a.dat", 10), ("/new/b.dat", 10)]))
+
+            for subcommand, path, n_files in [(down_subcommand, 'dir_0', 4), (up_subcommand, 'new', 2)]:
+                out, err = io.StringIO(), io.StringIO()
+                with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                    subcommand(['-r', os.path.join(proj_path, path), '--ndjson', '-',
+                                '--no-progress'], proj_path)
+                records = self._records(out.getvalue())
+                self.assertEqual([r['event'] for r in records], ['finish'] * n_files + ['summary'])
+                self.assertIn("loaded:", err.getvalue())
+                clifuncs.invalidate_project_context()
+
+
+if __name__ == '__main__':
+    unittest.main()
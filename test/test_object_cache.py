@@ -0,0 +1,180 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import materials_commons.api as mcapi
+import materials_commons.cli.object_cache as objcache
+import materials_commons.cli.offline as clioffline
+import materials_commons.cli.tmp_functions as tmpfuncs
+from benchmarks.bench import _environment
+from benchmarks.fake_server import FakeServer
+from materials_commons.cli.exceptions import MCCLIException
+from materials_commons.cli.subcommands.proj import ProjSubcommand
+
+
+class TestObjectCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="mc-test-objcache-")
+        self.path = os.path.join(self.tmpdir, "cache", "cache.db")
+        self.fetched = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _fetch(self):
+        self.fetched += 1
+        return [mcapi.Project({'id': 1, 'name': "proj_" + str(self.fetched)})]
+
+    def test_get_list(self):
+        cache = objcache.ObjectCache(self.path, ttls={'project': 300.0, 'dataset': 0})
+
+        projects = cache.get_list('project', "remote project", self._fetch, mcapi.Project)
+        self.assertEqual(projects[0].name, "proj_1")
+        projects = cache.get_list('project', "remote project", self._fetch, mcapi.Project)
+        self.assertEqual(self.fetched, 1)
+        self.assertIsInstance(projects[0], mcapi.Project)
+        self.assertEqual((projects[0].id, projects[0].name), (1, "proj_1"))
+
+        # --refresh
+        projects = cache.get_list('project', "remote project", self._fetch, mcapi.Project, refresh=True)
+        self.assertEqual(projects[0].name, "proj_2")
+
+        # invalidated
+        cache.invalidate(['dataset'])
+        cache.get_list('project', "remote project", self._fetch, mcapi.Project)
+        self.assertEqual(self.fetched, 2)
+        cache.invalidate(['project'])
+        cache.get_list('project', "remote project", self._fetch, mcapi.Project)
+        self.assertEqual(self.fetched, 3)
+
+        # expired
+        with mock.patch('time.time', return_value=os.path.getmtime(self.path) + 1000):
+            cache.get_list('project', "remote project", self._fetch, mcapi.Project)
+        self.assertEqual(self.fetched, 4)
+
+        # TTL 0: not cached, unless offline
+        cache.get_list('dataset', "remote dataset", self._fetch, mcapi.Project)
+        cache.get_list('dataset', "remote dataset", self._fetch, mcapi.Project)
+        self.assertEqual(self.fetched, 6)
+
+    def test_offline(self):
+        cache = objcache.ObjectCache(self.path, ttls={'project': 300.0})
+        cache.get_list('project', "remote project", self._fetch, mcapi.Project)
+        with mock.patch('time.time', return_value=os.path.getmtime(self.path) + 1000), \
+                clioffline.offline():
+            projects = cache.get_list('project', "remote project", self._fetch, mcapi.Project)
+        self.assertEqual(self.fetched, 1)
+        self.assertEqual(projects[0].name, "proj_1")
+
+    def test_proj_subcommand(self):
+        server = FakeServer()
+        server.create_project("proj_A")
+        server.create_project("proj_B")
+
+        def mc_proj(argv=[]):
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                ProjSubcommand()(argv, self.tmpdir)
+            return out.getvalue()
+
+        with mock.patch.object(objcache, 'USER_CACHE_PATH', self.path), \
+                _environment(server, self.tmpdir):
+            self.assertIn("proj_A", mc_proj())
+            self.assertEqual(server.calls["GET /projects"], 1)
+            self.assertIn("proj_B", mc_proj())
+            self.assertEqual(server.calls["GET /projects"], 1)
+
+            server.create_project("proj_C")
+            self.assertNotIn("proj_C", mc_proj())
+            self.assertIn("proj_C", mc_proj(['--refresh']))
+            self.assertEqual(server.calls["GET /projects"], 2)
+
+
+class FakeUserClient(object):
+    """Counts user requests"""
+
+    def __init__(self, users):
+        self.apikey = "apikey"
+        self.base_url = "http://localhost/api"
+        self.users = users
+        self.list_users_calls = 0
+        self.current_user_calls = 0
+
+    def get_current_user(self):
+        self.current_user_calls += 1
+        return mcapi.User(self.users[0])
+
+    def list_users(self):
+        self.list_users_calls += 1
+        return mcapi.User.from_list(self.users)
+
+
+class TestUserCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="mc-test-usercache-")
+        self.path = os.path.join(self.tmpdir, "cache", "cache.db")
+        self.users = [{'id': i, 'email': "user" + str(i) + "@test.org", 'name': "User " + str(i)}
+                      for i in range(1, 6)]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _objects(self, owner_ids):
+        return [mcapi.Dataset({'id': i, 'owner_id': owner_id}) for i, owner_id in enumerate(owner_ids)]
+
+    def test_add_owner(self):
+        with mock.patch.object(objcache, 'USER_CACHE_PATH', self.path):
+            client = FakeUserClient(self.users)
+            objects = self._objects([1, 2, 3, 2])
+            tmpfuncs.add_owner(client, objects)
+            self.assertEqual([obj.owner.email for obj in objects],
+                             ["user1@test.org", "user2@test.org", "user3@test.org", "user2@test.org"])
+            self.assertEqual(client.list_users_calls, 1)
+
+            # a new process: served from the persisted cache
+            client = FakeUserClient(self.users)
+            objects = self._objects([4, 5])
+            tmpfuncs.add_owner(client, objects)
+            self.assertEqual(objects[1].owner.name, "User 5")
+            self.assertEqual((client.current_user_calls, client.list_users_calls), (0, 0))
+
+            # missing owner: list_users at most once per process
+            client = FakeUserClient(self.users)
+            with self.assertRaises(MCCLIException):
+                tmpfuncs.add_owner(client, self._objects([99]))
+            with self.assertRaises(MCCLIException):
+                tmpfuncs.add_owner(client, self._objects([99]))
+            self.assertEqual(client.list_users_calls, 1)
+
+    def test_ttl(self):
+        objcache.UserCache(FakeUserClient(self.users), path=self.path, ttl=100.0).get_users([2])
+
+        client = FakeUserClient(self.users)
+        with mock.patch('time.time', return_value=os.path.getmtime(self.path) + 1000):
+            users = objcache.UserCache(client, path=self.path, ttl=100.0).get_users([2, 3])
+        self.assertEqual(sorted(users), [2, 3])
+        self.assertEqual(client.list_users_calls, 1)
+
+        # the current user is tried before listing all users
+        client = FakeUserClient(self.users)
+        users = objcache.UserCache(client, path=self.path, ttl=0).get_users([1])
+        self.assertEqual(users[1].email, "user1@test.org")
+        self.assertEqual((client.current_user_calls, client.list_users_calls), (1, 0))
+
+        # offline: cached users are used regardless of age
+        client = FakeUserClient(self.users)
+        with mock.patch('time.time', return_value=os.path.getmtime(self.path) + 1000), \
+                clioffline.offline():
+            users = objcache.UserCache(client, path=self.path, ttl=100.0).get_users([2])
+        self.assertEqual(users[2].name, "User 2")
+        self.assertEqual(client.list_users_calls, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
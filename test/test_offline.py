@@ -0,0 +1,82 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import materials_commons.api as mcapi
+import materials_commons.cli.functions as clifuncs
+import materials_commons.cli.offline as clioffline
+from benchmarks.bench import _environment, EMAIL, APIKEY
+from benchmarks.fake_server import FakeServer, synthetic_tree
+from materials_commons.cli.parser import main
+from materials_commons.cli.subcommands.ls import ls_subcommand
+from materials_commons.cli.user_config import RemoteConfig
+
+
+class TestOffline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="mc-test-offline-")
+        self.saved_no_version_check = os.environ.get('MC_NO_VERSION_CHECK')
+        os.environ['MC_NO_VERSION_CHECK'] = '1'
+
+    def tearDown(self):
+        clioffline.stop()
+        clifuncs.invalidate_project_context()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+        if self.saved_no_version_check is None:
+            os.environ.pop('MC_NO_VERSION_CHECK', None)
+        else:
+            os.environ['MC_NO_VERSION_CHECK'] = self.saved_no_version_check
+
+    def test_parse_offline_options(self):
+        self.assertEqual(clioffline.parse_offline_options(['mc', 'ls'], environ={}),
+                         (['mc', 'ls'], False))
+        self.assertEqual(clioffline.parse_offline_options(['mc', 'ls'], environ={'MC_OFFLINE': '1'}),
+                         (['mc', 'ls'], True))
+        self.assertEqual(
+            clioffline.parse_offline_options(['mc', '--trace', '--offline', 'ls', '--offline'], environ={}),
+            (['mc', '--trace', 'ls', '--offline'], True))
+
+    def test_requests_blocked(self):
+        client = mcapi.Client("apikey", base_url="http://localhost:1/api")
+        with clioffline.offline():
+            self.assertTrue(clioffline.enabled())
+            with self.assertRaises(clioffline.OfflineError):
+                client.get_all_projects()
+        self.assertFalse(clioffline.enabled())
+        self.assertFalse(hasattr(mcapi.Client._get, '__wrapped__'))
+
+    def test_offline_ls(self):
+        server = FakeServer()
+        proj_id = server.create_project("proj")
+        server.populate(proj_id, synthetic_tree(6, shape='deep', depth=2, file_size=10))
+        with _environment(server, self.tmpdir):
+            remote_config = RemoteConfig(mcurl=server.base_url, email=EMAIL, mcapikey=APIKEY)
+            proj_path = clifuncs.clone_project(remote_config, proj_id, self.tmpdir).local_path
+            ls_subcommand([proj_path], proj_path)
+            ls_subcommand([os.path.join(proj_path, "level_0")], proj_path)
+        clifuncs.invalidate_project_context()
+
+        # the remote is configured, but no server is installed: any request would fail
+        environ = {'MC_API_URL': server.base_url, 'MC_API_KEY': APIKEY, 'MC_API_EMAIL': EMAIL}
+        out = io.StringIO()
+        with mock.patch.dict(os.environ, environ), contextlib.redirect_stdout(out):
+            self.assertEqual(main(['mc', '--offline', 'ls', 'level_0'], working_dir=proj_path), None)
+        output = out.getvalue()
+        self.assertIn("Offline", output)
+        self.assertIn("level_1", output)
+        self.assertIn("file_0.dat", output)
+        self.assertFalse(clioffline.enabled())
+
+        out = io.StringIO()
+        with mock.patch.dict(os.environ, environ), contextlib.redirect_stdout(out):
+            self.assertEqual(main(['mc', '--offline', 'ls', 'level_0/level_1'], working_dir=proj_path), 1)
+        self.assertIn("not in the remote tree cache", out.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import io
+import unittest
+
+from tabulate import tabulate
+
+import materials_commons.cli.functions as clifuncs
+from materials_commons.cli.print_formatter import StreamingTable
+
+
+class CountingStream(io.StringIO):
+
+    def __init__(self):
+        super(CountingStream, self).__init__()
+        self.writes = 0
+
+    def write(self, s):
+        self.writes += 1
+        return super(CountingStream, self).write(s)
+
+
+class TestStreamingTable(unittest.TestCase):
+
+    columns = ['current', 'name', 'id', 'size', 'eq']
+    headers = ['', 'name', 'id', 'size', 'eq']
+
+    def _records(self, n):
+        return [{'current': '*' if i == 0 else ' ', 'name': "file_" + str(i) + ".dat", 'id': i,
+                 'size': clifuncs.humanize(i * 1000), 'eq': None} for i in range(n)]
+
+    def test_matches_tabulate(self):
+        records = self._records(25)
+        out = io.StringIO()
+        clifuncs.print_table(iter(records), columns=self.columns, headers=self.headers, out=out)
+        expected = tabulate([[r[c] for c in self.columns] for r in records], headers=self.headers)
+        self.assertEqual(out.getvalue(), expected + "\n")
+
+    def test_sample(self):
+        records = self._records(5)
+        records.append({'current': ' ', 'name': "a_much_longer_file_name.dat", 'id': 123456,
+                        'size': '-', 'eq': True})
+        out = CountingStream()
+        with StreamingTable(self.columns, self.headers, out=out, sample_size=3,
+                            buffer_lines=4) as table:
+            for record in records:
+                table.write(record)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 8)
+        self.assertEqual(lines[1].split(), ['--', '----------', '----', '------', '----'])
+        # sized from the sample: wider values are printed in full
+        self.assertIn("a_much_longer_file_name.dat  123456", lines[-1])
+        self.assertTrue(lines[-1].endswith("True"))
+        self.assertEqual(out.writes, 2)
+
+    def test_widths(self):
+        out = io.StringIO()
+        table = StreamingTable(['name', 'id'], ['name', 'id'], out=out, widths=[6, 3])
+        table.write({'name': "a", 'id': 1})
+        table.flush()
+        self.assertEqual(out.getvalue(), "name     id\n------  ---\na         1\n")
+        table.close()
+
+    def test_empty(self):
+        out = io.StringIO()
+        clifuncs.print_table([], columns=['name', 'id'], headers=['name', 'id'], out=out)
+        self.assertEqual(out.getvalue(), tabulate([], headers=['name', 'id']) + "\n")
+
+    def test_sort_records(self):
+        records = [{'a': 2, 'b': 'x'}, {'a': 1, 'b': 'y'}, {'a': 1, 'b': 'x'}]
+        expected = records
+        for key in reversed(['b', 'a']):
+            expected = sorted(expected, key=lambda r: r[key])
+        self.assertEqual(clifuncs.sort_records(list(records), ['b', 'a']), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
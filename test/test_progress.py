@@ -0,0 +1,91 @@
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+
+import materials_commons.cli.progress as cliprogress
+from materials_commons.cli.progress import TransferStats
+
+
+class TestProgress(unittest.TestCase):
+
+    def test_counts(self):
+        stats = TransferStats('upload')
+        for name in ['a', 'b', 'c', 'd']:
+            stats.add_planned(name, 100)
+        stats.start_file('a', 100)
+        self.assertEqual(stats.in_flight, 1)
+        stats.finish_file('a', 100)
+        stats.skip_file('b', 100)
+        stats.fail_file('c', 100)
+        self.assertEqual(stats.in_flight, 0)
+        self.assertEqual((stats.files_done, stats.files_skipped, stats.files_failed), (1, 1, 1))
+
+        d = stats.as_dict()
+        self.assertEqual(d['files'], {'total': 4, 'done': 1, 'skipped': 1, 'failed': 1})
+        self.assertEqual(d['bytes']['done'], 100)
+        self.assertGreater(stats.eta, 0.0)
+        self.assertIn("3/4 files", stats.format_line())
+
+    def test_exclusive_phases(self):
+        stats = TransferStats()
+        with stats.phase('compare'):
+            time.sleep(0.02)
+            with stats.phase('hash'):
+                time.sleep(0.05)
+        self.assertGreaterEqual(stats.phase_time['hash'], 0.05)
+        self.assertLess(stats.phase_time['compare'], 0.05)
+
+    def test_callbacks_and_reporting(self):
+        events = []
+
+        def callback(event, stats, path=None, size=0):
+            events.append((event, path))
+
+        # not active: instrumented code is a no-op
+        cliprogress.current().start_file('x', 1)
+
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            with cliprogress.subscribe(callback):
+                stats = TransferStats('download')
+            with cliprogress.reporting(stats, show=False, stats_json=path):
+                self.assertIs(cliprogress.current(), stats)
+                cliprogress.current().add_planned('a', 10)
+                cliprogress.current().start_file('a', 10)
+                cliprogress.current().finish_file('a', 10)
+            self.assertIsNot(cliprogress.current(), stats)
+            with open(path) as f:
+                summary = json.load(f)
+        finally:
+            os.remove(path)
+
+        self.assertEqual(events, [('planned', 'a'), ('start', 'a'), ('finish', 'a')])
+        self.assertEqual(summary['operation'], 'download')
+        self.assertEqual(summary['files']['done'], 1)
+        self.assertEqual(sorted(summary['phases']), sorted(cliprogress.PHASES))
+
+    def test_status_line_stream(self):
+        out = io.StringIO()
+        stream = cliprogress._StatusLineStream(out)
+        stream.set_status("1/2 files")
+        stream.write("uploaded: a\n")
+        self.assertEqual(out.getvalue(), "1/2 files\r\x1b[Kuploaded: a\n1/2 files")
+
+        # print() writes each argument, separator and end separately
+        out.seek(0)
+        out.truncate()
+        print("downloaded:", "a/b.txt", file=stream)
+        self.assertEqual(out.getvalue(), "\r\x1b[Kdownloaded: a/b.txt\n1/2 files")
+
+        # a status update in the middle of a line is shown once the line is finished
+        out.seek(0)
+        out.truncate()
+        stream.write("a/c.txt: ")
+        stream.set_status("2/2 files")
+        stream.write("")
+        stream.write("skipping\n")
+        self.assertEqual(out.getvalue(), "\r\x1b[Ka/c.txt: skipping\n2/2 files")
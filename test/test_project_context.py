@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+
+import materials_commons.cli.functions as clifuncs
+from materials_commons.cli.user_config import RemoteConfig
+
+
+class TestProjectContext(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.proj_path = os.path.join(self.tmpdir.name, "proj")
+        self.subdir = os.path.join(self.proj_path, "a", "b")
+        os.makedirs(self.subdir)
+
+        pconfig = clifuncs.ProjectConfig(self.proj_path)
+        pconfig.remote = RemoteConfig(mcurl="fake_url", email="fake_email")
+        pconfig.project_id = 1
+        pconfig.save()
+
+    def tearDown(self):
+        clifuncs.remove_hidden_project_files(self.proj_path)
+        self.tmpdir.cleanup()
+
+    def test_memoized(self):
+        ctx = clifuncs.project_context(self.subdir)
+        self.assertEqual(ctx.project_path, self.proj_path)
+        self.assertIs(clifuncs.project_context(self.proj_path), ctx)
+        self.assertIs(clifuncs.read_project_config(self.subdir), ctx.project_config)
+        self.assertEqual(ctx.project_config.project_id, 1)
+        self.assertEqual(ctx.remotetree, None)
+        self.assertIs(ctx.localtree, ctx.localtree)
+
+    def test_not_a_project(self):
+        self.assertEqual(clifuncs.project_context(self.tmpdir.name), None)
+        self.assertEqual(clifuncs.read_project_config(self.tmpdir.name), None)
+        with self.assertRaises(clifuncs.MCCLIException):
+            clifuncs.project_context(self.tmpdir.name, required=True)
+
+    def test_save_invalidates(self):
+        ctx = clifuncs.project_context(self.subdir)
+        pconfig = ctx.project_config
+        pconfig.remote_updatetime = 100.0
+        pconfig.save()
+
+        new_ctx = clifuncs.project_context(self.subdir)
+        self.assertIsNot(new_ctx, ctx)
+        self.assertEqual(new_ctx.project_config.remote_updatetime, 100.0)
+
+    def test_remove_invalidates(self):
+        self.assertEqual(clifuncs.project_path(self.subdir), self.proj_path)
+        clifuncs.remove_hidden_project_files(self.proj_path)
+        self.assertEqual(clifuncs.project_path(self.subdir), None)
+        self.assertEqual(clifuncs.project_context(self.subdir), None)
@@ -0,0 +1,122 @@
+import time
+import unittest
+
+import requests
+
+import materials_commons.api as mcapi
+from materials_commons.cli.exceptions import MCCLIException
+from materials_commons.cli.rate_limit import AdaptiveConcurrency, RateLimiter, TokenBucket, \
+    TransferPool, install_rate_limiter, parse_jobs, parse_retry_after, OK, OVERLOADED, METADATA, \
+    TRANSFER
+
+
+def _response(status_code, headers=None):
+    r = requests.models.Response()
+    r.status_code = status_code
+    r.headers.update(headers or {})
+    return r
+
+
+class _Client(object):
+    """Minimal stand-in for mcapi.Client request methods"""
+
+    def __init__(self):
+        self.rate_limit = 0
+        self.rate_limit_remaining = 0
+        self.status_code = 200
+
+    def _throttle(self):
+        raise Exception("should be replaced")
+
+    def _get(self, urlpart):
+        if self.status_code != 200:
+            raise mcapi.MCAPIError("error", _response(self.status_code, {'retry-after': '0.2'}))
+        return urlpart
+
+
+class TestRateLimit(unittest.TestCase):
+
+    def test_parse_jobs(self):
+        self.assertEqual(parse_jobs('auto'), 'auto')
+        self.assertEqual(parse_jobs('4'), 4)
+        with self.assertRaises(MCCLIException):
+            parse_jobs('0')
+        with self.assertRaises(MCCLIException):
+            parse_jobs('many')
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after('3'), 3.0)
+        self.assertEqual(parse_retry_after(None), None)
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+        self.assertEqual(parse_retry_after('not a date'), None)
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=50, burst=1)
+        start = time.monotonic()
+        for i in range(6):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_aimd(self):
+        c = AdaptiveConcurrency(initial=2, max_limit=4)
+        for i in range(20):
+            c.release(c.acquire(), OK)
+        self.assertEqual(c.limit, 4.0)
+
+        tokens = [c.acquire() for i in range(4)]
+        for token in tokens:
+            c.release(token, OVERLOADED)
+        self.assertEqual(c.limit, 2.0)
+
+        fixed = AdaptiveConcurrency(initial=3, max_limit=3, adaptive=False)
+        fixed.release(fixed.acquire(), OVERLOADED)
+        self.assertEqual(fixed.limit, 3.0)
+
+    def test_aimd_transfer_latency(self):
+        c = AdaptiveConcurrency(initial=2, max_limit=4)
+        c.release(c.acquire(), OK, kind=METADATA)
+        self.assertIsNotNone(c.min_latency)
+
+        # slow transfers (e.g. large files) are not compared with the metadata latency
+        for i in range(20):
+            c.release(c.acquire() - 10.0, OK, kind=TRANSFER)
+        self.assertEqual(c.limit, 4.0)
+        self.assertLess(c.min_latency, 10.0)
+
+        # a slow metadata request does not increase the limit
+        c.limit = 2.0
+        c.release(c.acquire() - 10.0, OK, kind=METADATA)
+        self.assertEqual(c.limit, 2.0)
+
+        c.release(c.acquire(), OVERLOADED, kind=TRANSFER)
+        self.assertEqual(c.limit, 1.0)
+
+    def test_install_rate_limiter(self):
+        client = _Client()
+        limiter = RateLimiter(jobs='auto')
+        install_rate_limiter(client, limiter)
+        client._throttle()
+        self.assertEqual(client._get("/a"), "/a")
+        self.assertEqual(limiter.concurrency.in_flight, 0)
+
+        client.status_code = 429
+        with self.assertRaises(mcapi.MCAPIError):
+            client._get("/a")
+        self.assertEqual(limiter.concurrency.in_flight, 0)
+        self.assertLess(limiter.concurrency.limit, 2.0)
+
+        client.status_code = 200
+        start = time.monotonic()
+        client._get("/a")
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+    def test_transfer_pool(self):
+        with TransferPool(1) as pool:
+            self.assertFalse(pool.parallel)
+            self.assertEqual(pool.submit(lambda x: x + 1, 1).result(), 2)
+            with self.assertRaises(ValueError):
+                pool.submit(int, "x")
+        with TransferPool(4) as pool:
+            self.assertTrue(pool.parallel)
+            futures = [pool.submit(lambda x: x * 2, i) for i in range(10)]
+            self.assertEqual(pool.wait(futures), [i * 2 for i in range(10)])
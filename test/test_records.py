@@ -0,0 +1,69 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from materials_commons.cli.records import CompareRecord, TreeRecord
+from materials_commons.cli.treedb import LocalTree
+
+
+class TestRecords(unittest.TestCase):
+
+    def test_compare_record(self):
+        record = CompareRecord()
+        self.assertIsNone(record['l_type'])
+        self.assertNotIn('eq', record)
+        self.assertEqual(len(record), 12)
+        with self.assertRaises(KeyError):
+            record['eq']
+        with self.assertRaises(KeyError):
+            record['not_a_field'] = 1
+
+        record['l_checksum'] = record['r_checksum'] = "abc"
+        record['eq'] = True
+        self.assertIn('eq', record)
+        self.assertEqual(record.get('eq'), True)
+        self.assertEqual(record.get('not_a_field', 1), 1)
+        self.assertEqual(record.to_dict()['eq'], True)
+
+        other = record.copy()
+        other['eq'] = False
+        self.assertNotEqual(record, other)
+        self.assertEqual(record, dict(record.items()))
+
+    def test_row_factory(self):
+        conn = sqlite3.connect(":memory:")
+        conn.row_factory = TreeRecord.row_factory
+        curs = conn.cursor()
+        curs.execute("CREATE TABLE t (path text, otype text, size integer)")
+        curs.execute("INSERT INTO t VALUES ('/a', 'file', 10), ('/b', 'directory', NULL)")
+        curs.execute("SELECT * FROM t")
+        records = curs.fetchall()
+        self.assertIsInstance(records[0], TreeRecord)
+        self.assertEqual((records[0]['path'], records[0]['size'], records[0]['checksum']),
+                         ('/a', 10, None))
+        self.assertEqual(records[1]['otype'], 'directory')
+
+        # other statements still get sqlite3.Row
+        curs.execute("SELECT count(*) AS n FROM t")
+        self.assertEqual(curs.fetchone()['n'], 2)
+
+    def test_localtree(self):
+        proj_path = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(proj_path, ".mc"))
+            os.mkdir(os.path.join(proj_path, "dir"))
+            with open(os.path.join(proj_path, "dir", "a.txt"), 'w') as f:
+                f.write("a")
+            localtree = LocalTree(proj_path)
+            localtree.connect()
+            localtree.update("/", recurs=True)
+            records = {record['path']: record for record in localtree.select_all()}
+            localtree.close()
+        finally:
+            shutil.rmtree(proj_path)
+        self.assertEqual(sorted(records), ["/", "/dir", "/dir/a.txt"])
+        self.assertIsInstance(records["/dir/a.txt"], TreeRecord)
+        self.assertEqual(records["/dir/a.txt"]['size'], 1)
+        self.assertEqual(records["/dir/a.txt"]['parent_path'], "/dir")
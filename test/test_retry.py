@@ -0,0 +1,155 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import requests
+
+import materials_commons.api as mcapi
+import materials_commons.cli.functions as clifuncs
+import materials_commons.cli.subcommands.down as down
+from benchmarks.bench import _environment, EMAIL, APIKEY
+from benchmarks.fake_server import FakeServer, synthetic_tree
+from materials_commons.cli.retry import RetryJournal, RetryPolicy, is_transient, UPLOAD, DOWNLOAD
+from materials_commons.cli.user_config import RemoteConfig
+
+
+def _error(status_code, headers=None):
+    r = requests.models.Response()
+    r.status_code = status_code
+    r.headers.update(headers or {})
+    return mcapi.MCAPIError("error " + str(status_code), r)
+
+
+class _Flaky(object):
+    """Raises the given errors in order, then returns 'ok'"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+def _policy(max_attempts=4):
+    policy = RetryPolicy(max_attempts=max_attempts, verbose=False)
+    policy.waits = []
+    policy._sleep = policy.waits.append
+    policy._random = lambda: 1.0
+    return policy
+
+
+class TestRetry(unittest.TestCase):
+
+    def test_is_transient(self):
+        self.assertTrue(is_transient(_error(502)))
+        self.assertTrue(is_transient(_error(429)))
+        self.assertTrue(is_transient(requests.exceptions.ConnectionError()))
+        self.assertFalse(is_transient(_error(404)))
+        self.assertFalse(is_transient(ValueError()))
+
+    def test_backoff(self):
+        policy = _policy()
+        fn = _Flaky([_error(502), _error(503), requests.exceptions.Timeout()])
+        self.assertEqual(policy.call(fn), 'ok')
+        self.assertEqual(fn.calls, 4)
+        self.assertEqual(policy.waits, [1.0, 2.0, 4.0])
+
+    def test_retry_after(self):
+        policy = _policy()
+        fn = _Flaky([_error(429, {'retry-after': '7'})])
+        self.assertEqual(policy.call(fn), 'ok')
+        self.assertEqual(policy.waits, [7.0])
+
+    def test_gives_up(self):
+        policy = _policy(max_attempts=2)
+        fn = _Flaky([_error(502), _error(502), _error(502)])
+        with self.assertRaises(mcapi.MCAPIError):
+            policy.call(fn)
+        self.assertEqual(fn.calls, 2)
+
+        fn = _Flaky([_error(404)])
+        with self.assertRaises(mcapi.MCAPIError):
+            policy.call(fn)
+        self.assertEqual(fn.calls, 1)
+
+    def test_already_done(self):
+        policy = _policy()
+        fn = _Flaky([_error(502)])
+        self.assertEqual(policy.call(fn, already_done=lambda: 'done'), 'done')
+        self.assertEqual(fn.calls, 1)
+
+        fn = _Flaky([_error(502)])
+        self.assertEqual(policy.call(fn, already_done=lambda: None), 'ok')
+        self.assertEqual(fn.calls, 2)
+
+    def test_journal(self):
+        proj_path = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(proj_path, ".mc"))
+            journal = RetryJournal(proj_path)
+            journal.record_failure(UPLOAD, "/A/a.txt", os.path.join(proj_path, "A", "a.txt"),
+                                   _error(502))
+            journal.record_failure(UPLOAD, "/A/b.txt", os.path.join(proj_path, "A", "b.txt"),
+                                   _error(502))
+            journal.record_failure(DOWNLOAD, "/A/a.txt", "/tmp/a.txt", _error(503), force=True)
+
+            journal = RetryJournal(proj_path)
+            self.assertEqual([e['path'] for e in journal.pending(UPLOAD)], ["/A/a.txt", "/A/b.txt"])
+            downloads = journal.pending(DOWNLOAD)
+            self.assertEqual(len(downloads), 1)
+            self.assertEqual(downloads[0]['force'], 1)
+
+            journal.record_success(UPLOAD, "/A/a.txt")
+            journal.record_success(UPLOAD, "/A/c.txt")
+            self.assertEqual([e['path'] for e in journal.pending(UPLOAD)], ["/A/b.txt"])
+            self.assertEqual(len(journal.pending(DOWNLOAD)), 1)
+
+            journal = RetryJournal(proj_path)
+            self.assertEqual([e['path'] for e in journal.pending(UPLOAD)], ["/A/b.txt"])
+        finally:
+            shutil.rmtree(proj_path)
+
+    def test_retry_failed_downloads(self):
+        tmpdir = tempfile.mkdtemp(prefix="mc-test-retry-")
+        server = FakeServer()
+        proj_id = server.create_project("proj")
+        server.populate(proj_id, synthetic_tree(8, shape='wide', fanout=2, file_size=10))
+        paths = ["/dir_0/file_0.dat", "/dir_0/file_2.dat", "/dir_1/file_1.dat", "/dir_1/file_3.dat"]
+        try:
+            with _environment(server, tmpdir):
+                remote_config = RemoteConfig(mcurl=server.base_url, email=EMAIL, mcapikey=APIKEY)
+                proj_path = clifuncs.clone_project(remote_config, proj_id, tmpdir).local_path
+                journal = RetryJournal(proj_path)
+                for path in paths:
+                    journal.record_failure(DOWNLOAD, path, proj_path + path, _error(503))
+
+                threads = set()
+                check_download_file = down._check_download_file
+
+                def _check(*args, **kwargs):
+                    threads.add(threading.current_thread().name)
+                    return check_download_file(*args, **kwargs)
+
+                with mock.patch.object(down, '_check_download_file', _check), \
+                        contextlib.redirect_stdout(io.StringIO()):
+                    down.down_subcommand(['--retry-failed', '--jobs', '4'], proj_path)
+                for path in paths:
+                    self.assertTrue(os.path.isfile(proj_path + path))
+                self.assertTrue(all(name.startswith("mc-transfer") for name in threads))
+                self.assertEqual(RetryJournal(proj_path).pending(DOWNLOAD), [])
+        finally:
+            clifuncs.invalidate_project_context()
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,205 @@
+import contextlib
+import difflib
+import io
+import os
+import random
+import re
+import shutil
+import subprocess
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+import materials_commons.api as mcapi
+import materials_commons.cli.blob_cache as blobcache
+import materials_commons.cli.functions as clifuncs
+import materials_commons.cli.stream_diff as clidiff
+import materials_commons.cli.subcommands.versions as versions
+from benchmarks.bench import APIKEY
+from benchmarks.fake_server import FakeServer, synthetic_content, synthetic_tree
+
+DOWNLOAD = "GET /projects/{id}/files/{id}/download"
+
+
+def apply_unified(a, diff):
+    """Apply a unified diff, as a list of lines, to a list of lines"""
+    result = []
+    i = 0
+    k = 2
+    while k < len(diff):
+        match = re.match(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@\n$", diff[k])
+        k += 1
+        start = int(match.group(1))
+        if match.group(2) != "0":
+            start -= 1
+        result += a[i:start]
+        i = start
+        while k < len(diff) and not diff[k].startswith("@@"):
+            tag, line = diff[k][0], diff[k][1:]
+            if tag in " -":
+                assert a[i] == line
+                i += 1
+            if tag in " +":
+                result.append(line)
+            k += 1
+    return result + a[i:]
+
+
+class TestStreamDiff(unittest.TestCase):
+
+    def _diff(self, a, b, **kwargs):
+        return list(clidiff.diff_streams(io.StringIO("".join(a)), io.StringIO("".join(b)),
+                                         fromfile="a", tofile="b", **kwargs))
+
+    def _edit(self, rng, a):
+        b = list(a)
+        for i in range(rng.randint(0, 8)):
+            k = rng.randint(0, len(b))
+            r = rng.random()
+            if r < 0.4 and k < len(b):
+                del b[k]
+            elif r < 0.7:
+                b.insert(k, "new " + str(rng.randint(0, 5)) + "\n")
+            elif k < len(b):
+                b[k] = "changed\n"
+        return b
+
+    def test_matches_difflib(self):
+        a = [str(i) + "\n" for i in range(40)]
+        b = list(a)
+        b[10] = "X\n"
+        del b[30]
+        b.append("end")
+        self.assertEqual(self._diff(a, b), list(difflib.unified_diff(a, b, "a", "b")))
+        self.assertEqual(self._diff(a, b, context=True), list(difflib.context_diff(a, b, "a", "b")))
+        self.assertEqual(self._diff(a, a), [])
+
+    def test_random_edits(self):
+        rng = random.Random(0)
+        for i in range(200):
+            a = [str(rng.randint(0, 30)) + "\n" for j in range(rng.randint(0, 60))]
+            b = self._edit(rng, a)
+            for max_memory in [clidiff.DEFAULT_MAX_MEMORY, 4000, 1]:
+                diff = self._diff(a, b, max_memory=max_memory)
+                self.assertEqual(apply_unified(a, diff), b)
+                self.assertEqual(diff == [], a == b)
+
+    def test_split_hunks_apply(self):
+        rng = random.Random(1)
+        tmpdir = tempfile.mkdtemp(prefix="mc-test-stream-diff-")
+        try:
+            n_split = 0
+            for i in range(100):
+                a = ["line " + str(j) + "\n" for j in range(rng.randint(20, 120))]
+                b = a
+                for k in range(4):
+                    b = self._edit(rng, b)
+                for max_memory in [400, 800]:
+                    diff = self._diff(a, b, max_memory=max_memory)
+                    self.assertEqual(apply_unified(a, diff), b)
+                    hunks = "".join(diff[2:]).split("@@ -")[1:]
+                    n_split += len(hunks) > sum(1 for line in difflib.unified_diff(a, b)
+                                                if line.startswith("@@"))
+                    # equal leading and trailing context, except at the start or end of the file
+                    for hunk in hunks:
+                        lines = hunk.splitlines()[1:]
+                        lead = next(k for k, line in enumerate(lines) if line[0] != ' ')
+                        trail = next(k for k, line in enumerate(reversed(lines)) if line[0] != ' ')
+                        start = int(re.match(r"^(\d+)", hunk).group(1))
+                        end = start + sum(1 for line in lines if line[0] != '+') - 1
+                        if start > 1 and end < len(a):
+                            self.assertEqual(lead, trail)
+                    if shutil.which("patch") and diff:
+                        path = os.path.join(tmpdir, "a")
+                        with open(path, 'w') as f:
+                            f.write("".join(a))
+                        result = subprocess.run(["patch", "-F0", "-s", path],
+                                                input="".join(diff), text=True,
+                                                capture_output=True)
+                        self.assertEqual(result.returncode, 0, result.stdout)
+                        with open(path) as f:
+                            self.assertEqual(f.read(), "".join(b))
+            self.assertGreater(n_split, 0)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_large(self):
+        a = ["line " + str(i) + "\n" for i in range(20000)]
+        b = list(a)
+        del b[5000:5010]
+        b[12000:12000] = ["inserted\n"] * 5
+        b[19000] = "changed\n"
+        diff = self._diff(a, b, max_memory=100000)
+        self.assertEqual(apply_unified(a, diff), b)
+        self.assertEqual(sum(1 for line in diff if line[0] in "+-"), 2 + 10 + 5 + 2)
+
+    def test_files_equal(self):
+        tmpdir = tempfile.mkdtemp(prefix="mc-test-stream-diff-")
+        try:
+            paths = [os.path.join(tmpdir, name) for name in ["a", "b", "c"]]
+            for path, content in zip(paths, [b"abc", b"abc", b"abd"]):
+                with open(path, 'wb') as f:
+                    f.write(content)
+            self.assertTrue(clidiff.files_equal(paths[0], paths[1]))
+            self.assertFalse(clidiff.files_equal(paths[0], paths[2]))
+            self.assertTrue(clidiff.files_equal(paths[0], paths[2], "x", "x"))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_parse_size(self):
+        self.assertEqual(clifuncs.parse_size("1024"), 1024)
+        self.assertEqual(clifuncs.parse_size("8K"), 8 * 1024)
+        self.assertEqual(clifuncs.parse_size("512MB"), 512 * 1024 * 1024)
+        self.assertEqual(clifuncs.parse_size(clifuncs.humanize(3 << 30)), 3 << 30)
+
+
+class TestDiffVersions(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="mc-test-diff-versions-")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_diff_versions(self):
+        server = FakeServer()
+        proj_id = server.create_project("proj")
+        server.populate(proj_id, synthetic_tree(2, shape='wide', fanout=1, file_size=3000))
+        records = []
+        for i, path in enumerate(["/dir_0/file_0.dat", "/dir_0/file_1.dat"]):
+            record = server._objects[server._by_path[(proj_id, path)]]
+            records.append({'current': '*' if i == 1 else '', 'id': record['id'],
+                            'checksum': record['checksum']})
+        proj = types.SimpleNamespace(remote=mcapi.Client(APIKEY, base_url=server.base_url),
+                                     id=proj_id, local_path=os.path.join(self.tmpdir, "proj"))
+        os.makedirs(os.path.join(proj.local_path, "dir_0"))
+        local = synthetic_content("/dir_0/file_1.dat", 3000).decode('utf-8')
+        local = local.replace("file_1.dat\n/dir_0/", "file_1.dat\nchanged\n/dir_0/", 1)
+        with open(os.path.join(proj.local_path, "dir_0", "file_1.dat"), 'w') as f:
+            f.write(local)
+
+        def diff(a, b, **kwargs):
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                versions.diff_versions(proj, "proj/dir_0/file_1.dat", a, b,
+                                       difflib.unified_diff, **kwargs)
+            return out.getvalue()
+
+        with mock.patch.object(blobcache, 'BLOB_CACHE_DIR', os.path.join(self.tmpdir, "cache")), \
+                mock.patch.object(versions, 'make_versions', return_value=records), \
+                server.installed():
+            # same checksum: nothing is downloaded
+            self.assertEqual(diff(records[0]['id'], records[0]['id']), "")
+            self.assertEqual(server.calls[DOWNLOAD], 0)
+
+            in_memory = diff('remote', 'local')
+            streamed = diff('remote', 'local', max_memory=40000)
+            self.assertEqual(in_memory, streamed)
+            self.assertEqual(in_memory.count("\n+changed\n"), 1)
+            self.assertEqual(diff('local', 'remote', max_memory=1000).count("\n-changed\n"), 1)
+            self.assertEqual(server.calls[DOWNLOAD], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
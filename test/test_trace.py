@@ -0,0 +1,89 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+
+import materials_commons.api as mcapi
+import materials_commons.cli.file_functions as filefuncs
+import materials_commons.cli.trace as clitrace
+from materials_commons.cli.retry import RetryJournal, UPLOAD
+
+
+def _json_response(content=b'{"data": {"id": 1}}', status_code=200):
+    r = requests.models.Response()
+    r.status_code = status_code
+    r._content = content
+    r.headers['content-type'] = 'application/json'
+    return r
+
+
+class TestTrace(unittest.TestCase):
+
+    def tearDown(self):
+        clitrace.stop()
+
+    def test_names(self):
+        self.assertEqual(clitrace.endpoint_name('GET', "/projects/12/directories/5/list?page=2"),
+                         "GET /projects/{id}/directories/{id}/list")
+        self.assertEqual(clitrace.statement_name("SELECT * FROM remotetree WHERE path=?"),
+                         "SELECT remotetree")
+        self.assertEqual(clitrace.statement_name("INSERT OR REPLACE INTO localtree (a) VALUES (?)"),
+                         "INSERT localtree")
+
+    def test_parse_trace_options(self):
+        self.assertEqual(clitrace.parse_trace_options(['mc', 'ls'], environ={}),
+                         (['mc', 'ls'], False, None))
+        self.assertEqual(clitrace.parse_trace_options(['mc', '--trace', 'ls'], environ={}),
+                         (['mc', 'ls'], True, None))
+        self.assertEqual(clitrace.parse_trace_options(['mc', '--trace=t.json', 'ls'], environ={}),
+                         (['mc', 'ls'], True, 't.json'))
+        self.assertEqual(clitrace.parse_trace_options(['mc', 'ls'], environ={'MC_TRACE': '1'}),
+                         (['mc', 'ls'], True, None))
+
+    def test_http(self):
+        original = mcapi.Client._get
+        client = mcapi.Client("apikey", base_url="https://example.org/api")
+        with mock.patch('materials_commons.api.client.requests.get',
+                        return_value=_json_response()):
+            out = io.StringIO()
+            with clitrace.tracing(out=out) as tracer:
+                self.assertEqual(client._get("/projects/12/directories/5"), {"id": 1})
+                self.assertEqual(client._get("/projects/12/directories/6"), {"id": 1})
+        self.assertIs(mcapi.Client._get, original)
+
+        rows = tracer.summary()
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['name'], "GET /projects/{id}/directories/{id}")
+        self.assertEqual(rows[0]['calls'], 2)
+        self.assertEqual(rows[0]['bytes'], 2 * len(b'{"data": {"id": 1}}'))
+        self.assertIn("API requests", out.getvalue())
+
+        trace = tracer.chrome_trace()
+        self.assertEqual(len(trace['traceEvents']), 2)
+        self.assertEqual(trace['traceEvents'][0]['ph'], 'X')
+        self.assertEqual(trace['traceEvents'][0]['args']['status'], 200)
+
+    def test_sqlite_and_cache(self):
+        proj_path = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(proj_path, ".mc"))
+            with clitrace.tracing(out=io.StringIO()) as tracer:
+                journal = RetryJournal(proj_path)
+                journal.record_failure(UPLOAD, "/a.txt", os.path.join(proj_path, "a.txt"), "error")
+                self.assertEqual(len(journal.pending(UPLOAD)), 1)
+
+                memo = filefuncs.LookupMemo()
+                memo.get_by_path(1, "/a", lambda: None)
+                memo.get_by_path(1, "/a", lambda: None)
+        finally:
+            shutil.rmtree(proj_path)
+
+        rows = {(row['cat'], row['name']): row for row in tracer.summary()}
+        self.assertIn(('sqlite', "INSERT retryjournal"), rows)
+        self.assertIn(('sqlite', "SELECT retryjournal"), rows)
+        cache = rows[('cache', 'get_by_path')]
+        self.assertEqual((cache['hits'], cache['misses']), (1, 1))
@@ -0,0 +1,143 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import materials_commons.api as mcapi
+import materials_commons.cli.subcommands.down as down
+import materials_commons.cli.tree_functions as treefuncs
+from materials_commons.cli.rate_limit import TransferPool
+from materials_commons.cli.transfer_plan import TransferPlan, DONE, PENDING
+
+
+class _Remote(object):
+    """Accepts uploads, until `crash_after` uploads have been made, and downloads"""
+
+    def __init__(self, crash_after=None):
+        self.crash_after = crash_after
+        self.uploaded = []
+        self.directory_ids = []
+        self.downloaded = []
+
+    def upload_file(self, project_id, directory_id, local_abspath):
+        if self.crash_after is not None and len(self.uploaded) >= self.crash_after:
+            raise KeyboardInterrupt()
+        self.uploaded.append(os.path.basename(local_abspath))
+        self.directory_ids.append(directory_id)
+        return mcapi.File(data={'id': len(self.uploaded), 'name': os.path.basename(local_abspath),
+                                'mime_type': 'text/plain', 'directory_id': directory_id})
+
+    def download_file(self, project_id, file_id, to):
+        self.downloaded.append(file_id)
+        with open(to, 'w') as f:
+            f.write("downloaded")
+
+
+class _Project(object):
+
+    def __init__(self, local_path, remote):
+        self.id = 1
+        self.local_path = local_path
+        self.remote = remote
+
+
+class TestTransferPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.proj_path = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.proj_path, ".mc"))
+        self.actions = []
+        for name in ["a.txt", "b.txt", "c.txt"]:
+            local_abspath = os.path.join(self.proj_path, name)
+            with open(local_abspath, 'w') as f:
+                f.write(name)
+            self.actions.append({'path': "/" + name, 'local_abspath': local_abspath,
+                                 'remote_id': 10, 'size': 5})
+
+    def tearDown(self):
+        shutil.rmtree(self.proj_path)
+
+    def test_save_and_mark(self):
+        plan = TransferPlan(self.proj_path, 'upload')
+        plan.save(self.actions)
+        self.assertEqual([a['path'] for a in plan.pending()], ["/a.txt", "/b.txt", "/c.txt"])
+
+        plan.mark(plan.pending()[0])
+        plan = TransferPlan(self.proj_path, 'upload')
+        self.assertEqual([a['path'] for a in plan.pending()], ["/b.txt", "/c.txt"])
+        self.assertEqual(plan.summary(), {DONE: (1, 5), PENDING: (2, 10)})
+
+        # plans for other operations are separate, saving replaces the plan
+        self.assertEqual(TransferPlan(self.proj_path, 'download').pending(), [])
+        plan.save(self.actions[:1])
+        self.assertEqual([a['path'] for a in plan.pending()], ["/a.txt"])
+
+    def test_resume_after_crash(self):
+        plan = TransferPlan(self.proj_path, 'upload')
+        plan.save(self.actions)
+
+        remote = _Remote(crash_after=2)
+        proj = _Project(self.proj_path, remote)
+        with self.assertRaises(KeyboardInterrupt):
+            treefuncs.execute_upload_plan(proj, plan, self.proj_path)
+        self.assertEqual(remote.uploaded, ["a.txt", "b.txt"])
+
+        remote = _Remote()
+        proj = _Project(self.proj_path, remote)
+        file_results, error_results = treefuncs.execute_upload_plan(proj, plan, self.proj_path)
+        self.assertEqual(remote.uploaded, ["c.txt"])
+        self.assertEqual(len(file_results), 1)
+        self.assertEqual(plan.pending(), [])
+
+    def test_missing_parents_created_once(self):
+        actions = []
+        for i in range(6):
+            local_abspath = os.path.join(self.proj_path, "f" + str(i) + ".txt")
+            with open(local_abspath, 'w') as f:
+                f.write("x")
+            actions.append({'path': "/d" + str(i % 2) + "/sub/f" + str(i) + ".txt",
+                            'local_abspath': local_abspath, 'remote_id': None, 'size': 1})
+        plan = TransferPlan(self.proj_path, 'upload')
+        plan.save(actions)
+
+        created = []
+
+        def mkdir(proj, path, **kwargs):
+            created.append((path, threading.current_thread() is threading.main_thread()))
+            return mcapi.File(data={'id': 100 + len(created), 'path': path,
+                                    'mime_type': 'directory'})
+
+        remote = _Remote()
+        proj = _Project(self.proj_path, remote)
+        with mock.patch.object(treefuncs, 'mkdir', mkdir), TransferPool(4) as pool:
+            file_results, error_results = treefuncs.execute_upload_plan(
+                proj, plan, self.proj_path, pool=pool)
+        self.assertEqual(created, [("/d0/sub", True), ("/d1/sub", True)])
+        self.assertEqual(len(file_results), 6)
+        self.assertEqual(sorted(remote.directory_ids), [101] * 3 + [102] * 3)
+
+    def test_download_plan_overwrite(self):
+        actions = [{'path': a['path'], 'local_abspath': a['local_abspath'], 'remote_id': i,
+                    'size': 5, 'force': False} for i, a in enumerate(self.actions)]
+        os.remove(actions[2]['local_abspath'])
+        plan = TransferPlan(self.proj_path, 'download')
+        plan.save(actions)
+
+        remote = _Remote()
+        proj = _Project(self.proj_path, remote)
+        prompts = []
+
+        def confirm(prompt):
+            prompts.append(threading.current_thread() is threading.main_thread())
+            return 'y' if len(prompts) == 1 else 'n'
+
+        with mock.patch('builtins.input', confirm), TransferPool(4) as pool:
+            self.assertFalse(down.execute_download_plan(proj, plan, self.proj_path, pool=pool))
+        self.assertEqual(prompts, [True, True])
+        self.assertEqual(sorted(remote.downloaded), [0, 2])
+        # the declined overwrite is left pending
+        self.assertEqual([a['path'] for a in plan.pending()], ["/b.txt"])
+        with open(actions[1]['local_abspath']) as f:
+            self.assertEqual(f.read(), "b.txt")
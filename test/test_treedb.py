@@ -1,10 +1,17 @@
 import os
+import shutil
+import tempfile
 import unittest
 
 import materials_commons.api as mcapi
 
+import materials_commons.cli.functions as clifuncs
+from benchmarks.bench import _environment, APIKEY, EMAIL
+from benchmarks.fake_server import FakeServer, synthetic_tree
 from materials_commons.cli.file_functions import isfile, isdir
-from materials_commons.cli.treedb import LocalTree, RemoteTree
+from materials_commons.cli.subcommands.fetch import fetch_subcommand
+from materials_commons.cli.treedb import LocalTree, RemoteTree, project_change_marker
+from materials_commons.cli.user_config import RemoteConfig
 
 from .cli_test_project import make_basic_project_1, test_project_directory, remove_if
 
@@ -204,3 +211,99 @@ class TestTreeTable(unittest.TestCase):
         # clean up
         basic_project_1.clean_files()
         client.delete_project(proj.id)
+
+
+class TestRemoteTreeChangeMarker(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="mc-test-marker-")
+
+    def tearDown(self):
+        clifuncs.invalidate_project_context()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _update(self, proj_path, path):
+        """Update path in a new auto-lock RemoteTree, as a new command would"""
+        clifuncs.invalidate_project_context()
+        proj = clifuncs.make_local_project(proj_path)
+        remotetree = RemoteTree(proj, None, auto_lock=True)
+        remotetree.connect()
+        try:
+            remotetree.update(path, get_children=True)
+            return {record['path']: record for record in remotetree.select_by_parent_path(path)}
+        finally:
+            remotetree.close()
+
+    def test_auto_lock(self):
+        server = FakeServer()
+        proj_id = server.create_project("proj")
+        server.populate(proj_id, synthetic_tree(4, shape='wide', fanout=2, file_size=10))
+        list_endpoint = "GET /projects/{id}/directories/{id}/list"
+        with _environment(server, self.tmpdir):
+            remote_config = RemoteConfig(mcurl=server.base_url, email=EMAIL, mcapikey=APIKEY)
+            proj_path = clifuncs.clone_project(remote_config, proj_id, self.tmpdir).local_path
+            server.age(3600)
+
+            self.assertEqual(sorted(self._update(proj_path, "/dir_0")),
+                             ["/dir_0/file_0.dat", "/dir_0/file_2.dat"])
+            self.assertEqual(server.calls[list_endpoint], 1)
+
+            # unchanged marker: served from the cache, reusing the project request for the marker
+            server.calls.clear()
+            self._update(proj_path, "/dir_0")
+            self.assertEqual(dict(server.calls), {"GET /projects/{id}": 1,
+                                                  "GET /projects/{id}/file-changes-since": 1})
+
+            # changed marker: updated from the remote
+            server.populate(proj_id, ([], [("/dir_0/new.dat", 10)]))
+            self.assertIn("/dir_0/new.dat", self._update(proj_path, "/dir_0"))
+            self.assertEqual(server.calls[list_endpoint], 1)
+
+    def test_fetch_records_marker(self):
+        server = FakeServer()
+        proj_id = server.create_project("proj")
+        server.populate(proj_id, synthetic_tree(4, shape='wide', fanout=2, file_size=10))
+        with _environment(server, self.tmpdir):
+            remote_config = RemoteConfig(mcurl=server.base_url, email=EMAIL, mcapikey=APIKEY)
+            proj_path = clifuncs.clone_project(remote_config, proj_id, self.tmpdir).local_path
+            fetch_subcommand(['--auto-lock'], proj_path)
+            server.populate(proj_id, ([], [("/dir_0/new.dat", 10)]))
+            server.age(3600)
+            clifuncs.invalidate_project_context()
+            fetch_subcommand(['-r', 'dir_0'], proj_path)
+
+            # the marker seen by `mc fetch` is recorded, so the fetched data is used
+            server.calls.clear()
+            self.assertIn("/dir_0/new.dat", self._update(proj_path, "/dir_0"))
+            self.assertEqual(dict(server.calls), {"GET /projects/{id}": 1,
+                                                  "GET /projects/{id}/file-changes-since": 1})
+
+    def test_same_size_change(self):
+        server = FakeServer()
+        proj_id = server.create_project("proj")
+        server.populate(proj_id, synthetic_tree(4, shape='wide', fanout=2, file_size=10))
+        list_endpoint = "GET /projects/{id}/directories/{id}/list"
+        with _environment(server, self.tmpdir):
+            remote_config = RemoteConfig(mcurl=server.base_url, email=EMAIL, mcapikey=APIKEY)
+            proj_path = clifuncs.clone_project(remote_config, proj_id, self.tmpdir).local_path
+            server.age(3600)
+            old_id = self._update(proj_path, "/dir_0")["/dir_0/file_0.dat"]['id']
+
+            # replace a file with contents of the same size, without changing the project
+            # 'updated_at', so that the marker is unchanged
+            proj = dict(server._projects[proj_id])
+            server.populate(proj_id, ([], [("/dir_0/file_0.dat", 10)]))
+            server._projects[proj_id].update(proj)
+
+            server.calls.clear()
+            new_id = self._update(proj_path, "/dir_0")["/dir_0/file_0.dat"]['id']
+            self.assertNotEqual(new_id, old_id)
+            self.assertEqual(server.calls[list_endpoint], 1)
+
+    def test_marker(self):
+        self.assertIsNone(project_change_marker({'name': 'proj'}))
+        a = project_change_marker({'updated_at': "2023-01-01T00:00:00.000000Z", 'file_count': 2})
+        b = project_change_marker({'file_count': 2, 'updated_at': "2023-01-01T00:00:00.000000Z"})
+        c = project_change_marker({'updated_at': "2023-01-01T00:00:00.000000Z", 'file_count': 3})
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
@@ -0,0 +1,81 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+import materials_commons.cli.version_check as version_check
+
+
+class TestVersionCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.orig_cache_file = version_check.CLI_VERSION_CACHE_FILE
+        version_check.CLI_VERSION_CACHE_FILE = os.path.join(self.tmpdir.name, "sub", ".cli-version-cache.json")
+
+    def tearDown(self):
+        version_check.CLI_VERSION_CACHE_FILE = self.orig_cache_file
+        self.tmpdir.cleanup()
+
+    def test_missing_cache(self):
+        self.assertEqual(version_check.read_version_cache(), {})
+        self.assertEqual(version_check.should_check_version(), True)
+
+    def test_update_version_cache(self):
+        version_check.update_version_cache("99.0.0")
+        cache = version_check.read_version_cache()
+        self.assertEqual(cache['latest_version'], "99.0.0")
+        self.assertEqual(version_check.should_check_version(cache), False)
+
+        cache['last_check'] = (datetime.now() - timedelta(days=2)).isoformat()
+        with open(version_check.CLI_VERSION_CACHE_FILE, 'w') as f:
+            json.dump(cache, f)
+        self.assertEqual(version_check.should_check_version(), True)
+
+    def test_failed_check(self):
+        with mock.patch.object(version_check, 'fetch_latest_version', side_effect=OSError("down")):
+            self.assertEqual(version_check.main(), 1)
+        cache = version_check.read_version_cache()
+        self.assertIsNone(cache['latest_version'])
+        self.assertEqual(version_check.should_check_version(cache), False)
+
+        version_check.update_version_cache("99.0.0")
+        with mock.patch.object(version_check, 'fetch_latest_version', side_effect=OSError("down")):
+            self.assertEqual(version_check.main(), 1)
+        self.assertEqual(version_check.read_version_cache()['latest_version'], "99.0.0")
+
+    def test_print_upgrade_notice(self):
+        installed_version = version_check.current_version()
+        if installed_version is None:
+            self.skipTest("materials-commons-cli is not installed")
+
+        out = io.StringIO()
+        version_check.print_upgrade_notice({'latest_version': installed_version}, out=out)
+        self.assertEqual(out.getvalue(), "")
+
+        out = io.StringIO()
+        version_check.print_upgrade_notice({'latest_version': "99.0.0"}, out=out)
+        self.assertIn("A newer version is available (99.0.0)", out.getvalue())
+
+    def test_notice_once_per_interval(self):
+        version_check.update_version_cache("99.0.0")
+        out = io.StringIO()
+        with mock.patch.object(version_check, 'current_version', return_value="1.0.0"), \
+                mock.patch.object(version_check, 'start_background_check') as start, \
+                mock.patch.dict(os.environ, {'MC_NO_VERSION_CHECK': ''}), \
+                mock.patch('sys.stderr', out):
+            version_check.check_package_version()
+            version_check.check_package_version()
+            self.assertEqual(out.getvalue().count("A newer version is available"), 1)
+
+            cache = version_check.read_version_cache()
+            cache['last_notice'] = (datetime.now() - timedelta(days=2)).isoformat()
+            with open(version_check.CLI_VERSION_CACHE_FILE, 'w') as f:
+                json.dump(cache, f)
+            version_check.check_package_version()
+            self.assertEqual(out.getvalue().count("A newer version is available"), 2)
+        start.assert_not_called()
+        self.assertEqual(version_check.read_version_cache()['latest_version'], "99.0.0")
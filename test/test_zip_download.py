@@ -0,0 +1,126 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+import materials_commons.api as mcapi
+import materials_commons.cli.functions as clifuncs
+import materials_commons.cli.offline as clioffline
+import materials_commons.cli.trace as clitrace
+import materials_commons.cli.zip_download as clizip
+from benchmarks.bench import _environment, APIKEY
+from benchmarks.fake_server import FakeServer, synthetic_tree
+from materials_commons.cli.exceptions import MCCLIException
+from materials_commons.cli.rate_limit import RateLimiter, install_rate_limiter
+from materials_commons.cli.subcommands.dataset import DatasetSubcommand
+
+DOWNLOAD = "GET /published/datasets/{id}/download_zipfile"
+
+
+class TestZipDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="mc-test-zip-download-")
+
+    def tearDown(self):
+        clifuncs.invalidate_project_context()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _server(self, n_datasets=1):
+        server = FakeServer()
+        proj_id = server.create_project("proj")
+        server.populate(proj_id, synthetic_tree(12, shape='wide', fanout=3, file_size=2000))
+        dataset_ids = []
+        for i in range(n_datasets):
+            dataset_id = server.create_dataset(proj_id, "ds_" + str(i), {
+                'include_dirs': ["/dir_" + str(i)]})
+            server.publish_dataset(dataset_id)
+            dataset_ids.append(dataset_id)
+        return server, dataset_ids
+
+    def test_download_ranged(self):
+        server, (dataset_id,) = self._server()
+        expected = server._zipfiles[dataset_id]
+        to = os.path.join(self.tmpdir, "ds.zip")
+        with _environment(server, self.tmpdir):
+            client = mcapi.Client(APIKEY, base_url=server.base_url)
+            size = clizip.download_dataset_zipfile(client, dataset_id, to, connections=3,
+                                                   part_size=1000)
+        self.assertEqual(size, len(expected))
+        with open(to, 'rb') as f:
+            self.assertEqual(f.read(), expected)
+        self.assertEqual(server.calls[DOWNLOAD], -(-len(expected) // 1000))
+
+    def test_offline_traced_and_rate_limited(self):
+        server, (dataset_id,) = self._server()
+        to = os.path.join(self.tmpdir, "ds.zip")
+        with _environment(server, self.tmpdir):
+            client = mcapi.Client(APIKEY, base_url=server.base_url)
+            with clioffline.offline():
+                with self.assertRaises(clioffline.OfflineError):
+                    clizip.download_dataset_zipfile(client, dataset_id, to)
+            self.assertEqual(server.calls[DOWNLOAD], 0)
+
+            limiter = RateLimiter(jobs=2)
+            acquired = []
+            acquire = limiter.acquire
+            limiter.acquire = lambda: acquired.append(1) or acquire()
+            install_rate_limiter(client, limiter)
+            with clitrace.tracing(out=io.StringIO()) as tracer:
+                clizip.download_dataset_zipfile(client, dataset_id, to, connections=2,
+                                                part_size=1000)
+        rows = {(row['cat'], row['name']): row for row in tracer.summary()}
+        self.assertEqual(rows[('http', DOWNLOAD)]['calls'], server.calls[DOWNLOAD])
+        self.assertEqual(rows[('http', DOWNLOAD)]['bytes'], len(server._zipfiles[dataset_id]))
+        self.assertEqual(len(acquired), server.calls[DOWNLOAD])
+        self.assertEqual(limiter.concurrency.in_flight, 0)
+
+    def test_extract(self):
+        zip_path = os.path.join(self.tmpdir, "ds.zip")
+        with zipfile.ZipFile(zip_path, 'w') as zf:
+            zf.writestr("a/x.txt", b"x" * 100)
+            zf.writestr("a/y.txt", b"y" * 100)
+            zf.writestr("z.txt", b"z")
+        dest = os.path.join(self.tmpdir, "ds")
+        self.assertEqual(clizip.extract_zipfile(zip_path, dest), (["a/x.txt", "a/y.txt", "z.txt"], []))
+        with open(os.path.join(dest, "a", "y.txt"), 'wb') as f:
+            f.write(b"Y" * 100)
+        self.assertEqual(clizip.extract_zipfile(zip_path, dest), (["a/y.txt"], ["a/x.txt", "z.txt"]))
+        with open(os.path.join(dest, "a", "y.txt"), 'rb') as f:
+            self.assertEqual(f.read(), b"y" * 100)
+
+        with zipfile.ZipFile(zip_path, 'w') as zf:
+            zf.writestr("../escape.txt", b"x")
+        with self.assertRaises(zipfile.BadZipFile):
+            clizip.extract_zipfile(zip_path, dest)
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, "escape.txt")))
+
+    def test_dataset_down(self):
+        server, dataset_ids = self._server(n_datasets=3)
+        with _environment(server, self.tmpdir):
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                DatasetSubcommand()(['--all', '--down', '--extract', '--down-jobs', '3'], self.tmpdir)
+            for dataset_id in dataset_ids:
+                uuid = server._datasets[dataset_id]['uuid']
+                with open(os.path.join(self.tmpdir, "dataset." + uuid + ".zip"), 'rb') as f:
+                    self.assertEqual(f.read(), server._zipfiles[dataset_id])
+                self.assertEqual(len(os.listdir(os.path.join(self.tmpdir, "dataset." + uuid))), 1)
+            self.assertEqual(out.getvalue().count("extracted 4 file(s), 0 unchanged"), 3)
+
+            # a failed download is reported, and does not stop the others
+            del server._zipfiles[dataset_ids[0]]
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                with self.assertRaises(MCCLIException):
+                    DatasetSubcommand()(['--all', '--down', '--down-jobs', '2'], self.tmpdir)
+            uuid = server._datasets[dataset_ids[0]]['uuid']
+            self.assertIn("dataset." + uuid + ".zip: FAILED", out.getvalue())
+            self.assertEqual(out.getvalue().count(": DONE"), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()